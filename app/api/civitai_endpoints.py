@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
 from pydantic import BaseModel
 
-from ..core.civitai_api import CivitaiAPI
-from ..core.settings import Settings
+from ..core.async_civitai_api import AsyncCivitaiAPI
+from ..core.settings import Settings, get_settings_service
 import logging
 
 # 配置日志
@@ -21,30 +21,33 @@ class ApiKeyRequest(BaseModel):
 
 # 获取全局设置
 def get_settings():
-    return Settings()
+    return get_settings_service().get()
 
 
-# 获取 API 客户端
-def get_api_client(settings: Settings = Depends(get_settings)):
-    return CivitaiAPI(settings=settings)
+# 获取 API 客户端，请求结束后关闭连接池
+async def get_api_client(settings: Settings = Depends(get_settings)):
+    api_client = AsyncCivitaiAPI(settings=settings)
+    try:
+        yield api_client
+    finally:
+        await api_client.aclose()
 
 
 @router.post("/api-key")
-async def set_api_key(request: ApiKeyRequest):
+async def set_api_key(request: ApiKeyRequest, settings: Settings = Depends(get_settings)):
     """设置 Civitai API 密钥"""
-    settings = Settings()
     settings.api_key = request.api_key
-    settings.save()
+    get_settings_service().save(settings)
     logger.info("API 密钥已更新")
     return {"status": "success", "message": "API 密钥已设置"}
 
 
 @router.get("/test-connection")
-async def test_connection(api_client: CivitaiAPI = Depends(get_api_client)):
+async def test_connection(api_client: AsyncCivitaiAPI = Depends(get_api_client)):
     """测试到 Civitai API 的连接"""
     try:
         # 尝试获取任何模型
-        result = api_client.search_models(page=1, page_size=1)
+        result = await api_client.search_models(page=1, page_size=1)
 
         if result and "items" in result and len(result["items"]) > 0:
             # 连接成功且返回结果
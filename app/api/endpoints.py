@@ -1,21 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Response
-from fastapi.responses import JSONResponse
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    BackgroundTasks,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional, Dict
 import os
 import json
 import time
+import asyncio
 import uuid
 import logging
 
 from ..core.civitai_api import CivitaiAPI
+from ..core.async_civitai_api import AsyncCivitaiAPI
 from ..core.download_manager import DownloadManager
-from ..core.settings import Settings
+from ..core.download_events import DownloadEventHub, task_filter
+from ..core.replay import transports_from_env
+from ..core import fast_json
+from ..core.settings import Settings, get_settings_service
+from ..core.library_index import get_library_index
 from ..models.api_models import (
     SettingsUpdate,
     SettingsResponse,
     SearchResults,
     Model,
     ModelVersion,
+    BulkModelsRequest,
     DownloadRequest,
     DownloadTask,
 )
@@ -29,27 +47,56 @@ logger = logging.getLogger("endpoints")
 # Create the router
 router = APIRouter()
 
-# Initialize global settings instance for the app
-_settings_instance = None
-
+# Shared async API client, so its connection pool is reused across requests
+_api_client_instance = None
+_api_client_service = None
 
-# Dependency for getting API client
-def get_api_client():
-    settings = Settings()
-    return CivitaiAPI(settings=settings)
+# Shared download manager, so the queue and download thread survive across requests
+_download_manager_instance = None
+_download_manager_service = None
 
-
-# Dependency for getting download manager
-def get_download_manager(api_client: CivitaiAPI = Depends(get_api_client)):
-    return DownloadManager(api_client=api_client)
+# Pushes download progress of the shared manager to streaming clients
+_event_hub_instance = None
 
 
 # Dependency for getting settings
 def get_settings():
-    global _settings_instance
-    if _settings_instance is None:
-        _settings_instance = Settings()
-    return _settings_instance
+    return get_settings_service().get()
+
+
+# Dependency for getting API client
+# Settings changes reach the shared instances through apply_settings(), so they
+# are only rebuilt for a new settings service
+def get_api_client(settings: Settings = Depends(get_settings)):
+    global _api_client_instance, _api_client_service
+    service = get_settings_service()
+    if _api_client_instance is None or _api_client_service is not service:
+        _api_client_instance = AsyncCivitaiAPI(
+            settings=settings, transport=transports_from_env()[1]
+        )
+        _api_client_service = service
+    return _api_client_instance
+
+
+# Dependency for getting download manager
+def get_download_manager(settings: Settings = Depends(get_settings)):
+    global _download_manager_instance, _download_manager_service
+    service = get_settings_service()
+    if _download_manager_instance is None or _download_manager_service is not service:
+        _download_manager_instance = DownloadManager(settings=settings)
+        _download_manager_service = service
+    return _download_manager_instance
+
+
+# Dependency for getting the download event hub
+def get_event_hub(download_manager: DownloadManager = Depends(get_download_manager)):
+    global _event_hub_instance
+    if (
+        _event_hub_instance is None
+        or _event_hub_instance.source != download_manager.snapshot_downloads
+    ):
+        _event_hub_instance = DownloadEventHub(download_manager.snapshot_downloads)
+    return _event_hub_instance
 
 
 @router.get("/settings")
@@ -72,7 +119,10 @@ def update_settings(
     settings.update(update_dict)
 
     # Save to file
-    settings.save()
+    get_settings_service().save(settings)
+
+    # The shared API client and download manager are subscribed to the settings
+    # service and pick up the new values in place
 
     # Recreate directories if model_dir was updated
     try:
@@ -87,7 +137,8 @@ def update_settings(
 
 
 @router.get("/models/search")
-def search_models(
+async def search_models(
+    background_tasks: BackgroundTasks,
     query: Optional[str] = None,
     type: Optional[str] = None,
     base_model: Optional[str] = None,
@@ -95,16 +146,16 @@ def search_models(
     page: int = 1,
     page_size: int = 20,
     nsfw: Optional[bool] = None,
-    api_client: CivitaiAPI = Depends(get_api_client),
+    cursor: Optional[str] = None,
+    api_client: AsyncCivitaiAPI = Depends(get_api_client),
+    settings: Settings = Depends(get_settings),
 ):
     """Search for models on Civitai"""
     # Get settings for NSFW if not specified
     if nsfw is None:
-        settings = Settings()
         nsfw = settings.show_nsfw
 
-    # Perform the search
-    results = api_client.search_models(
+    search_kwargs = dict(
         query=query,
         type=type,
         base_model=base_model,
@@ -113,6 +164,11 @@ def search_models(
         page_size=page_size,
         nsfw=nsfw,
     )
+    if cursor:
+        search_kwargs["cursor"] = cursor
+
+    # Perform the search
+    results = await api_client.search_models(**search_kwargs)
 
     if not results:
         # Return an empty result set instead of an error
@@ -126,10 +182,14 @@ def search_models(
             },
         }
 
-    # Make sure required fields exist in the response
+    # Make sure required fields exist in the response. The result is shared
+    # with the search cache, so fill them in on a copy
+    results = dict(results)
     if "items" not in results:
         results["items"] = []
-    if "metadata" not in results:
+    if "metadata" in results:
+        results["metadata"] = dict(results["metadata"])
+    else:
         results["metadata"] = {
             "totalItems": len(results.get("items", [])),
             "currentPage": page,
@@ -137,15 +197,34 @@ def search_models(
             "totalPages": 1,
         }
     if "totalPages" not in results["metadata"]:
-        results["metadata"]["totalPages"] = 1
+        # Cursor-paginated results only say whether another page exists
+        has_next = bool(results["metadata"].get("nextPage"))
+        results["metadata"]["totalPages"] = page + 1 if has_next else max(page, 1)
+
+    # Prefetch the next page into the search cache after the response is sent
+    next_kwargs = api_client.next_search_kwargs(results, **search_kwargs)
+    if next_kwargs:
+        background_tasks.add_task(api_client.search_models, **next_kwargs)
 
     return results
 
 
+@router.post("/models/bulk", response_model=dict)
+async def get_models_bulk(
+    request: BulkModelsRequest, api_client: AsyncCivitaiAPI = Depends(get_api_client)
+):
+    """Get details for many models with batched Civitai requests"""
+    models = await api_client.get_models_bulk(request.ids)
+    missing = [model_id for model_id in dict.fromkeys(request.ids) if model_id not in models]
+    return {"models": models, "missing": missing}
+
+
 @router.get("/models/{model_id}")
-def get_model(model_id: int, api_client: CivitaiAPI = Depends(get_api_client)):
+async def get_model(
+    model_id: int, api_client: AsyncCivitaiAPI = Depends(get_api_client)
+):
     """Get details for a specific model"""
-    model = api_client.get_model(model_id)
+    model = await api_client.get_model(model_id)
 
     if not model:
         raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
@@ -164,9 +243,11 @@ def get_model(model_id: int, api_client: CivitaiAPI = Depends(get_api_client)):
 
 
 @router.get("/models/{model_id}/versions")
-def get_model_versions(model_id: int, api_client: CivitaiAPI = Depends(get_api_client)):
+async def get_model_versions(
+    model_id: int, api_client: AsyncCivitaiAPI = Depends(get_api_client)
+):
     """Get all versions for a specific model"""
-    versions = api_client.get_model_versions(model_id)
+    versions = await api_client.get_model_versions(model_id)
 
     if versions is None:
         raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
@@ -183,24 +264,25 @@ def get_model_versions(model_id: int, api_client: CivitaiAPI = Depends(get_api_c
     return versions
 
 
-@router.post("/downloads", response_model=dict)
-async def create_download(
-    download_request: DownloadRequest,
-    api_client: CivitaiAPI = Depends(get_api_client),
-    download_manager: DownloadManager = Depends(get_download_manager),
-):
-    """Create a download task and add it to the queue"""
+# Downloads are switched off while the feature is under construction
+DOWNLOADS_ENABLED = False
+
+DOWNLOADS_DISABLED = {
+    "status": "disabled",
+    "message": "Downloads are temporarily disabled. This feature is under construction.",
+    "model_name": "Download Disabled",
+    "id": "disabled",
+}
 
-    # Check if downloads are disabled
-    return {
-        "status": "disabled",
-        "message": "Downloads are temporarily disabled. This feature is under construction.",
-        "model_name": "Download Disabled",
-        "id": "disabled",
-    }
 
+async def enqueue_download(
+    download_request: DownloadRequest,
+    api_client: AsyncCivitaiAPI,
+    download_manager: DownloadManager,
+):
+    """Resolve the requested file and add a download task for it to the queue"""
     # Get model data
-    model = api_client.get_model(download_request.model_id)
+    model = await api_client.get_model(download_request.model_id)
     if not model:
         raise HTTPException(
             status_code=404, detail=f"Model {download_request.model_id} not found"
@@ -249,183 +331,305 @@ async def create_download(
         subfolder=download_request.subfolder,
     )
 
-    # Record current state
-    print(f"Queue length before creating download task: {len(download_manager.queue)}")
-    print(
-        f"Recent downloads length before creating task: {len(download_manager.recent_downloads)}"
+    # Add to queue and recent downloads list (this method uses a thread lock internally)
+    print(f"Creating download task: {task['model_name']} - {task['filename']}")
+    added_task = await run_in_threadpool(download_manager.add_to_queue, task)
+    print(f"Queue status after addition: {len(download_manager.queue)} tasks")
+
+    # Return the added task to ensure the frontend receives task information immediately
+    return added_task or task
+
+
+@router.post("/downloads", response_model=dict)
+async def create_download(
+    download_request: DownloadRequest,
+    api_client: AsyncCivitaiAPI = Depends(get_api_client),
+    download_manager: DownloadManager = Depends(get_download_manager),
+):
+    """Create a download task and add it to the queue"""
+
+    # Check if downloads are disabled
+    if not DOWNLOADS_ENABLED:
+        return dict(DOWNLOADS_DISABLED)
+
+    return await enqueue_download(download_request, api_client, download_manager)
+
+
+@router.get("/downloads/stream")
+async def stream_downloads(
+    active_only: bool = False,
+    task_id: Optional[str] = None,
+    hub: DownloadEventHub = Depends(get_event_hub),
+):
+    """Stream download progress as Server-Sent Events"""
+    return StreamingResponse(
+        hub.stream(task_filter(active_only, task_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    # Create a simple progress callback function to update download status and ensure updates are correctly passed to the frontend
-    def progress_callback(updated_task):
-        # Ensure the current task is updated
-        with download_manager._tasks_lock:
-            # Update the task in the queue (if it exists)
-            for task in download_manager.queue:
-                if task["id"] == updated_task["id"]:
-                    task.update(
-                        {
-                            "progress": updated_task["progress"],
-                            "download_speed": updated_task.get("download_speed", 0),
-                            "eta": updated_task.get("eta", 0),
-                            "status": updated_task["status"],
-                        }
-                    )
-                    break
-
-            # Update the current download task (if it matches)
-            if (
-                download_manager.current_download
-                and download_manager.current_download["id"] == updated_task["id"]
-            ):
-                download_manager.current_download.update(
-                    {
-                        "progress": updated_task["progress"],
-                        "download_speed": updated_task.get("download_speed", 0),
-                        "eta": updated_task.get("eta", 0),
-                        "status": updated_task["status"],
-                    }
+
+async def _socket_command(message, api_client, download_manager, hub, subscriber):
+    """Run one command received on the download socket and return its result"""
+    op = message.get("op")
+
+    if op == "subscribe":
+        subscriber.matches = task_filter(
+            bool(message.get("active_only")), message.get("task_id")
+        )
+        return {"tasks": hub.snapshot(subscriber)}
+
+    if op == "status":
+        if message.get("task_id"):
+            task = await run_in_threadpool(
+                download_manager.get_download_status, message["task_id"]
+            )
+            if task is None:
+                raise HTTPException(status_code=404, detail="Download task not found")
+            return task
+        return await run_in_threadpool(download_manager.snapshot_downloads)
+
+    if op == "enqueue":
+        if not DOWNLOADS_ENABLED:
+            return dict(DOWNLOADS_DISABLED)
+        download_request = DownloadRequest(**(message.get("download") or {}))
+        return await enqueue_download(download_request, api_client, download_manager)
+
+    if op == "clear_history":
+        await run_in_threadpool(download_manager.clear_history)
+        return {"status": "success"}
+
+    task_id = message.get("task_id")
+    if op == "cancel":
+        done = await run_in_threadpool(download_manager.remove_from_queue, task_id)
+    elif op == "pause":
+        done = await run_in_threadpool(download_manager.pause_task, task_id)
+    elif op == "resume":
+        done = await run_in_threadpool(download_manager.resume_task, task_id)
+    elif op == "reorder":
+        done = await run_in_threadpool(
+            download_manager.move_task, task_id, int(message.get("position", 0))
+        )
+    else:
+        raise ValueError(f"Unknown operation: {op}")
+
+    if not done:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Cannot {op} download task {task_id}",
+        )
+    return {"status": op, "task_id": task_id}
+
+
+@router.websocket("/ws")
+async def download_socket(
+    websocket: WebSocket,
+    api_client: AsyncCivitaiAPI = Depends(get_api_client),
+    download_manager: DownloadManager = Depends(get_download_manager),
+    hub: DownloadEventHub = Depends(get_event_hub),
+):
+    """
+    Control channel for the download queue.
+
+    Clients send JSON commands such as ``{"id": 1, "op": "pause", "task_id": "..."}``
+    and receive a ``reply`` for each, while ``snapshot`` and ``delta`` events
+    for the tasks matching their subscription filter arrive on the same socket.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+
+    async def send(message):
+        async with send_lock:
+            await websocket.send_text(fast_json.dumps(message).decode("utf-8"))
+
+    subscriber = await hub.subscribe()
+    await send({"type": "snapshot", "tasks": hub.snapshot(subscriber)})
+
+    async def push_events():
+        try:
+            while True:
+                delta = await subscriber.wait(hub.KEEPALIVE)
+                if delta is None:
+                    await send({"type": "ping"})
+                else:
+                    await send({"type": "delta", "id": hub.next_id(), **delta})
+        except (WebSocketDisconnect, RuntimeError):
+            # Connection closed, the receive loop cleans up
+            pass
+
+    pusher = asyncio.ensure_future(push_events())
+    try:
+        while True:
+            try:
+                message = fast_json.loads(await websocket.receive_text())
+                if not isinstance(message, dict):
+                    raise ValueError("Command must be a JSON object")
+            except ValueError as e:
+                await send({"type": "reply", "id": None, "ok": False, "error": str(e)})
+                continue
+
+            reply = {"type": "reply", "id": message.get("id"), "op": message.get("op")}
+            try:
+                result = await _socket_command(
+                    message, api_client, download_manager, hub, subscriber
                 )
+                reply.update(ok=True, result=result)
+            except HTTPException as e:
+                reply.update(ok=False, error=e.detail, status=e.status_code)
+            except (ValueError, TypeError) as e:
+                reply.update(ok=False, error=str(e), status=400)
+            await send(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pusher.cancel()
+        hub.unsubscribe(subscriber)
 
-    # Add directly to the queue, don't use background_tasks
-    print(f"Creating download task: {task['model_name']} - {task['filename']}")
 
-    # Add to queue and recent downloads list (this method uses a thread lock internally)
-    added_task = download_manager.add_to_queue(task)
+# Longest a client may hold GET /downloads open waiting for changes (seconds)
+MAX_DOWNLOADS_WAIT = 60
 
-    # Record state after addition
-    print(f"Queue status after addition: {len(download_manager.queue)} tasks")
-    print(f"recent_downloads length: {len(download_manager.recent_downloads)} tasks")
 
-    # Ensure the download manager's _process_queue method uses progress callback
-    if (
-        not download_manager.download_thread
-        or not download_manager.download_thread.is_alive()
-    ):
-        download_manager._ensure_download_thread_running()
+def _recent_files_fallback(settings: Settings):
+    """Recently downloaded files found on disk, shown when no task is recorded"""
+    # Look for completed downloads
+    completed_files = []
 
-    # Ensure valid task information is returned to the frontend
-    if not added_task:
-        # This should not happen, but just to be safe
-        print("Warning: added_task is empty, returning original task")
-        return task
+    # Check Other directory
+    other_dir = os.path.join(settings.model_dir, "Other")
+    if os.path.exists(other_dir):
+        for file in os.listdir(other_dir):
+            if file.endswith(".txt"):
+                file_path = os.path.join(other_dir, file)
+                stat = os.stat(file_path)
+                completed_files.append(
+                    {
+                        "id": f"recent-{len(completed_files)}",
+                        "model_id": None,
+                        "version_id": 0,
+                        "file_id": 0,
+                        "model_name": "Recently Downloaded Test File",
+                        "filename": file,
+                        "model_type": "Other",
+                        "url": "",
+                        "status": "completed",
+                        "progress": 100,
+                        "file_path": file_path,
+                        "created_at": stat.st_mtime,
+                        "is_recent": True,
+                    }
+                )
 
-    # Return the added task to ensure the frontend receives task information immediately
-    return added_task
+    # Check Stable-diffusion directory
+    sd_dir = os.path.join(settings.model_dir, "Stable-diffusion")
+    if os.path.exists(sd_dir):
+        for file in os.listdir(sd_dir):
+            if file.endswith(".txt"):
+                file_path = os.path.join(sd_dir, file)
+                stat = os.stat(file_path)
+                completed_files.append(
+                    {
+                        "id": f"recent-{len(completed_files)}",
+                        "model_id": None,
+                        "version_id": 0,
+                        "file_id": 0,
+                        "model_name": "Recently Downloaded Checkpoint",
+                        "filename": file,
+                        "model_type": "Checkpoint",
+                        "url": "",
+                        "status": "completed",
+                        "progress": 100,
+                        "file_path": file_path,
+                        "created_at": stat.st_mtime,
+                        "is_recent": True,
+                    }
+                )
 
+    # Sort by most recent modification time
+    completed_files.sort(key=lambda x: x["created_at"], reverse=True)
 
-@router.get("/downloads", response_model=List[dict])
-def list_downloads(download_manager: DownloadManager = Depends(get_download_manager)):
-    """Get current download list and recently completed downloads"""
-    logger.info("Getting active and recent download tasks")
+    # Return only the 5 most recent files
+    completed_files = completed_files[:5]
 
-    # Use thread-lock protected method to get download task list
-    downloads = download_manager.get_active_and_recent_downloads()
+    if completed_files:
+        logger.info(f"Found {len(completed_files)} recently completed downloads")
+        return completed_files
 
-    logger.info(f"Current download: {download_manager.current_download is not None}")
-    if download_manager.current_download:
-        logger.info(
-            f"Current download task: {download_manager.current_download['id']} - {download_manager.current_download['filename']} - progress: {download_manager.current_download['progress']:.1f}%"
-        )
-    logger.info(f"Queue length: {len(download_manager.queue)}")
-    logger.info(f"Recent downloads length: {len(download_manager.recent_downloads)}")
-    logger.info(f"Returned download list length: {len(downloads)}")
+    # If no recently completed downloads are found, and in DEBUG mode, return test tasks
+    if os.environ.get("DEBUG", "False").lower() in (
+        "true",
+        "1",
+        "t",
+    ):
+        logger.info("No download tasks found, adding test task")
+        return [
+            {
+                "id": "test-task",
+                "model_id": 0,
+                "version_id": 0,
+                "file_id": 0,
+                "model_name": "Example Model (Not Downloaded)",
+                "filename": "example.safetensors",
+                "model_type": "Checkpoint",
+                "url": "",
+                "status": "completed",
+                "progress": 100,
+                "is_test": True,
+            }
+        ]
+    return []
+
+
+@router.get("/downloads")
+async def list_downloads(
+    request: Request,
+    response: Response,
+    since: Optional[int] = Query(None, ge=0),
+    wait: float = Query(0, ge=0, le=MAX_DOWNLOADS_WAIT),
+    download_manager: DownloadManager = Depends(get_download_manager),
+    settings: Settings = Depends(get_settings),
+    hub: DownloadEventHub = Depends(get_event_hub),
+):
+    """
+    Get current download list and recently completed downloads.
+
+    Responses carry the task store's state version as an ETag, and a matching
+    If-None-Match gets 304. With ``since``, only tasks changed after that
+    version are returned. With ``wait``, a client that is already up to date
+    is held until something changes or the wait runs out (long polling).
+    """
+    versions = hub.versions
+    # The manager takes its lock and the fallback scans the disk, so neither runs on the event loop
+    hub.poll(await run_in_threadpool(download_manager.get_active_and_recent_downloads))
+
+    if_none_match = request.headers.get("if-none-match")
+    up_to_date = (
+        since == versions.version
+        if since is not None
+        else if_none_match == versions.etag()
+    )
+    if wait and up_to_date:
+        await hub.wait_for_change(versions.version, wait)
 
-    # If there are download tasks, log them
-    if downloads:
-        for download in downloads:
-            logger.info(
-                f"Download task: {download['id']} - {download['status']} - progress: {download['progress']:.1f}%"
-            )
+    etag = versions.etag()
+    downloads = versions.tasks()
+    if since is None and not downloads:
+        # Files on disk are not versioned, so this response has no ETag
+        return await run_in_threadpool(_recent_files_fallback, settings)
 
-    # If no downloads are recorded, but stored recent downloads are empty, try to create some recent records
-    if len(downloads) == 0:
-        # Look for completed downloads
-        completed_files = []
-
-        # Check Other directory
-        other_dir = os.path.join(Settings().model_dir, "Other")
-        if os.path.exists(other_dir):
-            for file in os.listdir(other_dir):
-                if file.endswith(".txt"):
-                    file_path = os.path.join(other_dir, file)
-                    stat = os.stat(file_path)
-                    completed_files.append(
-                        {
-                            "id": f"recent-{len(completed_files)}",
-                            "model_id": None,
-                            "version_id": 0,
-                            "file_id": 0,
-                            "model_name": "Recently Downloaded Test File",
-                            "filename": file,
-                            "model_type": "Other",
-                            "url": "",
-                            "status": "completed",
-                            "progress": 100,
-                            "file_path": file_path,
-                            "created_at": stat.st_mtime,
-                            "is_recent": True,
-                        }
-                    )
-
-        # Check Stable-diffusion directory
-        sd_dir = os.path.join(Settings().model_dir, "Stable-diffusion")
-        if os.path.exists(sd_dir):
-            for file in os.listdir(sd_dir):
-                if file.endswith(".txt"):
-                    file_path = os.path.join(sd_dir, file)
-                    stat = os.stat(file_path)
-                    completed_files.append(
-                        {
-                            "id": f"recent-{len(completed_files)}",
-                            "model_id": None,
-                            "version_id": 0,
-                            "file_id": 0,
-                            "model_name": "Recently Downloaded Checkpoint",
-                            "filename": file,
-                            "model_type": "Checkpoint",
-                            "url": "",
-                            "status": "completed",
-                            "progress": 100,
-                            "file_path": file_path,
-                            "created_at": stat.st_mtime,
-                            "is_recent": True,
-                        }
-                    )
-
-        # Sort by most recent modification time
-        completed_files.sort(key=lambda x: x["created_at"], reverse=True)
-
-        # Return only the 5 most recent files
-        completed_files = completed_files[:5]
-
-        if completed_files:
-            logger.info(f"Found {len(completed_files)} recently completed downloads")
-            return completed_files
-
-        # If no recently completed downloads are found, and in DEBUG mode, return test tasks
-        if os.environ.get("DEBUG", "False").lower() in (
-            "true",
-            "1",
-            "t",
-        ):
-            logger.info("No download tasks found, adding test task")
-            return [
-                {
-                    "id": "test-task",
-                    "model_id": 0,
-                    "version_id": 0,
-                    "file_id": 0,
-                    "model_name": "Example Model (Not Downloaded)",
-                    "filename": "example.safetensors",
-                    "model_type": "Checkpoint",
-                    "url": "",
-                    "status": "completed",
-                    "progress": 100,
-                    "is_test": True,
-                }
-            ]
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    if since is not None:
+        return versions.changes_since(since)
 
-    logger.info(f"Total of {len(downloads)} download tasks returned")
+    if logger.isEnabledFor(logging.DEBUG):
+        for download in downloads:
+            logger.debug(
+                f"Download task: {download.get('id')} - {download.get('status')} - progress: {download.get('progress', 0):.1f}%"
+            )
     return downloads
 
 
@@ -480,12 +684,12 @@ def get_model_types():
 
 
 @router.get("/models/basemodels")
-def get_base_models(api_client: CivitaiAPI = Depends(get_api_client)):
+async def get_base_models(api_client: AsyncCivitaiAPI = Depends(get_api_client)):
     """Get a list of available base models"""
     try:
         # Try to get from API
         api_url = "models?baseModels=GetModels"
-        response = api_client.request(api_url, params=None)
+        response = await api_client.request(api_url, params=None)
 
         if response and "error" in response and "issues" in response["error"]:
             # Extract options from the error response
@@ -526,15 +730,56 @@ def get_base_models(api_client: CivitaiAPI = Depends(get_api_client)):
     return default_models
 
 
+@router.get("/cache")
+def get_cache_stats(api_client: AsyncCivitaiAPI = Depends(get_api_client)):
+    """Get statistics for the persistent metadata cache"""
+    if api_client.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **api_client.cache.stats()}
+
+
+@router.delete("/cache", response_model=dict)
+def clear_cache(api_client: AsyncCivitaiAPI = Depends(get_api_client)):
+    """Clear the persistent metadata cache"""
+    if api_client.cache is None:
+        return {"status": "disabled", "removed": 0}
+    removed = api_client.cache.clear()
+    return {"status": "success", "removed": removed}
+
+
+@router.delete("/cache/missing", response_model=dict)
+def purge_missing(
+    api_client: AsyncCivitaiAPI = Depends(get_api_client),
+    settings: Settings = Depends(get_settings),
+):
+    """Forget hashes and models Civitai reported as not found, so they are looked up again"""
+    removed = api_client.cache.purge_missing() if api_client.cache is not None else 0
+    library = get_library_index(settings)
+    lookups = library.forget_missing() if library is not None else 0
+    return {"status": "success", "removed": removed, "lookups": lookups}
+
+
+@router.get("/stats")
+def get_client_stats(api_client: AsyncCivitaiAPI = Depends(get_api_client)):
+    """Get request statistics for the Civitai API client"""
+    return {
+        "rate_limiter": api_client.limiter.stats(),
+        "single_flight": CivitaiAPI.flight.stats(),
+        "async_single_flight": AsyncCivitaiAPI.flight.stats(),
+        "search_cache": CivitaiAPI.search_cache.stats(),
+        "file_index": CivitaiAPI.file_index.stats(),
+        "download_events": (
+            _event_hub_instance.stats() if _event_hub_instance is not None else None
+        ),
+    }
+
+
 @router.post("/settings/api-key")
 def set_api_key(api_key: str, settings: Settings = Depends(get_settings)):
     """Directly set the API key without modifying other settings"""
     settings.api_key = api_key
-    settings.save()
-
-    # 重置 API 客户端以使用新的 API 键
-    global _api_client_instance
-    _api_client_instance = None
+    # 共享的 API 客户端会收到变更通知并使用新的 API 键
+    get_settings_service().save(settings)
 
     return {"success": True, "message": "API key has been set"}
 
@@ -545,24 +790,8 @@ def clear_download_history(
 ):
     """Clear download history, keeping only active downloads"""
     try:
-        # Get current active downloads
-        active_downloads = []
-
-        with download_manager._tasks_lock:
-            # Backup current downloads in queue
-            if download_manager.current_download:
-                active_downloads.append(download_manager.current_download.copy())
-
-            active_downloads.extend([task.copy() for task in download_manager.queue])
-
-            # Clear recent downloads list
-            download_manager.recent_downloads = []
-
-            # Keep only active downloads
-            for download in active_downloads:
-                if download["status"] in ["completed", "failed"]:
-                    continue
-                download_manager._add_to_recent_downloads(download)
+        # Keep only active downloads
+        download_manager.clear_history()
 
         return {"status": "success", "message": "Download history has been cleared"}
     except Exception as e:
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+import logging
+
+from ..core.jobs import JobManager, get_job_manager
+
+# 配置日志
+logger = logging.getLogger("jobs_endpoints")
+
+# 创建路由器
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("")
+def list_jobs(kind: Optional[str] = None, jobs: JobManager = Depends(get_job_manager)):
+    """List background jobs, newest first"""
+    return {"jobs": [job.to_dict() for job in jobs.list(kind)]}
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, jobs: JobManager = Depends(get_job_manager)):
+    """Get the status, progress and result of a background job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str, jobs: JobManager = Depends(get_job_manager)):
+    """Cancel a queued or running background job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if not job.cancel():
+        raise HTTPException(
+            status_code=409, detail=f"Job {job_id} has already {job.status}"
+        )
+    return job.to_dict()
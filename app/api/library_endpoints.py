@@ -0,0 +1,364 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+import os
+import logging
+
+from ..core.library_index import LibraryIndex, get_library_index
+from ..core import library_watcher
+from ..core.hashing import HashingEngine
+from ..core.jobs import JobCancelled, JobManager, get_job_manager
+from ..core.library_scanner import LibraryScanner, ScanCancelled
+from ..core.library_dedup import DedupCancelled, LibraryDeduplicator
+from ..core.update_checker import UpdateCheckCancelled, UpdateChecker
+from ..core.civitai_api import CivitaiAPI
+from ..core.replay import transports_from_env
+from ..core.settings import Settings, get_setting, get_settings_service
+
+# 配置日志
+logger = logging.getLogger("library_endpoints")
+
+# 创建路由器
+router = APIRouter(prefix="/api/library", tags=["library"])
+
+
+# 获取全局设置
+def get_settings():
+    return get_settings_service().get()
+
+
+# 获取本地库索引
+def get_library(settings: Settings = Depends(get_settings)):
+    library = get_library_index(settings)
+    if library is None:
+        raise HTTPException(status_code=503, detail="Library index is unavailable")
+    return library
+
+
+@router.get("")
+def search_library(
+    sha256: Optional[str] = None,
+    filename: Optional[str] = None,
+    model_id: Optional[int] = None,
+    fingerprint: Optional[str] = None,
+    base_model: Optional[str] = None,
+    models_only: bool = True,
+    limit: int = Query(100, ge=1, le=1000),
+    library: LibraryIndex = Depends(get_library),
+):
+    """Look up local files by hash, file name, model ID, quick fingerprint or base model"""
+    files = library.find(
+        sha256=sha256,
+        filename=filename,
+        model_id=model_id,
+        fingerprint=fingerprint,
+        base_model=base_model,
+        models_only=models_only,
+        limit=limit,
+    )
+    return {"files": files, "count": len(files)}
+
+
+@router.get("/stats")
+def get_library_stats(library: LibraryIndex = Depends(get_library)):
+    """Get statistics for the local library index"""
+    return library.stats()
+
+
+@router.get("/watcher")
+def get_watcher_stats():
+    """Get the folders kept current by the library watcher"""
+    watcher = library_watcher._watcher
+    if watcher is None:
+        return {"running": False, "watchdog": library_watcher.HAS_WATCHDOG, "folders": {}}
+    return watcher.stats()
+
+
+def scan_model_dirs(settings, library):
+    """扫描所有存在的模型目录"""
+    results = {}
+    for model_type, folder in settings.get_model_dirs().items():
+        if not os.path.isdir(folder):
+            continue
+        results[model_type] = library.scan(folder, model_type)
+    return results
+
+
+@router.post("/scan")
+def scan_library(
+    settings: Settings = Depends(get_settings),
+    library: LibraryIndex = Depends(get_library),
+):
+    """Bring the library index up to date with the model directories"""
+    return {"status": "success", "folders": scan_model_dirs(settings, library)}
+
+
+def model_paths(settings, library):
+    """索引中所有模型目录下的模型文件"""
+    paths = []
+    for folder in settings.get_model_dirs().values():
+        paths.extend(f["path"] for f in library.find(folder=folder, models_only=True))
+    return paths
+
+
+def hash_library(job, settings, library, engine, verify):
+    """后台任务：扫描模型目录并计算所有模型文件的哈希"""
+    job.update(stage="scan")
+    scan_model_dirs(settings, library)
+    job.check_cancelled()
+
+    paths = model_paths(settings, library)
+
+    job.update(stage="hash")
+    hashes = engine.hash_files(
+        paths,
+        progress=lambda state: job.update(**state),
+        cancel=job.cancel_event,
+        trust_sidecar=not verify,
+    )
+    return {
+        "files": len(hashes),
+        "failed": sorted(path for path, sha256 in hashes.items() if sha256 is None),
+    }
+
+
+@router.post("/hash")
+def start_hash_job(
+    workers: Optional[int] = Query(None, ge=1, le=32),
+    verify: bool = False,
+    settings: Settings = Depends(get_settings),
+    library: LibraryIndex = Depends(get_library),
+    jobs: JobManager = Depends(get_job_manager),
+):
+    """Hash every model file in the background; follow progress under /api/jobs"""
+    job = jobs.find_active("hash")
+    if job is None:
+        workers = workers or get_setting(
+            settings, "hash_workers", HashingEngine.DEFAULT_WORKERS
+        )
+        engine = HashingEngine(workers, index=library)
+        job = jobs.submit(
+            "hash",
+            hash_library,
+            settings,
+            library,
+            engine,
+            verify,
+            params={"workers": engine.workers, "verify": verify},
+        )
+    return job.to_dict()
+
+
+def read_library_headers(job, settings, library, workers):
+    """后台任务：读取所有 safetensors 模型文件的头部"""
+    job.update(stage="scan")
+    scan_model_dirs(settings, library)
+    job.check_cancelled()
+
+    job.update(stage="headers")
+    counts = {"read": 0, "invalid": 0}
+    for folder in settings.get_model_dirs().values():
+        if not os.path.isdir(folder):
+            continue
+        result = library.read_headers(
+            folder,
+            workers,
+            progress=lambda state: job.update(**state),
+            cancel=job.cancel_event,
+        )
+        job.check_cancelled()
+        for key in counts:
+            counts[key] += result[key]
+    return counts
+
+
+@router.post("/headers")
+def start_headers_job(
+    workers: Optional[int] = Query(None, ge=1, le=32),
+    settings: Settings = Depends(get_settings),
+    library: LibraryIndex = Depends(get_library),
+    jobs: JobManager = Depends(get_job_manager),
+):
+    """Read the safetensors headers of all model files in the background; follow progress under /api/jobs"""
+    job = jobs.find_active("headers")
+    if job is None:
+        workers = workers or LibraryIndex.HEADER_WORKERS
+        job = jobs.submit(
+            "headers",
+            read_library_headers,
+            settings,
+            library,
+            workers,
+            params={"workers": workers},
+        )
+    return job.to_dict()
+
+
+def dedup_library(job, settings, library, deduplicator, mode, dry_run):
+    """后台任务：查找内容相同的模型文件，并可选地替换为链接"""
+    job.update(stage="scan")
+    scan_model_dirs(settings, library)
+    job.check_cancelled()
+
+    try:
+        return deduplicator.run(
+            model_paths(settings, library),
+            mode=mode,
+            dry_run=dry_run,
+            progress=lambda state: job.update(**state),
+            cancel=job.cancel_event,
+        )
+    except DedupCancelled:
+        raise JobCancelled(job.id)
+
+
+@router.post("/dedup")
+def start_dedup_job(
+    mode: Optional[str] = Query(None, pattern="^(hardlink|reflink)$"),
+    dry_run: bool = True,
+    settings: Settings = Depends(get_settings),
+    library: LibraryIndex = Depends(get_library),
+    jobs: JobManager = Depends(get_job_manager),
+):
+    """
+    Find model files stored more than once in the background; follow progress under /api/jobs.
+
+    Without ``mode`` the duplicates and the reclaimable space are only
+    reported. With ``mode`` (hardlink or reflink) and ``dry_run=false`` the
+    duplicates are replaced with links to one copy.
+    """
+    job = jobs.find_active("dedup")
+    if job is None:
+        engine = HashingEngine(
+            get_setting(settings, "hash_workers", HashingEngine.DEFAULT_WORKERS),
+            index=library,
+        )
+        job = jobs.submit(
+            "dedup",
+            dedup_library,
+            settings,
+            library,
+            LibraryDeduplicator(library, engine),
+            mode,
+            dry_run,
+            params={"mode": mode, "dry_run": dry_run},
+        )
+    return job.to_dict()
+
+
+def resolve_library(job, settings, library, scanner, refresh):
+    """后台任务：把所有模型文件对应到 Civitai 上的模型"""
+    job.update(stage="scan")
+    scan_model_dirs(settings, library)
+    job.check_cancelled()
+
+    try:
+        result = scanner.run(
+            model_paths(settings, library),
+            progress=lambda state: job.update(**state),
+            cancel=job.cancel_event,
+            refresh=refresh,
+        )
+    except ScanCancelled:
+        raise JobCancelled(job.id)
+
+    files = result["files"]
+    return {
+        "files": len(files),
+        "models": len(result["models"]),
+        "found": sum(f["status"] == "found" for f in files.values()),
+        "not_found": sorted(p for p, f in files.items() if f["status"] == "not_found"),
+        "failed": sorted(p for p, f in files.items() if f["status"] in ("failed", "no_hash")),
+    }
+
+
+def check_library_updates(job, settings, library, scanner, checker, refresh):
+    """后台任务：检查所有已安装的模型是否有新版本"""
+    job.update(stage="scan")
+    scan_model_dirs(settings, library)
+    job.check_cancelled()
+
+    paths = model_paths(settings, library)
+    try:
+        scanner.run(
+            paths,
+            progress=lambda state: job.update(**state),
+            cancel=job.cancel_event,
+            fetch_models=False,
+        )
+    except ScanCancelled:
+        raise JobCancelled(job.id)
+    job.check_cancelled()
+
+    try:
+        return checker.check(
+            paths,
+            refresh,
+            progress=lambda state: job.update(**state),
+            cancel=job.cancel_event,
+        )
+    except UpdateCheckCancelled:
+        raise JobCancelled(job.id)
+
+
+def library_scanner(settings, library):
+    """按设置创建本地库扫描器"""
+    api = CivitaiAPI(settings=settings, transport=transports_from_env()[0])
+    engine = HashingEngine(
+        get_setting(settings, "hash_workers", HashingEngine.DEFAULT_WORKERS),
+        index=library,
+    )
+    return LibraryScanner(
+        api,
+        library,
+        engine,
+        workers=get_setting(settings, "lookup_workers", LibraryScanner.LOOKUP_WORKERS),
+        not_found_ttl=get_setting(
+            settings, "negative_cache_ttl", LibraryScanner.NOT_FOUND_TTL
+        ),
+    )
+
+
+@router.post("/updates")
+def start_update_check(
+    refresh: bool = False,
+    settings: Settings = Depends(get_settings),
+    library: LibraryIndex = Depends(get_library),
+    jobs: JobManager = Depends(get_job_manager),
+):
+    """Check every installed model for newer versions in the background; follow progress under /api/jobs"""
+    job = jobs.find_active("updates")
+    if job is None:
+        scanner = library_scanner(settings, library)
+        job = jobs.submit(
+            "updates",
+            check_library_updates,
+            settings,
+            library,
+            scanner,
+            UpdateChecker(scanner.api, library),
+            refresh,
+            params={"refresh": refresh},
+        )
+    return job.to_dict()
+
+
+@router.post("/resolve")
+def start_resolve_job(
+    refresh: bool = False,
+    settings: Settings = Depends(get_settings),
+    library: LibraryIndex = Depends(get_library),
+    jobs: JobManager = Depends(get_job_manager),
+):
+    """Match every model file with its Civitai model in the background; follow progress under /api/jobs"""
+    job = jobs.find_active("resolve")
+    if job is None:
+        job = jobs.submit(
+            "resolve",
+            resolve_library,
+            settings,
+            library,
+            library_scanner(settings, library),
+            refresh,
+            params={"refresh": refresh},
+        )
+    return job.to_dict()
@@ -0,0 +1,17 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from ..core import fast_json
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with the fast JSON backend (orjson when installed).
+
+    Used as the application's default response class, so large search pages
+    and model payloads are serialized without the standard library encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return fast_json.dumps(content)
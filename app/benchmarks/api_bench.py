@@ -0,0 +1,142 @@
+"""
+Benchmark Civitai API client paths against recorded responses.
+
+Usage:
+    # Record fixtures once (needs network access)
+    python -m app.benchmarks.api_bench --record fixtures.jsonl.gz --models 4201 4384
+
+    # Replay offline with 150 ms of injected latency per request
+    python -m app.benchmarks.api_bench fixtures.jsonl.gz --latency 150
+
+The same fixture file can be used by the running app by setting
+CIVITAI_FIXTURES (see app/core/replay.py).
+"""
+
+import re
+import time
+import asyncio
+import logging
+import argparse
+from unittest.mock import MagicMock
+
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.core.civitai_api import CivitaiAPI
+from app.core.rate_limiter import RateLimiter
+from app.core.response_cache import ResponseCache
+from app.core.replay import (
+    AsyncReplayTransport,
+    FixtureStore,
+    RecordingTransport,
+    ReplayTransport,
+)
+
+SEARCHES = [
+    {"sort": "Most Downloaded", "page_size": 100},
+    {"query": "anime", "page_size": 20},
+    {"type": "LORA", "page_size": 20},
+]
+
+
+def bench_settings():
+    """不使用磁盘缓存和代理的设置，保证每次运行都经过传输层"""
+    settings = MagicMock()
+    settings.api_key = ""
+    settings.model_dir = "models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.use_metadata_cache = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+def record(path, model_ids):
+    """Record the benchmark requests from the live API."""
+    store = FixtureStore(path)
+    api = CivitaiAPI(settings=bench_settings(), transport=RecordingTransport(store))
+    for search in SEARCHES:
+        api.search_models(**search)
+    for model_id in model_ids:
+        api.get_model(model_id)
+    api.get_models_bulk(model_ids)
+    store.save()
+    print(f"recorded {len(store)} responses to {path}")
+
+
+def replay(path, model_ids, latency, rounds):
+    """Replay the benchmark requests and print timings."""
+    store = FixtureStore(path)
+    if not model_ids:
+        # 默认回放所有录制过的模型详情
+        model_ids = sorted(
+            int(key.rsplit("/", 1)[1])
+            for key in store.keys()
+            if re.match(r"^GET .*/models/\d+$", key)
+        )
+
+    limiter = RateLimiter(rate=10000)
+    api = CivitaiAPI(
+        settings=bench_settings(),
+        limiter=limiter,
+        transport=ReplayTransport(store, latency=latency),
+    )
+
+    def sync_round():
+        # 每轮都换新的搜索缓存，测量的是完整的请求路径
+        api.search_cache = ResponseCache()
+        for search in SEARCHES:
+            api.search_models(**search)
+        for model_id in model_ids:
+            api.get_model(model_id)
+
+    async def async_round():
+        client = AsyncCivitaiAPI(
+            settings=bench_settings(),
+            limiter=limiter,
+            transport=AsyncReplayTransport(store, latency=latency),
+        )
+        client.search_cache = ResponseCache()
+        try:
+            await asyncio.gather(
+                *(client.search_models(**search) for search in SEARCHES),
+                *(client.get_model(model_id) for model_id in model_ids),
+            )
+        finally:
+            await client.aclose()
+
+    requests_per_round = len(SEARCHES) + len(model_ids)
+    print(f"{path}: {len(store)} responses, {requests_per_round} requests per round")
+
+    for name, fn in (
+        ("sync sequential", sync_round),
+        ("async concurrent", lambda: asyncio.run(async_round())),
+    ):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        ms = (time.perf_counter() - start) / rounds * 1000
+        print(f"  {name:<18} {ms:9.1f} ms/round")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixtures", nargs="?", help="fixture file to replay")
+    parser.add_argument("--record", metavar="PATH", help="record fixtures to PATH")
+    parser.add_argument("--models", type=int, nargs="*", default=[])
+    parser.add_argument("--latency", type=float, default=0, help="injected latency (ms)")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # 请求日志会淹没测量结果
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.record:
+        record(args.record, args.models)
+    elif args.fixtures:
+        replay(args.fixtures, args.models, args.latency / 1000, args.rounds)
+    else:
+        parser.error("either a fixture file or --record is required")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark JSON decoding and encoding of a 100-item Civitai search page.
+
+Usage:
+    python -m app.benchmarks.json_bench [recorded_page.json] [--rounds N]
+
+Pass a search page saved from ``/api/v1/models?limit=100`` to benchmark real
+data. Without one, a page with the same shape and typical field sizes is
+generated.
+"""
+
+import argparse
+import json
+import random
+import time
+
+from app.core import fast_json
+
+
+def synthetic_search_page(items=100, seed=0):
+    """
+    Build a search page shaped like a Civitai ``models`` response.
+
+    Args:
+        items (int, optional): Number of models on the page.
+        seed (int, optional): Random seed, for repeatable results.
+
+    Returns:
+        dict: Search page.
+    """
+    rng = random.Random(seed)
+
+    vocabulary = ["lora", "style", "anime", "photo", "detail", "<p>", "</p>"]
+
+    def text(words):
+        return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+    models = []
+    for model_id in range(1, items + 1):
+        versions = []
+        for v in range(rng.randint(1, 5)):
+            version_id = model_id * 100 + v
+            versions.append(
+                {
+                    "id": version_id,
+                    "modelId": model_id,
+                    "name": f"v{v + 1}.0",
+                    "createdAt": "2024-01-01T00:00:00.000Z",
+                    "updatedAt": "2024-01-02T00:00:00.000Z",
+                    "baseModel": rng.choice(["SD 1.5", "SDXL 1.0", "Pony", "Flux.1 D"]),
+                    "trainedWords": [text(2) for _ in range(rng.randint(0, 4))],
+                    "description": text(40),
+                    "stats": {"downloadCount": rng.randint(0, 10**6), "rating": 4.8},
+                    "files": [
+                        {
+                            "id": version_id * 10,
+                            "name": f"model_{version_id}.safetensors",
+                            "sizeKB": rng.uniform(10**4, 7 * 10**6),
+                            "type": "Model",
+                            "primary": True,
+                            "metadata": {
+                                "fp": "fp16",
+                                "size": "pruned",
+                                "format": "SafeTensor",
+                            },
+                            "hashes": {
+                                "AutoV2": f"{rng.getrandbits(40):010X}",
+                                "SHA256": f"{rng.getrandbits(256):064X}",
+                                "CRC32": f"{rng.getrandbits(32):08X}",
+                            },
+                            "downloadUrl": f"https://civitai.com/api/download/models/{version_id}",
+                        }
+                    ],
+                    "images": [
+                        {
+                            "url": f"https://image.civitai.com/{rng.getrandbits(64):x}.jpeg",
+                            "nsfwLevel": 1,
+                            "width": 832,
+                            "height": 1216,
+                            "hash": f"U{rng.getrandbits(100):x}",
+                            "meta": {
+                                "prompt": text(60),
+                                "negativePrompt": text(30),
+                                "steps": 30,
+                            },
+                        }
+                        for _ in range(rng.randint(1, 6))
+                    ],
+                }
+            )
+        models.append(
+            {
+                "id": model_id,
+                "name": f"Model {model_id}",
+                "description": text(300),
+                "type": rng.choice(["Checkpoint", "LORA", "TextualInversion"]),
+                "nsfw": False,
+                "tags": [text(1) for _ in range(8)],
+                "creator": {"username": f"user{model_id}", "image": None},
+                "stats": {"downloadCount": rng.randint(0, 10**6), "favoriteCount": 10},
+                "modelVersions": versions,
+            }
+        )
+
+    return {
+        "items": models,
+        "metadata": {
+            "nextCursor": "100|1700000000000",
+            "nextPage": "https://civitai.com/api/v1/models?cursor=100",
+            "pageSize": items,
+        },
+    }
+
+
+def timeit(fn, rounds):
+    """返回每次调用的平均耗时（毫秒）"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def run(body, rounds=200):
+    """
+    Compare the standard library with the fast JSON backend.
+
+    Args:
+        body (bytes): Raw JSON body of a search page.
+        rounds (int, optional): Iterations per measurement.
+
+    Returns:
+        dict: Average milliseconds per operation for each backend.
+    """
+    data = json.loads(body)
+    results = {
+        "stdlib decode": timeit(lambda: json.loads(body.decode("utf-8")), rounds),
+        "stdlib encode": timeit(
+            lambda: json.dumps(data, ensure_ascii=False).encode("utf-8"), rounds
+        ),
+    }
+    if fast_json.HAS_ORJSON:
+        results["fast_json decode"] = timeit(lambda: fast_json.loads(body), rounds)
+        results["fast_json encode"] = timeit(lambda: fast_json.dumps(data), rounds)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("page", nargs="?", help="recorded search page (JSON)")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, "rb") as f:
+            body = f.read()
+        source = args.page
+    else:
+        body = json.dumps(synthetic_search_page()).encode("utf-8")
+        source = "synthetic 100-item page"
+
+    backend = "orjson" if fast_json.HAS_ORJSON else "stdlib only"
+    print(f"{source}: {len(body) / 1024:.0f} KiB, backend: {backend}")
+    for name, ms in run(body, args.rounds).items():
+        print(f"  {name:<18} {ms:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+import asyncio
+import logging
+
+import httpx
+
+from .civitai_api import CivitaiAPI
+from .settings import get_setting
+from .single_flight import AsyncSingleFlight
+
+# 配置日志
+logger = logging.getLogger("civitai_api")
+
+
+class AsyncCivitaiAPI(CivitaiAPI):
+    """
+    Asynchronous client for the Civitai API.
+
+    Network methods are coroutines backed by a pooled httpx.AsyncClient, so a
+    slow Civitai response only suspends the request waiting on it instead of
+    blocking the event loop. Caching and helper methods are shared with
+    CivitaiAPI; metadata cache reads and writes (SQLite and zlib) run in a
+    worker thread.
+    """
+
+    # 所有异步客户端实例共享
+    flight = AsyncSingleFlight()
+
+    def __init__(
+        self,
+        api_key=None,
+        settings=None,
+        cache=None,
+        limiter=None,
+        max_connections=20,
+        transport=None,
+    ):
+        """
+        Initialize the API client.
+
+        Args:
+            api_key (str, optional): API key for Civitai. If None, uses the API key from settings.
+            settings (Settings, optional): Settings object. If None, uses the shared settings.
+            cache (MetadataCache, optional): Response cache. If None, uses the shared cache.
+            limiter (RateLimiter, optional): Rate limiter. If None, uses the shared limiter.
+            max_connections (int, optional): Size of the connection pool.
+            transport (httpx.AsyncBaseTransport, optional): Custom transport for the HTTP client.
+        """
+        super().__init__(api_key=api_key, settings=settings, cache=cache, limiter=limiter)
+        self.max_connections = max_connections
+        self.transport = transport
+        self._client = None
+        self._client_loop = None
+        # 设置变化后被替换下来的连接池
+        self._retired = []
+
+    def _get_client(self):
+        """
+        Get the pooled HTTP client for the running event loop.
+
+        Returns:
+            httpx.AsyncClient: HTTP client.
+        """
+        loop = asyncio.get_running_loop()
+        # httpx连接绑定在事件循环上，循环变化时需要新建客户端
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            proxies = self.settings.get_proxy_settings()
+            self._client = httpx.AsyncClient(
+                proxy=proxies.get("https") if isinstance(proxies, dict) else None,
+                verify=not get_setting(self.settings, "disable_dns_lookup", False),
+                timeout=get_setting(self.settings, "timeout", 30),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+            self._client_loop = loop
+        return self._client
+
+    # 需要新建连接池才能生效的设置
+    POOL_SETTINGS = frozenset({"use_proxy", "proxy_url", "disable_dns_lookup"})
+
+    def apply_settings(self, settings, changed):
+        """
+        Reconfigure the client in place after a settings change.
+
+        The connection pool is only replaced when the proxy or TLS
+        verification changed; a new timeout is applied to the existing pool.
+
+        Args:
+            settings (Settings): New settings.
+            changed (set): Names of the changed settings.
+        """
+        super().apply_settings(settings, changed)
+        client = self._client
+        if client is None or client.is_closed:
+            return
+        if changed & self.POOL_SETTINGS:
+            # 旧连接池上可能还有进行中的请求，留到aclose()时再关闭
+            self._retired.append(client)
+            self._client = None
+            self._client_loop = None
+        elif "timeout" in changed:
+            client.timeout = httpx.Timeout(get_setting(settings, "timeout", 30))
+
+    async def _off_loop(self, func, *args):
+        """在线程中运行访问元数据缓存的同步方法，避免阻塞事件循环"""
+        if self.cache is None:
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    async def aclose(self):
+        """Close the connection pool."""
+        while self._retired:
+            await self._retired.pop().aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+    async def request(self, endpoint, params=None, method="GET", not_found=None, refresh=False):
+        """
+        Make a request to the Civitai API.
+
+        Args:
+            endpoint (str): API endpoint to request.
+            params (dict, optional): Query parameters.
+            method (str, optional): HTTP method. Defaults to "GET".
+            not_found (optional): Returned instead of None when the server
+                answers 404.
+            refresh (bool, optional): Send the request even if the server
+                recently answered it with 404.
+
+        Returns:
+            dict or None: JSON response data, or None if request failed.
+        """
+        cache_key = self._cache_key(endpoint, params, method)
+        cached = await self._off_loop(self._cache_get, cache_key)
+        if cached and self.cache.is_fresh(cached):
+            logger.debug(f"命中元数据缓存: {cache_key}")
+            self.file_index.add_response(cached["data"], self._primary_only(params))
+            return cached["data"]
+        if not refresh and await self._off_loop(self._cache_is_missing, cache_key):
+            logger.debug(f"命中未找到记录: {cache_key}")
+            return not_found
+
+        if method != "GET":
+            result = await self._send(endpoint, params, method, cache_key, cached)
+        else:
+            result = await self.flight.do(
+                self._flight_key(endpoint, params),
+                self._send,
+                endpoint,
+                params,
+                method,
+                cache_key,
+                cached,
+            )
+        return not_found if result is self.NOT_FOUND else result
+
+    async def _send(self, endpoint, params, method, cache_key, cached):
+        """发送HTTP请求并解析响应"""
+        url = f"{self.base_url}/{endpoint}"
+
+        # 记录请求详情
+        logger.info(f"API请求: {method} {url}")
+        logger.debug(f"请求参数: {params}")
+
+        bucket = self.limiter.classify(endpoint, params)
+        headers = self._request_headers(cached)
+
+        try:
+            for attempt in range(self.MAX_RETRIES + 1):
+                # 没有令牌时挂起等待，不阻塞事件循环
+                await self.limiter.acquire_async(bucket)
+                response = await self._get_client().request(
+                    method, url, params=params, headers=headers
+                )
+                if not self._should_retry(bucket, response, attempt):
+                    break
+            return await self._off_loop(self._handle_response, response, cache_key, cached)
+
+        except httpx.TimeoutException:
+            logger.error(f"请求超时: {url}")
+            return None
+        except httpx.TransportError as e:
+            logger.error(f"连接错误 ({url}): {str(e)}")
+            return None
+        except httpx.HTTPError as e:
+            logger.error(f"请求异常 ({url}): {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"未预期的错误 ({url}): {str(e)}", exc_info=True)
+            return None
+
+    async def search_models(
+        self,
+        query=None,
+        type=None,
+        base_model=None,
+        sort="Most Downloaded",
+        page=1,
+        page_size=20,
+        nsfw=None,
+        cursor=None,
+    ):
+        """
+        Search for models on Civitai.
+
+        See CivitaiAPI.search_models for the parameters.
+
+        Returns:
+            dict or None: Search results, or None if request failed.
+        """
+        params = self._search_params(
+            query, type, base_model, sort, page, page_size, nsfw, cursor
+        )
+
+        cache_key = self._flight_key("models", params)
+        result = self.search_cache.get(cache_key)
+        if result is not None:
+            logger.debug(f"命中搜索缓存: page={page}, cursor={cursor}")
+            return result
+
+        # 记录完整搜索参数
+        logger.info(f"搜索模型: query={query}, type={type}, page={page}, nsfw={nsfw}")
+
+        result = await self.request("models", params)
+        self._log_search_result(result)
+        if result and "items" in result:
+            self.search_cache.put(cache_key, result)
+        return result
+
+    async def iter_search_pages(self, max_pages=None, prefetch=True, **search_kwargs):
+        """
+        Iterate over search result pages by following ``metadata.nextPage``.
+
+        See CivitaiAPI.iter_search_pages for the parameters.
+
+        Yields:
+            dict: One page of search results.
+        """
+        result = await self.search_models(**search_kwargs)
+        pending = None
+        count = 0
+        try:
+            while result:
+                count += 1
+                params = None
+                if max_pages is None or count < max_pages:
+                    params = self._next_page_params(result)
+
+                if params and prefetch:
+                    pending = asyncio.ensure_future(self.request("models", params))
+
+                yield result
+
+                if not params:
+                    return
+                result = await pending if pending else await self.request("models", params)
+                pending = None
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def iter_search_models(self, max_pages=None, prefetch=True, **search_kwargs):
+        """
+        Iterate over the models of every search result page.
+
+        Yields:
+            dict: One model.
+        """
+        async for page in self.iter_search_pages(max_pages, prefetch, **search_kwargs):
+            for item in page.get("items", []):
+                yield item
+
+    async def get_model(self, model_id):
+        """
+        Get details for a specific model.
+
+        Args:
+            model_id (int): Model ID.
+
+        Returns:
+            dict or None: Model details, or None if request failed.
+        """
+        return await self.request(f"models/{model_id}")
+
+    async def get_model_versions(self, model_id):
+        """
+        Get all versions for a specific model.
+
+        Args:
+            model_id (int): Model ID.
+
+        Returns:
+            list: List of model versions, empty if the request failed.
+        """
+        model_data = await self.get_model(model_id)
+        if model_data and "modelVersions" in model_data:
+            return model_data["modelVersions"]
+        return []
+
+    async def get_models_bulk(self, ids, max_workers=4, refresh=False):
+        """
+        Get details for many models using batched ``models?ids=`` requests.
+
+        See CivitaiAPI.get_models_bulk for details.
+
+        Args:
+            ids (iterable): Model IDs.
+            max_workers (int, optional): Maximum number of chunks fetched at once.
+            refresh (bool, optional): Fetch models the server recently did not
+                return, too.
+
+        Returns:
+            dict: Model details keyed by model ID.
+        """
+        models, missing = await self._off_loop(self._bulk_cached, list(ids), refresh)
+        chunks = self._bulk_chunks(missing)
+        if not chunks:
+            return models
+
+        logger.info(f"批量获取模型: {len(missing)} 个, 分 {len(chunks)} 批请求")
+
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await self._fetch_models_chunk(chunk)
+
+        pages = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+
+        fetched = self._merge_bulk_pages(pages, missing)
+        await self._off_loop(self._cache_fill, fetched)
+        await self._off_loop(self._bulk_missing, chunks, pages, fetched)
+        models.update(fetched)
+        return models
+
+    async def _fetch_models_chunk(self, chunk):
+        """获取一批模型，服务器分页时继续请求nextPage"""
+        items = []
+        params = self._bulk_params(chunk)
+        while params:
+            result = await self.request("models", params)
+            if not result:
+                return None
+            items.extend(result.get("items", []))
+            params = self._next_page_params(result)
+        return items
+
+    async def get_download_url(self, model_id, version_id=None, file_id=None):
+        """
+        Get the download URL for a specific model file.
+
+        Args:
+            model_id (int): Model ID.
+            version_id (int, optional): Version ID. If None, uses the latest version.
+            file_id (int, optional): File ID. If None, uses the primary file.
+
+        Returns:
+            str or None: Download URL, or None if not found.
+        """
+        record = self.file_index.lookup(model_id, version_id, file_id)
+        if record is None and version_id:
+            await self.get_model_version(version_id)
+            record = self.file_index.lookup(model_id, version_id, file_id)
+        if record is not None:
+            return record["downloadUrl"]
+
+        versions = await self.get_model_versions(model_id)
+        return self._select_download_url(versions, version_id, file_id)
+
+    async def get_file_record(self, model_id, version_id=None, file_id=None):
+        """
+        Get the indexed record (URL, size, hashes, primary flag) of a model file.
+
+        See CivitaiAPI.get_file_record for the parameters.
+
+        Returns:
+            dict or None: File record, or None if not found.
+        """
+        if await self.get_download_url(model_id, version_id, file_id) is None:
+            return None
+        # 请求的版本不存在时与get_download_url一样回退到最新版本
+        return self.file_index.lookup(
+            model_id, version_id, file_id
+        ) or self.file_index.lookup(model_id, None, file_id)
+
+    async def get_model_version(self, version_id):
+        """
+        Get details for a specific model version.
+
+        Args:
+            version_id (int): Version ID.
+
+        Returns:
+            dict or None: Version details, or None if request failed.
+        """
+        return await self.request(f"model-versions/{version_id}")
+
+    async def get_model_version_by_hash(self, hash_value, not_found=None, refresh=False):
+        """
+        Get model version details by hash.
+
+        Args:
+            hash_value (str): Hash value of the model file.
+            not_found (optional): Returned when Civitai does not know the hash.
+            refresh (bool, optional): Ask again even if Civitai recently did
+                not know the hash.
+
+        Returns:
+            dict or None: Version details, or None if request failed.
+        """
+        endpoint = f"model-versions/by-hash/{hash_value}"
+        kwargs = {}
+        if not_found is not None:
+            kwargs["not_found"] = not_found
+        if refresh:
+            kwargs["refresh"] = True
+        return await self.request(endpoint, **kwargs)
@@ -1,10 +1,19 @@
 import os
+import re
 import json
+import sqlite3
 import requests
 import logging
 from datetime import datetime
-from urllib.parse import urlencode
-from .settings import Settings
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse, parse_qs
+from .settings import get_setting, get_settings_service
+from .metadata_cache import get_metadata_cache
+from .single_flight import SingleFlight
+from .response_cache import ResponseCache
+from .rate_limiter import get_rate_limiter
+from .file_index import FileIndex
+from .fast_json import decode_response
 
 # 配置日志
 logger = logging.getLogger("civitai_api")
@@ -19,17 +28,67 @@ class CivitaiAPI:
 
     BASE_URL = "https://civitai.com/api/v1"
 
-    def __init__(self, api_key=None, settings=None):
+    # 可持久化缓存的端点：模型详情、版本详情和按哈希查询
+    CACHEABLE_ENDPOINT = re.compile(
+        r"^(models/\d+|model-versions/\d+|model-versions/by-hash/[0-9A-Za-z]+)$"
+    )
+
+    # 所有客户端实例共享，使并发的相同请求只发出一次
+    flight = SingleFlight()
+
+    # 版本ID/文件ID到文件记录的索引，由客户端看到的所有响应填充
+    file_index = FileIndex()
+
+    # 搜索结果页的短期内存缓存，预取的下一页存放在这里
+    search_cache = ResponseCache(maxsize=256, ttl=300)
+
+    # 遇到429/503时最多重试的次数，以及愿意等待的最长时间（秒）
+    MAX_RETRIES = 3
+    MAX_RETRY_WAIT = 120
+
+    # models?ids= 每页最多返回100条，按页大小分块可避免翻页
+    BULK_CHUNK_SIZE = 100
+
+    # 服务器返回404时 _handle_response 的结果，request() 再换成调用方要求的值
+    NOT_FOUND = object()
+
+    def __init__(
+        self, api_key=None, settings=None, cache=None, limiter=None, transport=None
+    ):
         """
         Initialize the API client.
 
         Args:
             api_key (str, optional): API key for Civitai. If None, uses the API key from settings.
-            settings (Settings, optional): Settings object. If None, creates a new one.
+            settings (Settings, optional): Settings object. If None, uses the shared settings.
+            cache (MetadataCache, optional): Response cache. If None, uses the shared
+                cache in the config directory (when enabled in settings).
+            limiter (RateLimiter, optional): Rate limiter. If None, uses the shared limiter.
+            transport (callable, optional): Function sending the HTTP request, with
+                the signature of requests.request (e.g. a replay transport).
+                If None, uses requests.request.
         """
-        self.settings = settings or Settings()
+        service = get_settings_service()
+        self.settings = settings or service.get()
         self.api_key = api_key or self.settings.api_key
         self.config = {"model_dir": self.settings.model_dir}
+        self.cache = cache if cache is not None else get_metadata_cache(self.settings)
+        self.limiter = limiter if limiter is not None else get_rate_limiter(self.settings)
+        self.transport = transport
+        # 可指向本地的替身服务器（app/standin_server.py）
+        self.base_url = get_setting(
+            self.settings, "api_base_url", self.BASE_URL
+        ).rstrip("/")
+
+        # 显式传入的参数不随设置变化
+        self._fixed = {
+            "api_key": api_key is not None,
+            "cache": cache is not None,
+            "limiter": limiter is not None,
+        }
+        # 使用共享设置时订阅变更，原地更新而不是重建客户端
+        if self.settings is service.current:
+            service.subscribe(self.apply_settings)
 
         # 记录API密钥状态
         if self.api_key:
@@ -37,6 +96,27 @@ class CivitaiAPI:
         else:
             logger.warning("未设置API密钥，部分功能可能受限")
 
+    def apply_settings(self, settings, changed):
+        """
+        Reconfigure the client in place after a settings change.
+
+        Args:
+            settings (Settings): New settings.
+            changed (set): Names of the changed settings.
+        """
+        self.settings = settings
+        self.config["model_dir"] = settings.model_dir
+        if "api_key" in changed and not self._fixed["api_key"]:
+            self.api_key = settings.api_key
+        if "api_base_url" in changed:
+            self.base_url = get_setting(settings, "api_base_url", self.BASE_URL).rstrip("/")
+        if "api_rate_limit" in changed and not self._fixed["limiter"]:
+            self.limiter = get_rate_limiter(settings)
+        cache_keys = {"use_metadata_cache", "metadata_cache_ttl", "negative_cache_ttl"}
+        if changed & cache_keys and not self._fixed["cache"]:
+            self.cache = get_metadata_cache(settings)
+        logger.info(f"API客户端已应用新设置: {', '.join(sorted(changed))}")
+
     def get_headers(self):
         """
         Get HTTP headers for API requests.
@@ -54,54 +134,171 @@ class CivitaiAPI:
 
         return headers
 
-    def request(self, endpoint, params=None, method="GET"):
+    def _cache_key(self, endpoint, params=None, method="GET"):
+        """
+        Get the metadata cache key for a request.
+
+        Args:
+            endpoint (str): API endpoint.
+            params (dict, optional): Query parameters.
+            method (str, optional): HTTP method.
+
+        Returns:
+            str or None: Cache key, or None if the request is not cacheable.
+        """
+        if self.cache is None or method != "GET" or params:
+            return None
+        if not self.CACHEABLE_ENDPOINT.match(endpoint):
+            return None
+        # 哈希不区分大小写
+        prefix = "model-versions/by-hash/"
+        if endpoint.startswith(prefix):
+            return prefix + endpoint[len(prefix) :].upper()
+        return endpoint
+
+    def _cache_get(self, key):
+        """读取缓存条目，缓存不可用时返回None"""
+        if not key:
+            return None
+        try:
+            return self.cache.get(key)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"读取元数据缓存失败: {e}")
+            return None
+
+    def _cache_is_missing(self, key):
+        """检查缓存是否记录了该请求最近返回404"""
+        if not key:
+            return False
+        try:
+            return self.cache.is_missing(key)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"读取元数据缓存失败: {e}")
+            return False
+
+    def _cache_missing(self, key):
+        """记录请求返回了404，失败时只记录警告"""
+        if not key:
+            return
+        try:
+            self.cache.put_missing(key)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"写入元数据缓存失败: {e}")
+
+    def _cache_store(self, key, data, response, revalidated=False):
+        """写入或刷新缓存条目，失败时只记录警告"""
+        if not key:
+            return
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        etag = etag if isinstance(etag, str) else None
+        last_modified = last_modified if isinstance(last_modified, str) else None
+        try:
+            if revalidated:
+                self.cache.touch(key, etag, last_modified)
+            else:
+                self.cache.put(key, data, etag, last_modified)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"写入元数据缓存失败: {e}")
+
+    def request(self, endpoint, params=None, method="GET", not_found=None, refresh=False):
         """
         Make a request to the Civitai API.
 
+        Model, version and by-hash lookups are served from the metadata cache
+        while fresh and revalidated with If-None-Match / If-Modified-Since
+        once they expire. Lookups the server recently answered with 404 are
+        not sent again. Concurrent identical GET requests share one
+        in-flight call.
+
         Args:
             endpoint (str): API endpoint to request.
             params (dict, optional): Query parameters.
             method (str, optional): HTTP method. Defaults to "GET".
+            not_found (optional): Returned instead of None when the server
+                answers 404, so callers can tell "unknown" from "failed".
+            refresh (bool, optional): Send the request even if the server
+                recently answered it with 404.
 
         Returns:
             dict or None: JSON response data, or None if request failed.
         """
-        url = f"{self.BASE_URL}/{endpoint}"
+        cache_key = self._cache_key(endpoint, params, method)
+        cached = self._cache_get(cache_key)
+        if cached and self.cache.is_fresh(cached):
+            logger.debug(f"命中元数据缓存: {cache_key}")
+            self.file_index.add_response(cached["data"], self._primary_only(params))
+            return cached["data"]
+        if not refresh and self._cache_is_missing(cache_key):
+            logger.debug(f"命中未找到记录: {cache_key}")
+            return not_found
+
+        if method != "GET":
+            result = self._send(endpoint, params, method, cache_key, cached)
+        else:
+            result = self.flight.do(
+                self._flight_key(endpoint, params),
+                self._send,
+                endpoint,
+                params,
+                method,
+                cache_key,
+                cached,
+            )
+        return not_found if result is self.NOT_FOUND else result
+
+    @staticmethod
+    def _primary_only(params=None, response=None):
+        """请求是否带 primaryFileOnly（响应中每个版本只列出主文件）"""
+        if params is not None:
+            return str(params.get("primaryFileOnly", "")).lower() == "true"
+        return "primaryFileOnly=true" in str(getattr(response, "url", ""))
+
+    def _flight_key(self, endpoint, params=None):
+        """
+        Get the identity used to coalesce concurrent GET requests.
+
+        Args:
+            endpoint (str): API endpoint.
+            params (dict, optional): Query parameters.
+
+        Returns:
+            tuple: Key covering the URL, parameters and credentials.
+        """
+        items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return (self.base_url, endpoint, items, self.api_key or "")
+
+    def _send(self, endpoint, params, method, cache_key, cached):
+        """发送HTTP请求并解析响应（由request调用，可能被多个调用方共享）"""
+        url = f"{self.base_url}/{endpoint}"
         proxies = self.settings.get_proxy_settings()
 
+        headers = self._request_headers(cached)
+
         # 记录请求详情
         logger.info(f"API请求: {method} {url}")
         logger.debug(f"请求参数: {params}")
         logger.debug(f"使用代理: {proxies}")
 
-        try:
-            response = requests.request(
-                method=method,
-                url=url,
-                params=params,
-                headers=self.get_headers(),
-                proxies=proxies,
-                timeout=self.settings.timeout,
-                verify=not self.settings.disable_dns_lookup,
-            )
-
-            # 记录响应状态
-            logger.debug(f"响应状态码: {response.status_code}")
+        bucket = self.limiter.classify(endpoint, params)
+        send = self.transport or requests.request
 
-            if response.status_code >= 400:
-                logger.error(f"API错误: {response.status_code} - {response.text}")
-                return None
-
-            # 尝试解析JSON
-            try:
-                data = response.json()
-                logger.debug(
-                    f"响应数据: {data if len(str(data)) < 500 else '(大量数据)'}"
+        try:
+            for attempt in range(self.MAX_RETRIES + 1):
+                # 没有令牌时排队等待，而不是直接请求失败
+                self.limiter.acquire(bucket)
+                response = send(
+                    method=method,
+                    url=url,
+                    params=params,
+                    headers=headers,
+                    proxies=proxies,
+                    timeout=self.settings.timeout,
+                    verify=not self.settings.disable_dns_lookup,
                 )
-                return data
-            except ValueError:
-                logger.error(f"JSON解析错误: {response.text[:200]}")
-                return None
+                if not self._should_retry(bucket, response, attempt):
+                    break
+            return self._handle_response(response, cache_key, cached)
 
         except requests.exceptions.Timeout:
             logger.error(f"请求超时: {url}")
@@ -116,6 +313,105 @@ class CivitaiAPI:
             logger.error(f"未预期的错误 ({url}): {str(e)}", exc_info=True)
             return None
 
+    def _cache_fill(self, models):
+        """将批量查询得到的模型写入缓存，使后续的get_model直接命中"""
+        if self.cache is None:
+            return
+        for model in models.values():
+            try:
+                self.cache.put(f"models/{model['id']}", model)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"写入元数据缓存失败: {e}")
+                return
+
+    def _should_retry(self, bucket, response, attempt):
+        """
+        Report a response to the rate limiter and decide whether to retry it.
+
+        Args:
+            bucket (str): Endpoint class of the request.
+            response: HTTP response.
+            attempt (int): Number of retries already made.
+
+        Returns:
+            bool: True if the request should be sent again.
+        """
+        retry_after = response.headers.get("Retry-After")
+        delay = self.limiter.feedback(bucket, response.status_code, retry_after, attempt)
+        if delay is None:
+            return False
+        if attempt >= self.MAX_RETRIES or delay > self.MAX_RETRY_WAIT:
+            logger.error(f"请求被限流，放弃重试 (已重试 {attempt} 次，需等待 {delay:.1f} 秒)")
+            return False
+        logger.info(f"请求被限流，第 {attempt + 1} 次重试")
+        return True
+
+    def _request_headers(self, cached=None):
+        """
+        Get request headers, adding validators when revalidating a cache entry.
+
+        Args:
+            cached (dict, optional): Expired cache entry being revalidated.
+
+        Returns:
+            dict: Headers dictionary.
+        """
+        headers = self.get_headers()
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def _handle_response(self, response, cache_key=None, cached=None):
+        """
+        Turn an HTTP response into decoded JSON, updating the metadata cache.
+
+        Works with both requests and httpx responses.
+
+        Args:
+            response: HTTP response.
+            cache_key (str, optional): Metadata cache key of the request.
+            cached (dict, optional): Cache entry the request was revalidating.
+
+        Returns:
+            dict or None: JSON response data, None if request failed, or
+                NOT_FOUND for a 404 response.
+        """
+        # 记录响应状态
+        logger.debug(f"响应状态码: {response.status_code}")
+
+        if response.status_code == 404:
+            logger.info(f"API返回404: {cache_key or response.text[:200]}")
+            self._cache_missing(cache_key)
+            return self.NOT_FOUND
+
+        if response.status_code == 304 and cached:
+            logger.debug(f"缓存重新验证成功: {cache_key}")
+            self._cache_store(cache_key, None, response, revalidated=True)
+            self.file_index.add_response(cached["data"], self._primary_only(response=response))
+            return cached["data"]
+
+        if response.status_code >= 400:
+            logger.error(f"API错误: {response.status_code} - {response.text}")
+            return None
+
+        # 尝试解析JSON
+        try:
+            data = decode_response(response)
+            # 只有开启DEBUG时才格式化响应内容，避免每次都把大数据转成字符串
+            if logger.isEnabledFor(logging.DEBUG):
+                text = str(data)
+                logger.debug(f"响应数据: {text if len(text) < 500 else '(大量数据)'}")
+            if isinstance(data, dict) and "error" not in data:
+                self._cache_store(cache_key, data, response)
+                self.file_index.add_response(data, self._primary_only(response=response))
+            return data
+        except ValueError:
+            logger.error(f"JSON解析错误: {response.text[:200]}")
+            return None
+
     def search_models(
         self,
         query=None,
@@ -125,10 +421,14 @@ class CivitaiAPI:
         page=1,
         page_size=20,
         nsfw=None,
+        cursor=None,
     ):
         """
         Search for models on Civitai.
 
+        Pages are kept in a short-lived in-memory cache, so a page that was
+        prefetched is returned without another round trip.
+
         Args:
             query (str, optional): Search query.
             type (str, optional): Model type filter.
@@ -139,17 +439,48 @@ class CivitaiAPI:
             page (int, optional): Page number. Defaults to 1.
             page_size (int, optional): Items per page. Defaults to 20.
             nsfw (bool, optional): Whether to include NSFW models.
+            cursor (str, optional): Cursor from a previous page's metadata.
+                Used instead of page when given.
 
         Returns:
             dict or None: Search results, or None if request failed.
         """
+        params = self._search_params(
+            query, type, base_model, sort, page, page_size, nsfw, cursor
+        )
+
+        cache_key = self._flight_key("models", params)
+        result = self.search_cache.get(cache_key)
+        if result is not None:
+            logger.debug(f"命中搜索缓存: page={page}, cursor={cursor}")
+            return result
+
+        # 记录完整搜索参数
+        logger.info(f"搜索模型: query={query}, type={type}, page={page}, nsfw={nsfw}")
+
+        # 发送请求并处理响应
+        result = self.request("models", params)
+        self._log_search_result(result)
+        if result and "items" in result:
+            self.search_cache.put(cache_key, result)
+        return result
+
+    def _search_params(
+        self, query, type, base_model, sort, page, page_size, nsfw, cursor=None
+    ):
+        """构建搜索请求的查询参数"""
         params = {
             "limit": page_size,
-            "page": page,
             "sort": sort,
             "primaryFileOnly": "true",
         }
 
+        # 使用游标时不能同时传page
+        if cursor:
+            params["cursor"] = cursor
+        else:
+            params["page"] = page
+
         if query:
             params["query"] = query
 
@@ -165,22 +496,97 @@ class CivitaiAPI:
             params["nsfw"] = "true" if nsfw else "false"
             logger.debug(f"NSFW参数设置为: {params['nsfw']}")
 
-        # 记录完整搜索参数
-        logger.info(f"搜索模型: query={query}, type={type}, page={page}, nsfw={nsfw}")
+        return params
 
-        # 发送请求并处理响应
-        result = self.request("models", params)
+    def iter_search_pages(self, max_pages=None, prefetch=True, **search_kwargs):
+        """
+        Iterate over search result pages by following ``metadata.nextPage``.
+
+        Only the current page (and, with prefetch, the next one) is held in
+        memory, so long crawls can stream results.
+
+        Args:
+            max_pages (int, optional): Stop after this many pages.
+            prefetch (bool, optional): Fetch the next page in the background
+                while the caller processes the current one.
+            **search_kwargs: Arguments for search_models.
+
+        Yields:
+            dict: One page of search results.
+        """
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            result = self.search_models(**search_kwargs)
+            count = 0
+            while result:
+                count += 1
+                params = None
+                if max_pages is None or count < max_pages:
+                    params = self._next_page_params(result)
+
+                pending = None
+                if params and executor:
+                    pending = executor.submit(self.request, "models", params)
+
+                yield result
+
+                if not params:
+                    return
+                result = pending.result() if pending else self.request("models", params)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def iter_search_models(self, max_pages=None, prefetch=True, **search_kwargs):
+        """
+        Iterate over the models of every search result page.
+
+        Args:
+            max_pages (int, optional): Stop after this many pages.
+            prefetch (bool, optional): Fetch the next page in the background.
+            **search_kwargs: Arguments for search_models.
+
+        Yields:
+            dict: One model.
+        """
+        for page in self.iter_search_pages(max_pages, prefetch, **search_kwargs):
+            yield from page.get("items", [])
 
+    def next_search_kwargs(self, result, **search_kwargs):
+        """
+        Get the search_models arguments for the page after a result.
+
+        Args:
+            result (dict): Search results.
+            **search_kwargs: Arguments used for the current page.
+
+        Returns:
+            dict or None: Arguments for the next page, or None on the last page.
+        """
+        metadata = (result or {}).get("metadata") or {}
+        page = search_kwargs.get("page") or 1
+
+        if metadata.get("nextCursor"):
+            return {**search_kwargs, "cursor": metadata["nextCursor"], "page": page + 1}
+        if search_kwargs.get("cursor"):
+            return None
+
+        total_pages = metadata.get("totalPages")
+        if (total_pages and page < total_pages) or (
+            not total_pages and metadata.get("nextPage")
+        ):
+            return {**search_kwargs, "page": page + 1}
+        return None
+
+    def _log_search_result(self, result):
+        """记录搜索结果统计"""
         if result:
-            # 记录搜索结果统计
             items_count = len(result.get("items", []))
             total_items = result.get("metadata", {}).get("totalItems", 0)
             logger.info(f"搜索结果: 找到 {items_count} 个模型，总共 {total_items} 个")
         else:
             logger.warning("搜索请求失败或未返回结果")
 
-        return result
-
     def get_model(self, model_id):
         """
         Get details for a specific model.
@@ -208,10 +614,162 @@ class CivitaiAPI:
             return model_data["modelVersions"]
         return []
 
+    def get_models_bulk(self, ids, max_workers=4, refresh=False):
+        """
+        Get details for many models using batched ``models?ids=`` requests.
+
+        Fresh entries are served from the metadata cache; the remaining ids are
+        split into chunks of one page each and fetched concurrently. Every
+        fetched model is written to the metadata cache, and ids a complete
+        chunk did not return are remembered as missing.
+
+        Args:
+            ids (iterable): Model IDs.
+            max_workers (int, optional): Maximum number of chunks fetched at once.
+            refresh (bool, optional): Fetch models the server recently did not
+                return, too.
+
+        Returns:
+            dict: Model details keyed by model ID. IDs that could not be
+                fetched are missing from the result.
+        """
+        models, missing = self._bulk_cached(ids, refresh)
+        chunks = self._bulk_chunks(missing)
+        if not chunks:
+            return models
+
+        logger.info(f"批量获取模型: {len(missing)} 个, 分 {len(chunks)} 批请求")
+
+        if len(chunks) == 1 or max_workers <= 1:
+            pages = [self._fetch_models_chunk(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+                pages = list(pool.map(self._fetch_models_chunk, chunks))
+
+        fetched = self._merge_bulk_pages(pages, missing)
+        self._cache_fill(fetched)
+        self._bulk_missing(chunks, pages, fetched)
+        models.update(fetched)
+        return models
+
+    def _bulk_missing(self, chunks, pages, fetched):
+        """记录完整获取的批次中没有返回的模型（已删除或不可见）"""
+        for chunk, items in zip(chunks, pages):
+            if items is None:
+                continue
+            for model_id in chunk:
+                if model_id not in fetched:
+                    self._cache_missing(self._cache_key(f"models/{model_id}"))
+
+    def _bulk_cached(self, ids, refresh=False):
+        """
+        Split requested model IDs into cached models and IDs still to fetch.
+
+        Args:
+            ids (iterable): Model IDs, possibly with duplicates.
+            refresh (bool, optional): Fetch IDs remembered as missing, too.
+
+        Returns:
+            tuple: (dict of cached models keyed by ID, list of missing IDs)
+        """
+        models = {}
+        missing = []
+        seen = set()
+        for model_id in ids:
+            try:
+                model_id = int(model_id)
+            except (TypeError, ValueError):
+                logger.warning(f"忽略无效的模型ID: {model_id}")
+                continue
+            if model_id in seen:
+                continue
+            seen.add(model_id)
+
+            key = self._cache_key(f"models/{model_id}")
+            cached = self._cache_get(key)
+            if cached and self.cache.is_fresh(cached):
+                models[model_id] = cached["data"]
+                self.file_index.add_model(cached["data"])
+            elif refresh or not self._cache_is_missing(key):
+                missing.append(model_id)
+        return models, missing
+
+    def _bulk_chunks(self, ids):
+        """将ID按页大小分块"""
+        size = self.BULK_CHUNK_SIZE
+        return [ids[i : i + size] for i in range(0, len(ids), size)]
+
+    def _bulk_params(self, chunk):
+        """构建批量查询的参数，ids以列表形式编码为重复的查询参数"""
+        return {"ids": list(chunk), "limit": self.BULK_CHUNK_SIZE, "nsfw": "true"}
+
+    def _next_page_params(self, result):
+        """
+        Get the query parameters of the next page of a list response.
+
+        Args:
+            result (dict): List response.
+
+        Returns:
+            dict or None: Parameters for the next page, or None on the last page.
+        """
+        next_page = (result or {}).get("metadata", {}).get("nextPage")
+        if not next_page:
+            return None
+        query = parse_qs(urlparse(next_page).query)
+        return {k: v if k == "ids" or len(v) > 1 else v[0] for k, v in query.items()}
+
+    def _fetch_models_chunk(self, chunk):
+        """
+        Fetch one chunk of models, following nextPage if the server paginates.
+
+        Args:
+            chunk (list): Model IDs.
+
+        Returns:
+            list or None: Model items returned for the chunk, or None if a
+                page could not be fetched.
+        """
+        items = []
+        params = self._bulk_params(chunk)
+        while params:
+            result = self.request("models", params)
+            if not result:
+                return None
+            items.extend(result.get("items", []))
+            params = self._next_page_params(result)
+        return items
+
+    def _merge_bulk_pages(self, pages, requested):
+        """
+        Merge chunk results into a dict keyed by model ID.
+
+        Args:
+            pages (list): Item lists returned for each chunk (None for failed chunks).
+            requested (list): Model IDs that were requested.
+
+        Returns:
+            dict: Model details keyed by model ID.
+        """
+        wanted = set(requested)
+        models = {}
+        for items in pages:
+            for item in items or ():
+                model_id = item.get("id") if isinstance(item, dict) else None
+                if model_id in wanted:
+                    models[model_id] = item
+
+        if len(models) < len(wanted):
+            logger.warning(f"批量获取模型: {len(wanted) - len(models)} 个未返回")
+        return models
+
     def get_download_url(self, model_id, version_id=None, file_id=None):
         """
         Get the download URL for a specific model file.
 
+        The file index answers most lookups without a request. On a miss the
+        version is fetched on its own, and only if that fails the whole model.
+
         Args:
             model_id (int): Model ID.
             version_id (int, optional): Version ID. If None, uses the latest version.
@@ -220,8 +778,49 @@ class CivitaiAPI:
         Returns:
             str or None: Download URL, or None if not found.
         """
+        record = self.file_index.lookup(model_id, version_id, file_id)
+        if record is None and version_id:
+            # 只请求单个版本，比获取整个模型轻量得多
+            self.get_model_version(version_id)
+            record = self.file_index.lookup(model_id, version_id, file_id)
+        if record is not None:
+            return record["downloadUrl"]
+
         # Get model versions
         versions = self.get_model_versions(model_id)
+        return self._select_download_url(versions, version_id, file_id)
+
+    def get_file_record(self, model_id, version_id=None, file_id=None):
+        """
+        Get the indexed record (URL, size, hashes, primary flag) of a model file.
+
+        Args:
+            model_id (int): Model ID.
+            version_id (int, optional): Version ID. If None, uses the latest version.
+            file_id (int, optional): File ID. If None, uses the primary file.
+
+        Returns:
+            dict or None: File record, or None if not found.
+        """
+        if self.get_download_url(model_id, version_id, file_id) is None:
+            return None
+        # 请求的版本不存在时与get_download_url一样回退到最新版本
+        return self.file_index.lookup(
+            model_id, version_id, file_id
+        ) or self.file_index.lookup(model_id, None, file_id)
+
+    def _select_download_url(self, versions, version_id=None, file_id=None):
+        """
+        Pick the download URL of a file from a list of model versions.
+
+        Args:
+            versions (list): Model versions, latest first.
+            version_id (int, optional): Version ID. If None, uses the latest version.
+            file_id (int, optional): File ID. If None, uses the primary file.
+
+        Returns:
+            str or None: Download URL, or None if not found.
+        """
         if not versions:
             return None
 
@@ -391,17 +990,26 @@ class CivitaiAPI:
         """
         return self.request(f"model-versions/{version_id}")
 
-    def get_model_version_by_hash(self, hash_value):
+    def get_model_version_by_hash(self, hash_value, not_found=None, refresh=False):
         """
         Get model version details by hash.
 
         Args:
             hash_value (str): Hash value of the model file.
+            not_found (optional): Returned when Civitai does not know the hash.
+            refresh (bool, optional): Ask again even if Civitai recently did
+                not know the hash.
 
         Returns:
             dict or None: Version details, or None if request failed.
         """
-        return self.request(f"model-versions/by-hash/{hash_value}")
+        endpoint = f"model-versions/by-hash/{hash_value}"
+        kwargs = {}
+        if not_found is not None:
+            kwargs["not_found"] = not_found
+        if refresh:
+            kwargs["refresh"] = True
+        return self.request(endpoint, **kwargs)
 
     def get_download_url_from_link(
         self, download_url, model_type=None, use_preview=False
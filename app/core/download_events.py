@@ -0,0 +1,425 @@
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+
+from . import fast_json
+
+# 配置日志
+logger = logging.getLogger("download_events")
+
+
+def format_sse(data, event=None, event_id=None):
+    """
+    Format one Server-Sent Events message.
+
+    Args:
+        data: JSON-serializable payload.
+        event (str, optional): Event name.
+        event_id (int, optional): Event ID.
+
+    Returns:
+        str: The encoded message.
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append("data: " + fast_json.dumps(data).decode("utf-8"))
+    return "\n".join(lines) + "\n\n"
+
+
+# 仍在进行中的任务状态
+ACTIVE_STATUSES = frozenset({"queued", "downloading", "active", "paused"})
+
+
+def task_filter(active_only=False, task_id=None):
+    """
+    Build a predicate selecting the tasks a client wants to see.
+
+    Args:
+        active_only (bool, optional): Only queued, paused and running tasks.
+        task_id (str, optional): Only this task.
+
+    Returns:
+        callable or None: Predicate taking a task, or None to see every task.
+    """
+    if not active_only and task_id is None:
+        return None
+
+    def matches(task):
+        if task_id is not None and task.get("id") != task_id:
+            return False
+        return not active_only or task.get("status") in ACTIVE_STATUSES
+
+    return matches
+
+
+class _Subscriber:
+    """一个连接待发送的变化，多次变化在发送前合并"""
+
+    def __init__(self, matches=None):
+        self.matches = matches
+        # 客户端当前能看到的任务ID，任务不再符合过滤条件时发送移除
+        self.visible = set()
+        self.upsert = {}
+        self.remove = set()
+        self.event = asyncio.Event()
+
+    def reset(self, tasks):
+        """按当前过滤条件重新开始，返回客户端应看到的全部任务"""
+        selected = [task for task in tasks if self.matches is None or self.matches(task)]
+        self.visible = {task["id"] for task in selected}
+        self.upsert = {}
+        self.remove = set()
+        self.event.clear()
+        return selected
+
+    def push(self, upsert, remove):
+        changed = False
+        for task in upsert:
+            task_id = task["id"]
+            if self.matches is None or self.matches(task):
+                self.upsert[task_id] = task
+                self.remove.discard(task_id)
+                self.visible.add(task_id)
+                changed = True
+            elif task_id in self.visible:
+                remove = list(remove) + [task_id]
+        for task_id in remove:
+            if task_id in self.visible:
+                self.upsert.pop(task_id, None)
+                self.remove.add(task_id)
+                self.visible.discard(task_id)
+                changed = True
+        if changed:
+            self.event.set()
+
+    def take(self):
+        delta = {"upsert": list(self.upsert.values()), "remove": sorted(self.remove)}
+        self.upsert = {}
+        self.remove = set()
+        self.event.clear()
+        return delta
+
+    async def wait(self, timeout):
+        """
+        Wait for the next batch of changes.
+
+        Args:
+            timeout (float): Seconds to wait.
+
+        Returns:
+            dict or None: Delta with ``upsert`` and ``remove``, or None on timeout.
+        """
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.take()
+
+
+class TaskVersions:
+    """
+    Versioned view of the download task store.
+
+    Every read that finds a change bumps a monotonically increasing state
+    version and stamps the changed tasks with it, so clients can ask for
+    only what changed since the version they already have.
+    """
+
+    # 记住的已移除任务数量，更早的移除需要客户端重新获取完整列表
+    MAX_REMOVED = 1000
+
+    def __init__(self):
+        self.version = 0
+        # 每次进程启动不同，避免重启后旧的ETag被误认为有效
+        self.epoch = uuid.uuid4().hex[:8]
+        self._tasks = {}
+        self._versions = {}
+        self._removed = OrderedDict()
+        # 早于这个版本的移除记录已被丢弃
+        self._floor = 0
+
+    def update(self, tasks):
+        """
+        Record the current tasks.
+
+        Args:
+            tasks (list): Current download tasks.
+
+        Returns:
+            tuple: (changed tasks, IDs of removed tasks).
+        """
+        current = {task["id"]: task for task in tasks if task.get("id") is not None}
+        upsert = [task for task_id, task in current.items() if self._tasks.get(task_id) != task]
+        remove = [task_id for task_id in self._tasks if task_id not in current]
+        if not upsert and not remove:
+            # 顺序变化不算变化，但保留新的顺序
+            self._tasks = current
+            return upsert, remove
+
+        self.version += 1
+        for task in upsert:
+            self._versions[task["id"]] = self.version
+            self._removed.pop(task["id"], None)
+        for task_id in remove:
+            self._versions.pop(task_id, None)
+            self._removed[task_id] = self.version
+        while len(self._removed) > self.MAX_REMOVED:
+            _, version = self._removed.popitem(last=False)
+            self._floor = max(self._floor, version)
+        self._tasks = current
+        return upsert, remove
+
+    def tasks(self):
+        """
+        Get the tasks as of the current version.
+
+        Returns:
+            list: Download tasks, in store order.
+        """
+        return list(self._tasks.values())
+
+    def etag(self):
+        """
+        Get an ETag for the current version.
+
+        Returns:
+            str: Quoted ETag.
+        """
+        return f'"{self.epoch}-{self.version}"'
+
+    def changes_since(self, since):
+        """
+        Get the changes made after a version.
+
+        Args:
+            since (int): Version the client already has.
+
+        Returns:
+            dict: ``version``, ``full`` and ``upsert``/``remove`` lists. When
+                ``full`` is true, ``upsert`` holds every task and replaces the
+                client's list (the version is unknown or too old).
+        """
+        if since > self.version or since < self._floor:
+            return {"version": self.version, "full": True, "upsert": self.tasks(), "remove": []}
+        return {
+            "version": self.version,
+            "full": False,
+            "upsert": [
+                task
+                for task_id, task in self._tasks.items()
+                if self._versions.get(task_id, 0) > since
+            ],
+            "remove": [
+                task_id for task_id, version in self._removed.items() if version > since
+            ],
+        }
+
+
+class DownloadEventHub:
+    """
+    Pushes download progress to any number of streaming clients.
+
+    A single poller reads the task store at a fixed cadence while at least
+    one client is connected and sends each client only the tasks that changed.
+    Changes a slow client has not received yet are merged, so it always gets
+    the latest state of a task instead of a backlog of intermediate updates.
+    """
+
+    # 读取任务状态的间隔（秒）
+    INTERVAL = 0.5
+
+    # 没有变化时发送注释行的间隔（秒），防止代理断开空闲连接
+    KEEPALIVE = 15
+
+    # 断线后浏览器重连前等待的时间（毫秒）
+    RETRY_MS = 3000
+
+    def __init__(self, source, interval=None):
+        """
+        Initialize the hub.
+
+        Args:
+            source (callable): Returns the current list of download tasks.
+            interval (float, optional): Seconds between reads of the task store.
+        """
+        self.source = source
+        self.interval = interval or self.INTERVAL
+        self.versions = TaskVersions()
+        self._subscribers = set()
+        self._poller = None
+        self._seq = 0
+
+    def poll(self, tasks=None):
+        """
+        Read the task store once and queue the changes for every client.
+
+        Args:
+            tasks (list, optional): Tasks already read by the caller. Read
+                from the source on the calling thread by default; code on the
+                event loop uses refresh() instead.
+
+        Returns:
+            bool: True if anything changed.
+        """
+        if tasks is None:
+            try:
+                tasks = self.source()
+            except Exception as e:
+                logger.error(f"读取下载任务失败: {e}", exc_info=True)
+                return False
+        upsert, remove = self.versions.update(tasks)
+        if not upsert and not remove:
+            return False
+        for subscriber in self._subscribers:
+            subscriber.push(upsert, remove)
+        return True
+
+    async def refresh(self):
+        """
+        Read the task store in a worker thread and queue the changes.
+
+        The source may wait for the download manager's lock, so it is never
+        called on the event loop.
+
+        Returns:
+            bool: True if anything changed.
+        """
+        try:
+            tasks = await asyncio.to_thread(self.source)
+        except Exception as e:
+            logger.error(f"读取下载任务失败: {e}", exc_info=True)
+            return False
+        return self.poll(tasks)
+
+    async def _run(self):
+        """有客户端连接时按固定间隔读取任务状态"""
+        try:
+            while self._subscribers:
+                await self.refresh()
+                await asyncio.sleep(self.interval)
+        finally:
+            self._poller = None
+
+    async def subscribe(self, matches=None):
+        """
+        Register a client and start polling if needed.
+
+        Args:
+            matches (callable, optional): Predicate selecting the tasks the client sees.
+
+        Returns:
+            _Subscriber: Handle for snapshot(), wait() and unsubscribe().
+        """
+        if not self._subscribers:
+            # 没有客户端时不读取，重新开始时先刷新一次状态
+            await self.refresh()
+        subscriber = _Subscriber(matches)
+        self._subscribers.add(subscriber)
+        if self._poller is None:
+            self._poller = asyncio.ensure_future(self._run())
+        return subscriber
+
+    def snapshot(self, subscriber):
+        """
+        Get every task a client should see and restart its change tracking.
+
+        Call again after changing ``subscriber.matches`` to apply a new filter.
+
+        Args:
+            subscriber (_Subscriber): Handle returned by subscribe().
+
+        Returns:
+            list: Tasks matching the client's filter.
+        """
+        return subscriber.reset(self.versions.tasks())
+
+    async def wait_for_change(self, version, timeout):
+        """
+        Wait until the state version moves past a version.
+
+        Args:
+            version (int): Version the caller already has.
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            bool: True if the state changed.
+        """
+        if self.versions.version != version:
+            return True
+        subscriber = await self.subscribe()
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while self.versions.version == version:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                await subscriber.wait(remaining)
+            return True
+        finally:
+            self.unsubscribe(subscriber)
+
+    def unsubscribe(self, subscriber):
+        """
+        Remove a client. Polling stops with the last client.
+
+        Args:
+            subscriber (_Subscriber): Handle returned by subscribe().
+        """
+        self._subscribers.discard(subscriber)
+
+    def next_id(self):
+        """
+        Get the next event ID.
+
+        Returns:
+            int: Event ID, increasing across all clients.
+        """
+        self._seq += 1
+        return self._seq
+
+    async def stream(self, matches=None):
+        """
+        Stream download events as Server-Sent Events.
+
+        The first message is a ``snapshot`` event with all tasks, followed by
+        ``delta`` events with ``upsert`` (changed tasks) and ``remove`` (task IDs).
+
+        Args:
+            matches (callable, optional): Predicate selecting the streamed tasks.
+
+        Yields:
+            str: Encoded SSE messages.
+        """
+        subscriber = await self.subscribe(matches)
+        try:
+            yield f"retry: {self.RETRY_MS}\n\n"
+            yield format_sse(
+                {"tasks": self.snapshot(subscriber)}, "snapshot", self._seq
+            )
+            while True:
+                delta = await subscriber.wait(self.KEEPALIVE)
+                if delta is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(delta, "delta", self.next_id())
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        """
+        Get hub statistics.
+
+        Returns:
+            dict: Connected clients, tracked tasks and events sent.
+        """
+        return {
+            "clients": len(self._subscribers),
+            "tasks": len(self.versions.tasks()),
+            "version": self.versions.version,
+            "events": self._seq,
+        }
@@ -7,7 +7,7 @@ import threading
 import requests
 from pathlib import Path
 import shutil
-from .settings import Settings
+from .settings import get_settings_service
 from .civitai_api import CivitaiAPI
 
 
@@ -17,17 +17,22 @@ class DownloadManager:
     Supports both direct downloads and downloads using aria2.
     """
 
-    def __init__(self, api_client=None, model_dir=None):
+    def __init__(self, api_client=None, model_dir=None, settings=None):
         """
         Initialize the download manager.
 
         Args:
             api_client (CivitaiAPI, optional): API client. If None, creates a new one.
             model_dir (str, optional): Base directory for models. If None, uses the default from settings.
+            settings (Settings, optional): Settings object. If None, uses the shared settings.
         """
-        self.settings = Settings()
+        service = get_settings_service()
+        self.settings = settings or service.get()
         self.api_client = api_client or CivitaiAPI(settings=self.settings)
         self.model_dir = model_dir or self.settings.model_dir
+        self._fixed_model_dir = model_dir is not None
+        # aria2参数变化后，在下一个aria2任务开始前重启自己启动的aria2
+        self._aria2_restart_pending = False
         self.queue = []
         self.current_download = None
         self.download_thread = None
@@ -42,11 +47,50 @@ class DownloadManager:
         # Ensure model directories exist
         self.settings.ensure_model_dirs()
 
+        # 使用共享设置时订阅变更
+        if self.settings is service.current:
+            service.subscribe(self.apply_settings)
+
         # Start the download thread
         self.thread = threading.Thread(target=self._process_queue)
         self.thread.daemon = True
         self.thread.start()
 
+    def apply_settings(self, settings, changed):
+        """
+        Reconfigure the manager in place after a settings change.
+
+        Queued and running downloads are kept. New tasks use the new model
+        directory and download method, and aria2 is restarted with new flags
+        before its next download.
+
+        Args:
+            settings (Settings): New settings.
+            changed (set): Names of the changed settings.
+        """
+        self.settings = settings
+        if "model_dir" in changed and not self._fixed_model_dir:
+            self.model_dir = settings.model_dir
+            try:
+                settings.ensure_model_dirs()
+            except OSError as e:
+                print(f"无法创建模型目录: {e}")
+        if "aria2_flags" in changed:
+            self._aria2_restart_pending = True
+
+    def _stop_aria2_rpc(self):
+        """停止由本管理器启动的aria2进程"""
+        process = self.aria2_process
+        self.aria2_process = None
+        if process is None or process.poll() is not None:
+            return
+        print("停止aria2 RPC服务器以应用新参数")
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
     def create_download_task(
         self,
         model_id,
@@ -166,6 +210,95 @@ class DownloadManager:
 
             return False
 
+    def _queued_task(self, task_id):
+        """查找尚未开始下载的队列任务（调用方需持有锁）"""
+        for i, task in enumerate(self.queue):
+            if task["id"] != task_id:
+                continue
+            if self.current_download and self.current_download["id"] == task_id:
+                return None, None
+            return i, task
+        return None, None
+
+    def pause_task(self, task_id):
+        """
+        Hold a queued task back until it is resumed.
+
+        Only tasks that have not started can be paused.
+
+        Args:
+            task_id (str): Task ID.
+
+        Returns:
+            bool: True if the task was paused.
+        """
+        with self._tasks_lock:
+            _, task = self._queued_task(task_id)
+            if task is None or task["status"] != "queued":
+                return False
+            task["status"] = "paused"
+            return True
+
+    def resume_task(self, task_id):
+        """
+        Put a paused task back in line.
+
+        Args:
+            task_id (str): Task ID.
+
+        Returns:
+            bool: True if the task was resumed.
+        """
+        with self._tasks_lock:
+            _, task = self._queued_task(task_id)
+            if task is None or task["status"] != "paused":
+                return False
+            task["status"] = "queued"
+        self._ensure_download_thread_running()
+        return True
+
+    def move_task(self, task_id, position):
+        """
+        Move a queued task to another place in the queue.
+
+        The running download always stays first.
+
+        Args:
+            task_id (str): Task ID.
+            position (int): New index among the tasks that have not started (0 is next).
+
+        Returns:
+            bool: True if the task was moved.
+        """
+        with self._tasks_lock:
+            index, task = self._queued_task(task_id)
+            if task is None:
+                return False
+            self.queue.pop(index)
+            running = (
+                self.current_download
+                and self.queue
+                and self.queue[0]["id"] == self.current_download["id"]
+            )
+            first = 1 if running else 0
+            position = min(max(0, int(position)), len(self.queue) - first)
+            self.queue.insert(first + position, task)
+            return True
+
+    def clear_history(self):
+        """Forget finished downloads, keeping the running and queued ones."""
+        with self._tasks_lock:
+            active_downloads = []
+            if self.current_download:
+                active_downloads.append(self.current_download.copy())
+            active_downloads.extend([task.copy() for task in self.queue])
+
+            self.recent_downloads = []
+            for download in active_downloads:
+                if download["status"] in ["completed", "failed"]:
+                    continue
+                self._add_to_recent_downloads(download)
+
     def get_queue(self):
         """
         Get the current download queue.
@@ -213,10 +346,21 @@ class DownloadManager:
         while True:
             # 检查队列是否为空（使用线程锁保护）
             with self._tasks_lock:
-                if not self.queue:
-                    # 队列为空，退出循环
+                # 跳过已暂停的任务，把第一个可下载的任务移到队首
+                runnable = next(
+                    (
+                        i
+                        for i, task in enumerate(self.queue)
+                        if task.get("status") != "paused"
+                    ),
+                    None,
+                )
+                if runnable is None:
+                    # 队列为空或全部暂停，退出循环
                     self.current_download = None
                     break
+                if runnable:
+                    self.queue.insert(0, self.queue.pop(runnable))
                 # 获取队列中的第一个任务但不立即移除
                 self.current_download = self.queue[
                     0
@@ -628,6 +772,10 @@ class DownloadManager:
 
     def _start_aria2_rpc(self):
         """Start the aria2 RPC server if not already running."""
+        if self._aria2_restart_pending:
+            self._aria2_restart_pending = False
+            self._stop_aria2_rpc()
+
         # Check if aria2 RPC is already running
         try:
             # Try to contact the RPC server
@@ -900,6 +1048,30 @@ class DownloadManager:
             task["error"] = error_msg
             return task
 
+    def snapshot_downloads(self):
+        """
+        Get copies of the current, queued and recently finished tasks without logging.
+
+        Returns:
+            list: Download tasks, newest first.
+        """
+        with self._tasks_lock:
+            result = []
+            seen = set()
+            if self.current_download:
+                result.append(self.current_download.copy())
+                seen.add(self.current_download["id"])
+            for task in list(self.queue) + list(self.recent_downloads):
+                task_id = task.get("id")
+                if task_id in seen:
+                    continue
+                seen.add(task_id)
+                result.append(task.copy())  # 使用副本避免引用问题
+
+        # 按创建时间排序（最新的在前）
+        result.sort(key=lambda x: x.get("created_at", 0), reverse=True)
+        return result
+
     def get_active_and_recent_downloads(self):
         """
         获取所有活动和最近的下载任务
@@ -909,41 +1081,9 @@ class DownloadManager:
         Returns:
             list: 下载任务列表
         """
-        with self._tasks_lock:
-            # 创建结果列表
-            result = []
-
-            # 如果有当前下载，添加到结果中
-            if self.current_download:
-                print(f"添加当前下载到结果列表: {self.current_download['id']}")
-                result.append(self.current_download.copy())  # 使用副本避免引用问题
-
-            # 添加队列中的任务
-            if self.queue:
-                print(f"添加队列中的{len(self.queue)}个任务到结果列表")
-                for task in self.queue:
-                    # 跳过当前下载（已添加）
-                    if (
-                        self.current_download
-                        and task["id"] == self.current_download["id"]
-                    ):
-                        continue
-                    result.append(task.copy())  # 使用副本避免引用问题
-
-            # 添加最近完成的下载
-            if self.recent_downloads:
-                print(f"添加{len(self.recent_downloads)}个最近完成的下载到结果列表")
-                for task in self.recent_downloads:
-                    # 避免重复添加
-                    task_id = task.get("id")
-                    if not any(r.get("id") == task_id for r in result):
-                        result.append(task.copy())  # 使用副本避免引用问题
-
-            # 按创建时间排序（最新的在前）
-            result.sort(key=lambda x: x.get("created_at", 0), reverse=True)
-
-            print(f"总共返回{len(result)}个下载任务")
-            return result
+        result = self.snapshot_downloads()
+        print(f"总共返回{len(result)}个下载任务")
+        return result
 
     def _get_aria2_downloads(self):
         """
@@ -0,0 +1,68 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson是可选依赖，缺失时回退到标准库
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+
+def loads(data):
+    """
+    Decode JSON.
+
+    Args:
+        data (bytes or str): JSON document.
+
+    Returns:
+        The decoded object.
+
+    Raises:
+        ValueError: If the document is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """
+    Encode an object as compact UTF-8 JSON.
+
+    Non-string dict keys (such as model IDs) are converted to strings, as the
+    standard library does.
+
+    Args:
+        obj: Object to encode.
+
+    Returns:
+        bytes: JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def decode_response(response):
+    """
+    Decode the JSON body of an HTTP response.
+
+    Parses the raw body directly when it is available, which skips the text
+    decoding step of response.json(). Works with requests and httpx responses.
+
+    Args:
+        response: HTTP response.
+
+    Returns:
+        The decoded object.
+
+    Raises:
+        ValueError: If the body is not valid JSON.
+    """
+    content = getattr(response, "content", None)
+    if isinstance(content, (bytes, bytearray)):
+        return loads(content)
+    return response.json()
@@ -0,0 +1,192 @@
+import threading
+
+
+class FileIndex:
+    """
+    In-memory index of model files keyed by version and file ID.
+
+    Filled from every model, version and search response the API client
+    sees, so resolving a download URL is usually a dictionary lookup instead
+    of a full model fetch followed by a linear scan. Search pages only list
+    the primary file of each version, so versions seen there are marked
+    partial and cannot answer lookups for other files.
+    """
+
+    def __init__(self, max_versions=50000):
+        """
+        Initialize the index.
+
+        Args:
+            max_versions (int, optional): Versions kept before the oldest are dropped.
+        """
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        # model_id -> 版本ID列表（最新在前）
+        self._models = {}
+        # version_id -> {"model_id", "files": [file_id, ...], "partial"}
+        self._versions = {}
+        # file_id -> 文件记录
+        self._files = {}
+
+    @staticmethod
+    def _file_record(file_data, version_id, model_id):
+        """提取下载所需的文件字段"""
+        size = file_data.get("size")
+        if size is None and file_data.get("sizeKB") is not None:
+            size = int(file_data["sizeKB"] * 1024)
+        return {
+            "id": file_data.get("id"),
+            "version_id": version_id,
+            "model_id": model_id,
+            "name": file_data.get("name"),
+            "type": file_data.get("type"),
+            "primary": bool(file_data.get("primary", False)),
+            "size": size,
+            "hashes": file_data.get("hashes") or {},
+            "downloadUrl": file_data.get("downloadUrl"),
+        }
+
+    def add_version(self, version, model_id=None, partial=False):
+        """
+        Index the files of a model version.
+
+        Args:
+            version (dict): Version data from the API.
+            model_id (int, optional): Model ID, if not part of the version data.
+            partial (bool, optional): The data only lists some of the files
+                (the primary file of a search result).
+        """
+        version_id = version.get("id")
+        if version_id is None or not isinstance(version.get("files"), list):
+            return
+        model_id = version.get("modelId", model_id)
+
+        records = [
+            self._file_record(f, version_id, model_id)
+            for f in version["files"]
+            if isinstance(f, dict) and f.get("id") is not None
+        ]
+
+        with self._lock:
+            old = self._versions.get(version_id)
+            if partial and old and not old["partial"]:
+                # 已有完整的文件列表，不用搜索结果覆盖
+                return
+            self._versions.pop(version_id, None)
+            if old:
+                for file_id in old["files"]:
+                    self._files.pop(file_id, None)
+            self._versions[version_id] = {
+                "model_id": model_id,
+                "files": [r["id"] for r in records],
+                "partial": partial,
+            }
+            for record in records:
+                self._files[record["id"]] = record
+            self._evict()
+
+    def add_model(self, model, partial=False):
+        """
+        Index every version of a model.
+
+        Args:
+            model (dict): Model data from the API.
+            partial (bool, optional): The versions only list some of their files.
+        """
+        model_id = model.get("id")
+        versions = [v for v in model.get("modelVersions") or [] if isinstance(v, dict)]
+        for version in versions:
+            self.add_version(version, model_id, partial)
+        if model_id is not None and versions:
+            with self._lock:
+                self._models[model_id] = [v.get("id") for v in versions]
+
+    def add_response(self, data, partial=False):
+        """
+        Index whatever files an API response contains.
+
+        Args:
+            data (dict): Decoded API response (model, version or list of models).
+            partial (bool, optional): The response was requested with
+                ``primaryFileOnly`` and only lists primary files.
+        """
+        if not isinstance(data, dict):
+            return
+        if isinstance(data.get("items"), list):
+            for item in data["items"]:
+                if isinstance(item, dict):
+                    self.add_model(item, partial)
+        elif "modelVersions" in data:
+            self.add_model(data, partial)
+        elif "files" in data:
+            self.add_version(data, partial=partial)
+
+    def _evict(self):
+        """超出容量时丢弃最早加入的版本（调用方需持有锁）"""
+        while len(self._versions) > self.max_versions:
+            version_id = next(iter(self._versions))
+            for file_id in self._versions.pop(version_id)["files"]:
+                self._files.pop(file_id, None)
+
+    def lookup(self, model_id=None, version_id=None, file_id=None):
+        """
+        Find a file record using the same rules as CivitaiAPI.get_download_url.
+
+        Args:
+            model_id (int, optional): Model ID, used when no version is given.
+            version_id (int, optional): Version ID. If None, uses the latest known version.
+            file_id (int, optional): File ID. If None, uses the primary file.
+
+        Returns:
+            dict or None: File record, or None if the index cannot answer
+                (including a file ID missing from a partial version).
+        """
+        with self._lock:
+            if version_id is None:
+                versions = self._models.get(model_id)
+                if not versions:
+                    return None
+                version_id = versions[0]
+
+            version = self._versions.get(version_id)
+            if version is None:
+                return None
+            if model_id is not None and version["model_id"] not in (None, model_id):
+                return None
+
+            records = [self._files[i] for i in version["files"] if i in self._files]
+            if not records:
+                return None
+
+            if file_id is not None:
+                for record in records:
+                    if record["id"] == file_id:
+                        return dict(record)
+                if version["partial"]:
+                    return None
+
+            for record in records:
+                if record["primary"]:
+                    return dict(record)
+            return dict(records[0])
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._models.clear()
+            self._versions.clear()
+            self._files.clear()
+
+    def stats(self):
+        """
+        Get index statistics.
+
+        Returns:
+            dict: Number of indexed models, versions and files.
+        """
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "versions": len(self._versions),
+                "files": len(self._files),
+            }
@@ -0,0 +1,267 @@
+import os
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 配置日志
+logger = logging.getLogger("hashing")
+
+# 每次读取的块大小，大块读取时 hashlib 会释放 GIL
+BLOCK_SIZE = 8 << 20
+
+
+# 快速指纹读取的每段大小（文件开头、中间、结尾各一段）
+FINGERPRINT_SAMPLE = 1 << 20
+
+
+class HashingCancelled(Exception):
+    """Raised inside a hashing worker when the caller cancelled the run."""
+
+
+def sha256_file(path, block_size=BLOCK_SIZE, on_read=None, cancel=None):
+    """
+    Compute the SHA256 hash of a file.
+
+    Reads into one page-aligned buffer, so large sequential reads do not
+    allocate and the digest is updated without copying.
+
+    Args:
+        path (str): File to hash.
+        block_size (int, optional): Bytes read at a time.
+        on_read (callable, optional): Called with the number of bytes after each read.
+        cancel (threading.Event, optional): Stops hashing when set.
+
+    Returns:
+        str: Upper-case hex digest.
+
+    Raises:
+        HashingCancelled: If ``cancel`` was set.
+        OSError: If the file cannot be read.
+    """
+    h = hashlib.sha256()
+    # 匿名 mmap 按页对齐，适合大块顺序读取
+    buffer = mmap.mmap(-1, block_size)
+    view = memoryview(buffer)
+    try:
+        with open(path, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise HashingCancelled(path)
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                h.update(view[:n])
+                if on_read is not None:
+                    on_read(n)
+    finally:
+        view.release()
+        buffer.close()
+    return h.hexdigest().upper()
+
+
+def quick_fingerprint(path, sample_size=FINGERPRINT_SAMPLE):
+    """
+    Compute a cheap fingerprint from the size and three samples of a file.
+
+    Hashes the first, middle and last ``sample_size`` bytes together with
+    the size. Different fingerprints prove files differ; equal fingerprints
+    only make a match likely and need a full SHA256 to confirm. Files no
+    larger than three samples are read whole, so their fingerprint is exact.
+
+    Args:
+        path (str): File to fingerprint.
+        sample_size (int, optional): Bytes read per sample.
+
+    Returns:
+        str: Hex digest.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        h.update(size.to_bytes(8, "little"))
+        if size <= 3 * sample_size:
+            h.update(f.read())
+        else:
+            for offset in (0, (size - sample_size) // 2, size - sample_size):
+                f.seek(offset)
+                h.update(f.read(sample_size))
+    return h.hexdigest()
+
+
+class HashProgress:
+    """Thread-safe byte and file counters of a hashing run, with rate and ETA."""
+
+    def __init__(self, total_files=0, total_bytes=0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.done_files = 0
+        # 实际读取的字节数，用于计算速度；缓存命中的文件只计入已完成
+        self.read_bytes = 0
+        self.skipped_bytes = 0
+        self.failed = 0
+        self.current = set()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def add_read(self, n):
+        with self._lock:
+            self.read_bytes += n
+
+    def start_file(self, path):
+        with self._lock:
+            self.current.add(path)
+
+    def finish_file(self, path, size, read, failed=False):
+        """结束一个文件；未读取的部分（缓存命中或出错）计为跳过"""
+        with self._lock:
+            self.current.discard(path)
+            self.done_files += 1
+            self.skipped_bytes += max(0, size - read)
+            if failed:
+                self.failed += 1
+
+    def snapshot(self):
+        """
+        Get the current progress.
+
+        Returns:
+            dict: Files and bytes done, throughput in bytes per second and
+                estimated seconds left (None until anything was read).
+        """
+        with self._lock:
+            elapsed = max(time.time() - self.started_at, 1e-6)
+            done_bytes = min(self.read_bytes + self.skipped_bytes, self.total_bytes)
+            rate = self.read_bytes / elapsed
+            remaining = self.total_bytes - done_bytes
+            return {
+                "files_done": self.done_files,
+                "files_total": self.total_files,
+                "bytes_done": done_bytes,
+                "bytes_total": self.total_bytes,
+                "failed": self.failed,
+                "current": sorted(os.path.basename(p) for p in self.current),
+                "rate": round(rate),
+                "eta": round(remaining / rate, 1) if rate > 0 else None,
+                "elapsed": round(elapsed, 1),
+            }
+
+
+class HashingEngine:
+    """
+    Hashes many files in parallel on a bounded thread pool.
+
+    hashlib releases the GIL while digesting large blocks, so a few
+    threads keep fast storage busy. Files are started largest first so the
+    workers finish at about the same time. With a LibraryIndex, unchanged
+    files are answered from its hash cache and new hashes are stored in it.
+    """
+
+    # 默认并行数，适合 NVMe；机械硬盘或网络存储应设为 1-2
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, workers=None, block_size=BLOCK_SIZE, index=None):
+        """
+        Initialize the engine.
+
+        Args:
+            workers (int, optional): Files hashed at the same time.
+            block_size (int, optional): Bytes read at a time per worker.
+            index (LibraryIndex, optional): Hash cache to consult and fill.
+        """
+        self.workers = max(1, workers or self.DEFAULT_WORKERS)
+        self.block_size = block_size
+        self.index = index
+
+    def hash_files(self, paths, progress=None, cancel=None, trust_sidecar=True, on_file=None):
+        """
+        Hash files in parallel.
+
+        Args:
+            paths (iterable): Files to hash.
+            progress (callable, optional): Called with HashProgress.snapshot()
+                after each file.
+            cancel (threading.Event, optional): Stops the run when set.
+            trust_sidecar (bool, optional): Accept sidecar hashes the index
+                considers fresh (only with an index).
+            on_file (callable, optional): Called with (path, sha256) as each
+                file finishes, from the worker thread.
+
+        Returns:
+            dict: Path to upper-case SHA256, or to None if the file could not be read.
+
+        Raises:
+            HashingCancelled: If ``cancel`` was set before all files were hashed.
+        """
+        sized = []
+        for path in dict.fromkeys(paths):
+            try:
+                sized.append((os.path.getsize(path), path))
+            except OSError as e:
+                logger.warning(f"无法读取文件大小 {path}: {e}")
+                sized.append((0, path))
+        # 先处理大文件，避免最后只剩一个线程在读大文件
+        sized.sort(key=lambda item: item[0], reverse=True)
+
+        state = HashProgress(len(sized), sum(size for size, _ in sized))
+        results = {}
+
+        def work(size, path):
+            # 缓存或 sidecar 中的哈希不经过 sha256_file，也要检查取消
+            if cancel is not None and cancel.is_set():
+                raise HashingCancelled()
+            read = [0]
+
+            def on_read(n):
+                read[0] += n
+                state.add_read(n)
+
+            def hasher(target):
+                return sha256_file(target, self.block_size, on_read, cancel)
+
+            state.start_file(path)
+            try:
+                if self.index is not None:
+                    sha256 = self.index.file_sha256(path, trust_sidecar, hasher=hasher)
+                else:
+                    sha256 = hasher(path)
+            except HashingCancelled:
+                state.finish_file(path, size, read[0])
+                raise
+            except OSError as e:
+                logger.error(f"计算哈希失败 {path}: {e}")
+                state.finish_file(path, size, read[0], failed=True)
+                return path, None
+            state.finish_file(path, size, read[0])
+            if on_file is not None:
+                on_file(path, sha256)
+            return path, sha256
+
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="hashing"
+        ) as pool:
+            futures = [pool.submit(work, size, path) for size, path in sized]
+            try:
+                for future in as_completed(futures):
+                    path, sha256 = future.result()
+                    results[path] = sha256
+                    if progress is not None:
+                        progress(state.snapshot())
+            except HashingCancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        snapshot = state.snapshot()
+        logger.info(
+            f"已计算 {snapshot['files_done']} 个文件的哈希，"
+            f"读取 {state.read_bytes} 字节，用时 {snapshot['elapsed']} 秒"
+        )
+        return results
@@ -0,0 +1,272 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 配置日志
+logger = logging.getLogger("jobs")
+
+
+class JobCancelled(Exception):
+    """Raised by a job function to stop after Job.cancel() was called."""
+
+
+class Job:
+    """A background task with progress, result and cooperative cancellation."""
+
+    # 尚未结束的状态
+    ACTIVE_STATUSES = frozenset({"queued", "running"})
+
+    def __init__(self, kind, params=None):
+        """
+        Initialize the job.
+
+        Args:
+            kind (str): Job type, such as ``hash``.
+            params (dict, optional): Parameters shown with the job.
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        """True once cancellation was requested."""
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """
+        Request cancellation. The job function stops at its next check.
+
+        Returns:
+            bool: False if the job had already finished.
+        """
+        with self._lock:
+            if self.status not in self.ACTIVE_STATUSES:
+                return False
+            self.cancel_event.set()
+            if self.status == "queued":
+                self._finish("cancelled")
+        return True
+
+    def check_cancelled(self):
+        """
+        Stop the job if cancellation was requested.
+
+        Raises:
+            JobCancelled: If the job was cancelled.
+        """
+        if self.cancelled:
+            raise JobCancelled(self.id)
+
+    def update(self, **progress):
+        """
+        Merge progress fields.
+
+        Args:
+            **progress: Fields such as ``files_done`` or ``eta``.
+        """
+        with self._lock:
+            self.progress.update(progress)
+
+    def _finish(self, status, result=None, error=None):
+        """记录结束状态（调用方需持有锁）"""
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+
+    def run(self, func, *args, **kwargs):
+        """执行任务函数并记录结果"""
+        with self._lock:
+            if self.status != "queued":
+                return
+            self.status = "running"
+            self.started_at = time.time()
+        try:
+            result = func(self, *args, **kwargs)
+        except JobCancelled:
+            status, result, error = "cancelled", None, None
+        except Exception as e:
+            if self.cancelled:
+                status, result, error = "cancelled", None, None
+            else:
+                logger.error(f"后台任务失败 {self.kind} {self.id}: {e}", exc_info=True)
+                status, result, error = "failed", None, str(e)
+        else:
+            status, error = "completed", None
+        with self._lock:
+            self._finish(status, result, error)
+        logger.info(f"后台任务结束 {self.kind} {self.id}: {status}")
+
+    def to_dict(self):
+        """
+        Get the job state.
+
+        Returns:
+            dict: ID, kind, status, progress, result, error and timestamps.
+        """
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Runs long tasks (hashing, scans) on a small thread pool.
+
+    Jobs are queued when every worker is busy. Finished jobs are kept for a
+    while so clients can read their result.
+    """
+
+    # 同时运行的任务数
+    MAX_WORKERS = 2
+
+    # 保留的已结束任务数量
+    MAX_FINISHED = 50
+
+    def __init__(self, max_workers=None):
+        """
+        Initialize the manager.
+
+        Args:
+            max_workers (int, optional): Jobs run at the same time.
+        """
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or self.MAX_WORKERS, thread_name_prefix="job"
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, params=None, **kwargs):
+        """
+        Queue a job.
+
+        Args:
+            kind (str): Job type.
+            func (callable): Called as ``func(job, *args, **kwargs)``; its
+                return value becomes the job result. It should call
+                ``job.check_cancelled()`` regularly.
+            params (dict, optional): Parameters shown with the job.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(job.run, func, *args, **kwargs)
+        logger.info(f"已提交后台任务 {kind} {job.id}")
+        return job
+
+    def _prune(self):
+        """丢弃最早结束的任务（调用方需持有锁）"""
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status not in Job.ACTIVE_STATUSES
+        ]
+        for job_id in finished[: max(0, len(finished) - self.MAX_FINISHED)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Get a job.
+
+        Args:
+            job_id (str): Job ID.
+
+        Returns:
+            Job or None: The job.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind=None):
+        """
+        Get all known jobs, newest first.
+
+        Args:
+            kind (str, optional): Only jobs of this type.
+
+        Returns:
+            list: Jobs.
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in reversed(jobs) if kind is None or job.kind == kind]
+
+    def find_active(self, kind):
+        """
+        Get a queued or running job of a type.
+
+        Args:
+            kind (str): Job type.
+
+        Returns:
+            Job or None: The job.
+        """
+        for job in self.list(kind):
+            if job.status in Job.ACTIVE_STATUSES:
+                return job
+        return None
+
+    def cancel(self, job_id):
+        """
+        Cancel a job.
+
+        Args:
+            job_id (str): Job ID.
+
+        Returns:
+            bool: True if the job was queued or running.
+        """
+        job = self.get(job_id)
+        return job is not None and job.cancel()
+
+    def shutdown(self):
+        """Cancel all jobs and wait for running ones to stop."""
+        for job in self.list():
+            job.cancel()
+        self._pool.shutdown(wait=True)
+
+
+# 进程内共享的任务管理器
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """
+    Get the shared job manager.
+
+    Returns:
+        JobManager: The manager.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+    return _manager
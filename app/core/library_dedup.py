@@ -0,0 +1,313 @@
+import os
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .hashing import HashingEngine, HashingCancelled
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 配置日志
+logger = logging.getLogger("library_dedup")
+
+# 可用的去重方式
+LINK_MODES = ("hardlink", "reflink")
+
+# Linux FICLONE ioctl，在 Btrfs/XFS 等文件系统上创建共享数据块的副本
+FICLONE = 0x40049409
+
+
+class DedupCancelled(Exception):
+    """Raised when a duplicate search or deduplication was cancelled."""
+
+
+def _reflink(source, target):
+    """创建 source 的写时复制副本"""
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+class LibraryDeduplicator:
+    """
+    Finds model files stored more than once and links the copies together.
+
+    Candidates are narrowed down from cheap to expensive checks: files are
+    grouped by size, groups with more than one file by quick fingerprint,
+    and only files whose fingerprints match are fully hashed. Paths that are
+    already hardlinks of each other count as one copy. Duplicates are
+    replaced by linking the kept file to a temporary name next to the
+    duplicate and renaming it over the duplicate, so the path always holds a
+    complete file.
+    """
+
+    def __init__(self, index, engine=None):
+        """
+        Initialize the deduplicator.
+
+        Args:
+            index (LibraryIndex): Index caching fingerprints and hashes.
+            engine (HashingEngine, optional): Engine hashing the candidates.
+        """
+        self.index = index
+        self.engine = engine or HashingEngine(index=index)
+
+    def run(self, paths, mode=None, dry_run=True, progress=None, cancel=None):
+        """
+        Find duplicates and optionally replace them with links.
+
+        Args:
+            paths (iterable): Files to compare.
+            mode (str, optional): ``hardlink`` or ``reflink`` to replace the
+                duplicates; None only reports them.
+            dry_run (bool, optional): Report what would be linked without
+                changing any file.
+            progress (callable, optional): Called with a dict holding the
+                ``stage`` (size, fingerprint, hash or link) and its counters.
+            cancel (threading.Event, optional): Stops the run when set.
+
+        Returns:
+            dict: The duplicate ``groups`` (see find()), the number of
+                ``duplicates``, the ``wasted`` and ``reclaimable`` bytes, and
+                for a link run the ``linked`` paths, the ``freed`` bytes and
+                the paths that ``failed``.
+
+        Raises:
+            ValueError: If ``mode`` is not a known link mode.
+            DedupCancelled: If ``cancel`` was set.
+        """
+        if mode is not None and mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode: {mode}")
+
+        groups = self.find(paths, progress, cancel)
+        result = {
+            "groups": groups,
+            "duplicates": sum(len(g["duplicates"]) for g in groups),
+            "wasted": sum(g["wasted"] for g in groups),
+            "reclaimable": sum(g["reclaimable"] for g in groups),
+            "mode": mode,
+            "dry_run": dry_run,
+        }
+        if mode is not None:
+            result.update(self.link(groups, mode, dry_run, progress, cancel))
+        logger.info(
+            f"重复文件检查完成: {len(groups)} 组, {result['duplicates']} 个重复文件, "
+            f"可回收 {result['reclaimable']} 字节"
+        )
+        return result
+
+    @staticmethod
+    def _check(cancel):
+        if cancel is not None and cancel.is_set():
+            raise DedupCancelled()
+
+    def find(self, paths, progress=None, cancel=None):
+        """
+        Group files with identical contents.
+
+        Args:
+            paths (iterable): Files to compare.
+            progress (callable, optional): See run().
+            cancel (threading.Event, optional): Stops the search when set.
+
+        Returns:
+            list: One dict per set of identical files, largest first, with the
+                ``sha256``, ``size``, all ``paths``, the path to ``keep``, the
+                ``duplicates`` to replace with links to it, the ``wasted``
+                bytes and the bytes ``reclaimable`` by linking (copies on
+                another filesystem cannot be linked).
+
+        Raises:
+            DedupCancelled: If ``cancel`` was set.
+        """
+        stats = {}
+        by_size = {}
+        for path in dict.fromkeys(paths):
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                logger.warning(f"无法读取文件 {path}: {e}")
+                continue
+            if st.st_size == 0:
+                continue
+            stats[path] = st
+            by_size.setdefault(st.st_size, []).append(path)
+        if progress is not None:
+            progress({"stage": "size", "files_total": len(stats)})
+        self._check(cancel)
+
+        def inodes(group):
+            return {(stats[p].st_dev, stats[p].st_ino) for p in group}
+
+        candidates = [p for group in by_size.values() if len(inodes(group)) > 1 for p in group]
+        fingerprints = self._fingerprints(candidates, progress, cancel)
+
+        by_fingerprint = {}
+        for path, fingerprint in fingerprints.items():
+            if fingerprint is not None:
+                key = (stats[path].st_size, fingerprint)
+                by_fingerprint.setdefault(key, []).append(path)
+        candidates = [
+            p for group in by_fingerprint.values() if len(inodes(group)) > 1 for p in group
+        ]
+
+        def report(state):
+            progress({"stage": "hash", **state})
+
+        try:
+            # 只相信真正计算过的哈希，侧边文件中的哈希可能已经过时
+            hashes = self.engine.hash_files(
+                candidates, report if progress is not None else None, cancel, trust_sidecar=False
+            )
+        except HashingCancelled:
+            raise DedupCancelled()
+
+        by_hash = {}
+        for path, sha256 in hashes.items():
+            if sha256 is not None:
+                by_hash.setdefault(sha256, []).append(path)
+
+        groups = []
+        for sha256, group in by_hash.items():
+            if len(inodes(group)) > 1:
+                groups.append(self._group(sha256, sorted(group), stats))
+        groups.sort(key=lambda g: (-g["wasted"], g["keep"]))
+        return groups
+
+    def _fingerprints(self, paths, progress, cancel):
+        """第二阶段：计算同样大小的文件的快速指纹"""
+        total = len(paths)
+        if progress is not None:
+            progress({"stage": "fingerprint", "files_done": 0, "files_total": total})
+        if not paths:
+            return {}
+
+        def work(path):
+            if cancel is not None and cancel.is_set():
+                return path, None
+            try:
+                return path, self.index.file_fingerprint(path)
+            except OSError as e:
+                logger.warning(f"无法计算快速指纹 {path}: {e}")
+                return path, None
+
+        results = {}
+        with ThreadPoolExecutor(
+            max_workers=min(self.engine.workers, total), thread_name_prefix="fingerprint"
+        ) as pool:
+            for done, (path, fingerprint) in enumerate(pool.map(work, paths), 1):
+                results[path] = fingerprint
+                if progress is not None:
+                    progress({"stage": "fingerprint", "files_done": done, "files_total": total})
+        self._check(cancel)
+        return results
+
+    @staticmethod
+    def _group(sha256, paths, stats):
+        """整理一组内容相同的文件，选出保留的文件"""
+        copies = {}
+        for path in paths:
+            copies.setdefault((stats[path].st_dev, stats[path].st_ino), []).append(path)
+        # 保留已经链接最多的文件，其余情况保留路径最小的
+        keep_inode = min(copies, key=lambda inode: (-len(copies[inode]), copies[inode][0]))
+        keep = copies[keep_inode][0]
+        duplicates = [
+            path
+            for inode, group in copies.items()
+            if inode != keep_inode and inode[0] == keep_inode[0]
+            for path in group
+        ]
+        size = stats[keep].st_size
+        devices = {}
+        for device, _ in copies:
+            devices[device] = devices.get(device, 0) + 1
+        return {
+            "sha256": sha256,
+            "size": size,
+            "paths": paths,
+            "keep": keep,
+            "duplicates": sorted(duplicates),
+            "wasted": size * (len(copies) - 1),
+            "reclaimable": size * sum(count - 1 for count in devices.values()),
+        }
+
+    def link(self, groups, mode="hardlink", dry_run=False, progress=None, cancel=None):
+        """
+        Replace duplicates with links to the kept file.
+
+        Each duplicate is checked against the kept file's size and hash
+        cache right before it is replaced, so files modified since the
+        search are left alone.
+
+        Args:
+            groups (list): Groups returned by find().
+            mode (str, optional): ``hardlink`` or ``reflink``.
+            dry_run (bool, optional): Only report what would be linked.
+            progress (callable, optional): See run().
+            cancel (threading.Event, optional): Stops linking when set.
+
+        Returns:
+            dict: The ``linked`` paths, the ``freed`` bytes and the paths
+                that ``failed`` with their error.
+
+        Raises:
+            DedupCancelled: If ``cancel`` was set.
+        """
+        linked = []
+        failed = {}
+        freed = 0
+        total = sum(len(g["duplicates"]) for g in groups)
+        done = 0
+        for group in groups:
+            # 同一 inode 的所有路径都被替换后才真正释放空间
+            inodes = {}
+            for path in group["duplicates"]:
+                self._check(cancel)
+                try:
+                    st = os.stat(path)
+                    if not dry_run:
+                        self._replace(group, path, mode)
+                except OSError as e:
+                    logger.error(f"去重失败 {path}: {e}")
+                    failed[path] = str(e)
+                else:
+                    linked.append(path)
+                    replaced = inodes.setdefault((st.st_dev, st.st_ino), [st.st_nlink, 0])
+                    replaced[1] += 1
+                done += 1
+                if progress is not None:
+                    progress({"stage": "link", "links_done": done, "links_total": total})
+            freed += group["size"] * sum(
+                links <= count for links, count in inodes.values()
+            )
+        if linked and not dry_run:
+            logger.info(f"已将 {len(linked)} 个重复文件替换为{mode}，释放 {freed} 字节")
+        return {"linked": linked, "freed": freed, "failed": failed}
+
+    def _replace(self, group, path, mode):
+        """先在重复文件旁边创建链接，再原子地改名覆盖重复文件"""
+        keep = group["keep"]
+        sha256 = group["sha256"]
+        for target in (keep, path):
+            st = os.stat(target)
+            if st.st_size != group["size"] or self.index.cached_sha256(target) != sha256:
+                raise OSError(f"file changed since it was hashed: {target}")
+
+        directory, name = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.dedup")
+        try:
+            if mode == "reflink":
+                _reflink(keep, tmp_path)
+                shutil.copystat(path, tmp_path)
+            else:
+                os.link(keep, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.index.remember_sha256(path, sha256)
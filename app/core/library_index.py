@@ -0,0 +1,1201 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import fast_json
+from .hashing import sha256_file, quick_fingerprint
+from .safetensors_header import SafetensorsHeaderError, read_summary
+
+# 配置日志
+logger = logging.getLogger("library_index")
+
+# 模型文件扩展名，其余文件（预览图、HTML、sidecar）只按文件名索引
+MODEL_EXTENSIONS = frozenset(
+    {".safetensors", ".ckpt", ".pt", ".pth", ".bin", ".sft", ".gguf", ".zip"}
+)
+
+# 记录 sha256/modelId 的 sidecar 文件扩展名
+SIDECAR_EXTENSION = ".json"
+
+# 有 JSON 头部（训练元数据、张量类型）的模型文件扩展名
+HEADER_EXTENSIONS = (".safetensors", ".sft")
+
+# SQLite 单条语句的参数数量上限较低，批量删除时分块
+_CHUNK = 500
+
+
+def _normalize(folder):
+    """统一目录路径，使同一目录总是得到相同的键"""
+    return os.path.normpath(os.path.abspath(folder))
+
+
+def _range(folder):
+    """目录下所有路径的范围条件（可以使用主键索引，不需要转义 LIKE）"""
+    prefix = folder.rstrip(os.sep) + os.sep
+    return "path >= ? AND path < ?", (prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+
+
+def _read_sidecar(path):
+    """读取 sidecar 中的哈希和模型信息，无法解析时返回空字典"""
+    try:
+        with open(path, "rb") as f:
+            data = fast_json.loads(f.read())
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取 sidecar {path}: {e}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    def as_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    sha256 = data.get("sha256")
+    return {
+        "sha256": sha256.upper() if isinstance(sha256, str) and sha256 else None,
+        "model_id": as_int(data.get("modelId")),
+        "version_id": as_int(data.get("versionId", data.get("modelVersionId"))),
+    }
+
+
+class LibraryIndex:
+    """
+    Persistent index of the files in the local model folders.
+
+    One row per file with its size, mtime and inode, so a rescan only
+    stats the tree and re-reads the sidecar ``.json`` files that changed.
+    Sidecar hashes and model IDs are copied to the model file with the
+    same name, and lookups by hash, file name and model ID use indexes
+    instead of walking the folders.
+
+    Computed SHA256 hashes are cached by (device, inode, size, mtime_ns),
+    so a file is hashed again only after it changed, and a renamed or
+    moved file keeps its hash. A quick fingerprint (size plus samples of
+    the start, middle and end) rules out matches without reading whole
+    files and follows files moved to another filesystem.
+    """
+
+    FILENAME = "civitai_library.sqlite3"
+
+    # ensure() 在这个时间（秒）内不重复扫描同一目录
+    RESCAN_AFTER = 60
+
+    COLUMNS = (
+        "path",
+        "folder",
+        "name",
+        "stem",
+        "size",
+        "mtime_ns",
+        "inode",
+        "device",
+        "sha256",
+        "fingerprint",
+        "model_id",
+        "version_id",
+        "model_type",
+        "base_model",
+        "dtype",
+        "tensors",
+        "is_model",
+    )
+
+    # 旧版本数据库中缺少的列
+    ADDED_COLUMNS = (
+        ("device", "INTEGER NOT NULL DEFAULT 0"),
+        ("fingerprint", "TEXT"),
+        ("base_model", "TEXT"),
+        ("dtype", "TEXT"),
+        ("tensors", "INTEGER"),
+        ("header", "TEXT"),
+    )
+
+    # 同时读取 safetensors 头部的线程数，每个文件只读几 KB
+    HEADER_WORKERS = 8
+
+    def __init__(self, path):
+        """
+        Initialize the index.
+
+        Args:
+            path (str): Path to the SQLite database file.
+        """
+        self.path = path
+        self._conn = None
+        self._lock = threading.RLock()
+        # 由 LibraryWatcher 保持最新的目录，ensure() 不需要再扫描
+        self._watched = set()
+
+    def _connect(self):
+        """打开数据库连接（延迟到第一次使用时）"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    name_lower TEXT NOT NULL,
+                    stem TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    device INTEGER NOT NULL DEFAULT 0,
+                    sha256 TEXT,
+                    fingerprint TEXT,
+                    model_id INTEGER,
+                    version_id INTEGER,
+                    model_type TEXT,
+                    base_model TEXT,
+                    dtype TEXT,
+                    tensors INTEGER,
+                    header TEXT,
+                    is_model INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+                CREATE INDEX IF NOT EXISTS files_name ON files (name_lower);
+                CREATE INDEX IF NOT EXISTS files_stem ON files (stem);
+                CREATE INDEX IF NOT EXISTS files_model ON files (model_id);
+                CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+                CREATE TABLE IF NOT EXISTS roots (
+                    path TEXT PRIMARY KEY,
+                    model_type TEXT,
+                    scanned_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS hashes (
+                    device INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    hashed_at REAL NOT NULL,
+                    PRIMARY KEY (device, inode, size, mtime_ns)
+                );
+                CREATE TABLE IF NOT EXISTS lookups (
+                    sha256 TEXT PRIMARY KEY,
+                    model_id INTEGER,
+                    version_id INTEGER,
+                    checked_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS updates (
+                    model_id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    updated_at TEXT,
+                    versions TEXT NOT NULL,
+                    checked_at REAL NOT NULL
+                );
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+            for name, definition in self.ADDED_COLUMNS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE files ADD COLUMN {name} {definition}")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS files_fingerprint ON files (fingerprint)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS files_base_model ON files (base_model)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(path, folder, name, st, model_type):
+        """根据 stat 结果生成文件记录"""
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        fields = _read_sidecar(path) if ext == SIDECAR_EXTENSION else {}
+        return (
+            path,
+            folder,
+            name,
+            name.lower(),
+            stem,
+            st.st_size,
+            st.st_mtime_ns,
+            st.st_ino,
+            st.st_dev,
+            fields.get("sha256"),
+            fields.get("model_id"),
+            fields.get("version_id"),
+            model_type,
+            int(ext in MODEL_EXTENSIONS),
+        )
+
+    def scan(self, folder, model_type=None, recursive=True, record_root=True):
+        """
+        Bring the index of a folder up to date.
+
+        Unchanged files (same size, mtime and inode) are skipped, so only new
+        or modified sidecars are read. Files that disappeared are removed.
+
+        Args:
+            folder (str): Folder to scan.
+            model_type (str, optional): Model type of the files in the folder.
+            recursive (bool, optional): Include subfolders (following symlinks).
+            record_root (bool, optional): Remember a recursive scan for ensure().
+
+        Returns:
+            dict: Number of files seen, updated, removed and moved.
+        """
+        folder = _normalize(folder)
+        if recursive:
+            where, params = _range(folder)
+        else:
+            where, params = "folder = ?", (folder,)
+        with self._lock:
+            known = {
+                row[0]: tuple(row[1:])
+                for row in self._connect().execute(
+                    f"SELECT path, size, mtime_ns, inode, device FROM files WHERE {where}",
+                    params,
+                )
+            }
+
+        seen = set()
+        changed = []
+        dirty = set()
+        visited = set()
+        for root, dirs, files in os.walk(folder, followlinks=True):
+            if not recursive:
+                dirs[:] = []
+            # 跳过符号链接造成的循环
+            real = os.path.realpath(root)
+            if real in visited:
+                dirs[:] = []
+                continue
+            visited.add(real)
+
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+                if known.get(path) == (st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev):
+                    continue
+                changed.append(self._row(path, root, name, st, model_type))
+                dirty.add(root)
+
+        removed = [path for path in known if path not in seen]
+        dirty.update(os.path.dirname(path) for path in removed)
+        moved = self._find_moves(changed, removed, known)
+
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (path, folder, name, name_lower, stem, size, "
+                "mtime_ns, inode, device, sha256, model_id, version_id, model_type, is_model) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                changed,
+            )
+            now = time.time()
+            for path, key, sha256, fingerprint in moved:
+                conn.execute(
+                    "INSERT OR REPLACE INTO hashes (device, inode, size, mtime_ns, sha256, hashed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, sha256, now),
+                )
+                conn.execute(
+                    "UPDATE files SET fingerprint = ? WHERE path = ?", (fingerprint, path)
+                )
+            for i in range(0, len(removed), _CHUNK):
+                chunk = removed[i : i + _CHUNK]
+                conn.execute(
+                    f"DELETE FROM files WHERE path IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            if model_type is not None:
+                conn.execute(
+                    f"UPDATE files SET model_type = ? WHERE {where} AND model_type IS NULL",
+                    (model_type, *params),
+                )
+            for directory in dirty:
+                self._link_sidecars(conn, directory)
+            # 文件变化或删除后旧的哈希不再有效，除非同一个文件还在其他路径下（重命名）
+            stale = [known[path] for path in removed]
+            stale.extend(known[row[0]] for row in changed if row[0] in known)
+            conn.executemany(
+                "DELETE FROM hashes WHERE size = ? AND mtime_ns = ? AND inode = ? AND device = ? "
+                "AND NOT EXISTS (SELECT 1 FROM files WHERE files.size = hashes.size "
+                "AND files.mtime_ns = hashes.mtime_ns AND files.inode = hashes.inode "
+                "AND files.device = hashes.device)",
+                stale,
+            )
+            if recursive and record_root:
+                conn.execute(
+                    "INSERT OR REPLACE INTO roots (path, model_type, scanned_at) VALUES (?, ?, ?)",
+                    (folder, model_type, time.time()),
+                )
+            conn.commit()
+
+        if changed or removed:
+            logger.info(
+                f"已更新本地库索引 {folder}: {len(changed)} 个文件变化, "
+                f"{len(removed)} 个文件移除, {len(moved)} 个文件移动"
+            )
+        return {
+            "files": len(seen),
+            "updated": len(changed),
+            "removed": len(removed),
+            "moved": len(moved),
+        }
+
+    def _find_moves(self, changed, removed, known):
+        """
+        找出被移动到其他文件系统（inode 改变）的已知文件，沿用它们的哈希
+
+        只对大小和修改时间都与消失的文件相同的新文件计算快速指纹
+        """
+        if not removed:
+            return []
+        candidates = {}
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(removed), _CHUNK):
+                chunk = removed[i : i + _CHUNK]
+                for path, fingerprint, sha256 in conn.execute(
+                    "SELECT f.path, f.fingerprint, h.sha256 FROM files f JOIN hashes h "
+                    "ON h.device = f.device AND h.inode = f.inode AND h.size = f.size "
+                    "AND h.mtime_ns = f.mtime_ns WHERE f.is_model = 1 "
+                    f"AND f.fingerprint IS NOT NULL AND f.path IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    candidates.setdefault(known[path][:2], {})[fingerprint] = sha256
+        if not candidates:
+            return []
+
+        moved = []
+        for row in changed:
+            path, size, mtime_ns, is_model = row[0], row[5], row[6], row[-1]
+            if not is_model or path in known or (size, mtime_ns) not in candidates:
+                continue
+            try:
+                fingerprint = quick_fingerprint(path)
+            except OSError:
+                continue
+            sha256 = candidates[(size, mtime_ns)].get(fingerprint)
+            if sha256:
+                # (device, inode, size, mtime_ns)
+                moved.append((path, (row[8], row[7], size, mtime_ns), sha256, fingerprint))
+        return moved
+
+    @staticmethod
+    def _link_sidecars(conn, folder):
+        """
+        把同名 sidecar 中的信息复制到模型文件（调用方需持有锁）
+
+        已计算的哈希优先；sidecar 中的哈希只有在 sidecar 不早于模型文件时才可信。
+        sidecar 没有ID时使用之前按哈希查询到的结果，重新扫描不会清除它们
+        """
+        sidecars = {
+            stem: (mtime_ns, sha256, model_id, version_id)
+            for stem, mtime_ns, sha256, model_id, version_id in conn.execute(
+                "SELECT stem, mtime_ns, sha256, model_id, version_id FROM files "
+                "WHERE folder = ? AND name_lower LIKE '%.json'",
+                (folder,),
+            )
+        }
+        updates = []
+        for path, stem, mtime_ns, hashed in conn.execute(
+            "SELECT f.path, f.stem, f.mtime_ns, h.sha256 FROM files f LEFT JOIN hashes h "
+            "ON h.device = f.device AND h.inode = f.inode AND h.size = f.size "
+            "AND h.mtime_ns = f.mtime_ns WHERE f.folder = ? AND f.is_model = 1",
+            (folder,),
+        ).fetchall():
+            sidecar_mtime, sha256, model_id, version_id = sidecars.get(
+                stem, (None, None, None, None)
+            )
+            if hashed:
+                sha256 = hashed
+            elif sidecar_mtime is None or sidecar_mtime < mtime_ns:
+                sha256 = None
+            updates.append([sha256, model_id, version_id, path])
+
+        hashes = list({u[0] for u in updates if u[0] and u[1] is None})
+        looked_up = {}
+        for i in range(0, len(hashes), _CHUNK):
+            chunk = hashes[i : i + _CHUNK]
+            for sha256, model_id, version_id in conn.execute(
+                "SELECT sha256, model_id, version_id FROM lookups WHERE model_id IS NOT NULL "
+                f"AND sha256 IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ):
+                looked_up[sha256] = (model_id, version_id)
+        for update in updates:
+            if update[1] is None and update[0] in looked_up:
+                update[1:3] = looked_up[update[0]]
+        conn.executemany(
+            "UPDATE files SET sha256 = ?, model_id = ?, version_id = ? WHERE path = ?",
+            updates,
+        )
+
+    def cached_sha256(self, path):
+        """
+        Get the cached SHA256 hash of a file without reading it.
+
+        Args:
+            path (str): File path.
+
+        Returns:
+            str or None: Upper-case hash, or None if the file changed since it was hashed.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return self._cached(st)
+
+    def _cached(self, st):
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT sha256 FROM hashes WHERE device = ? AND inode = ? "
+                    "AND size = ? AND mtime_ns = ?",
+                    (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns),
+                )
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def remember_sha256(self, path, sha256, st=None):
+        """
+        Cache the SHA256 hash of a file.
+
+        Args:
+            path (str): File path.
+            sha256 (str): Hash of the file contents.
+            st (os.stat_result, optional): Stat taken before hashing. The hash is
+                not cached if the file changed since.
+
+        Returns:
+            bool: True if the hash was cached.
+        """
+        try:
+            current = os.stat(path)
+        except OSError:
+            return False
+        key = (current.st_dev, current.st_ino, current.st_size, current.st_mtime_ns)
+        if st is not None and key != (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns):
+            logger.warning(f"文件在计算哈希时被修改，未缓存: {path}")
+            return False
+
+        sha256 = sha256.upper()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO hashes (device, inode, size, mtime_ns, sha256, hashed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, sha256, time.time()),
+            )
+            conn.execute(
+                "UPDATE files SET sha256 = ? WHERE device = ? AND inode = ? AND size = ? "
+                "AND mtime_ns = ? AND is_model = 1",
+                (sha256, *key),
+            )
+            conn.commit()
+        return True
+
+    def file_sha256(self, path, trust_sidecar=True, hasher=None):
+        """
+        Get the SHA256 hash of a file, reading it only if needed.
+
+        The cached hash is used while the file's device, inode, size and mtime
+        are unchanged. Otherwise a hash from the sidecar ``.json`` is used if
+        the sidecar is not older than the file, and as a last resort the file
+        is hashed and the result cached.
+
+        Args:
+            path (str): File path.
+            trust_sidecar (bool, optional): Accept the hash recorded in the sidecar.
+            hasher (callable, optional): Hashes a path. Defaults to sha256_file.
+
+        Returns:
+            str: Upper-case hash.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        st = os.stat(path)
+        sha256 = self._cached(st)
+        if sha256:
+            return sha256
+
+        if trust_sidecar:
+            sidecar = os.path.splitext(path)[0] + SIDECAR_EXTENSION
+            try:
+                fresh = os.stat(sidecar).st_mtime_ns >= st.st_mtime_ns
+            except OSError:
+                fresh = False
+            if fresh:
+                sha256 = _read_sidecar(sidecar).get("sha256")
+                if sha256:
+                    return sha256
+
+        sha256 = (hasher or sha256_file)(path)
+        if self.remember_sha256(path, sha256, st):
+            # 指纹只多读几 MB，之后文件被移动时可以沿用哈希
+            self.file_fingerprint(path)
+        return sha256
+
+    def lookup(self, sha256):
+        """
+        Get the remembered Civitai lookup of a hash.
+
+        Args:
+            sha256 (str): File hash.
+
+        Returns:
+            dict or None: ``model_id``, ``version_id`` (both None if Civitai
+                did not know the hash) and ``checked_at``, or None if the hash
+                was never looked up.
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT model_id, version_id, checked_at FROM lookups WHERE sha256 = ?",
+                    (sha256.upper(),),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        return {"model_id": row[0], "version_id": row[1], "checked_at": row[2]}
+
+    def remember_lookup(self, sha256, model_id=None, version_id=None):
+        """
+        Remember which Civitai model version a hash belongs to.
+
+        Files with the hash get the model and version ID unless their sidecar
+        already provided them.
+
+        Args:
+            sha256 (str): File hash.
+            model_id (int, optional): Model ID, or None if Civitai does not know the hash.
+            version_id (int, optional): Version ID.
+        """
+        sha256 = sha256.upper()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO lookups (sha256, model_id, version_id, checked_at) "
+                "VALUES (?, ?, ?, ?)",
+                (sha256, model_id, version_id, time.time()),
+            )
+            if model_id is not None:
+                conn.execute(
+                    "UPDATE files SET model_id = ?, version_id = ? "
+                    "WHERE sha256 = ? AND model_id IS NULL",
+                    (model_id, version_id, sha256),
+                )
+            conn.commit()
+
+    def model_versions(self, model_ids):
+        """
+        Get the remembered version lists of models.
+
+        Args:
+            model_ids (iterable): Model IDs.
+
+        Returns:
+            dict: Model ID to ``name``, ``updated_at``, ``versions`` (newest
+                first) and ``checked_at``, for the models that were remembered.
+        """
+        model_ids = list(model_ids)
+        results = {}
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(model_ids), _CHUNK):
+                chunk = model_ids[i : i + _CHUNK]
+                for model_id, name, updated_at, versions, checked_at in conn.execute(
+                    "SELECT model_id, name, updated_at, versions, checked_at FROM updates "
+                    f"WHERE model_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    results[model_id] = {
+                        "name": name,
+                        "updated_at": updated_at,
+                        "versions": fast_json.loads(versions),
+                        "checked_at": checked_at,
+                    }
+        return results
+
+    def remember_model_versions(self, models):
+        """
+        Remember the version lists of models.
+
+        Args:
+            models (dict): Model ID to ``name``, ``updated_at`` and
+                ``versions`` (list of dicts, newest first).
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO updates (model_id, name, updated_at, versions, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        model_id,
+                        model["name"],
+                        model["updated_at"],
+                        fast_json.dumps(model["versions"]).decode(),
+                        now,
+                    )
+                    for model_id, model in models.items()
+                ],
+            )
+            conn.commit()
+
+    def read_headers(self, folder=None, workers=None, progress=None, cancel=None):
+        """
+        Read the safetensors headers of indexed files that have not been read yet.
+
+        Only the header of each file is read (see safetensors_header), and the
+        result is kept until the file changes. Files with an invalid header
+        are recorded as read so they are not tried again.
+
+        Args:
+            folder (str, optional): Only files in this folder or its subfolders.
+            workers (int, optional): Files read at the same time.
+            progress (callable, optional): Called with ``files_done`` and
+                ``files_total`` after each file.
+            cancel (threading.Event, optional): Stops reading when set.
+
+        Returns:
+            dict: Number of headers read and of files without a valid header.
+        """
+        conditions = ["is_model = 1", "header IS NULL"]
+        conditions.append(
+            "(" + " OR ".join("name_lower LIKE ?" for _ in HEADER_EXTENSIONS) + ")"
+        )
+        params = [f"%{ext}" for ext in HEADER_EXTENSIONS]
+        if folder is not None:
+            where, folder_params = _range(_normalize(folder))
+            conditions.append(where)
+            params.extend(folder_params)
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    f"SELECT path, size, mtime_ns FROM files WHERE {' AND '.join(conditions)}",
+                    params,
+                )
+                .fetchall()
+            )
+
+        def work(row):
+            if cancel is not None and cancel.is_set():
+                return None
+            try:
+                return row, read_summary(row[0])
+            except (SafetensorsHeaderError, OSError) as e:
+                logger.warning(f"无法读取 safetensors 头部 {row[0]}: {e}")
+                return row, None
+
+        counts = {"read": 0, "invalid": 0}
+        with ThreadPoolExecutor(
+            max_workers=max(1, workers or self.HEADER_WORKERS), thread_name_prefix="header"
+        ) as pool:
+            for done, result in enumerate(pool.map(work, rows), 1):
+                if result is None:
+                    continue
+                row, summary = result
+                self._store_header(*row, summary)
+                counts["read" if summary is not None else "invalid"] += 1
+                if progress is not None:
+                    progress({"files_done": done, "files_total": len(rows)})
+        if rows:
+            logger.info(f"已读取 {counts['read']} 个 safetensors 头部，{counts['invalid']} 个无效")
+        return counts
+
+    def _store_header(self, path, size, mtime_ns, summary):
+        """保存头部摘要；文件在读取期间变化时不保存"""
+        summary = summary or {}
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE files SET base_model = ?, dtype = ?, tensors = ?, header = ? "
+                "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (
+                    summary.get("base_model"),
+                    summary.get("dtype"),
+                    summary.get("tensors"),
+                    fast_json.dumps(summary).decode(),
+                    path,
+                    size,
+                    mtime_ns,
+                ),
+            )
+            conn.commit()
+
+    def file_header(self, path):
+        """
+        Get the safetensors header summary of a file, reading it if needed.
+
+        Args:
+            path (str): File path.
+
+        Returns:
+            dict or None: Summary (see safetensors_header.summarize), or None
+                if the file has no valid header.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        path = _normalize(path)
+        st = os.stat(path)
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT header FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                    (path, st.st_size, st.st_mtime_ns),
+                )
+                .fetchone()
+            )
+        if row is not None and row[0] is not None:
+            return fast_json.loads(row[0]) or None
+        try:
+            summary = read_summary(path)
+        except SafetensorsHeaderError as e:
+            logger.warning(f"无法读取 safetensors 头部 {path}: {e}")
+            summary = None
+        self._store_header(path, st.st_size, st.st_mtime_ns, summary)
+        return summary
+
+    def forget_missing(self):
+        """
+        Forget the hashes Civitai did not know, so they are looked up again.
+
+        Returns:
+            int: Number of forgotten hashes.
+        """
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute("DELETE FROM lookups WHERE model_id IS NULL").rowcount
+            conn.commit()
+        return count
+
+    def file_fingerprint(self, path):
+        """
+        Get the quick fingerprint of a file, computing it if needed.
+
+        Args:
+            path (str): File path.
+
+        Returns:
+            str: Fingerprint (see hashing.quick_fingerprint).
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        st = os.stat(path)
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT fingerprint FROM files WHERE device = ? AND inode = ? AND size = ? "
+                    "AND mtime_ns = ? AND fingerprint IS NOT NULL LIMIT 1",
+                    key,
+                )
+                .fetchone()
+            )
+        if row:
+            return row[0]
+
+        fingerprint = quick_fingerprint(path)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE files SET fingerprint = ? WHERE device = ? AND inode = ? AND size = ? "
+                "AND mtime_ns = ?",
+                (fingerprint, *key),
+            )
+            conn.commit()
+        return fingerprint
+
+    def identify(self, path, verify=False):
+        """
+        Check whether a file is already known, reading as little as possible.
+
+        A cached hash answers immediately. Otherwise the quick fingerprint is
+        compared with the indexed files: no match proves the file is new
+        without hashing it. A match with a file that still exists (a likely
+        duplicate) is confirmed with a full SHA256; a match with a file that
+        is gone (a move) reuses that file's hash.
+
+        Args:
+            path (str): File path.
+            verify (bool, optional): Always compute the full SHA256.
+
+        Returns:
+            str or None: Upper-case SHA256 if the file matches a known file
+                (or was verified), None if no indexed file has the same contents.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        st = os.stat(path)
+        sha256 = self._cached(st)
+        if sha256:
+            return sha256
+        if verify:
+            return self.file_sha256(path, trust_sidecar=False)
+
+        fingerprint = self.file_fingerprint(path)
+        with self._lock:
+            matches = (
+                self._connect()
+                .execute(
+                    "SELECT path, sha256 FROM files WHERE fingerprint = ? AND size = ? "
+                    "AND sha256 IS NOT NULL AND path != ?",
+                    (fingerprint, st.st_size, _normalize(path)),
+                )
+                .fetchall()
+            )
+        if not matches:
+            return None
+        known = {sha256 for _, sha256 in matches}
+        if len(known) == 1 and not any(os.path.exists(p) for p, _ in matches):
+            sha256 = known.pop()
+            self.remember_sha256(path, sha256, st)
+            return sha256
+        return self.file_sha256(path, trust_sidecar=False)
+
+    def ensure(self, folder, model_type=None, max_age=None):
+        """
+        Scan a folder unless it was scanned recently or is being watched.
+
+        Args:
+            folder (str): Folder to scan.
+            model_type (str, optional): Model type of the files in the folder.
+            max_age (float, optional): Seconds a scan stays valid. Defaults to RESCAN_AFTER.
+
+        Returns:
+            bool: True if the folder was scanned.
+        """
+        if self.is_watched(folder):
+            return False
+        max_age = self.RESCAN_AFTER if max_age is None else max_age
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT scanned_at FROM roots WHERE path = ?", (_normalize(folder),))
+                .fetchone()
+            )
+        if row is not None and time.time() - row[0] < max_age:
+            return False
+        self.scan(folder, model_type)
+        return True
+
+    def watch(self, folder):
+        """
+        Mark a folder as kept up to date by a watcher.
+
+        Args:
+            folder (str): Folder covered by the watcher, including subfolders.
+        """
+        with self._lock:
+            self._watched.add(_normalize(folder))
+
+    def unwatch(self, folder):
+        """
+        Stop treating a folder as watched.
+
+        Args:
+            folder (str): Folder passed to watch().
+        """
+        with self._lock:
+            self._watched.discard(_normalize(folder))
+
+    def is_watched(self, folder):
+        """
+        Check whether a watcher keeps a folder up to date.
+
+        Args:
+            folder (str): Folder to check.
+
+        Returns:
+            bool: True if the folder or one of its parents is watched.
+        """
+        folder = _normalize(folder)
+        with self._lock:
+            return any(
+                folder == root or folder.startswith(root.rstrip(os.sep) + os.sep)
+                for root in self._watched
+            )
+
+    def find(
+        self,
+        sha256=None,
+        filename=None,
+        stem=None,
+        model_id=None,
+        fingerprint=None,
+        base_model=None,
+        folder=None,
+        models_only=False,
+        limit=None,
+    ):
+        """
+        Look up indexed files.
+
+        Args:
+            sha256 (str, optional): SHA256 hash (any case).
+            filename (str, optional): File name, compared case-insensitively.
+            stem (str, optional): File name without extension.
+            model_id (int, optional): Civitai model ID.
+            fingerprint (str, optional): Quick fingerprint.
+            base_model (str, optional): Base model from the safetensors header,
+                compared case-insensitively.
+            folder (str, optional): Only files in this folder or its subfolders.
+            models_only (bool, optional): Skip sidecars, previews and other files.
+            limit (int, optional): Maximum number of results.
+
+        Returns:
+            list: File records (dicts), ordered by path.
+        """
+        conditions = []
+        params = []
+        if sha256:
+            conditions.append("sha256 = ?")
+            params.append(sha256.upper())
+        if filename:
+            conditions.append("name_lower = ?")
+            params.append(filename.lower())
+        if stem is not None:
+            conditions.append("stem = ?")
+            params.append(stem)
+        if model_id is not None:
+            conditions.append("model_id = ?")
+            params.append(int(model_id))
+        if fingerprint:
+            conditions.append("fingerprint = ?")
+            params.append(fingerprint)
+        if base_model:
+            conditions.append("base_model = ? COLLATE NOCASE")
+            params.append(base_model)
+        if folder is not None:
+            where, folder_params = _range(_normalize(folder))
+            conditions.append(where)
+            params.extend(folder_params)
+        if models_only:
+            conditions.append("is_model = 1")
+
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM files"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY path"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        return [
+            {**dict(zip(self.COLUMNS, row)), "is_model": bool(row[-1])} for row in rows
+        ]
+
+    def get(self, path):
+        """
+        Get the record of one file.
+
+        Args:
+            path (str): File path.
+
+        Returns:
+            dict or None: File record, or None if the file is not indexed.
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    f"SELECT {', '.join(self.COLUMNS)} FROM files WHERE path = ?",
+                    (_normalize(path),),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        return {**dict(zip(self.COLUMNS, row)), "is_model": bool(row[-1])}
+
+    def by_sha256(self, sha256, folder=None):
+        """
+        Find files by SHA256 hash.
+
+        Args:
+            sha256 (str): SHA256 hash (any case).
+            folder (str, optional): Only files in this folder or its subfolders.
+
+        Returns:
+            list: File records.
+        """
+        return self.find(sha256=sha256, folder=folder)
+
+    def by_filename(self, filename, folder=None):
+        """
+        Find files by name, case-insensitively.
+
+        Args:
+            filename (str): File name.
+            folder (str, optional): Only files in this folder or its subfolders.
+
+        Returns:
+            list: File records.
+        """
+        return self.find(filename=filename, folder=folder)
+
+    def by_model_id(self, model_id, folder=None):
+        """
+        Find the model files of a Civitai model.
+
+        Args:
+            model_id (int): Civitai model ID.
+            folder (str, optional): Only files in this folder or its subfolders.
+
+        Returns:
+            list: File records.
+        """
+        return self.find(model_id=model_id, folder=folder, models_only=True)
+
+    def filenames(self, folder=None):
+        """
+        Get the lower-cased names of all indexed files.
+
+        Args:
+            folder (str, optional): Only files in this folder or its subfolders.
+
+        Returns:
+            set: File names.
+        """
+        return self._distinct("name_lower", folder)
+
+    def sha256_set(self, folder=None):
+        """
+        Get the SHA256 hashes of all indexed files.
+
+        Args:
+            folder (str, optional): Only files in this folder or its subfolders.
+
+        Returns:
+            set: Upper-case SHA256 hashes.
+        """
+        return self._distinct("sha256", folder, "sha256 IS NOT NULL")
+
+    def _distinct(self, column, folder=None, condition=None):
+        conditions = [condition] if condition else []
+        params = ()
+        if folder is not None:
+            where, params = _range(_normalize(folder))
+            conditions.append(where)
+        query = f"SELECT DISTINCT {column} FROM files"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            return {row[0] for row in self._connect().execute(query, params)}
+
+    def clear(self):
+        """
+        Remove all entries.
+
+        Returns:
+            int: Number of removed files.
+        """
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute("DELETE FROM files").rowcount
+            conn.execute("DELETE FROM roots")
+            conn.execute("DELETE FROM hashes")
+            conn.execute("DELETE FROM lookups")
+            conn.execute("DELETE FROM updates")
+            conn.commit()
+        logger.info(f"已清空本地库索引: {count} 个文件")
+        return count
+
+    def stats(self):
+        """
+        Get index statistics.
+
+        Returns:
+            dict: Number of indexed files, model files, hashed model files,
+                model files with a read header, cached hashes, remembered
+                Civitai lookups and scanned folders.
+        """
+        with self._lock:
+            conn = self._connect()
+            files, models, hashed, headers = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(is_model), 0), "
+                "COALESCE(SUM(is_model = 1 AND sha256 IS NOT NULL), 0), "
+                "COALESCE(SUM(is_model = 1 AND header IS NOT NULL), 0) FROM files"
+            ).fetchone()
+            cached = conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+            lookups = conn.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+            roots = [
+                {"path": path, "model_type": model_type, "scanned_at": scanned_at}
+                for path, model_type, scanned_at in conn.execute(
+                    "SELECT path, model_type, scanned_at FROM roots ORDER BY path"
+                )
+            ]
+        return {
+            "files": files,
+            "models": models,
+            "hashed": hashed,
+            "headers": headers,
+            "cached_hashes": cached,
+            "lookups": lookups,
+            "roots": roots,
+            "path": self.path,
+        }
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 按数据库路径共享索引实例
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_library_index(settings):
+    """
+    Get the shared library index stored in the settings' config directory.
+
+    Args:
+        settings (Settings): Settings object.
+
+    Returns:
+        LibraryIndex or None: The index, or None if the config directory is unusable.
+    """
+    try:
+        config_dir = settings.get_config_dir()
+    except (AttributeError, TypeError):
+        return None
+    if not isinstance(config_dir, str):
+        return None
+    path = os.path.join(config_dir, LibraryIndex.FILENAME)
+
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = LibraryIndex(path)
+            _indexes[path] = index
+    return index
@@ -0,0 +1,228 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .hashing import HashingEngine, HashingCancelled
+
+# 配置日志
+logger = logging.getLogger("library_scanner")
+
+
+class ScanCancelled(Exception):
+    """Raised when a library scan was cancelled."""
+
+
+class LibraryScanner:
+    """
+    Matches local model files with their Civitai models.
+
+    Runs as a pipeline: the files are hashed in parallel, the hashes are
+    resolved to model versions with concurrent by-hash lookups (the API
+    client's rate limiter keeps them within budget), and the models are
+    fetched with batched ``models?ids=`` requests. Every lookup result is
+    stored in the library index as it arrives, including hashes Civitai does
+    not know, so a cancelled scan resumes where it stopped and unknown files
+    are not asked about again until NOT_FOUND_TTL has passed.
+    """
+
+    # 同时进行的按哈希查询数量，实际速率由限流器控制
+    LOOKUP_WORKERS = 8
+
+    # Civitai 不认识的哈希多久之后重新查询（秒）
+    NOT_FOUND_TTL = 7 * 24 * 3600
+
+    def __init__(self, api, index, engine=None, workers=None, not_found_ttl=None):
+        """
+        Initialize the scanner.
+
+        Args:
+            api (CivitaiAPI): Client used for the lookups.
+            index (LibraryIndex): Index holding hashes and lookup results.
+            engine (HashingEngine, optional): Engine hashing the files.
+            workers (int, optional): Concurrent by-hash lookups.
+            not_found_ttl (float, optional): Seconds unknown hashes are not looked up again.
+        """
+        self.api = api
+        self.index = index
+        self.engine = engine or HashingEngine(index=index)
+        self.workers = max(1, workers or self.LOOKUP_WORKERS)
+        self.not_found_ttl = self.NOT_FOUND_TTL if not_found_ttl is None else not_found_ttl
+
+    def run(
+        self,
+        paths,
+        progress=None,
+        cancel=None,
+        hash_missing=True,
+        refresh=False,
+        fetch_models=True,
+    ):
+        """
+        Resolve files to Civitai models.
+
+        Args:
+            paths (iterable): Model files.
+            progress (callable, optional): Called with a dict holding the
+                ``stage`` (hash, lookup or models) and its counters.
+            cancel (threading.Event, optional): Stops the scan when set.
+            hash_missing (bool, optional): Hash files without a known hash.
+                Otherwise only cached and sidecar hashes are used.
+            refresh (bool, optional): Look up hashes again even if the index
+                or the client's negative cache remembers the answer.
+            fetch_models (bool, optional): Fetch the details of the found models.
+
+        Returns:
+            dict: ``files`` maps each path to its ``sha256``, ``model_id``,
+                ``version_id`` and ``status`` (found, not_found, no_hash or
+                failed); ``models`` maps model IDs to model details.
+
+        Raises:
+            ScanCancelled: If ``cancel`` was set.
+        """
+        paths = list(dict.fromkeys(paths))
+        started = time.time()
+        hashes = self._hash(paths, progress, cancel, hash_missing)
+
+        files = {}
+        for path in paths:
+            files[path] = {
+                "sha256": hashes.get(path),
+                "model_id": None,
+                "version_id": None,
+                "status": "no_hash",
+            }
+        self._from_sidecars(files)
+        self._resolve(files, progress, cancel, refresh)
+
+        self._check(cancel)
+        models = {}
+        ids = {f["model_id"] for f in files.values() if f["model_id"] is not None}
+        if fetch_models and ids:
+            if progress is not None:
+                progress({"stage": "models", "models_total": len(ids)})
+            models = self.api.get_models_bulk(ids, refresh=refresh)
+
+        counts = {}
+        for f in files.values():
+            counts[f["status"]] = counts.get(f["status"], 0) + 1
+        logger.info(
+            f"本地库扫描完成: {len(files)} 个文件, {len(models)} 个模型, "
+            f"{counts}, 用时 {time.time() - started:.1f} 秒"
+        )
+        return {"files": files, "models": models}
+
+    @staticmethod
+    def _check(cancel):
+        if cancel is not None and cancel.is_set():
+            raise ScanCancelled()
+
+    def _hash(self, paths, progress, cancel, hash_missing):
+        """第一阶段：取得所有文件的哈希"""
+        if not hash_missing:
+            hashes = {}
+            for path in paths:
+                sha256 = self.index.cached_sha256(path)
+                if sha256 is None:
+                    row = self.index.get(path)
+                    sha256 = row["sha256"] if row else None
+                hashes[path] = sha256
+            return hashes
+
+        def report(state):
+            progress({"stage": "hash", **state})
+
+        try:
+            return self.engine.hash_files(
+                paths, report if progress is not None else None, cancel
+            )
+        except HashingCancelled:
+            raise ScanCancelled()
+
+    def _from_sidecars(self, files):
+        """侧边文件已经记录了模型和版本ID的文件不需要查询"""
+        for path, f in files.items():
+            row = self.index.get(path)
+            if row and row["model_id"] and row["version_id"]:
+                f.update(model_id=row["model_id"], version_id=row["version_id"], status="found")
+
+    def _resolve(self, files, progress, cancel, refresh):
+        """第二阶段：按哈希并发查询模型版本，结果随时写入索引"""
+        pending = {}
+        answers = {}
+        now = time.time()
+        for f in files.values():
+            sha256 = f["sha256"]
+            if f["status"] == "found" or not sha256 or sha256 in answers:
+                continue
+            known = None if refresh else self.index.lookup(sha256)
+            if known is not None and (
+                known["model_id"] is not None
+                or now - known["checked_at"] < self.not_found_ttl
+            ):
+                answers[sha256] = (known["model_id"], known["version_id"])
+            else:
+                pending[sha256] = None
+
+        total = len(pending)
+        done = 0
+        if progress is not None:
+            progress({"stage": "lookup", "lookups_done": 0, "lookups_total": total})
+
+        if pending:
+            with ThreadPoolExecutor(
+                max_workers=min(self.workers, total), thread_name_prefix="lookup"
+            ) as pool:
+                futures = {
+                    pool.submit(self._lookup, sha256, refresh): sha256 for sha256 in pending
+                }
+                try:
+                    for future in as_completed(futures):
+                        sha256 = futures[future]
+                        answer = future.result()
+                        if answer is not None:
+                            answers[sha256] = answer
+                        done += 1
+                        if progress is not None:
+                            progress(
+                                {"stage": "lookup", "lookups_done": done, "lookups_total": total}
+                            )
+                        self._check(cancel)
+                except ScanCancelled:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        for f in files.values():
+            if f["status"] == "found":
+                continue
+            if not f["sha256"]:
+                f["status"] = "no_hash"
+            elif f["sha256"] not in answers:
+                f["status"] = "failed"
+            else:
+                model_id, version_id = answers[f["sha256"]]
+                f.update(
+                    model_id=model_id,
+                    version_id=version_id,
+                    status="found" if model_id is not None else "not_found",
+                )
+
+    def _lookup(self, sha256, refresh=False):
+        """
+        Look up one hash and remember the answer.
+
+        Returns:
+            tuple or None: (model_id, version_id), both None if Civitai does
+                not know the hash, or None if the request failed.
+        """
+        data = self.api.get_model_version_by_hash(
+            sha256, not_found=self.api.NOT_FOUND, refresh=refresh
+        )
+        if data is self.api.NOT_FOUND:
+            self.index.remember_lookup(sha256)
+            return None, None
+        if not isinstance(data, dict) or not data.get("modelId"):
+            return None
+        model_id, version_id = data["modelId"], data.get("id")
+        self.index.remember_lookup(sha256, model_id, version_id)
+        return model_id, version_id
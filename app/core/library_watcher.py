@@ -0,0 +1,474 @@
+import os
+import time
+import logging
+import threading
+
+from .settings import get_setting, get_settings_service
+from .library_index import get_library_index
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog是可选依赖，缺失时回退到定期对比目录修改时间
+    Observer = None
+    FileSystemEventHandler = object
+
+HAS_WATCHDOG = Observer is not None
+
+# 收不到 inotify 事件的网络文件系统
+NETWORK_FILESYSTEMS = frozenset(
+    {"nfs", "nfs4", "cifs", "smbfs", "smb3", "9p", "afs", "fuse.sshfs", "fuse.rclone"}
+)
+
+# 配置日志
+logger = logging.getLogger("library_watcher")
+
+
+def is_network_filesystem(path, mounts_file="/proc/mounts"):
+    """
+    Check whether a path is on a network filesystem.
+
+    Args:
+        path (str): Path to check.
+        mounts_file (str, optional): Mount table to read.
+
+    Returns:
+        bool: True if the mount holding the path is a network filesystem.
+            False when the mount table is unavailable (non-Linux systems).
+    """
+    try:
+        with open(mounts_file, encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return False
+    path = os.path.realpath(path)
+    best, best_type = "", None
+    for mount_point, fs_type in mounts:
+        # /proc/mounts 中的空格等字符被转义为八进制
+        mount_point = mount_point.replace("\\040", " ")
+        prefix = mount_point.rstrip(os.sep) + os.sep
+        if (path == mount_point or path.startswith(prefix)) and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type in NETWORK_FILESYSTEMS
+
+
+class _EventHandler(FileSystemEventHandler):
+    """把 watchdog 事件转换为需要重新扫描的目录"""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed", "closed_no_write"):
+            return
+        paths = [event.src_path]
+        if getattr(event, "dest_path", None):
+            paths.append(event.dest_path)
+        for path in paths:
+            path = os.fsdecode(path)
+            if event.is_directory and event.event_type != "modified":
+                # 目录被创建、删除或移动时需要扫描整个子树
+                self.watcher.mark(path, recursive=True)
+            self.watcher.mark(os.path.dirname(path))
+
+
+class LibraryWatcher:
+    """
+    Keeps the library index current while other tools change the model folders.
+
+    Uses filesystem events (inotify through the optional watchdog package)
+    where they work. Network filesystems and systems without watchdog are
+    polled instead: only directories whose mtime changed are rescanned.
+    Bursts of changes, such as an rsync run, are merged and applied once the
+    folders have been quiet for ``debounce`` seconds.
+    """
+
+    # 变化停止后等待的时间（秒）
+    DEBOUNCE = 2.0
+
+    # 持续变化时最长的等待时间（秒）
+    MAX_DELAY = 30.0
+
+    # 轮询模式下对比目录修改时间的间隔（秒）
+    POLL_INTERVAL = 60.0
+
+    # 事件模式下完整核对一次的间隔（秒），以防漏掉事件
+    RESYNC_INTERVAL = 1800.0
+
+    def __init__(self, index, mode="auto", debounce=None, poll_interval=None):
+        """
+        Initialize the watcher.
+
+        Args:
+            index (LibraryIndex): Index to keep current.
+            mode (str, optional): ``auto`` (events where possible), ``events`` or ``poll``.
+            debounce (float, optional): Quiet seconds before changes are applied.
+            poll_interval (float, optional): Seconds between polls of polled folders.
+        """
+        self.index = index
+        self.mode = mode
+        self.debounce = self.DEBOUNCE if debounce is None else debounce
+        self.poll_interval = poll_interval or self.POLL_INTERVAL
+        self.settings = None
+        # root -> {"model_type", "mode", "dirs": {目录: mtime_ns}, "next_poll"}
+        self._roots = {}
+        self._pending = {}
+        self._first_event = None
+        self._last_event = None
+        self._observer = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._cond = threading.Condition()
+        self._flushes = 0
+        self._polls = 0
+
+    def _root_mode(self, folder):
+        """决定目录使用事件还是轮询"""
+        if self.mode == "poll" or not HAS_WATCHDOG:
+            return "poll"
+        if self.mode == "auto" and is_network_filesystem(folder):
+            return "poll"
+        return "events"
+
+    def add(self, folder, model_type=None):
+        """
+        Start watching a folder and its subfolders.
+
+        The folder counts as watched once the background thread (or the next
+        poll()) has scanned it; until then lookups keep scanning it themselves.
+
+        Args:
+            folder (str): Folder to watch.
+            model_type (str, optional): Model type of the files in the folder.
+
+        Returns:
+            bool: False if the folder is already watched or does not exist.
+        """
+        folder = os.path.normpath(os.path.abspath(folder))
+        with self._cond:
+            if folder in self._roots or not os.path.isdir(folder):
+                return False
+            mode = self._root_mode(folder)
+            # dirs 为 None 表示尚未完成首次扫描
+            self._roots[folder] = {
+                "model_type": model_type,
+                "mode": mode,
+                "dirs": None,
+                "next_poll": time.monotonic(),
+            }
+            self._cond.notify_all()
+        if mode == "events" and self._observer is not None:
+            self._observer.schedule(_EventHandler(self), folder, recursive=True)
+        logger.info(f"开始监视模型目录 ({mode}): {folder}")
+        return True
+
+    def remove(self, folder):
+        """
+        Stop watching a folder.
+
+        Args:
+            folder (str): Folder passed to add().
+        """
+        folder = os.path.normpath(os.path.abspath(folder))
+        with self._cond:
+            root = self._roots.pop(folder, None)
+        if root is None:
+            return
+        self.index.unwatch(folder)
+        if root["mode"] == "events" and self._observer is not None:
+            # watchdog 不能按路径取消单个监视，重新安排剩余目录
+            self._observer.unschedule_all()
+            for other, info in self._watched():
+                if info["mode"] == "events":
+                    self._observer.schedule(_EventHandler(self), other, recursive=True)
+
+    def set_folders(self, folders):
+        """
+        Watch exactly these folders.
+
+        Args:
+            folders (dict): Model type to folder.
+        """
+        wanted = {
+            os.path.normpath(os.path.abspath(folder)): model_type
+            for model_type, folder in folders.items()
+        }
+        for folder, _ in self._watched():
+            if folder not in wanted:
+                self.remove(folder)
+        for folder, model_type in wanted.items():
+            self.add(folder, model_type)
+
+    def apply_settings(self, settings, changed):
+        """
+        Follow the model directory of new settings.
+
+        Args:
+            settings (Settings): New settings.
+            changed (set): Names of the changed settings.
+        """
+        self.settings = settings
+        if "model_dir" in changed:
+            self.set_folders(settings.get_model_dirs())
+
+    def start(self):
+        """Start the event observer and the background thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        if HAS_WATCHDOG and self.mode != "poll":
+            self._observer = Observer()
+            for folder, root in self._watched():
+                if root["mode"] == "events":
+                    self._observer.schedule(_EventHandler(self), folder, recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        self._thread = threading.Thread(
+            target=self._run, name="library-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and apply pending changes."""
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for folder, _ in self._watched():
+            self.index.unwatch(folder)
+
+    def mark(self, path, recursive=False):
+        """
+        Schedule a directory for rescanning.
+
+        Args:
+            path (str): Directory whose entries changed.
+            recursive (bool, optional): Rescan its subfolders as well.
+        """
+        path = os.path.normpath(path)
+        now = time.monotonic()
+        with self._cond:
+            self._pending[path] = self._pending.get(path, False) or recursive
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+            self._cond.notify_all()
+
+    def _watched(self):
+        """监视目录的快照；_roots 会被其他线程修改，只能在锁内读取"""
+        with self._cond:
+            return list(self._roots.items())
+
+    def _is_watched(self, folder, root):
+        """目录是否仍以同一条记录被监视（没有在期间被移除或重新添加）"""
+        with self._cond:
+            return self._roots.get(folder) is root
+
+    def _root_of(self, path):
+        """找到包含路径的监视目录"""
+        for folder, root in self._watched():
+            if path == folder or path.startswith(folder.rstrip(os.sep) + os.sep):
+                return folder, root
+        return None, None
+
+    def flush(self):
+        """
+        Apply pending changes now.
+
+        Returns:
+            int: Number of rescanned directories.
+        """
+        with self._cond:
+            pending = self._pending
+            self._pending = {}
+            self._first_event = self._last_event = None
+        # 被递归扫描的目录之下的目录不需要单独扫描
+        recursive = [path for path, flag in pending.items() if flag]
+        count = 0
+        for path, flag in sorted(pending.items()):
+            if not flag and any(
+                path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in recursive
+            ):
+                continue
+            folder, root = self._root_of(path)
+            if root is None or not self._is_watched(folder, root):
+                continue
+            try:
+                self.index.scan(
+                    path, root["model_type"], recursive=flag, record_root=False
+                )
+                count += 1
+            except Exception as e:
+                logger.error(f"更新本地库索引失败 {path}: {e}", exc_info=True)
+        if count:
+            self._flushes += 1
+        return count
+
+    @staticmethod
+    def _dir_mtimes(folder):
+        """记录目录树中每个目录的修改时间"""
+        mtimes = {}
+        visited = set()
+        for root, dirs, _ in os.walk(folder, followlinks=True):
+            real = os.path.realpath(root)
+            if real in visited:
+                dirs[:] = []
+                continue
+            visited.add(real)
+            try:
+                mtimes[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+        return mtimes
+
+    def poll(self, folder=None):
+        """
+        Compare directory mtimes and rescan the directories that changed.
+
+        Adding, removing or renaming a file changes the mtime of its
+        directory, so unchanged directories need no file stats at all.
+
+        Args:
+            folder (str, optional): Only poll this watched folder.
+
+        Returns:
+            int: Number of directories marked for rescanning.
+        """
+        marked = 0
+        for path, root in self._watched():
+            if folder is not None and path != os.path.normpath(os.path.abspath(folder)):
+                continue
+            previous = root["dirs"]
+            if previous is None:
+                # 首次扫描整个目录，之后才把目录交给监视器维护
+                self.index.scan(path, root["model_type"])
+                dirs = self._dir_mtimes(path)
+                with self._cond:
+                    # 扫描期间目录被移除时不再标记为已监视
+                    if self._roots.get(path) is not root:
+                        continue
+                    root["dirs"] = dirs
+                self.index.watch(path)
+                continue
+            current = self._dir_mtimes(path)
+            for directory, mtime_ns in current.items():
+                if previous.get(directory) != mtime_ns:
+                    self.mark(directory)
+                    marked += 1
+            for directory in previous:
+                if directory not in current:
+                    self.mark(directory, recursive=True)
+                    marked += 1
+            with self._cond:
+                root["dirs"] = current
+        self._polls += 1
+        return marked
+
+    def _run(self):
+        """后台线程：合并变化后更新索引，并按时轮询"""
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            with self._cond:
+                if self._last_event is not None:
+                    quiet_at = min(
+                        self._last_event + self.debounce, self._first_event + self.MAX_DELAY
+                    )
+                else:
+                    quiet_at = None
+                next_poll = min(
+                    (root.get("next_poll", now) for root in self._roots.values()),
+                    default=now + self.poll_interval,
+                )
+                deadline = min(t for t in (quiet_at, next_poll) if t is not None)
+                if deadline > now:
+                    self._cond.wait(deadline - now)
+                    continue
+
+            if quiet_at is not None and quiet_at <= now:
+                self.flush()
+            for path, root in self._watched():
+                if root.get("next_poll", now) <= now:
+                    try:
+                        self.poll(path)
+                    except Exception as e:
+                        logger.error(f"检查模型目录失败 {path}: {e}", exc_info=True)
+                    interval = (
+                        self.poll_interval if root["mode"] == "poll" else self.RESYNC_INTERVAL
+                    )
+                    with self._cond:
+                        root["next_poll"] = now + interval
+        self.flush()
+
+    def stats(self):
+        """
+        Get watcher statistics.
+
+        Returns:
+            dict: Watched folders with their mode, pending changes and counters.
+        """
+        with self._cond:
+            return {
+                "watchdog": HAS_WATCHDOG,
+                "running": self._thread is not None,
+                "folders": {
+                    folder: {
+                        "mode": root["mode"],
+                        "ready": root["dirs"] is not None,
+                        "directories": len(root["dirs"] or ()),
+                    }
+                    for folder, root in self._roots.items()
+                },
+                "pending": len(self._pending),
+                "flushes": self._flushes,
+                "polls": self._polls,
+            }
+
+
+# 进程内共享的监视器
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_library_watcher(settings):
+    """
+    Get the shared watcher for the library index of the settings.
+
+    The watcher follows the model directories of the settings and is
+    reconfigured when the model directory changes.
+
+    Args:
+        settings (Settings): Settings object.
+
+    Returns:
+        LibraryWatcher or None: The watcher, or None if the index is unavailable.
+    """
+    global _watcher
+    index = get_library_index(settings)
+    if index is None:
+        return None
+    with _watcher_lock:
+        if _watcher is None or _watcher.index is not index:
+            if _watcher is not None:
+                _watcher.stop()
+            _watcher = LibraryWatcher(
+                index,
+                mode=get_setting(settings, "library_watch_mode", "auto"),
+                poll_interval=get_setting(
+                    settings, "library_poll_interval", LibraryWatcher.POLL_INTERVAL
+                ),
+            )
+            service = get_settings_service()
+            if settings is service.current:
+                service.subscribe(_watcher.apply_settings, keys={"model_dir"})
+        watcher = _watcher
+    if watcher.settings is not settings:
+        watcher.settings = settings
+        watcher.set_folders(settings.get_model_dirs())
+    return watcher
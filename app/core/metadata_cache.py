@@ -0,0 +1,302 @@
+import os
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+
+from .settings import get_setting
+from . import fast_json
+
+# 配置日志
+logger = logging.getLogger("metadata_cache")
+
+
+class MetadataCache:
+    """
+    Persistent on-disk cache for Civitai API responses.
+
+    Model, version and by-hash payloads are stored zlib-compressed in a SQLite
+    database together with the time they were fetched and the validators
+    (ETag / Last-Modified) needed for conditional revalidation.
+
+    Keys the server answered with 404 (hashes of merges and private models,
+    deleted models) are remembered separately for ``negative_ttl`` seconds,
+    so they are not requested again on every scan.
+    """
+
+    FILENAME = "civitai_cache.sqlite3"
+
+    def __init__(self, path, ttl=21600, negative_ttl=604800):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): Path to the SQLite database file.
+            ttl (int, optional): Seconds an entry is served without revalidation.
+            negative_ttl (int, optional): Seconds a missing key is not requested
+                again. 0 disables negative caching.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        """打开数据库连接（延迟到第一次使用时）"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS missing (
+                    key TEXT PRIMARY KEY,
+                    checked_at REAL NOT NULL
+                );
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key):
+        """
+        Get a cached response.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            dict or None: Entry with "data", "etag", "last_modified" and
+                "fetched_at", or None if the key is not cached.
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT body, etag, last_modified, fetched_at FROM responses WHERE key = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+
+        try:
+            data = fast_json.loads(zlib.decompress(row[0]))
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"缓存条目损坏，已丢弃 ({key}): {e}")
+            self.delete(key)
+            return None
+
+        return {
+            "data": data,
+            "etag": row[1],
+            "last_modified": row[2],
+            "fetched_at": row[3],
+        }
+
+    def is_fresh(self, entry):
+        """
+        Check whether an entry can be served without revalidation.
+
+        Args:
+            entry (dict): Entry returned by get().
+
+        Returns:
+            bool: True if the entry is younger than the TTL.
+        """
+        return bool(entry) and time.time() - entry["fetched_at"] < self.ttl
+
+    def put(self, key, data, etag=None, last_modified=None):
+        """
+        Store a response.
+
+        Args:
+            key (str): Cache key.
+            data (dict): Decoded JSON payload.
+            etag (str, optional): ETag header of the response.
+            last_modified (str, optional): Last-Modified header of the response.
+        """
+        body = zlib.compress(fast_json.dumps(data))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, time.time()),
+            )
+            conn.execute("DELETE FROM missing WHERE key = ?", (key,))
+            conn.commit()
+
+    def is_missing(self, key):
+        """
+        Check whether the server recently reported a key as not found.
+
+        Args:
+            key (str): Cache key.
+
+        Returns:
+            bool: True if the key was missing less than ``negative_ttl`` seconds ago.
+        """
+        if self.negative_ttl <= 0:
+            return False
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT checked_at FROM missing WHERE key = ?", (key,))
+                .fetchone()
+            )
+        return row is not None and time.time() - row[0] < self.negative_ttl
+
+    def put_missing(self, key):
+        """
+        Remember that the server reported a key as not found.
+
+        Args:
+            key (str): Cache key.
+        """
+        if self.negative_ttl <= 0:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO missing (key, checked_at) VALUES (?, ?)",
+                (key, time.time()),
+            )
+            conn.commit()
+
+    def purge_missing(self):
+        """
+        Forget all keys remembered as not found.
+
+        Returns:
+            int: Number of removed keys.
+        """
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute("DELETE FROM missing").rowcount
+            conn.commit()
+        logger.info(f"已清空未找到记录: {count} 条")
+        return count
+
+    def touch(self, key, etag=None, last_modified=None):
+        """
+        Mark an entry as freshly validated (after a 304 response).
+
+        Args:
+            key (str): Cache key.
+            etag (str, optional): New ETag, if the server sent one.
+            last_modified (str, optional): New Last-Modified, if the server sent one.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE responses SET fetched_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                "WHERE key = ?",
+                (time.time(), etag, last_modified, key),
+            )
+            conn.commit()
+
+    def delete(self, key):
+        """
+        Remove an entry.
+
+        Args:
+            key (str): Cache key.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+
+    def clear(self):
+        """
+        Remove all entries.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute("DELETE FROM responses").rowcount
+            conn.execute("DELETE FROM missing")
+            conn.commit()
+        logger.info(f"已清空元数据缓存: {count} 条")
+        return count
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Number of entries, total compressed size in bytes and
+                number of keys remembered as not found.
+        """
+        with self._lock:
+            conn = self._connect()
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses"
+            ).fetchone()
+            missing = conn.execute("SELECT COUNT(*) FROM missing").fetchone()[0]
+        return {"entries": count, "bytes": size, "missing": missing, "path": self.path}
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 按数据库路径共享缓存实例，避免每个客户端各开一个连接
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_metadata_cache(settings):
+    """
+    Get the shared metadata cache stored in the settings' config directory.
+
+    Args:
+        settings (Settings): Settings object.
+
+    Returns:
+        MetadataCache or None: The cache, or None if caching is disabled or
+            the config directory is unusable.
+    """
+    if not get_setting(settings, "use_metadata_cache", True):
+        return None
+
+    try:
+        config_dir = settings.get_config_dir()
+    except (AttributeError, TypeError):
+        return None
+    if not isinstance(config_dir, str):
+        return None
+    path = os.path.join(config_dir, MetadataCache.FILENAME)
+
+    ttl = get_setting(settings, "metadata_cache_ttl", 21600)
+    negative_ttl = get_setting(settings, "negative_cache_ttl", 604800)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = MetadataCache(path, ttl=ttl, negative_ttl=negative_ttl)
+            _caches[path] = cache
+        else:
+            cache.ttl = ttl
+            cache.negative_ttl = negative_ttl
+    return cache
@@ -0,0 +1,300 @@
+import re
+import time
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+from .settings import get_setting
+
+# 配置日志
+logger = logging.getLogger("rate_limiter")
+
+
+class TokenBucket:
+    """
+    Token bucket with an adaptive refill rate.
+
+    The rate is halved whenever the server pushes back (429/503) and grows
+    back additively on successful responses, up to the configured budget.
+    While a Retry-After penalty is active no tokens are handed out, so
+    callers queue instead of failing.
+    """
+
+    # 被限流后速率不会低于配置值的这个比例
+    MIN_RATE_FACTOR = 0.1
+
+    def __init__(self, rate, burst):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate (float): Requests per second.
+            burst (int): Maximum number of requests sent back to back.
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, rate, burst):
+        """
+        Change the budget of the bucket.
+
+        Args:
+            rate (float): Requests per second.
+            burst (int): Maximum number of requests sent back to back.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            # 正处于降速状态时保持降速，只是不超过新的上限
+            slowed = self.rate < self.max_rate
+            self.max_rate = rate
+            self.rate = min(self.rate, rate) if slowed else rate
+            self.burst = burst
+            self.tokens = min(self.tokens, burst)
+
+    def _refill(self, now):
+        """按经过的时间补充令牌（调用方需持有锁）"""
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self):
+        """
+        Take a token, reserving one in the future if none is available.
+
+        Returns:
+            float: Seconds the caller has to wait before sending.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def penalize(self, delay):
+        """
+        Block the bucket for a while and slow it down.
+
+        Args:
+            delay (float): Seconds before the next request may be sent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.rate = max(self.max_rate * self.MIN_RATE_FACTOR, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def reward(self):
+        """Speed the bucket back up after a successful response."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def stats(self):
+        """
+        Get bucket state.
+
+        Returns:
+            dict: Current and configured rate, available tokens and remaining penalty.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "tokens": round(self.tokens, 3),
+                "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 3),
+            }
+
+
+class RateLimiter:
+    """
+    Client-side rate limiter for Civitai API calls.
+
+    Requests are grouped into endpoint classes, each with its own token
+    bucket, so a burst of searches does not starve model lookups.
+    """
+
+    # 各类端点占总速率的比例
+    BUDGETS = {
+        "search": 0.5,
+        "models": 1.0,
+        "versions": 1.0,
+        "default": 0.5,
+    }
+
+    # 服务器要求等待的状态码
+    RETRY_STATUS = (429, 503)
+
+    def __init__(self, rate=4.0):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float, optional): Requests per second for a full budget.
+        """
+        self.rate = rate
+        self.buckets = {
+            name: TokenBucket(*self._budget(name, rate)) for name in self.BUDGETS
+        }
+        self.throttled = 0
+
+    def _budget(self, name, rate):
+        """计算某类端点的速率和突发量"""
+        class_rate = max(0.1, rate * self.BUDGETS[name])
+        return class_rate, max(1, int(class_rate * 2))
+
+    def configure(self, rate):
+        """
+        Change the overall request rate.
+
+        Args:
+            rate (float): Requests per second for a full budget.
+        """
+        if rate == self.rate:
+            return
+        self.rate = rate
+        for name, bucket in self.buckets.items():
+            bucket.configure(*self._budget(name, rate))
+
+    @staticmethod
+    def classify(endpoint, params=None):
+        """
+        Get the endpoint class of a request.
+
+        Args:
+            endpoint (str): API endpoint.
+            params (dict, optional): Query parameters.
+
+        Returns:
+            str: Endpoint class name.
+        """
+        if endpoint.startswith("model-versions"):
+            return "versions"
+        if endpoint == "models":
+            return "models" if params and "ids" in params else "search"
+        if re.match(r"^models/\d+$", endpoint):
+            return "models"
+        return "default"
+
+    def acquire(self, name):
+        """
+        Wait (blocking the thread) until a request of this class may be sent.
+
+        Args:
+            name (str): Endpoint class.
+        """
+        wait = self.buckets[name].reserve()
+        if wait > 0:
+            logger.debug(f"速率限制: {name} 等待 {wait:.2f} 秒")
+            time.sleep(wait)
+
+    async def acquire_async(self, name):
+        """
+        Wait (suspending the coroutine) until a request of this class may be sent.
+
+        Args:
+            name (str): Endpoint class.
+        """
+        wait = self.buckets[name].reserve()
+        if wait > 0:
+            logger.debug(f"速率限制: {name} 等待 {wait:.2f} 秒")
+            await asyncio.sleep(wait)
+
+    def feedback(self, name, status_code, retry_after=None, attempt=0):
+        """
+        Adapt the bucket to a response.
+
+        Args:
+            name (str): Endpoint class.
+            status_code (int): Response status code.
+            retry_after (str, optional): Retry-After header of the response.
+            attempt (int, optional): Number of retries already made.
+
+        Returns:
+            float or None: Seconds to back off before retrying, or None if the
+                response should not be retried.
+        """
+        bucket = self.buckets[name]
+        if status_code not in self.RETRY_STATUS:
+            bucket.reward()
+            return None
+
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = min(60.0, 2.0**attempt)
+        self.throttled += 1
+        bucket.penalize(delay)
+        logger.warning(f"Civitai限流 ({status_code}): {name} 暂停 {delay:.1f} 秒")
+        return delay
+
+    def stats(self):
+        """
+        Get limiter statistics.
+
+        Returns:
+            dict: Configured rate, throttled responses and per-class bucket state.
+        """
+        return {
+            "rate": self.rate,
+            "throttled": self.throttled,
+            "buckets": {name: bucket.stats() for name, bucket in self.buckets.items()},
+        }
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    Args:
+        value (str): Header value, either seconds or an HTTP date.
+
+    Returns:
+        float or None: Seconds to wait, or None if the value is missing or invalid.
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+# 进程内所有客户端共享同一个限流器，以便共同遵守服务器给出的配额
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(settings):
+    """
+    Get the shared rate limiter, updated to the rate in the settings.
+
+    Args:
+        settings (Settings): Settings object.
+
+    Returns:
+        RateLimiter: The limiter.
+    """
+    global _limiter
+    rate = get_setting(settings, "api_rate_limit", 4.0)
+    if rate <= 0:
+        rate = 4.0
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(rate)
+        else:
+            _limiter.configure(rate)
+    return _limiter
@@ -0,0 +1,350 @@
+import os
+import gzip
+import atexit
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import httpx
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 配置日志
+logger = logging.getLogger("replay")
+
+# 录制时保留的响应头，其余的对回放没有意义
+RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+
+def request_key(method, url, params=None):
+    """
+    Get the fixture key of a request.
+
+    The host is dropped and query parameters are sorted, so the same request
+    made by the sync and the async client, or against another base URL, maps
+    to the same fixture.
+
+    Args:
+        method (str): HTTP method.
+        url (str): Request URL, possibly with a query string.
+        params (dict, optional): Extra query parameters.
+
+    Returns:
+        str: Fixture key such as ``GET /api/v1/models?limit=20&page=1``.
+    """
+    if params:
+        url = requests.Request(method, url, params=params).prepare().url
+    parts = urlsplit(str(url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{method.upper()} {parts.path}" + (f"?{query}" if query else "")
+
+
+class FixtureStore:
+    """
+    Gzipped JSON-lines store of recorded API responses.
+
+    Each line holds one response: its key, status code, the headers needed
+    for caching and rate limiting, and the body as text.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the store, loading the fixture file if it exists.
+
+        Args:
+            path (str): Path to the ``.jsonl.gz`` fixture file.
+        """
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._changed = False
+        self.load()
+
+    def load(self):
+        """Load the fixture file."""
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry
+        logger.info(f"已加载 {len(self._entries)} 条录制响应: {self.path}")
+
+    def save(self):
+        """Write all entries to the fixture file, sorted by key."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            entries = [self._entries[key] for key in sorted(self._entries)]
+            self._changed = False
+        tmp_path = self.path + ".tmp"
+        # mtime=0 使相同内容生成相同的文件
+        with open(tmp_path, "wb") as raw, gzip.GzipFile(
+            fileobj=raw, mode="wb", mtime=0
+        ) as f:
+            for entry in entries:
+                line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+                f.write(line.encode("utf-8") + b"\n")
+        os.replace(tmp_path, self.path)
+
+    def save_changes(self):
+        """Write the fixture file if responses were recorded since it was loaded or saved."""
+        if self._changed:
+            self.save()
+
+    def get(self, key):
+        """
+        Get a recorded response.
+
+        Args:
+            key (str): Fixture key.
+
+        Returns:
+            dict or None: Recorded entry.
+        """
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, status_code, headers, body):
+        """
+        Record a response.
+
+        Args:
+            key (str): Fixture key.
+            status_code (int): Response status code.
+            headers (Mapping): Response headers.
+            body (str): Response body.
+        """
+        kept = {name: headers[name] for name in RECORDED_HEADERS if headers.get(name)}
+        with self._lock:
+            self._entries[key] = {
+                "key": key,
+                "status": status_code,
+                "headers": kept,
+                "body": body,
+            }
+            self._changed = True
+
+    def keys(self):
+        """
+        Get the recorded keys.
+
+        Returns:
+            list: Fixture keys, sorted.
+        """
+        with self._lock:
+            return sorted(self._entries)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class ReplayResponse:
+    """Minimal stand-in for requests.Response built from a recorded entry."""
+
+    def __init__(self, entry, url):
+        self.status_code = entry["status"]
+        self.headers = CaseInsensitiveDict(entry.get("headers") or {})
+        self.text = entry.get("body") or ""
+        self.content = self.text.encode("utf-8")
+        self.url = url
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class NotRecorded(requests.RequestException):
+    """Raised by ReplayTransport for a request that was never recorded."""
+
+
+class AsyncNotRecorded(httpx.TransportError):
+    """Raised by AsyncReplayTransport for a request that was never recorded."""
+
+
+class _Latency:
+    """可复现的注入延迟：固定值加上按种子生成的抖动"""
+
+    def __init__(self, latency=0.0, jitter=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self):
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+
+class ReplayTransport:
+    """
+    Serves recorded responses to CivitaiAPI instead of the network.
+
+    Used as the ``transport`` of CivitaiAPI. Requests that were never
+    recorded raise NotRecorded, so the client treats them as failed rather
+    than as a 404 it would remember in the metadata cache.
+    """
+
+    def __init__(self, store, latency=0.0, jitter=0.0, seed=0):
+        """
+        Initialize the transport.
+
+        Args:
+            store (FixtureStore): Recorded responses.
+            latency (float, optional): Seconds added to every response.
+            jitter (float, optional): Maximum random deviation from the latency.
+            seed (int, optional): Seed for the jitter, for repeatable runs.
+        """
+        self.store = store
+        self.latency = _Latency(latency, jitter, seed)
+        self.misses = 0
+
+    def __call__(self, method, url, params=None, **kwargs):
+        key = request_key(method, url, params)
+        entry = self.store.get(key)
+        if entry is None:
+            self.misses += 1
+            logger.error(f"没有录制的响应: {key}")
+            raise NotRecorded(f"Not recorded: {key}")
+        delay = self.latency.next()
+        if delay:
+            time.sleep(delay)
+        return ReplayResponse(entry, url)
+
+
+class RecordingTransport:
+    """
+    Sends requests to the real API and records the responses.
+
+    Used as the ``transport`` of CivitaiAPI. Call ``store.save()`` when done.
+    """
+
+    def __init__(self, store, transport=None):
+        """
+        Initialize the transport.
+
+        Args:
+            store (FixtureStore): Store receiving the responses.
+            transport (callable, optional): Underlying transport. Defaults to requests.request.
+        """
+        self.store = store
+        self.transport = transport
+
+    def __call__(self, method, url, params=None, **kwargs):
+        send = self.transport or requests.request
+        response = send(method=method, url=url, params=params, **kwargs)
+        key = request_key(method, url, params)
+        self.store.put(key, response.status_code, response.headers, response.text)
+        return response
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Serves recorded responses to AsyncCivitaiAPI instead of the network.
+
+    Requests that were never recorded raise AsyncNotRecorded.
+    """
+
+    def __init__(self, store, latency=0.0, jitter=0.0, seed=0):
+        """
+        Initialize the transport.
+
+        Args:
+            store (FixtureStore): Recorded responses.
+            latency (float, optional): Seconds added to every response.
+            jitter (float, optional): Maximum random deviation from the latency.
+            seed (int, optional): Seed for the jitter, for repeatable runs.
+        """
+        self.store = store
+        self.latency = _Latency(latency, jitter, seed)
+        self.misses = 0
+
+    async def handle_async_request(self, request):
+        key = request_key(request.method, str(request.url))
+        entry = self.store.get(key)
+        if entry is None:
+            self.misses += 1
+            logger.error(f"没有录制的响应: {key}")
+            raise AsyncNotRecorded(f"Not recorded: {key}", request=request)
+        delay = self.latency.next()
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(
+            entry["status"],
+            headers=entry.get("headers") or {},
+            content=(entry.get("body") or "").encode("utf-8"),
+            request=request,
+        )
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Sends AsyncCivitaiAPI requests to the real API and records the responses."""
+
+    def __init__(self, store, transport=None):
+        """
+        Initialize the transport.
+
+        Args:
+            store (FixtureStore): Store receiving the responses.
+            transport (httpx.AsyncBaseTransport, optional): Underlying transport.
+        """
+        self.store = store
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+        key = request_key(request.method, str(request.url))
+        self.store.put(
+            key, response.status_code, response.headers, body.decode("utf-8", "replace")
+        )
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            content=body,
+            request=request,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def transports_from_env():
+    """
+    Build record/replay transports from environment variables.
+
+    ``CIVITAI_FIXTURES`` names the fixture file and ``CIVITAI_FIXTURE_MODE``
+    is ``replay`` (default) or ``record``. ``CIVITAI_REPLAY_LATENCY`` adds
+    latency in milliseconds to replayed responses.
+
+    Returns:
+        tuple: (sync transport, async transport), or (None, None) if not configured.
+    """
+    path = os.environ.get("CIVITAI_FIXTURES")
+    if not path:
+        return None, None
+
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = FixtureStore(path)
+        # 每个文件只注册一次，退出时写入录制的响应
+        atexit.register(store.save_changes)
+
+    mode = os.environ.get("CIVITAI_FIXTURE_MODE", "replay").lower()
+    if mode == "record":
+        return RecordingTransport(store), AsyncRecordingTransport(store)
+
+    latency = float(os.environ.get("CIVITAI_REPLAY_LATENCY", "0")) / 1000
+    return ReplayTransport(store, latency), AsyncReplayTransport(store, latency)
+
+
+# 按路径共享的录制文件
+_stores = {}
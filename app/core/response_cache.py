@@ -0,0 +1,79 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Small in-memory LRU cache with a time-to-live for API responses.
+
+    Used for responses that are not worth persisting, such as search pages,
+    so that a page fetched ahead of time can be served instantly when the
+    user asks for it. Cached values are shared between callers, so treat
+    them as read-only.
+    """
+
+    def __init__(self, maxsize=128, ttl=300):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int, optional): Maximum number of entries kept.
+            ttl (int, optional): Seconds an entry stays valid.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Get a cached value.
+
+        Args:
+            key (hashable): Cache key.
+
+        Returns:
+            The cached value, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key (hashable): Cache key.
+            value: Value to store.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Number of entries, hits and misses.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
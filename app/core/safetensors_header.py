@@ -0,0 +1,156 @@
+import os
+import logging
+from collections import Counter
+
+from . import fast_json
+
+# 配置日志
+logger = logging.getLogger("safetensors_header")
+
+# 格式规定头部最大 100MB，超过说明文件损坏或不是 safetensors
+MAX_HEADER_SIZE = 100 << 20
+
+# 摘要中保留的训练标签数量
+MAX_TAGS = 50
+
+
+class SafetensorsHeaderError(ValueError):
+    """Raised when a file does not start with a valid safetensors header."""
+
+
+def _pread(fd, size, offset):
+    """按偏移读取，不移动文件位置；没有 os.pread 的系统（Windows）退回到 seek"""
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def read_header(path):
+    """
+    Read the JSON header of a safetensors file.
+
+    Only the 8-byte length prefix and the header itself are read; tensor
+    data is never touched.
+
+    Args:
+        path (str): File to read.
+
+    Returns:
+        dict: Tensor entries keyed by name, plus ``__metadata__`` if present.
+
+    Raises:
+        SafetensorsHeaderError: If the file has no valid header.
+        OSError: If the file cannot be read.
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        file_size = os.fstat(fd).st_size
+        prefix = _pread(fd, 8, 0)
+        if len(prefix) < 8:
+            raise SafetensorsHeaderError(f"file too short: {path}")
+        size = int.from_bytes(prefix, "little")
+        if size > MAX_HEADER_SIZE or 8 + size > file_size:
+            raise SafetensorsHeaderError(f"invalid header length {size}: {path}")
+        data = b""
+        while len(data) < size:
+            chunk = _pread(fd, size - len(data), 8 + len(data))
+            if not chunk:
+                raise SafetensorsHeaderError(f"truncated header: {path}")
+            data += chunk
+    finally:
+        os.close(fd)
+
+    try:
+        header = fast_json.loads(data)
+    except ValueError as e:
+        raise SafetensorsHeaderError(f"header is not JSON: {path}: {e}")
+    if not isinstance(header, dict):
+        raise SafetensorsHeaderError(f"header is not an object: {path}")
+    return header
+
+
+def _tag_frequency(value):
+    """合并 ss_tag_frequency 中各数据集的标签计数"""
+    if isinstance(value, str):
+        try:
+            value = fast_json.loads(value)
+        except ValueError:
+            return {}
+    if not isinstance(value, dict):
+        return {}
+    counts = Counter()
+    for tags in value.values():
+        if not isinstance(tags, dict):
+            continue
+        for tag, count in tags.items():
+            if isinstance(count, int):
+                counts[tag.strip()] += count
+    return dict(counts.most_common(MAX_TAGS))
+
+
+def summarize(header):
+    """
+    Extract the fields used to classify a model from its header.
+
+    Args:
+        header (dict): Header returned by read_header().
+
+    Returns:
+        dict: Tensor count, parameter count, dtype counts and the most
+            common dtype, plus the training metadata (base model, network
+            module and dimension, title and the most frequent training tags)
+            when the trainer recorded it.
+    """
+    metadata = header.get("__metadata__")
+    metadata = metadata if isinstance(metadata, dict) else {}
+
+    dtypes = Counter()
+    params = 0
+    tensors = 0
+    for name, info in header.items():
+        if name == "__metadata__" or not isinstance(info, dict):
+            continue
+        tensors += 1
+        dtypes[info.get("dtype")] += 1
+        count = 1
+        for dim in info.get("shape") or ():
+            count *= dim
+        params += count
+
+    def text(*keys):
+        for key in keys:
+            value = metadata.get(key)
+            if isinstance(value, str) and value.strip() and value != "None":
+                return value.strip()
+        return None
+
+    return {
+        "tensors": tensors,
+        "params": params,
+        "dtype": dtypes.most_common(1)[0][0] if dtypes else None,
+        "dtypes": dict(dtypes),
+        "base_model": text("ss_base_model_version", "modelspec.architecture"),
+        "network": text("ss_network_module"),
+        "network_dim": text("ss_network_dim"),
+        "network_alpha": text("ss_network_alpha"),
+        "title": text("modelspec.title", "ss_output_name"),
+        "tags": _tag_frequency(metadata.get("ss_tag_frequency")),
+    }
+
+
+def read_summary(path):
+    """
+    Read and summarize the header of a safetensors file.
+
+    Args:
+        path (str): File to read.
+
+    Returns:
+        dict: See summarize().
+
+    Raises:
+        SafetensorsHeaderError: If the file has no valid header.
+        OSError: If the file cannot be read.
+    """
+    return summarize(read_header(path))
@@ -2,6 +2,8 @@ import os
 import json
 import tempfile
 import logging
+import threading
+import weakref
 
 # 配置日志
 logging.basicConfig(
@@ -10,19 +12,45 @@ logging.basicConfig(
 logger = logging.getLogger("settings")
 
 
+def get_setting(settings, name, default):
+    """
+    Read a setting, falling back to the default when it is missing or has the wrong type.
+
+    Args:
+        settings: Settings object (or a stand-in for one).
+        name (str): Attribute name.
+        default: Value used when the attribute is absent or not of the default's type.
+
+    Returns:
+        The setting value or the default.
+    """
+    value = getattr(settings, name, default)
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else default
+    if isinstance(default, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return default
+        return value
+    if default is None or isinstance(value, type(default)):
+        return value
+    return default
+
+
 class Settings:
     """
     Manages application settings for the Civitai Browser application.
     Settings are saved to and loaded from a JSON file.
     """
 
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, check_permissions=True):
         """
         Initialize settings with default values.
 
         Args:
             config_path (str, optional): Path to the config file.
                 If None, uses the default path or environment variable.
+            check_permissions (bool, optional): Probe the model and config
+                directories for write access.
         """
         # 优先使用环境变量来设置配置路径
         self.config_path = config_path or os.environ.get(
@@ -50,6 +78,16 @@ class Settings:
         self.save_images = self._parse_bool_env("CIVITAI_SAVE_IMAGES", False)
         self.custom_image_dir = os.environ.get("CIVITAI_IMAGE_DIR", None)
         self.timeout = int(os.environ.get("CIVITAI_TIMEOUT", "30"))
+        self.use_metadata_cache = self._parse_bool_env("CIVITAI_METADATA_CACHE", True)
+        self.metadata_cache_ttl = int(os.environ.get("CIVITAI_CACHE_TTL", "21600"))
+        # 未找到的哈希和模型多久之后重新查询（秒），0表示不缓存
+        self.negative_cache_ttl = int(
+            os.environ.get("CIVITAI_NEGATIVE_CACHE_TTL", "604800")
+        )
+        self.api_rate_limit = float(os.environ.get("CIVITAI_RATE_LIMIT", "4"))
+        self.api_base_url = os.environ.get(
+            "CIVITAI_API_BASE_URL", "https://civitai.com/api/v1"
+        )
 
         # 确保配置目录存在，如果不能创建，使用临时目录
         self._ensure_config_dir()
@@ -57,8 +95,9 @@ class Settings:
         # 尝试加载现有设置
         self.load()
 
-        # 检查目录可写性
-        self._check_directory_permissions()
+        # 检查目录可写性（会写入并删除测试文件，只在启动时做一次）
+        if check_permissions:
+            self._check_directory_permissions()
 
     def _parse_bool_env(self, env_var, default):
         """从环境变量解析布尔值"""
@@ -139,6 +178,11 @@ class Settings:
             "save_images": self.save_images,
             "custom_image_dir": self.custom_image_dir,
             "timeout": self.timeout,
+            "use_metadata_cache": self.use_metadata_cache,
+            "metadata_cache_ttl": self.metadata_cache_ttl,
+            "negative_cache_ttl": self.negative_cache_ttl,
+            "api_rate_limit": self.api_rate_limit,
+            "api_base_url": self.api_base_url,
         }
 
     def from_dict(self, data):
@@ -205,14 +249,23 @@ class Settings:
 
         return {"http": self.proxy_url, "https": self.proxy_url}
 
-    def ensure_model_dirs(self):
+    def get_config_dir(self):
         """
-        Create all necessary model directories if they don't exist.
+        Get the directory holding the config file and other persistent state.
+
+        Returns:
+            str: Path to the config directory.
+        """
+        return os.path.dirname(os.path.abspath(self.config_path))
+
+    def get_model_dirs(self):
+        """
+        Get the model directory of each model type.
 
         Returns:
             dict: Dictionary of model type to directory path.
         """
-        model_dirs = {
+        return {
             "Checkpoint": os.path.join(self.model_dir, "Stable-diffusion"),
             "LORA": os.path.join(self.model_dir, "Lora"),
             "LoCon": os.path.join(self.model_dir, "LyCORIS"),
@@ -223,6 +276,15 @@ class Settings:
             "Upscaler": os.path.join(self.model_dir, "ESRGAN"),
         }
 
+    def ensure_model_dirs(self):
+        """
+        Create all necessary model directories if they don't exist.
+
+        Returns:
+            dict: Dictionary of model type to directory path.
+        """
+        model_dirs = self.get_model_dirs()
+
         # 尝试创建所有目录，但处理错误而不中断
         created_dirs = {}
         for model_type, dir_path in model_dirs.items():
@@ -254,3 +316,192 @@ class Settings:
             # 额外的aria2命令行参数
             "aria2_flags": "",
         }
+
+
+class SettingsService:
+    """
+    Process-wide holder of the current settings.
+
+    The config file is read once. Later calls only stat the file and reload
+    it when its modification time or size changed, so API requests do not
+    re-read the file or probe directory permissions.
+
+    Long-lived components subscribe to changes and reconfigure themselves in
+    place instead of being rebuilt.
+    """
+
+    def __init__(self, config_path=None):
+        """
+        Initialize the service.
+
+        Args:
+            config_path (str, optional): Path to the config file.
+                If None, uses the default path or environment variable.
+        """
+        self.config_path = config_path
+        self._settings = None
+        self._source = None
+        self._stamp = None
+        self._snapshot = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def _resolve_path(self):
+        """配置文件路径，未指定时跟随环境变量"""
+        return self.config_path or os.environ.get(
+            "CIVITAI_CONFIG_PATH", os.path.join(os.getcwd(), "config", "settings.json")
+        )
+
+    @staticmethod
+    def _file_stamp(path):
+        """用修改时间和大小判断配置文件是否变化"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def current(self):
+        """The loaded settings, without checking the config file (None before the first get())."""
+        return self._settings
+
+    def get(self):
+        """
+        Get the current settings, reloading them if the config file changed.
+
+        Subscribers are notified when a reload changed any value. A file
+        that was only touched or rewritten with the same values keeps the
+        current Settings object.
+
+        Returns:
+            Settings: Settings object.
+        """
+        source = self._resolve_path()
+        with self._lock:
+            if self._settings is None or source != self._source:
+                # 首次加载时检查目录权限
+                self._settings = Settings(config_path=source)
+                self._source = source
+                self._stamp = self._file_stamp(self._settings.config_path)
+                self._snapshot = self._settings.to_dict()
+                return self._settings
+
+            stamp = self._file_stamp(self._settings.config_path)
+            if stamp == self._stamp:
+                return self._settings
+
+            settings = Settings(config_path=source, check_permissions=False)
+            self._stamp = self._file_stamp(settings.config_path)
+            changed = self._diff(settings)
+            if not changed:
+                # 只是文件被touch或重写为相同内容，继续使用原来的对象
+                return self._settings
+            logger.info(f"配置文件已变化，重新加载: {self._settings.config_path}")
+            self._settings = settings
+
+        self._notify(settings, changed)
+        return settings
+
+    def save(self, settings=None):
+        """
+        Save the settings and notify subscribers of the changed values.
+
+        The new file state is remembered, so the write is not mistaken for an
+        outside change.
+
+        Args:
+            settings (Settings, optional): Settings to save. Defaults to the current ones.
+
+        Returns:
+            bool: True if the settings were saved.
+        """
+        settings = settings or self.get()
+        saved = settings.save()
+        with self._lock:
+            if settings is not self._settings:
+                return saved
+            self._stamp = self._file_stamp(settings.config_path)
+            changed = self._diff(settings)
+        self._notify(settings, changed)
+        return saved
+
+    def subscribe(self, callback, keys=None):
+        """
+        Register a callback for settings changes.
+
+        Bound methods are held weakly, so subscribing does not keep the
+        component alive.
+
+        Args:
+            callback (callable): Called as ``callback(settings, changed)`` with the
+                new settings and the set of changed setting names.
+            keys (Iterable[str], optional): Only notify when one of these settings changed.
+
+        Returns:
+            callable: Function removing the subscription.
+        """
+        if hasattr(callback, "__self__"):
+            ref = weakref.WeakMethod(callback)
+        else:
+            ref = lambda: callback  # noqa: E731
+        entry = (ref, frozenset(keys) if keys is not None else None)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+
+        return unsubscribe
+
+    def _diff(self, settings):
+        """对比上次的快照，返回变化的设置项（调用方需持有锁）"""
+        current = settings.to_dict()
+        changed = {
+            key
+            for key in set(current) | set(self._snapshot)
+            if current.get(key) != self._snapshot.get(key)
+        }
+        self._snapshot = current
+        return changed
+
+    def _notify(self, settings, changed):
+        """通知订阅者，单个订阅者出错不影响其他订阅者"""
+        if not changed:
+            return
+        with self._lock:
+            entries = list(self._subscribers)
+        for ref, keys in entries:
+            callback = ref()
+            if callback is None:
+                with self._lock:
+                    if (ref, keys) in self._subscribers:
+                        self._subscribers.remove((ref, keys))
+                continue
+            if keys is not None and not keys & changed:
+                continue
+            try:
+                callback(settings, changed)
+            except Exception as e:
+                logger.error(f"设置变更回调失败: {e}", exc_info=True)
+
+
+# 进程内共享的设置服务
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_settings_service():
+    """
+    Get the shared settings service.
+
+    Returns:
+        SettingsService: The service.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = SettingsService()
+    return _service
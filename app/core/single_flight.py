@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+
+class _Call:
+    """An in-flight call shared by every thread asking for the same key."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls made from threads.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    The shared result object is handed to every caller, so treat it as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Run fn, or join an identical call that is already in flight.
+
+        Args:
+            key (hashable): Identity of the call.
+            fn (callable): Function performing the work.
+            *args: Positional arguments for fn.
+            **kwargs: Keyword arguments for fn.
+
+        Returns:
+            The result of fn.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self):
+        """
+        Get coalescing statistics.
+
+        Returns:
+            dict: Total calls, calls that joined an in-flight call, and calls in flight.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent identical calls made from coroutines.
+
+    The work runs in its own task, so a caller being cancelled does not cancel
+    the call for the others still waiting on it.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        """
+        Await coro_fn, or join an identical call that is already in flight.
+
+        Args:
+            key (hashable): Identity of the call.
+            coro_fn (callable): Coroutine function performing the work.
+            *args: Positional arguments for coro_fn.
+            **kwargs: Keyword arguments for coro_fn.
+
+        Returns:
+            The result of coro_fn.
+        """
+        loop = asyncio.get_running_loop()
+        self.calls += 1
+
+        task = self._tasks.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self.coalesced += 1
+        else:
+            task = loop.create_task(coro_fn(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        """任务结束后移除，避免误删同一键的新任务"""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # 读取异常，防止无人等待时出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """
+        Get coalescing statistics.
+
+        Returns:
+            dict: Total calls, calls that joined an in-flight call, and calls in flight.
+        """
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._tasks),
+        }
@@ -0,0 +1,200 @@
+import time
+import logging
+
+# 配置日志
+logger = logging.getLogger("update_checker")
+
+
+class UpdateCheckCancelled(Exception):
+    """Raised when an update check was cancelled."""
+
+
+def _versions(model):
+    """模型的已发布版本（从新到旧），只保留判断更新需要的字段"""
+    versions = []
+    for version in model.get("modelVersions") or ():
+        if not isinstance(version, dict) or version.get("id") is None:
+            continue
+        if version.get("status", "Published") != "Published":
+            continue
+        versions.append(
+            {
+                "id": version["id"],
+                "name": version.get("name"),
+                "baseModel": version.get("baseModel"),
+                "publishedAt": version.get("publishedAt"),
+            }
+        )
+    return versions
+
+
+def _updated_at(model):
+    """模型最后修改的时间；模型本身没有时取最新的版本时间"""
+    if model.get("updatedAt"):
+        return model["updatedAt"]
+    stamps = [
+        version.get("updatedAt") or version.get("publishedAt")
+        for version in model.get("modelVersions") or ()
+        if isinstance(version, dict)
+    ]
+    stamps = [stamp for stamp in stamps if stamp]
+    return max(stamps) if stamps else None
+
+
+class UpdateChecker:
+    """
+    Checks whether newer versions exist for the installed models.
+
+    Installed files are matched with their model versions through the
+    library index, and the models are fetched with batched ``models?ids=``
+    requests. The version list of every model is remembered in the index,
+    so a repeat check only fetches models not checked within
+    CHECK_INTERVAL; all other models are answered from the index. Civitai
+    has no cheaper way to ask whether a model changed, so every due model
+    is fetched in full, and its stored ``updatedAt`` only decides whether
+    the new version list is reported as changed.
+    """
+
+    # 多久之后重新向 Civitai 询问一个模型的版本（秒）
+    CHECK_INTERVAL = 6 * 3600
+
+    # 每批询问的模型数，与 CivitaiAPI 每个 models?ids= 请求的页大小一致
+    CHUNK_SIZE = 100
+
+    def __init__(self, api, index, check_interval=None):
+        """
+        Initialize the checker.
+
+        Args:
+            api (CivitaiAPI): Client used to fetch the models.
+            index (LibraryIndex): Index holding the installed files and version lists.
+            check_interval (float, optional): Seconds a remembered version list is used.
+        """
+        self.api = api
+        self.index = index
+        self.check_interval = self.CHECK_INTERVAL if check_interval is None else check_interval
+
+    def check(self, paths=None, refresh=False, progress=None, cancel=None):
+        """
+        Check the installed files for updates.
+
+        Args:
+            paths (iterable, optional): Model files; all indexed model files by default.
+            refresh (bool, optional): Ask about every model, even those
+                checked within the check interval or recently not found.
+            progress (callable, optional): Called with a dict holding the
+                ``stage`` (models), ``models_done`` and ``models_total``.
+            cancel (threading.Event, optional): Stops the check between
+                batches when set. Batches already fetched stay remembered.
+
+        Returns:
+            dict: ``files`` maps each path to its ``model_id``,
+                ``version_id``, ``latest_version_id`` and ``status`` (latest,
+                outdated, unavailable, or unresolved if the file is not
+                matched with a model yet); ``models`` maps model IDs to the
+                ``name``, the ``latest_version``, the ``installed`` version
+                IDs, whether an ``update`` is available and whether the
+                latest version is ``new`` since the previous check;
+                ``updates`` counts the models with an update, ``checked``
+                the models fetched and ``changed`` those whose versions moved.
+
+        Raises:
+            UpdateCheckCancelled: If ``cancel`` was set.
+        """
+        started = time.time()
+        if paths is None:
+            rows = self.index.find(models_only=True)
+        else:
+            rows = [self.index.get(path) or {"path": path} for path in dict.fromkeys(paths)]
+
+        installed = {}
+        for row in rows:
+            if row.get("model_id") and row.get("version_id"):
+                installed.setdefault(row["model_id"], set()).add(row["version_id"])
+
+        known = self.index.model_versions(installed)
+        now = time.time()
+        due = sorted(
+            model_id
+            for model_id in installed
+            if refresh
+            or model_id not in known
+            or now - known[model_id]["checked_at"] >= self.check_interval
+        )
+        current = dict(known)
+        changed = set()
+        for done in range(0, len(due), self.CHUNK_SIZE):
+            if progress is not None:
+                progress({"stage": "models", "models_done": done, "models_total": len(due)})
+            if cancel is not None and cancel.is_set():
+                raise UpdateCheckCancelled()
+            chunk = due[done : done + self.CHUNK_SIZE]
+            refreshed = {}
+            for model_id, model in self.api.get_models_bulk(chunk, refresh=refresh).items():
+                model_id = int(model_id)
+                updated_at = _updated_at(model)
+                old = known.get(model_id)
+                entry = {
+                    "name": model.get("name"),
+                    "updated_at": updated_at,
+                    "versions": _versions(model),
+                }
+                if old is None or updated_at is None or old["updated_at"] != updated_at:
+                    changed.add(model_id)
+                refreshed[model_id] = entry
+                current[model_id] = entry
+            # 每批结果立即写入索引，取消后已问过的模型不必再问
+            if refreshed:
+                self.index.remember_model_versions(refreshed)
+        if progress is not None:
+            progress({"stage": "models", "models_done": len(due), "models_total": len(due)})
+
+        models = {}
+        for model_id, versions in installed.items():
+            entry = current.get(model_id)
+            if entry is None or not entry["versions"]:
+                continue
+            latest = entry["versions"][0]
+            old = known.get(model_id)
+            models[model_id] = {
+                "name": entry["name"],
+                "latest_version": latest,
+                "installed": sorted(versions),
+                "update": latest["id"] not in versions,
+                "new": old is not None
+                and bool(old["versions"])
+                and old["versions"][0]["id"] != latest["id"],
+            }
+
+        files = {}
+        for row in rows:
+            model_id = row.get("model_id")
+            version_id = row.get("version_id")
+            model = models.get(model_id)
+            if not model_id or not version_id:
+                status = "unresolved"
+            elif model is None:
+                status = "unavailable"
+            elif model["latest_version"]["id"] == version_id:
+                status = "latest"
+            else:
+                status = "outdated"
+            files[row["path"]] = {
+                "model_id": model_id,
+                "version_id": version_id,
+                "latest_version_id": model["latest_version"]["id"] if model else None,
+                "status": status,
+            }
+
+        updates = sum(model["update"] for model in models.values())
+        logger.info(
+            f"更新检查完成: {len(models)} 个模型, {updates} 个有更新, "
+            f"请求 {len(due)} 个, 变化 {len(changed)} 个, 用时 {time.time() - started:.1f} 秒"
+        )
+        return {
+            "files": files,
+            "models": models,
+            "updates": updates,
+            "checked": len(due),
+            "changed": len(changed),
+        }
@@ -8,9 +8,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 import logging
 
+from .api import endpoints
 from .api.endpoints import router as api_router
 from .api.civitai_endpoints import router as civitai_router
-from .core.settings import Settings
+from .api.library_endpoints import router as library_router
+from .api.jobs_endpoints import router as jobs_router
+from .api.responses import FastJSONResponse
+from .core.settings import get_setting, get_settings_service
+from .core import jobs, library_watcher
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +28,7 @@ app = FastAPI(
     title="Civitai Browser",
     description="Standalone application for downloading models from Civitai",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -48,10 +54,54 @@ app.include_router(api_router, prefix="/api")
 # Include Civitai specific routes
 app.include_router(civitai_router)
 
+# Include local library routes
+app.include_router(library_router)
+
+# Include background job routes
+app.include_router(jobs_router)
+
 # Don't automatically ensure model directories for testing
 # Settings().ensure_model_dirs()
 
 
+@app.on_event("startup")
+async def load_settings():
+    """Load settings and probe directory permissions once at startup"""
+    get_settings_service().get()
+
+
+@app.on_event("startup")
+def start_library_watcher():
+    """Keep the library index current while model folders change"""
+    settings = get_settings_service().get()
+    if not get_setting(settings, "watch_library", True):
+        return
+    watcher = library_watcher.get_library_watcher(settings)
+    if watcher is not None:
+        watcher.start()
+
+
+@app.on_event("shutdown")
+async def close_api_client():
+    """Close the shared API client's connection pool"""
+    if endpoints._api_client_instance is not None:
+        await endpoints._api_client_instance.aclose()
+
+
+@app.on_event("shutdown")
+def stop_jobs():
+    """Cancel background jobs and wait for them to stop"""
+    if jobs._manager is not None:
+        jobs._manager.shutdown()
+
+
+@app.on_event("shutdown")
+def stop_library_watcher():
+    """Stop watching the model folders"""
+    if library_watcher._watcher is not None:
+        library_watcher._watcher.stop()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Root endpoint, serves the main HTML page"""
@@ -79,7 +129,7 @@ def run_app():
 
     # Ensure model directories exist when running the app
     try:
-        Settings().ensure_model_dirs()
+        get_settings_service().get().ensure_model_dirs()
     except Exception as e:
         # Log but don't crash if we can't create directories
         print(f"Warning: Could not create model directories: {e}")
@@ -17,6 +17,11 @@ class SettingsUpdate(BaseModel):
     base_model_filter: Optional[List[str]] = None
     save_images: Optional[bool] = None
     custom_image_dir: Optional[str] = None
+    use_metadata_cache: Optional[bool] = None
+    metadata_cache_ttl: Optional[int] = None
+    negative_cache_ttl: Optional[int] = None
+    api_rate_limit: Optional[float] = None
+    api_base_url: Optional[str] = None
 
 
 class SettingsResponse(BaseModel):
@@ -34,6 +39,11 @@ class SettingsResponse(BaseModel):
     base_model_filter: Optional[List[str]]
     save_images: bool
     custom_image_dir: Optional[str]
+    use_metadata_cache: bool
+    metadata_cache_ttl: int
+    negative_cache_ttl: int
+    api_rate_limit: float
+    api_base_url: str
 
 
 class ModelFile(BaseModel):
@@ -92,6 +102,12 @@ class SearchResults(BaseModel):
     metadata: Dict[str, Any]
 
 
+class BulkModelsRequest(BaseModel):
+    """Model for looking up many models at once"""
+
+    ids: List[int]
+
+
 class DownloadRequest(BaseModel):
     """Model for requesting a model download"""
 
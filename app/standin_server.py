@@ -0,0 +1,575 @@
+"""
+Local stand-in for the Civitai API and CDN, for benchmarking downloads.
+
+Serves a synthetic, deterministic model catalog with the same endpoints the
+app uses (``/api/v1/models``, ``/api/v1/model-versions``, ``by-hash`` and
+``/api/download/models/{id}``). Downloads redirect (307) to signed file URLs
+that support ``Range`` and ``ETag``. Per-connection throttling, random
+disconnects and random 429 responses can be switched on to stress-test
+download engines.
+
+Every file carries its real SHA256, so by-hash lookups work for downloaded
+files. Hashing multi-GB files takes a while, so the hashes are computed in
+parallel at startup and kept in a hash cache file (``--hash-cache``).
+``--hash-limit`` gives larger files placeholder hashes instead; by-hash
+lookups cannot match those files.
+
+Usage:
+    python -m app.standin_server --port 8001 --throttle 20M --disconnect-rate 0.05
+
+Then point the app at it with CIVITAI_API_BASE_URL=http://127.0.0.1:8001/api/v1
+"""
+
+import os
+import re
+import json
+import hmac
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("standin_server")
+
+MiB = 1024 * 1024
+GiB = 1024 * MiB
+
+MODEL_TYPES = ["Checkpoint", "LORA", "TextualInversion", "VAE", "LoCon"]
+BASE_MODELS = ["SD 1.5", "SDXL 1.0", "Pony", "Flux.1 D"]
+
+
+@dataclass
+class StandinConfig:
+    """Behaviour of the stand-in server."""
+
+    models: int = 20
+    versions_per_model: int = 2
+    # 文件大小按顺序循环使用
+    file_sizes: List[int] = field(
+        default_factory=lambda: [8 * MiB, 64 * MiB, 512 * MiB, 2 * GiB, 6 * GiB]
+    )
+    # 设置后超过此大小的文件使用占位哈希（按哈希查询无法匹配这些文件）
+    hash_limit: Optional[int] = None
+    # 保存已计算哈希的文件，重启时不必重新计算
+    hash_cache: Optional[str] = None
+    # 每个连接的下载速度上限（字节/秒），0表示不限速
+    throttle: int = 0
+    # 下载过程中随机断开连接的概率
+    disconnect_rate: float = 0.0
+    # API和下载请求随机返回429的概率
+    error_rate: float = 0.0
+    retry_after: int = 1
+    # 签名下载链接的有效期（秒）
+    url_ttl: int = 3600
+    seed: int = 0
+    secret: str = "standin-secret"
+
+
+class SyntheticFile:
+    """
+    Deterministic file content generated from a seed.
+
+    The content repeats a pseudo-random 1 MiB block derived from the file
+    ID, so any byte range can be produced without storing the file.
+    """
+
+    BLOCK_SIZE = MiB
+
+    def __init__(self, file_id, size, seed=0):
+        self.file_id = file_id
+        self.size = size
+        rng = random.Random(f"{seed}:{file_id}")
+        block = rng.randbytes(self.BLOCK_SIZE)
+        # 两个块相接，任意偏移处都能直接切出不超过一个块的数据
+        self._double = block + block
+
+    def read(self, offset, length):
+        """
+        Read a byte range.
+
+        Args:
+            offset (int): Start offset.
+            length (int): Number of bytes, at most BLOCK_SIZE.
+
+        Returns:
+            bytes: File content.
+        """
+        length = max(0, min(length, self.size - offset, self.BLOCK_SIZE))
+        start = offset % self.BLOCK_SIZE
+        return self._double[start : start + length]
+
+    def iter_range(self, start, end, chunk_size=64 * 1024):
+        """Yield the bytes from start to end (inclusive) in chunks."""
+        offset = start
+        while offset <= end:
+            chunk = self.read(offset, min(chunk_size, end - offset + 1))
+            if not chunk:
+                break
+            yield chunk
+            offset += len(chunk)
+
+    def sha256(self):
+        """Compute the SHA256 of the whole file."""
+        digest = hashlib.sha256()
+        for offset in range(0, self.size, self.BLOCK_SIZE):
+            digest.update(self.read(offset, self.BLOCK_SIZE))
+        return digest.hexdigest().upper()
+
+
+class Catalog:
+    """Synthetic models, versions and files."""
+
+    def __init__(self, config):
+        self.config = config
+        self.models = {}
+        self.versions = {}
+        self.files = {}
+        self.file_versions = {}
+        self.by_hash = {}
+        self._build()
+
+    def _hashes(self, files):
+        """
+        Get the SHA256 of every synthetic file.
+
+        Hashes are read from and written to the hash cache file, keyed by
+        seed, file ID and size; the missing ones are computed in parallel.
+
+        Args:
+            files (list): SyntheticFile objects.
+
+        Returns:
+            dict: File ID to upper-case SHA256.
+        """
+        config = self.config
+        cache = {}
+        if config.hash_cache and os.path.exists(config.hash_cache):
+            try:
+                with open(config.hash_cache, "r", encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法读取哈希缓存 {config.hash_cache}: {e}")
+
+        def key(synthetic):
+            return f"{config.seed}:{synthetic.file_id}:{synthetic.size}"
+
+        hashes = {}
+        pending = []
+        for synthetic in files:
+            if config.hash_limit is not None and synthetic.size > config.hash_limit:
+                placeholder = f"placeholder:{synthetic.file_id}".encode()
+                hashes[synthetic.file_id] = hashlib.sha256(placeholder).hexdigest().upper()
+            elif key(synthetic) in cache:
+                hashes[synthetic.file_id] = cache[key(synthetic)]
+            else:
+                pending.append(synthetic)
+
+        if pending:
+            logger.info(f"计算 {len(pending)} 个文件的SHA256...")
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                for synthetic, sha256 in zip(pending, pool.map(SyntheticFile.sha256, pending)):
+                    hashes[synthetic.file_id] = sha256
+                    cache[key(synthetic)] = sha256
+            if config.hash_cache:
+                try:
+                    with open(config.hash_cache, "w", encoding="utf-8") as f:
+                        json.dump(cache, f)
+                except OSError as e:
+                    logger.warning(f"无法写入哈希缓存 {config.hash_cache}: {e}")
+        return hashes
+
+    def _build(self):
+        """生成确定性的模型目录"""
+        config = self.config
+        rng = random.Random(config.seed)
+        size_index = 0
+
+        synthetic_files = []
+        for model_id in range(1, config.models + 1):
+            for v in range(config.versions_per_model):
+                file_id = (model_id * 1000 + v) * 10
+                size = config.file_sizes[size_index % len(config.file_sizes)]
+                size_index += 1
+                synthetic_files.append(SyntheticFile(file_id, size, config.seed))
+        hashes = self._hashes(synthetic_files)
+        synthetic_files = {synthetic.file_id: synthetic for synthetic in synthetic_files}
+
+        for model_id in range(1, config.models + 1):
+            model_type = MODEL_TYPES[model_id % len(MODEL_TYPES)]
+            versions = []
+            for v in range(config.versions_per_model):
+                version_id = model_id * 1000 + v
+                file_id = version_id * 10
+                synthetic = synthetic_files[file_id]
+                size = synthetic.size
+                sha256 = hashes[file_id]
+                self.files[file_id] = synthetic
+                self.file_versions[file_id] = version_id
+                self.by_hash[sha256] = version_id
+
+                version = {
+                    "id": version_id,
+                    "modelId": model_id,
+                    "name": f"v{config.versions_per_model - v}.0",
+                    "createdAt": f"2024-01-{28 - v:02d}T00:00:00.000Z",
+                    "updatedAt": f"2024-01-{28 - v:02d}T00:00:00.000Z",
+                    "baseModel": BASE_MODELS[(model_id + v) % len(BASE_MODELS)],
+                    "trainedWords": [f"trigger{model_id}"],
+                    "files": [
+                        {
+                            "id": file_id,
+                            "name": f"model_{model_id}_v{v}.safetensors",
+                            "sizeKB": size / 1024,
+                            "type": "Model",
+                            "primary": True,
+                            "metadata": {"format": "SafeTensor", "fp": "fp16"},
+                            "hashes": {"SHA256": sha256, "AutoV2": sha256[:10]},
+                            "downloadUrl": f"/api/download/models/{version_id}",
+                        }
+                    ],
+                    "images": [],
+                }
+                versions.append(version)
+                self.versions[version_id] = version
+
+            self.models[model_id] = {
+                "id": model_id,
+                "name": f"Synthetic {model_type} {model_id}",
+                "description": "<p>Synthetic model served by the stand-in server.</p>",
+                "type": model_type,
+                "nsfw": False,
+                "tags": [model_type.lower(), "synthetic"],
+                "creator": {"username": "standin"},
+                "stats": {"downloadCount": rng.randint(0, 100000)},
+                "modelVersions": versions,
+            }
+
+
+def absolute(data, base_url):
+    """把下载链接补全为绝对地址（返回副本，不修改目录数据）"""
+    if isinstance(data, dict):
+        return {
+            k: base_url + v if k == "downloadUrl" else absolute(v, base_url)
+            for k, v in data.items()
+        }
+    if isinstance(data, list):
+        return [absolute(v, base_url) for v in data]
+    return data
+
+
+def sign(secret, file_id, expires):
+    """计算下载链接签名"""
+    message = f"{file_id}:{expires}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range`` header.
+
+    Args:
+        header (str): Header value, e.g. ``bytes=100-``.
+        size (int): File size.
+
+    Returns:
+        tuple or None: (start, end) inclusive, or None if the header is absent.
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        raise ValueError(header)
+    first, last = match.groups()
+    if first == "":
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def create_app(config=None):
+    """
+    Create the stand-in FastAPI application.
+
+    Args:
+        config (StandinConfig, optional): Server behaviour.
+
+    Returns:
+        FastAPI: The application.
+    """
+    config = config or StandinConfig()
+    catalog = Catalog(config)
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Civitai stand-in")
+    app.state.config = config
+    app.state.catalog = catalog
+
+    def throttled():
+        """按配置的概率返回429"""
+        if config.error_rate and rng.random() < config.error_rate:
+            return JSONResponse(
+                {"error": "Too Many Requests"},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        return None
+
+    def base_url(request):
+        return str(request.base_url).rstrip("/")
+
+    @app.get("/api/v1/models")
+    def list_models(
+        request: Request,
+        limit: int = 100,
+        page: int = 1,
+        cursor: Optional[str] = None,
+        query: Optional[str] = None,
+        types: Optional[str] = None,
+        ids: Optional[List[int]] = Query(None),
+    ):
+        error = throttled()
+        if error:
+            return error
+
+        models = list(catalog.models.values())
+        if ids:
+            wanted = set(ids)
+            models = [m for m in models if m["id"] in wanted]
+        if query:
+            models = [m for m in models if query.lower() in m["name"].lower()]
+        if types:
+            models = [m for m in models if m["type"] == types]
+
+        limit = max(1, min(limit, 100))
+        # 与Civitai一样：带query或ids时使用游标分页
+        use_cursor = bool(query or ids or cursor)
+        start = int(cursor) if cursor else (page - 1) * limit
+        items = models[start : start + limit]
+        has_next = start + limit < len(models)
+
+        metadata = {"pageSize": limit}
+        if has_next:
+            params = [
+                (k, v)
+                for k, v in request.query_params.multi_items()
+                if k not in ("page", "cursor")
+            ]
+            if use_cursor:
+                metadata["nextCursor"] = str(start + limit)
+                params.append(("cursor", start + limit))
+            else:
+                params.append(("page", page + 1))
+            metadata["nextPage"] = f"{base_url(request)}/api/v1/models?{urlencode(params)}"
+        if not use_cursor:
+            metadata.update(
+                {
+                    "totalItems": len(models),
+                    "currentPage": page,
+                    "totalPages": max(1, -(-len(models) // limit)),
+                }
+            )
+
+        return {"items": absolute(items, base_url(request)), "metadata": metadata}
+
+    @app.get("/api/v1/models/{model_id}")
+    def get_model(model_id: int, request: Request):
+        error = throttled()
+        if error:
+            return error
+        model = catalog.models.get(model_id)
+        if model is None:
+            raise HTTPException(status_code=404, detail="Model not found")
+        return absolute(model, base_url(request))
+
+    @app.get("/api/v1/model-versions/by-hash/{hash_value}")
+    def get_version_by_hash(hash_value: str, request: Request):
+        error = throttled()
+        if error:
+            return error
+        version_id = catalog.by_hash.get(hash_value.upper())
+        if version_id is None:
+            raise HTTPException(status_code=404, detail="Model not found")
+        return absolute(catalog.versions[version_id], base_url(request))
+
+    @app.get("/api/v1/model-versions/{version_id}")
+    def get_version(version_id: int, request: Request):
+        error = throttled()
+        if error:
+            return error
+        version = catalog.versions.get(version_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+        return absolute(version, base_url(request))
+
+    @app.get("/api/download/models/{version_id}")
+    def download(version_id: int, request: Request):
+        error = throttled()
+        if error:
+            return error
+        version = catalog.versions.get(version_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+
+        file_data = version["files"][0]
+        expires = int(time.time()) + config.url_ttl
+        token = sign(config.secret, file_data["id"], expires)
+        url = (
+            f"{base_url(request)}/files/{file_data['id']}/{file_data['name']}"
+            f"?expires={expires}&token={token}"
+        )
+        return RedirectResponse(url, status_code=307)
+
+    @app.api_route("/files/{file_id}/{filename}", methods=["GET", "HEAD"])
+    async def serve_file(
+        file_id: int, filename: str, request: Request, expires: int = 0, token: str = ""
+    ):
+        synthetic = catalog.files.get(file_id)
+        if synthetic is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        if expires < time.time() or not hmac.compare_digest(
+            token, sign(config.secret, file_id, expires)
+        ):
+            raise HTTPException(status_code=403, detail="Invalid or expired signature")
+        error = throttled()
+        if error:
+            return error
+
+        etag = f'"{file_id}-{synthetic.size}"'
+        headers = {
+            "Accept-Ranges": "bytes",
+            "ETag": etag,
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        }
+
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        byte_range = None
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range == etag:
+            try:
+                byte_range = parse_range(request.headers.get("range"), synthetic.size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={**headers, "Content-Range": f"bytes */{synthetic.size}"},
+                )
+
+        status = 200
+        start, end = 0, synthetic.size - 1
+        if byte_range:
+            status = 206
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{synthetic.size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        if request.method == "HEAD":
+            return Response(status_code=status, headers=headers)
+
+        # 按概率决定本次连接在何处断开
+        cut_at = None
+        if config.disconnect_rate and rng.random() < config.disconnect_rate:
+            cut_at = rng.randint(start, end)
+
+        async def body():
+            sent = 0
+            started = time.monotonic()
+            for chunk in synthetic.iter_range(start, end):
+                if cut_at is not None and start + sent + len(chunk) > cut_at:
+                    logger.info(f"模拟断开连接: file={file_id} offset={cut_at}")
+                    yield chunk[: cut_at - start - sent]
+                    return
+                yield chunk
+                sent += len(chunk)
+                if config.throttle:
+                    delay = sent / config.throttle - (time.monotonic() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+        return StreamingResponse(
+            body(),
+            status_code=status,
+            headers=headers,
+            media_type="application/octet-stream",
+        )
+
+    return app
+
+
+def parse_size(value):
+    """解析带单位的大小，例如 20M、1.5G"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([KMG]?)i?B?", value.strip(), re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    number, unit = match.groups()
+    return int(float(number) * {"": 1, "K": 1024, "M": MiB, "G": GiB}[unit.upper()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Civitai stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--models", type=int, default=20)
+    parser.add_argument(
+        "--file-sizes",
+        type=parse_size,
+        nargs="+",
+        help="file sizes to cycle through, e.g. 8M 512M 4G",
+    )
+    parser.add_argument(
+        "--hash-limit",
+        type=parse_size,
+        help="give files above this size placeholder hashes instead of real ones",
+    )
+    parser.add_argument(
+        "--hash-cache",
+        default=os.path.join(tempfile.gettempdir(), "civitai_standin_hashes.json"),
+        help="file keeping computed hashes between runs",
+    )
+    parser.add_argument(
+        "--throttle", type=parse_size, default=0, help="bytes/s per connection"
+    )
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StandinConfig(
+        models=args.models,
+        hash_limit=args.hash_limit,
+        hash_cache=args.hash_cache,
+        throttle=args.throttle,
+        disconnect_rate=args.disconnect_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    if args.file_sizes:
+        config.file_sizes = args.file_sizes
+
+    import uvicorn
+
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
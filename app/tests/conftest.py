@@ -6,6 +6,62 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.core.civitai_api import CivitaiAPI
 from app.core.download_manager import DownloadManager
+from app.core.response_cache import ResponseCache
+from app.core.file_index import FileIndex
+from app.core.rate_limiter import RateLimiter
+from app.core import settings as settings_module
+from app.core import jobs as jobs_module
+from app.core import library_watcher as watcher_module
+
+
+@pytest.fixture(autouse=True)
+def isolated_config_dir(tmp_path, monkeypatch):
+    """Keep settings and on-disk caches of each test in a temporary directory"""
+    monkeypatch.setenv("CIVITAI_CONFIG_PATH", str(tmp_path / "config" / "settings.json"))
+    yield tmp_path / "config"
+
+
+@pytest.fixture(autouse=True)
+def fresh_settings_service(monkeypatch):
+    """Do not share loaded settings between tests"""
+    monkeypatch.setattr(settings_module, "_service", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_job_manager(monkeypatch):
+    """Give each test its own background job manager and stop its jobs afterwards"""
+    monkeypatch.setattr(jobs_module, "_manager", None)
+    yield
+    if jobs_module._manager is not None:
+        jobs_module._manager.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def fresh_library_watcher(monkeypatch):
+    """Give each test its own library watcher and stop it afterwards"""
+    monkeypatch.setattr(watcher_module, "_watcher", None)
+    yield
+    if watcher_module._watcher is not None:
+        watcher_module._watcher.stop()
+
+
+@pytest.fixture(autouse=True)
+def fresh_search_cache(monkeypatch):
+    """Do not let search pages cached by one test leak into another"""
+    monkeypatch.setattr(CivitaiAPI, "search_cache", ResponseCache())
+
+
+@pytest.fixture(autouse=True)
+def fresh_file_index(monkeypatch):
+    """Start each test with an empty download file index"""
+    monkeypatch.setattr(CivitaiAPI, "file_index", FileIndex())
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter(monkeypatch):
+    """Give each test its own rate limiter so budgets are not shared"""
+    limiter = RateLimiter(rate=1000.0)
+    monkeypatch.setattr("app.core.civitai_api.get_rate_limiter", lambda settings: limiter)
 
 
 # Create a new client for each test to avoid state leakage
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import httpx
+import pytest
+from unittest.mock import MagicMock
+
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.core.metadata_cache import MetadataCache
+from app.core.single_flight import AsyncSingleFlight
+
+
+@pytest.fixture
+def mock_settings():
+    settings = MagicMock()
+    settings.api_key = "test_api_key"
+    settings.model_dir = "/test/models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_flight(monkeypatch):
+    monkeypatch.setattr(AsyncCivitaiAPI, "flight", AsyncSingleFlight())
+
+
+MODEL = {
+    "id": 12345,
+    "name": "Test Model",
+    "type": "Checkpoint",
+    "modelVersions": [
+        {
+            "id": 67890,
+            "name": "v1.0",
+            "files": [
+                {
+                    "id": 98765,
+                    "name": "test_model_v1.safetensors",
+                    "primary": True,
+                    "downloadUrl": "https://example.com/test_model_v1.safetensors",
+                }
+            ],
+        }
+    ],
+}
+
+
+def make_client(mock_settings, handler):
+    return AsyncCivitaiAPI(
+        settings=mock_settings, transport=httpx.MockTransport(handler)
+    )
+
+
+def test_search_models(mock_settings):
+    """Test searching for models with the async client"""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"items": [MODEL], "metadata": {"totalItems": 1}})
+
+    async def main():
+        api = make_client(mock_settings, handler)
+        try:
+            return await api.search_models(query="test", nsfw=False)
+        finally:
+            await api.aclose()
+
+    result = asyncio.run(main())
+
+    assert result["items"][0]["name"] == "Test Model"
+    assert seen[0].url.params["query"] == "test"
+    assert seen[0].url.params["nsfw"] == "false"
+    assert seen[0].headers["Authorization"] == "Bearer test_api_key"
+
+
+def test_get_download_url(mock_settings):
+    """Test resolving a download URL with the async client"""
+
+    async def main():
+        api = make_client(mock_settings, lambda request: httpx.Response(200, json=MODEL))
+        try:
+            return await api.get_download_url(12345, version_id=67890)
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(main()) == "https://example.com/test_model_v1.safetensors"
+
+
+def test_errors_return_none(mock_settings):
+    """Test HTTP and transport error handling"""
+
+    def not_found(request):
+        return httpx.Response(404, text="Not found")
+
+    def unreachable(request):
+        raise httpx.ConnectError("Connection failed", request=request)
+
+    async def main():
+        results = []
+        for handler in (not_found, unreachable):
+            api = make_client(mock_settings, handler)
+            results.append(await api.get_model(1))
+            await api.aclose()
+        return results
+
+    assert asyncio.run(main()) == [None, None]
+
+
+def test_slow_request_does_not_block_event_loop(mock_settings):
+    """Test that other coroutines keep running while a request is pending"""
+
+    class SlowTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json=MODEL)
+
+    async def main():
+        api = AsyncCivitaiAPI(settings=mock_settings, transport=SlowTransport())
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        model = await api.get_model(12345)
+        task.cancel()
+        await api.aclose()
+        return model, ticks
+
+    model, ticks = asyncio.run(main())
+    assert model["id"] == 12345
+    assert ticks > 5
+
+
+def test_concurrent_requests_share_connection_and_call(mock_settings):
+    """Test that identical concurrent requests are coalesced"""
+    calls = []
+
+    class CountingTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            calls.append(request.url)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=MODEL)
+
+    async def main():
+        api = AsyncCivitaiAPI(settings=mock_settings, transport=CountingTransport())
+        results = await asyncio.gather(*(api.get_model(12345) for _ in range(5)))
+        await api.aclose()
+        return results
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result["id"] == 12345 for result in results)
+
+
+def test_settings_change_reconfigures_client_in_place(tmp_path, monkeypatch):
+    """Settings changes reach the shared client without rebuilding it"""
+    from app.core.settings import get_settings_service
+
+    monkeypatch.setenv("CIVITAI_MODEL_DIR", str(tmp_path / "models"))
+    service = get_settings_service()
+    settings = service.get()
+    api = AsyncCivitaiAPI()
+
+    async def scenario():
+        client = api._get_client()
+
+        settings.api_key = "rotated_key"
+        settings.timeout = 90
+        service.save(settings)
+        assert api.api_key == "rotated_key"
+        assert api._get_client() is client
+        assert client.timeout.read == 90
+
+        settings.use_proxy = True
+        settings.proxy_url = "http://127.0.0.1:3128"
+        service.save(settings)
+        assert api._get_client() is not client
+
+        await api.aclose()
+        assert client.is_closed
+
+    asyncio.run(scenario())
+
+
+def test_metadata_cache_is_used_off_the_event_loop(mock_settings, tmp_path):
+    """Test that SQLite cache reads and writes do not run on the event loop thread"""
+    cache = MetadataCache(str(tmp_path / "cache.sqlite3"))
+    threads = []
+    for name in ("get", "put", "is_missing"):
+        original = getattr(cache, name)
+
+        def record(*args, _original=original, **kwargs):
+            threads.append(threading.get_ident())
+            return _original(*args, **kwargs)
+
+        setattr(cache, name, record)
+
+    async def main():
+        api = AsyncCivitaiAPI(
+            settings=mock_settings,
+            cache=cache,
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json=MODEL)),
+        )
+        try:
+            await api.get_model(12345)
+            await api.get_model(12345)
+            await api.get_models_bulk([12345])
+        finally:
+            await api.aclose()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    cache.close()
+
+    assert threads
+    assert loop_thread not in threads
@@ -9,6 +9,7 @@ import requests
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from core.civitai_api import CivitaiAPI
+from core.file_index import FileIndex
 from core.settings import Settings
 
 
@@ -126,7 +127,9 @@ def test_get_model_versions(api_client, mock_response):
 
 def test_get_download_url(api_client, mock_response):
     """Test getting a download URL for a specific model file"""
-    with patch.object(api_client, "get_model_versions") as mock_get_versions:
+    with patch.object(api_client, "get_model_versions") as mock_get_versions, patch.object(
+        api_client, "get_model_version", return_value=None
+    ), patch.object(api_client, "file_index", FileIndex()):
         # Create a custom response for the get_model_versions method
         mock_get_versions.return_value = [
             {
@@ -255,6 +258,21 @@ def test_request_error_handling(mock_request, civitai_api):
     assert result is None
 
 
+@patch("requests.request")
+def test_not_found_is_told_apart_from_failure(mock_request, civitai_api):
+    """测试404可以和请求失败区分开"""
+    mock_response = MagicMock()
+    mock_response.status_code = 404
+    mock_response.text = '{"error":"Model not found"}'
+    mock_request.return_value = mock_response
+
+    missing = object()
+    assert civitai_api.get_model_version_by_hash("ABC", not_found=missing) is missing
+
+    mock_response.status_code = 500
+    assert civitai_api.get_model_version_by_hash("ABC", not_found=missing) is None
+
+
 @patch("requests.request")
 def test_api_key_in_headers(mock_request, civitai_api):
     """测试API密钥是否正确包含在请求头中"""
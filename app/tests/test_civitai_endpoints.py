@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -23,13 +23,14 @@ def mock_settings():
 
 @pytest.fixture
 def mock_api_client():
-    api_client = MagicMock()
+    api_client = AsyncMock()
     return api_client
 
 
 def test_set_api_key(client, mock_settings):
     """测试设置 API 密钥端点"""
-    with patch("app.api.civitai_endpoints.Settings", return_value=mock_settings):
+    app.dependency_overrides[get_settings] = lambda: mock_settings
+    try:
         response = client.post("/api/civitai/api-key", json={"api_key": "new_api_key"})
 
         assert response.status_code == 200
@@ -39,6 +40,8 @@ def test_set_api_key(client, mock_settings):
         # 验证设置被保存
         mock_settings.save.assert_called_once()
         assert mock_settings.api_key == "new_api_key"
+    finally:
+        app.dependency_overrides = {}
 
 
 def test_test_connection_success(client, mock_api_client):
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import json
+import threading
+
+from app.core.download_events import DownloadEventHub, format_sse
+
+
+def parse_event(message):
+    """Split an SSE message into its event name and decoded data"""
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    return fields.get("event"), json.loads(fields["data"])
+
+
+def test_format_sse():
+    message = format_sse({"a": 1}, "delta", 7)
+    assert message == 'id: 7\nevent: delta\ndata: {"a":1}\n\n'
+
+
+def test_poll_sends_only_changes():
+    tasks = [{"id": "a", "progress": 0}, {"id": "b", "progress": 0}]
+    hub = DownloadEventHub(lambda: [dict(t) for t in tasks])
+
+    async def scenario():
+        stream = hub.stream()
+        assert (await stream.__anext__()).startswith("retry:")
+        event, data = parse_event(await stream.__anext__())
+        assert event == "snapshot"
+        assert [t["id"] for t in data["tasks"]] == ["a", "b"]
+
+        # 两次变化在发送前合并，只发送最新状态
+        tasks[0]["progress"] = 10
+        hub.poll()
+        tasks[0]["progress"] = 20
+        del tasks[1]
+        hub.poll()
+        assert hub.poll() is False
+
+        event, data = parse_event(await stream.__anext__())
+        assert event == "delta"
+        assert data == {"upsert": [{"id": "a", "progress": 20}], "remove": ["b"]}
+
+        await stream.aclose()
+        assert hub.stats()["clients"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_single_poller_for_many_clients():
+    calls = []
+
+    def source():
+        calls.append(1)
+        return [{"id": "a", "progress": len(calls)}]
+
+    hub = DownloadEventHub(source, interval=0.01)
+
+    async def scenario():
+        streams = [hub.stream() for _ in range(5)]
+        for stream in streams:
+            await stream.__anext__()
+            await stream.__anext__()
+        await asyncio.sleep(0.1)
+        polled = len(calls)
+        for stream in streams:
+            event, data = parse_event(await stream.__anext__())
+            assert event == "delta"
+            assert data["upsert"][0]["progress"] <= len(calls)
+            await stream.aclose()
+        return polled
+
+    polled = asyncio.run(scenario())
+    # 5个客户端共享一个轮询，而不是每个客户端各自读取
+    assert polled < 30
+
+
+def test_blocked_source_does_not_stall_the_loop():
+    """Test that a source waiting for a lock is read outside the event loop"""
+    slow = threading.Event()
+    release = threading.Event()
+
+    def source():
+        if slow.is_set():
+            release.wait(1.0)
+        return [{"id": "a", "progress": 0}]
+
+    hub = DownloadEventHub(source, interval=0.01)
+
+    async def scenario():
+        stream = hub.stream()
+        await stream.__anext__()
+        await stream.__anext__()
+        slow.set()
+        loop = asyncio.get_running_loop()
+        lags = []
+        for _ in range(10):
+            started = loop.time()
+            await asyncio.sleep(0.01)
+            lags.append(loop.time() - started)
+        release.set()
+        await stream.aclose()
+        return max(lags)
+
+    started = time.time()
+    assert asyncio.run(scenario()) < 0.5
+    assert time.time() - started < 5
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.endpoints import get_download_manager, get_event_hub
+from app.core.download_events import DownloadEventHub
+from app.core.download_manager import DownloadManager
+
+
+@pytest.fixture
+def manager():
+    settings = MagicMock()
+    settings.model_dir = "/test/models"
+    # 不启动真正的下载线程
+    with patch.object(DownloadManager, "_process_queue"):
+        manager = DownloadManager(api_client=MagicMock(), settings=settings)
+    for i, name in enumerate(["a", "b", "c"]):
+        manager.queue.append(
+            {"id": name, "status": "queued", "progress": 0, "created_at": 3 - i}
+        )
+    return manager
+
+
+@pytest.fixture
+def socket_client(manager):
+    hub = DownloadEventHub(manager.snapshot_downloads, interval=0.01)
+    app.dependency_overrides[get_download_manager] = lambda: manager
+    app.dependency_overrides[get_event_hub] = lambda: hub
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def command(ws, **message):
+    """Send a command and return its reply, collecting events seen meanwhile"""
+    ws.send_json(message)
+    events = []
+    while True:
+        data = ws.receive_json()
+        if data["type"] == "reply":
+            return data, events
+        events.append(data)
+
+
+def test_socket_snapshot_and_commands(socket_client, manager):
+    with socket_client.websocket_connect("/api/ws") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert [t["id"] for t in snapshot["tasks"]] == ["a", "b", "c"]
+
+        reply, _ = command(ws, id=1, op="pause", task_id="b")
+        assert reply["ok"] is True
+        assert manager.get_download_status("b")["status"] == "paused"
+
+        reply, _ = command(ws, id=2, op="reorder", task_id="c", position=0)
+        assert reply["ok"] is True
+        assert [t["id"] for t in manager.queue] == ["c", "a", "b"]
+
+        reply, _ = command(ws, id=3, op="cancel", task_id="missing")
+        assert reply == {
+            "type": "reply",
+            "id": 3,
+            "op": "cancel",
+            "ok": False,
+            "error": "Cannot cancel download task missing",
+            "status": 409,
+        }
+
+        reply, _ = command(ws, id=4, op="explode")
+        assert reply["ok"] is False
+        assert reply["status"] == 400
+
+
+def test_socket_filtered_subscription(socket_client, manager):
+    with socket_client.websocket_connect("/api/ws") as ws:
+        ws.receive_json()
+
+        reply, _ = command(ws, id=1, op="subscribe", task_id="a")
+        assert [t["id"] for t in reply["result"]["tasks"]] == ["a"]
+
+        # 其他任务的变化不会发送给只订阅了a的客户端
+        manager.queue[1]["progress"] = 50
+        manager.queue[0]["progress"] = 10
+        while True:
+            event = ws.receive_json()
+            if event["type"] == "delta":
+                break
+        assert event["upsert"] == [
+            {"id": "a", "status": "queued", "progress": 10, "created_at": 3}
+        ]
+        assert event["remove"] == []
+
+
+def test_socket_status_runs_off_the_event_loop(socket_client, manager):
+    """Test that a task status is read in a worker thread, not on the event loop"""
+    on_loop = []
+    get_status = manager.get_download_status
+
+    def status(task_id):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return get_status(task_id)
+
+    with patch.object(manager, "get_download_status", side_effect=status):
+        with socket_client.websocket_connect("/api/ws") as ws:
+            ws.receive_json()
+            reply, _ = command(ws, id=1, op="status", task_id="a")
+
+    assert reply["ok"] is True
+    assert on_loop == [False]
@@ -0,0 +1,102 @@
+import time
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.endpoints import get_download_manager, get_event_hub
+from app.core.download_events import DownloadEventHub, TaskVersions
+from app.core.download_manager import DownloadManager
+
+
+def test_task_versions_changes_since():
+    versions = TaskVersions()
+    versions.update([{"id": "a", "progress": 0}, {"id": "b", "progress": 0}])
+    assert versions.version == 1
+
+    versions.update([{"id": "a", "progress": 0}, {"id": "b", "progress": 0}])
+    assert versions.version == 1
+
+    versions.update([{"id": "a", "progress": 10}])
+    assert versions.version == 2
+    assert versions.changes_since(1) == {
+        "version": 2,
+        "full": False,
+        "upsert": [{"id": "a", "progress": 10}],
+        "remove": ["b"],
+    }
+    assert versions.changes_since(2)["upsert"] == []
+
+    # 未知的版本（例如服务重启前的版本）返回完整列表
+    assert versions.changes_since(99)["full"] is True
+
+
+def test_task_versions_forgets_old_removals():
+    versions = TaskVersions()
+    versions.MAX_REMOVED = 2
+    for i in range(4):
+        versions.update([{"id": str(i)}])
+    assert versions.changes_since(1)["full"] is True
+    assert versions.changes_since(3)["full"] is False
+
+
+@pytest.fixture
+def manager():
+    settings = MagicMock()
+    settings.model_dir = "/test/models"
+    with patch.object(DownloadManager, "_process_queue"):
+        manager = DownloadManager(api_client=MagicMock(), settings=settings)
+    manager.queue.append({"id": "a", "status": "queued", "progress": 0, "created_at": 1})
+    return manager
+
+
+@pytest.fixture
+def client(manager):
+    hub = DownloadEventHub(manager.snapshot_downloads, interval=0.01)
+    app.dependency_overrides[get_download_manager] = lambda: manager
+    app.dependency_overrides[get_event_hub] = lambda: hub
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_downloads_etag_and_since(client, manager):
+    response = client.get("/api/downloads")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert [t["id"] for t in response.json()] == ["a"]
+
+    response = client.get("/api/downloads", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    manager.queue[0]["progress"] = 40
+    response = client.get("/api/downloads?since=1")
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    data = response.json()
+    assert data["version"] == 2
+    assert data["upsert"] == [
+        {"id": "a", "status": "queued", "progress": 40, "created_at": 1}
+    ]
+
+
+def test_downloads_long_poll(client, manager):
+    version = client.get("/api/downloads?since=0").json()["version"]
+
+    # 没有变化时等到超时
+    started = time.monotonic()
+    data = client.get(f"/api/downloads?since={version}&wait=0.2").json()
+    assert time.monotonic() - started >= 0.2
+    assert data["upsert"] == [] and data["version"] == version
+
+    # 有变化时立即返回
+    def change():
+        time.sleep(0.1)
+        with manager._tasks_lock:
+            manager.queue[0]["progress"] = 75
+
+    threading.Thread(target=change).start()
+    started = time.monotonic()
+    data = client.get(f"/api/downloads?since={version}&wait=5").json()
+    assert time.monotonic() - started < 2
+    assert data["upsert"][0]["progress"] == 75
@@ -1,12 +1,14 @@
 import json
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 import os
 
 from app.main import app
-from app.core.settings import Settings
+from app.core.settings import Settings, get_settings_service
 from app.core.civitai_api import CivitaiAPI
+from app.core.async_civitai_api import AsyncCivitaiAPI
 from app.core.download_manager import DownloadManager
 from app.api.endpoints import get_settings, get_api_client, get_download_manager
 
@@ -56,7 +58,7 @@ def mock_settings():
 def mock_api_client(mock_settings):
     """Mock API client for testing"""
     with patch("app.api.endpoints.get_api_client") as mock_get_client:
-        api_client = CivitaiAPI(settings=mock_settings)
+        api_client = AsyncCivitaiAPI(settings=mock_settings)
         mock_get_client.return_value = api_client
         yield api_client
 
@@ -65,27 +67,20 @@ def mock_api_client(mock_settings):
 def mock_download_manager(mock_api_client):
     """Mock download manager for testing"""
     with patch("app.api.endpoints.get_download_manager") as mock_get_manager:
-        with patch("app.core.download_manager.Settings") as mock_settings_class:
-            # Create a mock settings instance for DownloadManager
-            settings_instance = MagicMock()
-            settings_instance.model_dir = "/test/models"
-            settings_instance.ensure_model_dirs = MagicMock()
-            mock_settings_class.return_value = settings_instance
+        # Create a mock settings instance for DownloadManager
+        settings_instance = MagicMock()
+        settings_instance.model_dir = "/test/models"
+        settings_instance.ensure_model_dirs = MagicMock()
 
-            # Create the download manager with our mocked dependencies
-            download_manager = DownloadManager(api_client=mock_api_client)
+        # Create the download manager with our mocked dependencies
+        download_manager = DownloadManager(
+            api_client=mock_api_client, settings=settings_instance
+        )
 
-            # Set up the mock for the get_download_manager dependency
-            mock_get_manager.return_value = download_manager
+        # Set up the mock for the get_download_manager dependency
+        mock_get_manager.return_value = download_manager
 
-            yield download_manager
-
-
-# Reset the global settings instance before each test
-@pytest.fixture(autouse=True)
-def clear_settings_instance():
-    with patch("app.api.endpoints._settings_instance", None):
-        yield
+        yield download_manager
 
 
 def test_read_settings(client, mock_settings):
@@ -217,7 +212,7 @@ def test_search_models(client, mock_api_client, mock_settings):
     }
 
     # Set up mocks
-    mock_api_client.search_models = MagicMock(return_value=mock_search_result)
+    mock_api_client.search_models = AsyncMock(return_value=mock_search_result)
 
     # Override dependencies
     client.app.dependency_overrides[get_api_client] = lambda: mock_api_client
@@ -270,7 +265,7 @@ def test_search_models(client, mock_api_client, mock_settings):
     )
 
     # Test with failed search
-    mock_api_client.search_models = MagicMock(return_value=None)
+    mock_api_client.search_models = AsyncMock(return_value=None)
     response = client.get("/api/models/search")
     assert response.status_code == 200
     data = response.json()
@@ -283,6 +278,24 @@ def test_search_models(client, mock_api_client, mock_settings):
     client.app.dependency_overrides = {}
 
 
+def test_search_does_not_modify_cached_result(client, mock_api_client, mock_settings):
+    """Test that filling in pagination fields leaves the (cached) search result alone"""
+    cached = {"items": [], "metadata": {"nextPage": "https://civitai.com/api/v1/models?cursor=2"}}
+    mock_api_client.search_models = AsyncMock(return_value=cached)
+    mock_api_client.next_search_kwargs = MagicMock(return_value=None)
+    client.app.dependency_overrides[get_api_client] = lambda: mock_api_client
+    client.app.dependency_overrides[get_settings] = lambda: mock_settings
+
+    response = client.get("/api/models/search?query=test")
+
+    assert response.json()["metadata"]["totalPages"] == 2
+    assert cached == {
+        "items": [],
+        "metadata": {"nextPage": "https://civitai.com/api/v1/models?cursor=2"},
+    }
+    client.app.dependency_overrides = {}
+
+
 def test_get_model(client, mock_api_client):
     """Test GET /api/models/{model_id} endpoint"""
     mock_model = {
@@ -312,7 +325,7 @@ def test_get_model(client, mock_api_client):
     }
 
     # Set up mock
-    mock_api_client.get_model = MagicMock(return_value=mock_model)
+    mock_api_client.get_model = AsyncMock(return_value=mock_model)
 
     # Override dependency
     client.app.dependency_overrides[get_api_client] = lambda: mock_api_client
@@ -325,7 +338,7 @@ def test_get_model(client, mock_api_client):
     assert data["name"] == "Test Model"
 
     # Test with model not found
-    mock_api_client.get_model = MagicMock(return_value=None)
+    mock_api_client.get_model = AsyncMock(return_value=None)
     response = client.get("/api/models/999")
     assert response.status_code == 404
 
@@ -333,6 +346,24 @@ def test_get_model(client, mock_api_client):
     client.app.dependency_overrides = {}
 
 
+def test_get_models_bulk(client, mock_api_client):
+    """Test POST /api/models/bulk endpoint"""
+    mock_api_client.get_models_bulk = AsyncMock(
+        return_value={1: {"id": 1, "name": "Model 1"}}
+    )
+    client.app.dependency_overrides[get_api_client] = lambda: mock_api_client
+
+    response = client.post("/api/models/bulk", json={"ids": [1, 2, 2]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["models"]["1"]["name"] == "Model 1"
+    assert data["missing"] == [2]
+    mock_api_client.get_models_bulk.assert_awaited_once_with([1, 2, 2])
+
+    # Clean up
+    client.app.dependency_overrides = {}
+
+
 def test_get_model_versions(client, mock_api_client):
     """Test GET /api/models/{model_id}/versions endpoint"""
     mock_versions = [
@@ -356,7 +387,7 @@ def test_get_model_versions(client, mock_api_client):
     ]
 
     # Set up mock
-    mock_api_client.get_model_versions = MagicMock(return_value=mock_versions)
+    mock_api_client.get_model_versions = AsyncMock(return_value=mock_versions)
 
     # Override dependency
     client.app.dependency_overrides[get_api_client] = lambda: mock_api_client
@@ -370,7 +401,7 @@ def test_get_model_versions(client, mock_api_client):
     assert data[0]["name"] == "v1.0"
 
     # Test with versions not found
-    mock_api_client.get_model_versions = MagicMock(return_value=None)
+    mock_api_client.get_model_versions = AsyncMock(return_value=None)
     response = client.get("/api/models/999/versions")
     assert response.status_code == 404
 
@@ -450,6 +481,36 @@ def test_list_downloads(client, mock_download_manager):
     client.app.dependency_overrides = {}
 
 
+def test_list_downloads_reads_off_the_event_loop(client, mock_download_manager, mock_settings):
+    """Test that the task list and the disk fallback are read in a worker thread"""
+    threads = []
+
+    def on_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    def active_downloads():
+        threads.append(on_loop())
+        return []
+
+    def fallback(settings):
+        threads.append(on_loop())
+        return []
+
+    mock_download_manager.get_active_and_recent_downloads = MagicMock(side_effect=active_downloads)
+    client.app.dependency_overrides[get_download_manager] = lambda: mock_download_manager
+    client.app.dependency_overrides[get_settings] = lambda: mock_settings
+
+    with patch("app.api.endpoints._recent_files_fallback", side_effect=fallback):
+        assert client.get("/api/downloads").status_code == 200
+
+    assert threads == [False, False]
+    client.app.dependency_overrides = {}
+
+
 def test_get_download_status(client, mock_download_manager):
     """Test GET /api/downloads/{task_id} endpoint"""
     mock_status = {
@@ -558,8 +619,8 @@ def test_create_download_for_model_128713(
     }
 
     # Set up mock methods
-    mock_api_client.get_model = MagicMock(return_value=mock_model)
-    mock_api_client.get_download_url = MagicMock(
+    mock_api_client.get_model = AsyncMock(return_value=mock_model)
+    mock_api_client.get_download_url = AsyncMock(
         return_value="https://example.com/download"
     )
     mock_download_manager.create_download_task = MagicMock(return_value=mock_task)
@@ -671,3 +732,30 @@ def test_create_download_for_model_128713(
 
     # Clean up
     client.app.dependency_overrides = {}
+
+
+def test_shared_instances_survive_settings_reload(isolated_config_dir):
+    """Test that reloading settings.json reconfigures the shared client and manager in place"""
+    service = get_settings_service()
+    settings = service.get()
+    service.save(settings)
+    api_client = get_api_client(get_settings())
+    download_manager = get_download_manager(get_settings())
+
+    # 文件被touch，内容没有变化
+    os.utime(settings.config_path, ns=(0, 1))
+    assert get_api_client(get_settings()) is api_client
+    assert get_download_manager(get_settings()) is download_manager
+
+    # 外部修改了设置
+    with open(settings.config_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["api_key"] = "edited_key"
+    with open(settings.config_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.utime(settings.config_path, ns=(0, 2))
+
+    assert get_api_client(get_settings()) is api_client
+    assert get_download_manager(get_settings()) is download_manager
+    assert api_client.api_key == "edited_key"
+    assert download_manager.settings is service.current
@@ -0,0 +1,62 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.api.endpoints import get_api_client
+from app.core import fast_json
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.benchmarks.json_bench import run, synthetic_search_page
+
+
+def test_round_trip():
+    """Test encoding and decoding, including non-string keys"""
+    data = {"items": [{"id": 1, "name": "模型"}], 2: None}
+    encoded = fast_json.dumps(data)
+    assert isinstance(encoded, bytes)
+    assert fast_json.loads(encoded) == {"items": [{"id": 1, "name": "模型"}], "2": None}
+
+    with pytest.raises(ValueError):
+        fast_json.loads(b"{not json")
+
+
+def test_decode_response_prefers_raw_body():
+    """Test decoding from response.content, with response.json() as fallback"""
+    response = MagicMock()
+    response.content = b'{"id": 1}'
+    assert fast_json.decode_response(response) == {"id": 1}
+    response.json.assert_not_called()
+
+    response = MagicMock()
+    response.json.return_value = {"id": 2}
+    assert fast_json.decode_response(response) == {"id": 2}
+
+
+def test_stdlib_fallback(monkeypatch):
+    """Test the backend without orjson installed"""
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.dumps({1: "é"}) == '{"1":"é"}'.encode("utf-8")
+    assert fast_json.loads(b'{"a": 1}') == {"a": 1}
+
+
+def test_default_response_class(client, monkeypatch):
+    """Test that API responses are rendered by the fast JSON backend"""
+    rendered = []
+    dumps = fast_json.dumps
+    monkeypatch.setattr(fast_json, "dumps", lambda obj: rendered.append(obj) or dumps(obj))
+
+    api_client = AsyncCivitaiAPI(settings=MagicMock())
+    api_client.get_models_bulk = AsyncMock(return_value={1: {"id": 1}})
+    client.app.dependency_overrides[get_api_client] = lambda: api_client
+
+    response = client.post("/api/models/bulk", json={"ids": [1]})
+    assert response.status_code == 200
+    assert response.json()["models"] == {"1": {"id": 1}}
+    assert rendered
+
+    client.app.dependency_overrides = {}
+
+
+def test_benchmark_runs():
+    """Smoke test for the JSON benchmark"""
+    body = fast_json.dumps(synthetic_search_page(items=5))
+    results = run(body, rounds=1)
+    assert "stdlib decode" in results
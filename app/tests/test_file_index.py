@@ -0,0 +1,136 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.civitai_api import CivitaiAPI
+from app.core.file_index import FileIndex
+from app.core.single_flight import SingleFlight
+
+
+MODEL = {
+    "id": 1,
+    "name": "Test Model",
+    "modelVersions": [
+        {
+            "id": 11,
+            "files": [
+                {"id": 111, "primary": False, "sizeKB": 2, "downloadUrl": "https://x/111"},
+                {"id": 112, "primary": True, "hashes": {"SHA256": "AB"}, "downloadUrl": "https://x/112"},
+            ],
+        },
+        {"id": 10, "files": [{"id": 101, "downloadUrl": "https://x/101"}]},
+    ],
+}
+
+# 搜索结果（primaryFileOnly）中的同一模型，只列出主文件
+SEARCH_ITEM = {
+    "id": 1,
+    "modelVersions": [{"id": 11, "files": [MODEL["modelVersions"][0]["files"][1]]}],
+}
+
+VERSION = {
+    "id": 20,
+    "modelId": 2,
+    "files": [{"id": 201, "primary": True, "downloadUrl": "https://x/201"}],
+}
+
+
+@pytest.fixture
+def mock_settings():
+    settings = MagicMock()
+    settings.api_key = "test_api_key"
+    settings.model_dir = "/test/models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_flight(monkeypatch):
+    monkeypatch.setattr(CivitaiAPI, "flight", SingleFlight())
+
+
+def make_response(data):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = data
+    response.headers = {}
+    return response
+
+
+def test_lookup_matches_download_url_rules():
+    """Test version/file selection from the index"""
+    index = FileIndex()
+    index.add_response(MODEL)
+
+    assert index.lookup(1)["id"] == 112
+    assert index.lookup(1, 11, 111)["size"] == 2048
+    assert index.lookup(1, 11, 999)["id"] == 112
+    assert index.lookup(1, 10)["id"] == 101
+    assert index.lookup(1, 12) is None
+    assert index.lookup(3, 11) is None
+
+    index.add_response({"items": [{"id": 2, "modelVersions": [VERSION]}]})
+    assert index.lookup(2)["hashes"] == {}
+    assert index.stats() == {"models": 2, "versions": 3, "files": 4}
+
+
+def test_eviction():
+    """Test that the index stays bounded"""
+    index = FileIndex(max_versions=1)
+    index.add_version(VERSION)
+    index.add_response(MODEL)
+    assert index.lookup(2, 20) is None
+    assert index.stats()["versions"] == 1
+
+
+@patch("requests.request")
+def test_download_url_uses_index(mock_request, mock_settings):
+    """Test that a model response already seen answers URL lookups"""
+    mock_request.return_value = make_response(MODEL)
+    api = CivitaiAPI(settings=mock_settings)
+
+    api.get_model(1)
+    assert api.get_download_url(1) == "https://x/112"
+    assert api.get_download_url(1, 10) == "https://x/101"
+    assert mock_request.call_count == 1
+
+
+@patch("requests.request")
+def test_download_url_fetches_single_version_on_miss(mock_request, mock_settings):
+    """Test that a miss fetches model-versions/{id} instead of the whole model"""
+    mock_request.return_value = make_response(VERSION)
+    api = CivitaiAPI(settings=mock_settings)
+
+    assert api.get_download_url(2, 20) == "https://x/201"
+    assert api.get_file_record(2, 20)["primary"] is True
+    assert mock_request.call_count == 1
+    assert mock_request.call_args.kwargs["url"].endswith("/model-versions/20")
+
+
+def test_search_pages_only_answer_primary_files():
+    """Test that versions from primaryFileOnly pages do not guess other files"""
+    index = FileIndex()
+    index.add_response({"items": [SEARCH_ITEM]}, partial=True)
+
+    assert index.lookup(1, 11)["id"] == 112
+    assert index.lookup(1, 11, 111) is None
+
+    # 完整的版本数据不会被之后的搜索结果覆盖
+    index.add_response(MODEL)
+    index.add_response({"items": [SEARCH_ITEM]}, partial=True)
+    assert index.lookup(1, 11, 111)["id"] == 111
+    assert index.lookup(1, 11, 999)["id"] == 112
+
+
+@patch("requests.request")
+def test_download_url_after_search_fetches_other_files(mock_request, mock_settings):
+    """Test that a non-primary file of a searched version is fetched, not guessed"""
+    api = CivitaiAPI(settings=mock_settings)
+    search = make_response({"items": [SEARCH_ITEM]})
+    search.url = "https://civitai.com/api/v1/models?limit=20&primaryFileOnly=true"
+    mock_request.side_effect = [search, make_response(MODEL["modelVersions"][0])]
+
+    api.search_models(query="test")
+    assert api.get_download_url(1, 11, 111) == "https://x/111"
+    assert mock_request.call_args.kwargs["url"].endswith("/model-versions/11")
@@ -0,0 +1,121 @@
+import os
+import hashlib
+import threading
+import pytest
+from unittest.mock import patch
+
+from app.core import hashing
+from app.core.hashing import HashingEngine, HashingCancelled, quick_fingerprint, sha256_file
+from app.core.library_index import LibraryIndex
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest().upper()
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Model files of different sizes"""
+    paths = {}
+    for name, size in (("small.pt", 10), ("large.safetensors", 300_000), ("mid.ckpt", 5000)):
+        path = tmp_path / name
+        data = os.urandom(size)
+        path.write_bytes(data)
+        paths[str(path)] = digest(data)
+    return paths
+
+
+def test_sha256_file_matches_hashlib(tmp_path):
+    """Test hashing across several blocks, including a partial last block"""
+    data = os.urandom(10_000)
+    path = tmp_path / "model.bin"
+    path.write_bytes(data)
+    reads = []
+
+    assert sha256_file(str(path), block_size=4096, on_read=reads.append) == digest(data)
+    assert reads == [4096, 4096, 1808]
+
+
+def test_sha256_file_can_be_cancelled(tmp_path):
+    """Test that a set cancel event stops hashing"""
+    path = tmp_path / "model.bin"
+    path.write_bytes(b"x" * 100)
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(HashingCancelled):
+        sha256_file(str(path), cancel=cancel)
+
+
+def test_quick_fingerprint_samples_start_middle_and_end(tmp_path):
+    """Test that only changes inside the sampled ranges alter the fingerprint"""
+    data = bytearray(os.urandom(100))
+    path = tmp_path / "model.bin"
+    path.write_bytes(data)
+    fingerprint = quick_fingerprint(str(path), sample_size=10)
+
+    data[30] ^= 0xFF  # 不在采样范围内
+    path.write_bytes(data)
+    assert quick_fingerprint(str(path), sample_size=10) == fingerprint
+
+    for offset in (0, 45, 99):
+        changed = bytearray(data)
+        changed[offset] ^= 0xFF
+        path.write_bytes(changed)
+        assert quick_fingerprint(str(path), sample_size=10) != fingerprint
+
+    path.write_bytes(bytes(data) + b"x")
+    assert quick_fingerprint(str(path), sample_size=10) != fingerprint
+
+
+def test_engine_hashes_largest_files_first(files):
+    """Test parallel hashing results and size ordering"""
+    started = []
+    original = hashing.sha256_file
+
+    def record(path, *args):
+        started.append(os.path.basename(path))
+        return original(path, *args)
+
+    engine = HashingEngine(workers=1, block_size=4096)
+    snapshots = []
+    with patch.object(hashing, "sha256_file", side_effect=record):
+        results = engine.hash_files(list(files), progress=snapshots.append)
+
+    assert results == files
+    assert started == ["large.safetensors", "mid.ckpt", "small.pt"]
+    final = snapshots[-1]
+    assert final["files_done"] == final["files_total"] == 3
+    assert final["bytes_done"] == final["bytes_total"] == 305_010
+    assert final["eta"] == 0
+
+
+def test_engine_uses_and_fills_hash_cache(files, tmp_path):
+    """Test that a second run reads nothing and reports missing files"""
+    index = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    engine = HashingEngine(workers=4, index=index)
+    assert engine.hash_files(list(files)) == files
+
+    missing = str(tmp_path / "missing.pt")
+    snapshots = []
+    results = engine.hash_files(list(files) + [missing], progress=snapshots.append)
+
+    assert results == {**files, missing: None}
+    assert snapshots[-1]["failed"] == 1
+    assert snapshots[-1]["rate"] == 0
+    index.close()
+
+
+def test_cached_files_honour_cancel(files, tmp_path):
+    """Test that a cancelled run stops even if every hash is cached"""
+    index = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    engine = HashingEngine(workers=1, index=index)
+    engine.hash_files(list(files))
+    cancel = threading.Event()
+    cancel.set()
+
+    with patch.object(index, "file_sha256", wraps=index.file_sha256) as cached:
+        with pytest.raises(HashingCancelled):
+            engine.hash_files(list(files), cancel=cancel)
+    cached.assert_not_called()
+    index.close()
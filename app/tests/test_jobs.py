@@ -0,0 +1,97 @@
+import time
+import threading
+import pytest
+
+from app.core.jobs import Job, JobManager, get_job_manager
+from app.core.settings import get_settings_service
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def wait_for(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.status in Job.ACTIVE_STATUSES and time.time() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def test_job_result_and_progress(manager):
+    """Test that a job's progress and return value are recorded"""
+
+    def work(job, n):
+        job.update(done=n)
+        return n * 2
+
+    job = manager.submit("double", work, 21)
+
+    assert wait_for(job) == "completed"
+    state = job.to_dict()
+    assert state["result"] == 42
+    assert state["progress"] == {"done": 21}
+    assert state["started_at"] <= state["finished_at"]
+    assert manager.list() == [job]
+
+
+def test_failed_job_records_error(manager):
+    """Test that exceptions mark the job failed"""
+
+    def work(job):
+        raise ValueError("boom")
+
+    job = manager.submit("broken", work)
+
+    assert wait_for(job) == "failed"
+    assert job.error == "boom"
+
+
+def test_cancel_running_and_queued_jobs(manager):
+    """Test cooperative cancellation and cancelling a job that never started"""
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.check_cancelled()
+            time.sleep(0.01)
+
+    running = manager.submit("loop", work)
+    queued = manager.submit("loop", work)
+    assert started.wait(5)
+    assert manager.find_active("loop") is queued
+
+    assert manager.cancel(queued.id)
+    assert queued.status == "cancelled"
+    assert manager.cancel(running.id)
+    assert wait_for(running) == "cancelled"
+    assert not manager.cancel(running.id)
+
+
+def test_hash_job_api(client, tmp_path):
+    """Test starting a library hash job and following it under /api/jobs"""
+    settings = get_settings_service().get()
+    settings.model_dir = str(tmp_path / "models")
+    lora = tmp_path / "models" / "Lora"
+    lora.mkdir(parents=True)
+    (lora / "a.safetensors").write_bytes(b"a" * 1000)
+    (lora / "b.pt").write_bytes(b"b" * 10)
+
+    response = client.post("/api/library/hash", params={"workers": 2})
+    assert response.status_code == 200
+    job_id = response.json()["id"]
+
+    job = get_job_manager().get(job_id)
+    assert wait_for(job) == "completed"
+
+    state = client.get(f"/api/jobs/{job_id}").json()
+    assert state["kind"] == "hash"
+    assert state["result"] == {"files": 2, "failed": []}
+    assert state["progress"]["files_done"] == 2
+    assert client.get("/api/jobs", params={"kind": "hash"}).json()["jobs"][0]["id"] == job_id
+    assert client.delete(f"/api/jobs/{job_id}").status_code == 409
+    assert client.get("/api/jobs/unknown").status_code == 404
+    assert client.get("/api/library", params={"filename": "b.pt"}).json()["files"][0]["sha256"]
@@ -0,0 +1,134 @@
+import os
+import threading
+import pytest
+from unittest.mock import patch
+
+from app.core import library_dedup
+from app.core.jobs import get_job_manager
+from app.core.library_dedup import DedupCancelled, LibraryDeduplicator
+from app.core.library_index import LibraryIndex
+from app.core.settings import get_settings_service
+from app.tests.test_jobs import wait_for
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a library index in a temporary directory"""
+    library = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    yield library
+    library.close()
+
+
+@pytest.fixture
+def models(tmp_path):
+    """A folder with two copies of one model, a look-alike and a unique model"""
+    folder = tmp_path / "models"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "a.safetensors").write_bytes(b"same" * 100)
+    (folder / "sub" / "b.safetensors").write_bytes(b"same" * 100)
+    # 大小相同但内容不同
+    (folder / "c.safetensors").write_bytes(b"diff" * 100)
+    (folder / "d.safetensors").write_bytes(b"unique")
+    return folder
+
+
+def paths(folder):
+    return [os.path.join(root, name) for root, _, names in os.walk(folder) for name in names]
+
+
+def test_finds_duplicates_by_size_fingerprint_and_hash(library, models):
+    """Test that only identical files are grouped and unique sizes are never read"""
+    dedup = LibraryDeduplicator(library)
+    stages = set()
+
+    with patch.object(library, "file_fingerprint", wraps=library.file_fingerprint) as fingerprint:
+        result = dedup.run(paths(models), progress=lambda state: stages.add(state["stage"]))
+
+    assert str(models / "d.safetensors") not in [c.args[0] for c in fingerprint.call_args_list]
+    assert stages == {"size", "fingerprint", "hash"}
+    assert result["duplicates"] == 1
+    assert result["wasted"] == result["reclaimable"] == 400
+    [group] = result["groups"]
+    assert group["keep"] == str(models / "a.safetensors")
+    assert group["duplicates"] == [str(models / "sub" / "b.safetensors")]
+    assert "linked" not in result
+
+
+def test_dry_run_changes_nothing(library, models):
+    """Test that a dry run reports the links without touching the files"""
+    before = os.stat(models / "sub" / "b.safetensors").st_ino
+
+    result = LibraryDeduplicator(library).run(paths(models), mode="hardlink")
+
+    assert result["linked"] == [str(models / "sub" / "b.safetensors")]
+    assert os.stat(models / "sub" / "b.safetensors").st_ino == before
+
+
+def test_hardlinks_replace_duplicates(library, models):
+    """Test that duplicates become hardlinks and are not reported again"""
+    dedup = LibraryDeduplicator(library)
+
+    result = dedup.run(paths(models), mode="hardlink", dry_run=False)
+
+    assert result["freed"] == 400
+    assert result["failed"] == {}
+    assert os.path.samefile(models / "a.safetensors", models / "sub" / "b.safetensors")
+    assert (models / "sub" / "b.safetensors").read_bytes() == b"same" * 100
+    assert sorted(os.listdir(models / "sub")) == ["b.safetensors"]
+    assert dedup.run(paths(models))["groups"] == []
+
+
+def test_changed_files_are_not_replaced(library, models):
+    """Test that a duplicate modified after the search is left alone"""
+    dedup = LibraryDeduplicator(library)
+    groups = dedup.find(paths(models))
+    (models / "sub" / "b.safetensors").write_bytes(b"edit" * 100)
+
+    result = dedup.link(groups, "hardlink")
+
+    assert list(result["failed"]) == [str(models / "sub" / "b.safetensors")]
+    assert (models / "sub" / "b.safetensors").read_bytes() == b"edit" * 100
+    assert sorted(os.listdir(models / "sub")) == ["b.safetensors"]
+
+
+def test_failed_link_keeps_duplicate(library, models):
+    """Test that an unsupported reflink leaves the duplicate and no temporary file"""
+    with patch.object(library_dedup, "fcntl", None):
+        result = LibraryDeduplicator(library).run(paths(models), mode="reflink", dry_run=False)
+
+    assert list(result["failed"]) == [str(models / "sub" / "b.safetensors")]
+    assert result["freed"] == 0
+    assert sorted(os.listdir(models / "sub")) == ["b.safetensors"]
+
+
+def test_cancel_stops_dedup(library, models):
+    """Test that a set cancel event stops the search"""
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(DedupCancelled):
+        LibraryDeduplicator(library).run(paths(models), cancel=cancel)
+
+    with pytest.raises(ValueError):
+        LibraryDeduplicator(library).run(paths(models), mode="copy")
+
+
+def test_dedup_job_api(client, tmp_path):
+    """Test reporting duplicates in a background job"""
+    settings = get_settings_service().get()
+    settings.model_dir = str(tmp_path / "models")
+    lora = tmp_path / "models" / "Lora"
+    lora.mkdir(parents=True)
+    (lora / "a.safetensors").write_bytes(b"x" * 100)
+    (lora / "b.safetensors").write_bytes(b"x" * 100)
+
+    assert client.post("/api/library/dedup", params={"mode": "copy"}).status_code == 422
+    response = client.post("/api/library/dedup", params={"mode": "hardlink"})
+    assert response.status_code == 200
+    job = get_job_manager().get(response.json()["id"])
+    assert wait_for(job) == "completed"
+
+    assert job.result["dry_run"] is True
+    assert job.result["reclaimable"] == 100
+    assert job.result["linked"] == [str(lora / "b.safetensors")]
+    assert not os.path.samefile(lora / "a.safetensors", lora / "b.safetensors")
@@ -0,0 +1,250 @@
+import os
+import json
+import hashlib
+import pytest
+from unittest.mock import patch
+
+from app.core import library_index as library_module
+from app.core.library_index import LibraryIndex, get_library_index
+from app.core.settings import Settings, get_settings_service
+
+SHA = "ab" * 32
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a library index in a temporary directory"""
+    library = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    yield library
+    library.close()
+
+
+@pytest.fixture
+def models(tmp_path):
+    """A model folder with one model, its sidecar and a preview"""
+    folder = tmp_path / "models" / "Lora"
+    (folder / "styles").mkdir(parents=True)
+    (folder / "styles" / "ink_12.safetensors").write_bytes(b"x" * 16)
+    (folder / "styles" / "ink_12.json").write_text(
+        json.dumps({"sha256": SHA.lower(), "modelId": 7})
+    )
+    (folder / "styles" / "ink_12.preview.png").write_bytes(b"png")
+    return folder
+
+
+def test_scan_indexes_files_and_sidecars(library, models):
+    """Test that sidecar hashes and model IDs are attached to the model file"""
+    result = library.scan(str(models), "LORA")
+
+    assert result == {"files": 3, "updated": 3, "removed": 0, "moved": 0}
+    [model] = library.by_model_id(7)
+    assert model["name"] == "ink_12.safetensors"
+    assert model["sha256"] == SHA.upper()
+    assert model["model_type"] == "LORA"
+    assert model["size"] == 16
+    assert model["folder"] == str(models / "styles")
+    assert {f["name"] for f in library.by_sha256(SHA)} == {
+        "ink_12.safetensors",
+        "ink_12.json",
+    }
+    assert library.by_filename("INK_12.SAFETENSORS")[0]["is_model"]
+    assert library.sha256_set(str(models)) == {SHA.upper()}
+    assert "ink_12.preview.png" in library.filenames(str(models))
+
+
+def test_rescan_reads_only_changed_sidecars(library, models):
+    """Test that unchanged files are skipped and removed files dropped"""
+    library.scan(str(models))
+
+    with patch.object(
+        library_module, "_read_sidecar", wraps=library_module._read_sidecar
+    ) as read:
+        assert library.scan(str(models)) == {"files": 3, "updated": 0, "removed": 0, "moved": 0}
+        read.assert_not_called()
+
+        (models / "styles" / "ink_12.json").unlink()
+        result = library.scan(str(models))
+
+    assert result == {"files": 2, "updated": 0, "removed": 1, "moved": 0}
+    [model] = library.by_filename("ink_12.safetensors")
+    assert model["sha256"] is None
+    assert library.by_sha256(SHA) == []
+
+
+def test_rescan_keeps_looked_up_ids(library, tmp_path):
+    """Test that a new file in a folder does not clear the IDs found by hash"""
+    folder = tmp_path / "Lora"
+    folder.mkdir()
+    (folder / "plain.safetensors").write_bytes(b"plain")
+    library.scan(str(folder))
+    library.remember_sha256(str(folder / "plain.safetensors"), SHA)
+    library.remember_lookup(SHA, 8, 80)
+
+    (folder / "plain.preview.png").write_bytes(b"png")
+    assert library.scan(str(folder))["updated"] == 1
+
+    [model] = library.by_model_id(8)
+    assert model["name"] == "plain.safetensors"
+    assert model["version_id"] == 80
+
+
+def test_lookups_are_scoped_to_folder(library, models, tmp_path):
+    """Test that a folder filter does not match sibling folders with the same prefix"""
+    other = tmp_path / "models" / "Lora2"
+    other.mkdir()
+    (other / "ink_12.safetensors").write_bytes(b"y")
+    library.scan(str(models))
+    library.scan(str(other))
+
+    assert len(library.by_filename("ink_12.safetensors")) == 2
+    [entry] = library.by_filename("ink_12.safetensors", str(other))
+    assert entry["folder"] == str(other)
+    assert library.find(stem="ink_12", folder=str(other)) == [entry]
+
+
+def test_ensure_skips_recent_scans(library, models):
+    """Test that ensure() only rescans once the previous scan is too old"""
+    assert library.ensure(str(models))
+    assert not library.ensure(str(models))
+    assert library.ensure(str(models), max_age=0)
+    assert library.stats()["roots"][0]["path"] == str(models)
+
+
+def test_non_recursive_scan_updates_one_folder(library, models):
+    """Test refreshing a single folder after a download or delete"""
+    library.scan(str(models))
+    (models / "styles" / "new.ckpt").write_bytes(b"z")
+    (models / "top.pt").write_bytes(b"z")
+
+    result = library.scan(str(models / "styles"), recursive=False)
+
+    assert result == {"files": 4, "updated": 1, "removed": 0, "moved": 0}
+    assert library.by_filename("new.ckpt")
+    assert not library.by_filename("top.pt")
+
+
+def test_scan_survives_symlink_loops(library, models):
+    """Test that following symlinks does not loop forever"""
+    os.symlink(str(models), str(models / "styles" / "loop"))
+
+    assert library.scan(str(models))["files"] == 3
+
+
+def test_library_endpoints(client, tmp_path, models):
+    """Test scanning and searching through the API"""
+    settings = get_settings_service().get()
+    settings.model_dir = str(tmp_path / "models")
+
+    response = client.post("/api/library/scan")
+    assert response.status_code == 200
+    assert response.json()["folders"]["LORA"]["files"] == 3
+
+    response = client.get("/api/library", params={"sha256": SHA.lower()})
+    assert response.status_code == 200
+    [entry] = response.json()["files"]
+    assert entry["model_id"] == 7
+
+    stats = client.get("/api/library/stats").json()
+    assert stats["models"] == 1
+    assert stats["hashed"] == 1
+
+
+def test_get_library_index_is_shared(tmp_path):
+    """Test that the same config directory gets the same index"""
+    settings = Settings(str(tmp_path / "settings.json"), check_permissions=False)
+    assert get_library_index(settings) is get_library_index(settings)
+    assert get_library_index(object()) is None
+
+
+def test_file_sha256_is_cached_until_the_file_changes(library, tmp_path):
+    """Test that unchanged files are never rehashed and changed files always are"""
+    path = tmp_path / "model.safetensors"
+    path.write_bytes(b"first")
+    expected = hashlib.sha256(b"first").hexdigest().upper()
+
+    with patch.object(
+        library_module, "sha256_file", wraps=library_module.sha256_file
+    ) as hasher:
+        assert library.file_sha256(str(path)) == expected
+        assert library.file_sha256(str(path)) == expected
+        assert hasher.call_count == 1
+
+        path.write_bytes(b"second")
+        os.utime(path, ns=(1, 1))
+        assert library.file_sha256(str(path)) == hashlib.sha256(b"second").hexdigest().upper()
+        assert hasher.call_count == 2
+
+
+def test_file_sha256_trusts_only_fresh_sidecars(library, tmp_path):
+    """Test that a sidecar older than the model file is ignored"""
+    path = tmp_path / "model.safetensors"
+    path.write_bytes(b"weights")
+    sidecar = tmp_path / "model.json"
+    sidecar.write_text(json.dumps({"sha256": SHA}))
+
+    os.utime(sidecar, ns=(2_000_000_000, 2_000_000_000))
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    assert library.file_sha256(str(path)) == SHA.upper()
+
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+    assert library.file_sha256(str(path)) == hashlib.sha256(b"weights").hexdigest().upper()
+
+
+def test_renamed_file_keeps_cached_hash(library, models):
+    """Test that the hash cache follows the inode, not the path"""
+    model = models / "styles" / "ink_12.safetensors"
+    library.scan(str(models))
+    sha256 = library.file_sha256(str(model), trust_sidecar=False)
+    assert library.by_filename("ink_12.safetensors")[0]["sha256"] == sha256
+
+    renamed = models / "renamed.safetensors"
+    os.rename(model, renamed)
+    library.scan(str(models))
+
+    assert library.cached_sha256(str(renamed)) == sha256
+    assert library.by_sha256(sha256)[0]["name"] == "renamed.safetensors"
+
+
+def test_moved_file_keeps_hash_through_fingerprint(library, models, tmp_path):
+    """Test that a file copied elsewhere (new inode, same mtime) is recognised without rehashing"""
+    model = models / "styles" / "ink_12.safetensors"
+    library.scan(str(models))
+    sha256 = library.file_sha256(str(model), trust_sidecar=False)
+    st = os.stat(model)
+
+    moved = models / "moved.safetensors"
+    moved.write_bytes(model.read_bytes())
+    os.utime(moved, ns=(st.st_atime_ns, st.st_mtime_ns))
+    model.unlink()
+
+    with patch.object(library_module, "sha256_file") as hasher:
+        result = library.scan(str(models))
+        hasher.assert_not_called()
+
+    assert result["moved"] == 1
+    assert library.cached_sha256(str(moved)) == sha256
+    assert library.by_filename("moved.safetensors")[0]["fingerprint"]
+
+
+def test_identify_reads_whole_file_only_on_fingerprint_match(library, tmp_path):
+    """Test that new files are ruled out by fingerprint and duplicates confirmed by SHA256"""
+    original = tmp_path / "a.safetensors"
+    original.write_bytes(b"weights")
+    library.scan(str(tmp_path))
+    library.file_sha256(str(original))
+
+    other = tmp_path / "b.safetensors"
+    other.write_bytes(b"other!!")
+    copy = tmp_path / "c.safetensors"
+    copy.write_bytes(b"weights")
+    library.scan(str(tmp_path))
+
+    with patch.object(
+        library_module, "sha256_file", wraps=library_module.sha256_file
+    ) as hasher:
+        assert library.identify(str(other)) is None
+        hasher.assert_not_called()
+        assert library.identify(str(copy)) == hashlib.sha256(b"weights").hexdigest().upper()
+        assert hasher.call_count == 1
+        assert library.identify(str(other), verify=True)
+        assert hasher.call_count == 2
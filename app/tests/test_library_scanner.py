@@ -0,0 +1,153 @@
+import json
+import hashlib
+import threading
+import pytest
+
+from app.core.library_index import LibraryIndex
+from app.core.library_scanner import LibraryScanner, ScanCancelled
+
+
+def sha(data):
+    return hashlib.sha256(data).hexdigest().upper()
+
+
+class FakeAPI:
+    """Stand-in for CivitaiAPI that knows some hashes and counts requests"""
+
+    NOT_FOUND = object()
+
+    def __init__(self, versions, offline=()):
+        self.versions = versions
+        self.offline = set(offline)
+        self.lookups = []
+        self.bulk = []
+        self.refreshed = []
+        self.lock = threading.Lock()
+
+    def get_model_version_by_hash(self, hash_value, not_found=None, refresh=False):
+        with self.lock:
+            self.lookups.append(hash_value)
+            if refresh:
+                self.refreshed.append(hash_value)
+        if hash_value in self.offline:
+            return None
+        if hash_value not in self.versions:
+            return not_found
+        model_id, version_id = self.versions[hash_value]
+        return {"id": version_id, "modelId": model_id}
+
+    def get_models_bulk(self, ids, refresh=False):
+        self.bulk.append(sorted(ids))
+        return {model_id: {"id": model_id, "name": f"model {model_id}"} for model_id in ids}
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a library index in a temporary directory"""
+    library = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    yield library
+    library.close()
+
+
+@pytest.fixture
+def models(tmp_path):
+    """A folder with a known, an unknown and a duplicated model file"""
+    folder = tmp_path / "models"
+    folder.mkdir()
+    (folder / "known.safetensors").write_bytes(b"known")
+    (folder / "copy.safetensors").write_bytes(b"known")
+    (folder / "unknown.safetensors").write_bytes(b"unknown")
+    return folder
+
+
+def test_pipeline_resolves_and_fetches_models(library, models):
+    """Test that files are hashed, looked up once per hash and models fetched in bulk"""
+    library.scan(str(models))
+    api = FakeAPI({sha(b"known"): (7, 70)})
+    stages = set()
+
+    result = LibraryScanner(api, library).run(
+        [str(p) for p in models.iterdir()], progress=lambda state: stages.add(state["stage"])
+    )
+
+    files = result["files"]
+    assert files[str(models / "known.safetensors")]["status"] == "found"
+    assert files[str(models / "copy.safetensors")]["version_id"] == 70
+    assert files[str(models / "unknown.safetensors")]["status"] == "not_found"
+    assert sorted(api.lookups) == sorted([sha(b"known"), sha(b"unknown")])
+    assert api.bulk == [[7]]
+    assert result["models"][7]["name"] == "model 7"
+    assert stages == {"hash", "lookup", "models"}
+    # 查询结果写回索引，已安装标记不需要再次查询
+    assert library.get(str(models / "known.safetensors"))["model_id"] == 7
+
+
+def test_rerun_resumes_from_index(library, models):
+    """Test that remembered answers, including unknown hashes, are not asked again"""
+    library.scan(str(models))
+    paths = [str(p) for p in models.iterdir()]
+    LibraryScanner(FakeAPI({sha(b"known"): (7, 70)}), library).run(paths)
+
+    api = FakeAPI({})
+    result = LibraryScanner(api, library).run(paths)
+
+    assert api.lookups == []
+    assert result["files"][str(models / "known.safetensors")]["model_id"] == 7
+    assert result["files"][str(models / "unknown.safetensors")]["status"] == "not_found"
+
+    # 过期的未找到记录会重新查询
+    LibraryScanner(api, library, not_found_ttl=0).run(paths)
+    assert api.lookups == [sha(b"unknown")]
+
+
+def test_refresh_asks_again(library, models):
+    """Test that a refresh run bypasses the index and the client's negative cache"""
+    library.scan(str(models))
+    paths = [str(p) for p in models.iterdir()]
+    LibraryScanner(FakeAPI({}), library).run(paths)
+
+    api = FakeAPI({sha(b"unknown"): (8, 80)})
+    result = LibraryScanner(api, library).run(paths, refresh=True)
+
+    assert sorted(api.refreshed) == sorted([sha(b"known"), sha(b"unknown")])
+    assert result["files"][str(models / "unknown.safetensors")]["model_id"] == 8
+
+
+def test_failed_lookups_are_retried(library, models):
+    """Test that lookups that failed are not remembered"""
+    api = FakeAPI({sha(b"known"): (7, 70)}, offline={sha(b"known")})
+    paths = [str(models / "known.safetensors")]
+
+    result = LibraryScanner(api, library).run(paths)
+    assert result["files"][paths[0]]["status"] == "failed"
+    assert library.lookup(sha(b"known")) is None
+
+    api.offline.clear()
+    assert LibraryScanner(api, library).run(paths)["files"][paths[0]]["status"] == "found"
+
+
+def test_sidecar_ids_skip_lookup(library, models):
+    """Test that files whose sidecar names the model version are not looked up"""
+    (models / "unknown.json").write_text(
+        json.dumps({"sha256": sha(b"unknown"), "modelId": 3, "modelVersionId": 30})
+    )
+    library.scan(str(models))
+    api = FakeAPI({})
+
+    result = LibraryScanner(api, library).run(
+        [str(models / "unknown.safetensors")], hash_missing=False
+    )
+
+    assert result["files"][str(models / "unknown.safetensors")]["version_id"] == 30
+    assert api.lookups == []
+
+
+def test_cancel_stops_scan(library, models):
+    """Test that a set cancel event stops the scan"""
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(ScanCancelled):
+        LibraryScanner(FakeAPI({}), library).run(
+            [str(p) for p in models.iterdir()], cancel=cancel
+        )
@@ -0,0 +1,187 @@
+import os
+import time
+import pytest
+from unittest.mock import patch
+
+from app.core import library_watcher as watcher_module
+from app.core.library_index import LibraryIndex
+from app.core.library_watcher import (
+    LibraryWatcher,
+    get_library_watcher,
+    is_network_filesystem,
+)
+from app.core.settings import Settings
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a library index in a temporary directory"""
+    library = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    yield library
+    library.close()
+
+
+@pytest.fixture
+def models(tmp_path):
+    """A model folder with one model in a subfolder"""
+    folder = tmp_path / "models" / "Lora"
+    (folder / "styles").mkdir(parents=True)
+    (folder / "styles" / "ink.safetensors").write_bytes(b"x" * 16)
+    return folder
+
+
+def touch_dir(path):
+    """Move a directory's mtime forward, as a coarse filesystem clock would eventually"""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_first_poll_scans_and_marks_folder_watched(library, models):
+    """Test that a folder counts as watched only after its first scan"""
+    watcher = LibraryWatcher(library, mode="poll")
+    assert watcher.add(str(models), "LORA")
+    assert not watcher.add(str(models), "LORA")
+    assert not library.is_watched(str(models))
+
+    watcher.poll()
+
+    assert library.is_watched(str(models / "styles"))
+    assert library.by_filename("ink.safetensors")[0]["model_type"] == "LORA"
+    assert not library.ensure(str(models))
+
+
+def test_poll_rescans_only_changed_directories(library, models):
+    """Test that new and deleted files are picked up from directory mtimes"""
+    (models / "other").mkdir()
+    watcher = LibraryWatcher(library, mode="poll")
+    watcher.add(str(models), "LORA")
+    watcher.poll()
+
+    (models / "styles" / "new.safetensors").write_bytes(b"y" * 8)
+    touch_dir(models / "styles")
+
+    with patch.object(library, "scan", wraps=library.scan) as scan:
+        assert watcher.poll() == 1
+        assert watcher.flush() == 1
+    scan.assert_called_once_with(
+        str(models / "styles"), "LORA", recursive=False, record_root=False
+    )
+    assert library.by_filename("new.safetensors")[0]["model_type"] == "LORA"
+
+    os.remove(models / "styles" / "ink.safetensors")
+    touch_dir(models / "styles")
+    watcher.poll()
+    watcher.flush()
+    assert library.by_filename("ink.safetensors") == []
+
+
+def test_removed_directory_drops_its_files(library, models):
+    """Test that a deleted subfolder is rescanned recursively"""
+    watcher = LibraryWatcher(library, mode="poll")
+    watcher.add(str(models))
+    watcher.poll()
+
+    os.remove(models / "styles" / "ink.safetensors")
+    os.rmdir(models / "styles")
+    touch_dir(models)
+    watcher.poll()
+    watcher.flush()
+
+    assert library.find(folder=str(models), models_only=False) == []
+
+
+def test_bursts_are_merged(library, models):
+    """Test that repeated changes to a directory lead to a single rescan"""
+    watcher = LibraryWatcher(library, mode="poll", debounce=0.05)
+    watcher.add(str(models), "LORA")
+    watcher.poll()
+
+    with patch.object(library, "scan", wraps=library.scan) as scan:
+        watcher.start()
+        for i in range(20):
+            (models / "styles" / f"part_{i}.safetensors").write_bytes(b"z")
+            watcher.mark(str(models / "styles"))
+        deadline = time.time() + 5
+        while watcher.stats()["flushes"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        watcher.stop()
+
+    assert scan.call_count == 1
+    assert len(library.find(folder=str(models))) == 21
+
+
+def test_folder_removed_during_first_scan_is_not_watched(library, models):
+    """Test that a folder removed by another thread while it is scanned stays unwatched"""
+    watcher = LibraryWatcher(library, mode="poll")
+    watcher.add(str(models), "LORA")
+    scan = library.scan
+
+    def scan_and_remove(path, *args, **kwargs):
+        result = scan(path, *args, **kwargs)
+        watcher.remove(path)
+        return result
+
+    with patch.object(library, "scan", side_effect=scan_and_remove):
+        watcher.poll()
+
+    assert not library.is_watched(str(models))
+    assert watcher.stats()["folders"] == {}
+
+    watcher.mark(str(models / "styles"))
+    with patch.object(library, "scan") as rescan:
+        assert watcher.flush() == 0
+    rescan.assert_not_called()
+
+
+def test_marks_outside_watched_folders_are_ignored(library, models, tmp_path):
+    """Test that changes outside the watched folders do not touch the index"""
+    watcher = LibraryWatcher(library, mode="poll")
+    watcher.add(str(models))
+    watcher.poll()
+
+    watcher.mark(str(tmp_path))
+    assert watcher.flush() == 0
+
+
+def test_network_filesystems_are_polled(tmp_path):
+    """Test that folders on network mounts are detected from the mount table"""
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "/dev/sda1 / ext4 rw 0 0\n"
+        f"server:/share {tmp_path / 'nas'} nfs4 rw 0 0\n"
+    )
+
+    assert is_network_filesystem(str(tmp_path / "nas" / "models"), str(mounts))
+    assert not is_network_filesystem(str(tmp_path / "local"), str(mounts))
+    assert not is_network_filesystem(str(tmp_path), str(tmp_path / "missing"))
+
+    with patch.object(watcher_module, "HAS_WATCHDOG", True), patch.object(
+        watcher_module, "is_network_filesystem", return_value=True
+    ):
+        assert LibraryWatcher(None)._root_mode(str(tmp_path)) == "poll"
+
+
+def test_shared_watcher_follows_model_dir(tmp_path):
+    """Test that the shared watcher watches the model folders of the settings"""
+    settings = Settings(config_path=str(tmp_path / "config.json"))
+    settings.model_dir = str(tmp_path / "models")
+    os.makedirs(os.path.join(settings.model_dir, "Lora"))
+
+    watcher = get_library_watcher(settings)
+    assert watcher is get_library_watcher(settings)
+    assert list(watcher.stats()["folders"]) == [os.path.join(settings.model_dir, "Lora")]
+
+    settings.model_dir = str(tmp_path / "other")
+    os.makedirs(os.path.join(settings.model_dir, "Stable-diffusion"))
+    watcher.apply_settings(settings, {"model_dir"})
+    assert list(watcher.stats()["folders"]) == [
+        os.path.join(settings.model_dir, "Stable-diffusion")
+    ]
+
+
+def test_watcher_endpoint(client):
+    """Test that the watcher status is reported when no watcher runs"""
+    response = client.get("/api/library/watcher")
+
+    assert response.status_code == 200
+    assert response.json()["running"] is False
@@ -0,0 +1,212 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.civitai_api import CivitaiAPI
+from app.core.metadata_cache import MetadataCache, get_metadata_cache
+from app.core.settings import Settings
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create a metadata cache in a temporary directory"""
+    cache = MetadataCache(str(tmp_path / "cache.sqlite3"), ttl=3600)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def mock_settings():
+    settings = MagicMock()
+    settings.api_key = "test_api_key"
+    settings.model_dir = "/test/models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+def make_response(status_code=200, data=None, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = data
+    response.headers = headers or {}
+    response.text = ""
+    return response
+
+
+def test_put_and_get(cache):
+    """Test storing and reading back an entry"""
+    model = {"id": 1, "name": "Test Model", "description": "<p>" + "x" * 5000 + "</p>"}
+    cache.put("models/1", model, etag='"abc"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+
+    entry = cache.get("models/1")
+    assert entry["data"] == model
+    assert entry["etag"] == '"abc"'
+    assert entry["last_modified"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert cache.is_fresh(entry)
+    assert cache.get("models/2") is None
+
+
+def test_entries_survive_reopen(tmp_path):
+    """Test that entries persist across cache instances (restarts)"""
+    path = str(tmp_path / "cache.sqlite3")
+    first = MetadataCache(path)
+    first.put("model-versions/5", {"id": 5})
+    first.close()
+
+    second = MetadataCache(path)
+    assert second.get("model-versions/5")["data"] == {"id": 5}
+    assert second.stats()["entries"] == 1
+    second.close()
+
+
+def test_expired_entry_is_not_fresh(cache):
+    """Test TTL handling"""
+    cache.put("models/1", {"id": 1})
+    entry = cache.get("models/1")
+    entry["fetched_at"] = time.time() - 7200
+    assert not cache.is_fresh(entry)
+
+    cache.touch("models/1", etag='"new"')
+    entry = cache.get("models/1")
+    assert cache.is_fresh(entry)
+    assert entry["etag"] == '"new"'
+
+
+def test_clear(cache):
+    """Test clearing the cache"""
+    cache.put("models/1", {"id": 1})
+    cache.put("models/2", {"id": 2})
+    assert cache.clear() == 2
+    assert cache.get("models/1") is None
+
+
+def test_shared_cache_uses_config_dir(isolated_config_dir):
+    """Test that the shared cache lives next to settings.json"""
+    settings = Settings()
+    cache = get_metadata_cache(settings)
+    assert cache is get_metadata_cache(settings)
+    assert cache.path == str(isolated_config_dir / MetadataCache.FILENAME)
+
+    settings.use_metadata_cache = False
+    assert get_metadata_cache(settings) is None
+
+
+@patch("requests.request")
+def test_request_served_from_cache(mock_request, mock_settings, cache):
+    """Test that fresh entries skip the network entirely"""
+    mock_request.return_value = make_response(data={"id": 1, "name": "Test Model"})
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+
+    assert api.get_model(1)["name"] == "Test Model"
+    assert api.get_model(1)["name"] == "Test Model"
+    assert mock_request.call_count == 1
+
+    # Search results are not cached
+    api.request("models", {"query": "test"})
+    api.request("models", {"query": "test"})
+    assert mock_request.call_count == 3
+
+
+@patch("requests.request")
+def test_request_revalidates_stale_entry(mock_request, mock_settings, cache):
+    """Test conditional revalidation of expired entries"""
+    cache.ttl = 0
+    mock_request.return_value = make_response(
+        data={"id": 1, "name": "Test Model"}, headers={"ETag": '"v1"'}
+    )
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+    api.get_model(1)
+
+    mock_request.return_value = make_response(status_code=304)
+    assert api.get_model(1) == {"id": 1, "name": "Test Model"}
+
+    _, kwargs = mock_request.call_args
+    assert kwargs["headers"]["If-None-Match"] == '"v1"'
+
+
+@patch("requests.request")
+def test_by_hash_key_is_case_insensitive(mock_request, mock_settings, cache):
+    """Test that by-hash lookups share an entry regardless of hash case"""
+    mock_request.return_value = make_response(data={"id": 5, "modelId": 1})
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+
+    api.get_model_version_by_hash("abcdef")
+    api.get_model_version_by_hash("ABCDEF")
+    assert mock_request.call_count == 1
+
+
+@patch("requests.request")
+def test_errors_are_not_cached(mock_request, mock_settings, cache):
+    """Test that failed responses are not stored"""
+    mock_request.return_value = make_response(status_code=500)
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+
+    assert api.get_model(1) is None
+    assert cache.get("models/1") is None
+
+
+def test_missing_keys_expire_and_purge(cache):
+    """Test that not-found keys are remembered for the negative TTL"""
+    cache.negative_ttl = 3600
+    cache.put_missing("models/9")
+    assert cache.is_missing("models/9")
+    assert cache.stats()["missing"] == 1
+
+    cache.negative_ttl = 0
+    assert not cache.is_missing("models/9")
+
+    cache.negative_ttl = 3600
+    assert cache.purge_missing() == 1
+    assert not cache.is_missing("models/9")
+
+    # 之后找到的条目不再算作未找到
+    cache.put_missing("models/9")
+    cache.put("models/9", {"id": 9})
+    assert not cache.is_missing("models/9")
+
+
+@patch("requests.request")
+def test_unknown_hash_is_not_requested_again(mock_request, mock_settings, cache):
+    """Test that a 404 by-hash lookup is answered from the negative cache"""
+    mock_request.return_value = make_response(status_code=404)
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+    missing = object()
+
+    assert api.get_model_version_by_hash("abc", not_found=missing) is missing
+    assert api.get_model_version_by_hash("ABC", not_found=missing) is missing
+    assert api.get_model_version_by_hash("abc") is None
+    assert mock_request.call_count == 1
+
+    cache.purge_missing()
+    api.get_model_version_by_hash("abc")
+    assert mock_request.call_count == 2
+
+
+@patch("requests.request")
+def test_refresh_bypasses_negative_cache(mock_request, mock_settings, cache):
+    """Test that a refresh lookup is sent even if the hash was recently unknown"""
+    mock_request.return_value = make_response(status_code=404)
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+    missing = object()
+
+    assert api.get_model_version_by_hash("abc", not_found=missing) is missing
+    assert api.get_model_version_by_hash("abc", not_found=missing, refresh=True) is missing
+    assert mock_request.call_count == 2
+
+    mock_request.return_value = make_response(data={"id": 1, "modelId": 2})
+    assert api.get_model_version_by_hash("abc", refresh=True) == {"id": 1, "modelId": 2}
+    assert not cache.is_missing("model-versions/by-hash/ABC")
+
+
+def test_purge_missing_endpoint(client, isolated_config_dir):
+    """Test that the purge endpoint empties the negative cache"""
+    cache = get_metadata_cache(Settings())
+    cache.put_missing("model-versions/by-hash/ABC")
+
+    response = client.delete("/api/cache/missing")
+
+    assert response.status_code == 200
+    assert response.json()["removed"] == 1
+    assert not cache.is_missing("model-versions/by-hash/ABC")
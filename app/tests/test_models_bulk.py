@@ -0,0 +1,152 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.core.civitai_api import CivitaiAPI
+from app.core.metadata_cache import MetadataCache
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+
+
+@pytest.fixture
+def mock_settings():
+    settings = MagicMock()
+    settings.api_key = "test_api_key"
+    settings.model_dir = "/test/models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetadataCache(str(tmp_path / "cache.sqlite3"), ttl=3600)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_flight(monkeypatch):
+    monkeypatch.setattr(CivitaiAPI, "flight", SingleFlight())
+    monkeypatch.setattr(AsyncCivitaiAPI, "flight", AsyncSingleFlight())
+
+
+def models_page(ids, next_page=None):
+    metadata = {"nextPage": next_page} if next_page else {}
+    return {"items": [{"id": i, "name": f"Model {i}"} for i in ids], "metadata": metadata}
+
+
+def make_response(data):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = data
+    response.headers = {}
+    return response
+
+
+@patch("requests.request")
+def test_bulk_chunks_by_page_size(mock_request, mock_settings):
+    """Test that ids are split into chunks of one page and merged by id"""
+    mock_request.side_effect = lambda **kwargs: make_response(
+        models_page(kwargs["params"]["ids"])
+    )
+    api = CivitaiAPI(settings=mock_settings)
+
+    ids = list(range(1, 251)) + [5, "7", "bad"]
+    models = api.get_models_bulk(ids)
+
+    assert sorted(models) == list(range(1, 251))
+    assert models[7]["name"] == "Model 7"
+    assert mock_request.call_count == 3
+    chunk_sizes = sorted(len(c.kwargs["params"]["ids"]) for c in mock_request.call_args_list)
+    assert chunk_sizes == [50, 100, 100]
+
+
+@patch("requests.request")
+def test_bulk_follows_next_page(mock_request, mock_settings):
+    """Test that a paginated chunk is followed until the last page"""
+    next_page = "https://civitai.com/api/v1/models?ids=2&ids=3&limit=100&cursor=abc"
+    mock_request.side_effect = [
+        make_response(models_page([1], next_page)),
+        make_response(models_page([2, 3])),
+    ]
+    api = CivitaiAPI(settings=mock_settings)
+
+    models = api.get_models_bulk([1, 2, 3, 4])
+
+    assert sorted(models) == [1, 2, 3]
+    params = mock_request.call_args.kwargs["params"]
+    assert params["cursor"] == "abc"
+    assert params["ids"] == ["2", "3"]
+
+
+@patch("requests.request")
+def test_bulk_fills_metadata_cache(mock_request, mock_settings, cache):
+    """Test that bulk results are cached for single-model lookups"""
+    mock_request.return_value = make_response(models_page([1, 2]))
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+
+    api.get_models_bulk([1, 2])
+    assert api.get_model(2)["name"] == "Model 2"
+    assert api.get_models_bulk([1, 2]) == {1: {"id": 1, "name": "Model 1"}, 2: {"id": 2, "name": "Model 2"}}
+    assert mock_request.call_count == 1
+
+
+def test_async_bulk_fetches_chunks_concurrently(mock_settings):
+    """Test that the async client fetches chunks in parallel within the limit"""
+    active = 0
+    peak = 0
+
+    class SlowTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            ids = [int(i) for i in request.url.params.get_list("ids")]
+            return httpx.Response(200, json=models_page(ids))
+
+    async def run():
+        api = AsyncCivitaiAPI(settings=mock_settings, transport=SlowTransport())
+        try:
+            return await api.get_models_bulk(range(1, 501), max_workers=3)
+        finally:
+            await api.aclose()
+
+    models = asyncio.run(run())
+
+    assert len(models) == 500
+    assert peak == 3
+
+
+@patch("requests.request")
+def test_bulk_remembers_missing_models(mock_request, mock_settings, cache):
+    """Test that ids a complete chunk did not return are not requested again"""
+    mock_request.return_value = make_response(models_page([1]))
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+
+    assert list(api.get_models_bulk([1, 2])) == [1]
+    assert cache.is_missing("models/2")
+    assert list(api.get_models_bulk([1, 2])) == [1]
+    assert mock_request.call_count == 1
+
+    # refresh 时再问一次记录为未找到的模型
+    assert list(api.get_models_bulk([1, 2], refresh=True)) == [1]
+    assert mock_request.call_count == 2
+    assert mock_request.call_args.kwargs["params"]["ids"] == [2]
+
+
+@patch("requests.request")
+def test_bulk_failure_is_not_remembered(mock_request, mock_settings, cache):
+    """Test that ids of a failed chunk are not cached as missing"""
+    response = make_response(None)
+    response.status_code = 500
+    response.text = ""
+    mock_request.return_value = response
+    api = CivitaiAPI(settings=mock_settings, cache=cache)
+
+    assert api.get_models_bulk([1, 2]) == {}
+    assert not cache.is_missing("models/1")
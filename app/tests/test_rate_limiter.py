@@ -0,0 +1,123 @@
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.core.civitai_api import CivitaiAPI
+from app.core.rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+
+
+@pytest.fixture
+def mock_settings():
+    settings = MagicMock()
+    settings.api_key = "test_api_key"
+    settings.model_dir = "/test/models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_flight(monkeypatch):
+    monkeypatch.setattr(CivitaiAPI, "flight", SingleFlight())
+    monkeypatch.setattr(AsyncCivitaiAPI, "flight", AsyncSingleFlight())
+
+
+def make_response(status_code=200, data=None, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = data
+    response.headers = headers or {}
+    response.text = ""
+    return response
+
+
+def test_token_bucket_spaces_out_bursts():
+    """Test that requests beyond the burst have to wait"""
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+def test_penalty_blocks_and_slows_down():
+    """Test adaptive slow-down after a 429 and recovery after successes"""
+    limiter = RateLimiter(rate=10)
+    assert limiter.feedback("search", 429, "2") == 2.0
+    bucket = limiter.buckets["search"]
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
+    assert bucket.rate == 2.5
+
+    for _ in range(10):
+        limiter.feedback("search", 200)
+    assert bucket.rate == bucket.max_rate
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_classify():
+    """Test endpoint classes"""
+    assert RateLimiter.classify("models", {"query": "x"}) == "search"
+    assert RateLimiter.classify("models", {"ids": [1]}) == "models"
+    assert RateLimiter.classify("models/1") == "models"
+    assert RateLimiter.classify("model-versions/by-hash/ABC") == "versions"
+    assert RateLimiter.classify("tags") == "default"
+
+
+def test_parse_retry_after():
+    """Test both Retry-After formats"""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@patch("requests.request")
+def test_request_retries_after_429(mock_request, mock_settings):
+    """Test that a throttled request is queued and retried instead of failing"""
+    mock_request.side_effect = [
+        make_response(429, headers={"Retry-After": "0.05"}),
+        make_response(200, data={"id": 1}),
+    ]
+    api = CivitaiAPI(settings=mock_settings, limiter=RateLimiter(rate=100))
+
+    start = time.monotonic()
+    assert api.get_model(1) == {"id": 1}
+    assert time.monotonic() - start >= 0.05
+    assert mock_request.call_count == 2
+
+
+@patch("requests.request")
+def test_request_gives_up_after_max_retries(mock_request, mock_settings):
+    """Test that persistent throttling still ends with None"""
+    mock_request.return_value = make_response(503, headers={"Retry-After": "0"})
+    api = CivitaiAPI(settings=mock_settings, limiter=RateLimiter(rate=100))
+
+    assert api.get_model(1) is None
+    assert mock_request.call_count == CivitaiAPI.MAX_RETRIES + 1
+
+
+def test_async_request_retries_after_429(mock_settings):
+    """Test retrying in the async client"""
+    responses = iter(
+        [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, json={"id": 1}),
+        ]
+    )
+
+    async def run():
+        api = AsyncCivitaiAPI(
+            settings=mock_settings,
+            limiter=RateLimiter(rate=100),
+            transport=httpx.MockTransport(lambda request: next(responses)),
+        )
+        try:
+            return await api.get_model(1)
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(run()) == {"id": 1}
@@ -0,0 +1,162 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.core.civitai_api import CivitaiAPI
+from app.core import replay
+from app.core.metadata_cache import MetadataCache
+from app.core.replay import (
+    AsyncReplayTransport,
+    FixtureStore,
+    RecordingTransport,
+    ReplayTransport,
+    request_key,
+    transports_from_env,
+)
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+
+
+@pytest.fixture
+def mock_settings():
+    settings = MagicMock()
+    settings.api_key = "test_api_key"
+    settings.model_dir = "/test/models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_flight(monkeypatch):
+    monkeypatch.setattr(CivitaiAPI, "flight", SingleFlight())
+    monkeypatch.setattr(AsyncCivitaiAPI, "flight", AsyncSingleFlight())
+
+
+@pytest.fixture
+def recorded(tmp_path, mock_settings):
+    """Record two responses through a fake live transport"""
+    live = MagicMock()
+    live.return_value.status_code = 200
+    live.return_value.headers = {"ETag": '"v1"', "Set-Cookie": "secret"}
+    live.return_value.text = '{"id": 1, "name": "Test Model"}'
+    live.return_value.json.return_value = {"id": 1, "name": "Test Model"}
+
+    path = str(tmp_path / "fixtures.jsonl.gz")
+    store = FixtureStore(path)
+    api = CivitaiAPI(settings=mock_settings, transport=RecordingTransport(store, live))
+    api.get_model(1)
+    api.search_models(query="test")
+    store.save()
+    return path
+
+
+def test_request_key_is_canonical():
+    """Test that equivalent requests share a key"""
+    assert request_key("get", "https://civitai.com/api/v1/models", {"b": 1, "a": "x y"}) == (
+        "GET /api/v1/models?a=x+y&b=1"
+    )
+    assert request_key("GET", "http://localhost:8001/api/v1/models?b=1&a=x%20y") == (
+        "GET /api/v1/models?a=x+y&b=1"
+    )
+
+
+def test_record_and_replay(recorded, mock_settings):
+    """Test replaying recorded responses offline"""
+    store = FixtureStore(recorded)
+    assert len(store) == 2
+    entry = store.get("GET /api/v1/models/1")
+    assert entry["headers"] == {"ETag": '"v1"'}
+
+    transport = ReplayTransport(store, latency=0.02)
+    api = CivitaiAPI(settings=mock_settings, transport=transport)
+
+    start = time.monotonic()
+    assert api.get_model(1) == {"id": 1, "name": "Test Model"}
+    assert time.monotonic() - start >= 0.02
+
+    assert api.get_model(2) is None
+    assert transport.misses == 1
+
+
+def test_unrecorded_requests_are_not_cached_as_missing(recorded, mock_settings, tmp_path):
+    """Test that a replay miss counts as a failure, not as a 404 to remember"""
+    store = FixtureStore(recorded)
+    cache = MetadataCache(str(tmp_path / "cache.sqlite3"))
+    api = CivitaiAPI(settings=mock_settings, cache=cache, transport=ReplayTransport(store))
+
+    assert api.get_model_version_by_hash("AB", not_found=api.NOT_FOUND) is None
+    assert cache.stats()["missing"] == 0
+
+    async def run():
+        api = AsyncCivitaiAPI(
+            settings=mock_settings, cache=cache, transport=AsyncReplayTransport(store)
+        )
+        try:
+            return await api.get_model(2)
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(run()) is None
+    assert cache.stats()["missing"] == 0
+    cache.close()
+
+
+def test_async_replay(recorded, mock_settings):
+    """Test that the async client replays the same fixtures"""
+    store = FixtureStore(recorded)
+
+    async def run():
+        api = AsyncCivitaiAPI(settings=mock_settings, transport=AsyncReplayTransport(store))
+        try:
+            return await api.get_model(1), await api.search_models(query="test")
+        finally:
+            await api.aclose()
+
+    model, search = asyncio.run(run())
+    assert model["name"] == "Test Model"
+    assert search["id"] == 1
+
+
+def test_saved_file_is_deterministic(recorded):
+    """Test that saving the same entries produces identical bytes"""
+    with open(recorded, "rb") as f:
+        first = f.read()
+    FixtureStore(recorded).save()
+    with open(recorded, "rb") as f:
+        assert f.read() == first
+
+
+def test_transports_from_env(recorded, monkeypatch):
+    """Test configuring replay through the environment"""
+    assert transports_from_env() == (None, None)
+
+    monkeypatch.setenv("CIVITAI_FIXTURES", recorded)
+    monkeypatch.setenv("CIVITAI_REPLAY_LATENCY", "5")
+    sync_transport, async_transport = transports_from_env()
+    assert isinstance(sync_transport, ReplayTransport)
+    assert isinstance(async_transport, AsyncReplayTransport)
+    assert sync_transport.latency.latency == 0.005
+
+
+def test_store_is_saved_once_at_exit(tmp_path, monkeypatch):
+    """Test that recording jobs share one store that is saved once, and only if it changed"""
+    path = str(tmp_path / "new.jsonl.gz")
+    monkeypatch.setattr(replay, "_stores", {})
+    monkeypatch.setenv("CIVITAI_FIXTURES", path)
+    monkeypatch.setenv("CIVITAI_FIXTURE_MODE", "record")
+
+    with patch.object(replay.atexit, "register") as register:
+        first = transports_from_env()[0]
+        second = transports_from_env()[0]
+    assert first.store is second.store
+    assert register.call_count == 1
+    save = register.call_args.args[0]
+
+    save()
+    assert not (tmp_path / "new.jsonl.gz").exists()
+    first.store.put("models/1", 200, {}, "{}")
+    save()
+    assert FixtureStore(path).get("models/1")["status"] == 200
@@ -0,0 +1,142 @@
+import json
+import struct
+import pytest
+from unittest.mock import patch
+
+from app.core import safetensors_header
+from app.core.jobs import get_job_manager
+from app.core.library_index import LibraryIndex
+from app.core.safetensors_header import (
+    SafetensorsHeaderError,
+    read_header,
+    read_summary,
+)
+from app.core.settings import get_settings_service
+from app.tests.test_jobs import wait_for
+
+
+def write_safetensors(path, metadata=None, dtype="F16", data=b"\0" * 64):
+    """Write a small safetensors file with two tensors"""
+    header = {
+        "lora_up.weight": {"dtype": dtype, "shape": [4, 2], "data_offsets": [0, 16]},
+        "lora_down.weight": {"dtype": dtype, "shape": [2, 4], "data_offsets": [16, 32]},
+        "alpha": {"dtype": "F32", "shape": [], "data_offsets": [32, 36]},
+    }
+    if metadata is not None:
+        header["__metadata__"] = metadata
+    encoded = json.dumps(header).encode()
+    path.write_bytes(struct.pack("<Q", len(encoded)) + encoded + data)
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a library index in a temporary directory"""
+    library = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    yield library
+    library.close()
+
+
+def test_summary_from_header(tmp_path):
+    """Test that tensors and training metadata are summarized"""
+    path = tmp_path / "ink.safetensors"
+    write_safetensors(
+        path,
+        {
+            "ss_base_model_version": "sdxl_base_v1-0",
+            "ss_network_module": "networks.lora",
+            "ss_network_dim": "16",
+            "ss_output_name": "ink",
+            "ss_tag_frequency": json.dumps(
+                {"1_ink": {"ink": 10, " sketch": 2}, "2_more": {"ink": 5, "paper": 1}}
+            ),
+        },
+    )
+
+    summary = read_summary(str(path))
+
+    assert summary["tensors"] == 3
+    assert summary["params"] == 17
+    assert summary["dtype"] == "F16"
+    assert summary["dtypes"] == {"F16": 2, "F32": 1}
+    assert summary["base_model"] == "sdxl_base_v1-0"
+    assert summary["network"] == "networks.lora"
+    assert summary["network_dim"] == "16"
+    assert summary["title"] == "ink"
+    assert list(summary["tags"].items()) == [("ink", 15), ("sketch", 2), ("paper", 1)]
+
+
+def test_only_the_header_is_read(tmp_path):
+    """Test that the tensor data is never read"""
+    path = tmp_path / "big.safetensors"
+    write_safetensors(path, data=b"\0" * (1 << 20))
+
+    with patch.object(
+        safetensors_header, "_pread", wraps=safetensors_header._pread
+    ) as pread:
+        read_header(str(path))
+
+    assert sum(call.args[1] for call in pread.call_args_list) < 1024
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"\x01\x02",
+        struct.pack("<Q", 1 << 40) + b"{}",
+        struct.pack("<Q", 5) + b"{not json",
+        struct.pack("<Q", 2) + b"[]",
+    ],
+)
+def test_invalid_headers(tmp_path, content):
+    """Test that files without a valid header raise SafetensorsHeaderError"""
+    path = tmp_path / "broken.safetensors"
+    path.write_bytes(content)
+
+    with pytest.raises(SafetensorsHeaderError):
+        read_header(str(path))
+
+
+def test_headers_are_stored_in_index(library, tmp_path):
+    """Test that headers are read once, filtered on and read again after a change"""
+    folder = tmp_path / "Lora"
+    folder.mkdir()
+    write_safetensors(folder / "xl.safetensors", {"ss_base_model_version": "sdxl_base_v1-0"})
+    write_safetensors(folder / "sd.safetensors", {"ss_base_model_version": "sd_v1"})
+    (folder / "broken.safetensors").write_bytes(b"nope")
+    (folder / "old.ckpt").write_bytes(b"ckpt")
+    library.scan(str(folder), "LORA")
+
+    assert library.read_headers(str(folder)) == {"read": 2, "invalid": 1}
+    assert library.read_headers(str(folder)) == {"read": 0, "invalid": 0}
+    assert library.stats()["headers"] == 3
+
+    files = library.find(base_model="SDXL_base_v1-0")
+    assert [f["name"] for f in files] == ["xl.safetensors"]
+    assert files[0]["dtype"] == "F16"
+    assert files[0]["tensors"] == 3
+    assert library.file_header(str(folder / "broken.safetensors")) is None
+
+    # 文件变化后重新扫描会清除保存的头部
+    write_safetensors(folder / "sd.safetensors", {"ss_base_model_version": "sdxl_base_v1-0"}, "BF16")
+    library.scan(str(folder), "LORA")
+    assert library.get(str(folder / "sd.safetensors"))["base_model"] is None
+    assert library.file_header(str(folder / "sd.safetensors"))["dtype"] == "BF16"
+    assert len(library.find(base_model="sdxl_base_v1-0")) == 2
+
+
+def test_headers_job_api(client, tmp_path):
+    """Test reading the headers of all model files in a background job"""
+    settings = get_settings_service().get()
+    settings.model_dir = str(tmp_path / "models")
+    lora = tmp_path / "models" / "Lora"
+    lora.mkdir(parents=True)
+    write_safetensors(lora / "ink.safetensors", {"ss_base_model_version": "sd_v1"})
+
+    response = client.post("/api/library/headers")
+    assert response.status_code == 200
+    job = get_job_manager().get(response.json()["id"])
+    assert wait_for(job) == "completed"
+    assert job.result == {"read": 1, "invalid": 0}
+
+    files = client.get("/api/library", params={"base_model": "sd_v1"}).json()["files"]
+    assert [f["name"] for f in files] == ["ink.safetensors"]
@@ -0,0 +1,126 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.api.endpoints import get_api_client, get_settings
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.core.civitai_api import CivitaiAPI
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+
+
+@pytest.fixture
+def mock_settings():
+    settings = MagicMock()
+    settings.api_key = "test_api_key"
+    settings.model_dir = "/test/models"
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.show_nsfw = False
+    settings.get_proxy_settings.return_value = None
+    return settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_flight(monkeypatch):
+    monkeypatch.setattr(CivitaiAPI, "flight", SingleFlight())
+    monkeypatch.setattr(AsyncCivitaiAPI, "flight", AsyncSingleFlight())
+
+
+def search_page(cursor=None, next_cursor=None):
+    start = int(cursor or 0)
+    metadata = {}
+    if next_cursor:
+        metadata["nextCursor"] = next_cursor
+        metadata["nextPage"] = f"https://civitai.com/api/v1/models?query=test&limit=2&cursor={next_cursor}"
+    return {"items": [{"id": start + 1}, {"id": start + 2}], "metadata": metadata}
+
+
+def cursor_response(params):
+    cursor = params.get("cursor")
+    next_cursor = {None: "2", "2": "4"}.get(cursor)
+    return search_page(cursor, next_cursor)
+
+
+def make_response(data):
+    response = MagicMock()
+    response.status_code = 200
+    response.json.return_value = data
+    response.headers = {}
+    return response
+
+
+@patch("requests.request")
+def test_iter_search_pages_follows_next_page(mock_request, mock_settings):
+    """Test that the paginator streams every page via nextPage"""
+    mock_request.side_effect = lambda **kwargs: make_response(
+        cursor_response(kwargs["params"])
+    )
+    api = CivitaiAPI(settings=mock_settings)
+
+    ids = [model["id"] for model in api.iter_search_models(query="test", page_size=2)]
+    assert ids == [1, 2, 3, 4, 5, 6]
+    assert mock_request.call_count == 3
+
+    pages = list(api.iter_search_pages(max_pages=2, prefetch=False, query="other"))
+    assert len(pages) == 2
+
+
+@patch("requests.request")
+def test_search_pages_are_cached(mock_request, mock_settings):
+    """Test that a repeated (or prefetched) page skips the network"""
+    mock_request.return_value = make_response(search_page())
+    api = CivitaiAPI(settings=mock_settings)
+
+    first = api.search_models(query="test", page=2)
+    assert api.search_models(query="test", page=2) is first
+    assert mock_request.call_count == 1
+
+    api.search_models(query="test", page=3)
+    assert mock_request.call_count == 2
+
+
+def test_next_search_kwargs(mock_settings):
+    """Test choosing the page to prefetch"""
+    api = CivitaiAPI(settings=mock_settings)
+
+    paged = {"metadata": {"totalPages": 3}}
+    assert api.next_search_kwargs(paged, query="a", page=2) == {"query": "a", "page": 3}
+    assert api.next_search_kwargs(paged, query="a", page=3) is None
+
+    cursored = {"metadata": {"nextCursor": "abc", "nextPage": "https://x"}}
+    assert api.next_search_kwargs(cursored, page=1) == {"page": 2, "cursor": "abc"}
+    assert api.next_search_kwargs({"metadata": {}}, page=2, cursor="abc") is None
+
+
+def test_async_iter_search_pages(mock_settings):
+    """Test the async paginator"""
+
+    def handler(request):
+        return httpx.Response(200, json=cursor_response(dict(request.url.params)))
+
+    async def run():
+        api = AsyncCivitaiAPI(settings=mock_settings, transport=httpx.MockTransport(handler))
+        try:
+            return [model["id"] async for model in api.iter_search_models(query="test")]
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(run()) == [1, 2, 3, 4, 5, 6]
+
+
+def test_search_endpoint_prefetches_next_page(client, mock_settings):
+    """Test that the search endpoint prefetches page N+1"""
+    api_client = AsyncCivitaiAPI(settings=mock_settings)
+    api_client.search_models = AsyncMock(
+        return_value={"items": [], "metadata": {"totalPages": 3}}
+    )
+    client.app.dependency_overrides[get_api_client] = lambda: api_client
+    client.app.dependency_overrides[get_settings] = lambda: mock_settings
+
+    response = client.get("/api/models/search?query=test&page=1&nsfw=false")
+    assert response.status_code == 200
+    assert api_client.search_models.await_count == 2
+    assert api_client.search_models.await_args.kwargs["page"] == 2
+
+    client.app.dependency_overrides = {}
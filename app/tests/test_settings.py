@@ -7,7 +7,9 @@ import json
 # Add the app directory to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from core.settings import Settings
+from unittest.mock import patch
+
+from core.settings import Settings, SettingsService
 
 
 @pytest.fixture
@@ -106,3 +108,97 @@ def test_update_settings():
     # Other settings should remain at default values
     assert settings.download_with_aria2 == True
     assert settings.create_model_json == True
+
+
+def test_settings_service_loads_once(tmp_path):
+    """The service probes permissions once and reuses the loaded settings"""
+    config_path = str(tmp_path / "settings.json")
+    service = SettingsService(config_path=config_path)
+
+    with patch.object(
+        Settings, "_check_directory_permissions", autospec=True
+    ) as probe:
+        first = service.get()
+        second = service.get()
+
+    assert first is second
+    assert probe.call_count == 1
+
+
+def test_settings_service_reloads_on_change(tmp_path):
+    """Outside edits to the config file are picked up, own saves are not reloaded"""
+    config_path = str(tmp_path / "settings.json")
+    service = SettingsService(config_path=config_path)
+    settings = service.get()
+
+    settings.api_key = "saved_key"
+    service.save(settings)
+    assert service.get() is settings
+
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump({"api_key": "edited_key", "show_nsfw": True}, f)
+    os.utime(config_path, ns=(0, 1))
+
+    with patch.object(
+        Settings, "_check_directory_permissions", autospec=True
+    ) as probe:
+        reloaded = service.get()
+
+    assert reloaded is not settings
+    assert reloaded.api_key == "edited_key"
+    assert reloaded.show_nsfw is True
+    probe.assert_not_called()
+
+
+def test_settings_service_keeps_settings_when_file_is_touched(tmp_path):
+    """Rewriting the config file without changing a value keeps the settings object"""
+    config_path = str(tmp_path / "settings.json")
+    service = SettingsService(config_path=config_path)
+    settings = service.get()
+    service.save(settings)
+    calls = []
+    service.subscribe(lambda s, changed: calls.append(changed))
+
+    os.utime(config_path, ns=(0, 1))
+
+    assert service.get() is settings
+    assert service.get() is settings
+    assert calls == []
+
+
+def test_settings_service_notifies_subscribers(tmp_path):
+    """Subscribers hear about changed keys they care about"""
+    service = SettingsService(config_path=str(tmp_path / "settings.json"))
+    settings = service.get()
+    calls = []
+    timeouts = []
+
+    service.subscribe(lambda s, changed: calls.append(changed))
+    service.subscribe(lambda s, changed: timeouts.append(s.timeout), keys={"timeout"})
+
+    settings.api_key = "new_key"
+    service.save(settings)
+    settings.timeout = 90
+    service.save(settings)
+    service.save(settings)
+
+    assert calls == [{"api_key"}, {"timeout"}]
+    assert timeouts == [90]
+
+
+def test_settings_service_holds_bound_methods_weakly(tmp_path):
+    """A subscribed component can still be garbage collected"""
+    service = SettingsService(config_path=str(tmp_path / "settings.json"))
+    settings = service.get()
+
+    class Component:
+        def apply(self, settings, changed):
+            raise AssertionError("should have been collected")
+
+    component = Component()
+    service.subscribe(component.apply)
+    del component
+
+    settings.show_nsfw = True
+    service.save(settings)
+    assert service._subscribers == []
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.core.civitai_api import CivitaiAPI
+from app.core.single_flight import SingleFlight, AsyncSingleFlight
+
+
+def test_concurrent_calls_are_coalesced():
+    """Test that threads asking for the same key share one call"""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    executions = []
+
+    def work():
+        executions.append(1)
+        started.set()
+        release.wait(2)
+        return {"id": 1}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("models/1", work)))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    # Give the followers time to join the in-flight call
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(executions) == 1
+    assert results == [{"id": 1}] * 5
+    assert flight.stats() == {"calls": 5, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_are_shared_and_not_cached():
+    """Test that followers receive the leader's exception, and the key is released"""
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_async_calls_are_coalesced():
+    """Test coalescing of concurrent coroutines"""
+    flight = AsyncSingleFlight()
+    executions = []
+
+    async def work(model_id):
+        executions.append(model_id)
+        await asyncio.sleep(0.05)
+        return {"id": model_id}
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do(("models", 1), work, 1) for _ in range(4)),
+            flight.do(("models", 2), work, 2),
+        )
+
+    results = asyncio.run(main())
+
+    assert sorted(executions) == [1, 2]
+    assert results[:4] == [{"id": 1}] * 4
+    assert results[4] == {"id": 2}
+    assert flight.stats()["coalesced"] == 3
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_caller_cancellation_does_not_cancel_others():
+    """Test that cancelling one waiter leaves the shared call running"""
+    flight = AsyncSingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+@patch("requests.request")
+def test_api_client_coalesces_identical_requests(mock_request, monkeypatch):
+    """Test that CivitaiAPI.request shares in-flight GET requests"""
+    settings = MagicMock()
+    settings.api_key = ""
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.get_proxy_settings.return_value = None
+
+    release = threading.Event()
+
+    def slow_response(**kwargs):
+        release.wait(2)
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {}
+        response.json.return_value = {"items": [], "metadata": {}}
+        return response
+
+    mock_request.side_effect = slow_response
+    monkeypatch.setattr(CivitaiAPI, "flight", SingleFlight())
+
+    api = CivitaiAPI(settings=settings)
+    threads = [
+        threading.Thread(target=api.request, args=("models", {"query": "test"}))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert mock_request.call_count == 1
+    assert CivitaiAPI.flight.stats()["coalesced"] == 2
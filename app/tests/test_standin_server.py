@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+from app.core.async_civitai_api import AsyncCivitaiAPI
+from app.core.single_flight import AsyncSingleFlight
+from app.standin_server import (
+    Catalog,
+    MiB,
+    StandinConfig,
+    SyntheticFile,
+    create_app,
+    parse_range,
+)
+
+
+@pytest.fixture
+def config():
+    return StandinConfig(
+        models=5, versions_per_model=2, file_sizes=[300000, 3 * MiB], hash_limit=4 * MiB
+    )
+
+
+@pytest.fixture
+def standin(config):
+    return TestClient(create_app(config), base_url="http://standin")
+
+
+@pytest.fixture(autouse=True)
+def fresh_flight(monkeypatch):
+    monkeypatch.setattr(AsyncCivitaiAPI, "flight", AsyncSingleFlight())
+
+
+def test_parse_range():
+    """Test Range header parsing"""
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=10-", 100) == (10, 99)
+    assert parse_range("bytes=10-19", 100) == (10, 19)
+    assert parse_range("bytes=-5", 100) == (95, 99)
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_models_pagination_and_ids(standin):
+    """Test page-based listing and cursor-based ids lookups"""
+    data = standin.get("/api/v1/models", params={"limit": 2}).json()
+    assert [m["id"] for m in data["items"]] == [1, 2]
+    assert data["metadata"]["totalPages"] == 3
+    assert "page=2" in data["metadata"]["nextPage"]
+
+    data = standin.get("/api/v1/models?ids=4&ids=1&ids=5&limit=2").json()
+    assert [m["id"] for m in data["items"]] == [1, 4]
+    assert data["metadata"]["nextCursor"] == "2"
+    file_data = data["items"][0]["modelVersions"][0]["files"][0]
+    assert file_data["downloadUrl"] == "http://standin/api/download/models/1000"
+
+
+def test_download_redirect_range_and_etag(standin):
+    """Test the signed redirect, ranges and validators of downloads"""
+    version = standin.get("/api/v1/model-versions/1000").json()
+    file_data = version["files"][0]
+
+    response = standin.get("/api/download/models/1000", follow_redirects=False)
+    assert response.status_code == 307
+    location = response.headers["location"]
+    assert "token=" in location
+
+    full = standin.get(location)
+    assert len(full.content) == 300000
+    assert hashlib.sha256(full.content).hexdigest().upper() == file_data["hashes"]["SHA256"]
+
+    partial = standin.get(location, headers={"Range": "bytes=1000-1999"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == "bytes 1000-1999/300000"
+    assert partial.content == full.content[1000:2000]
+
+    etag = full.headers["etag"]
+    assert standin.get(location, headers={"If-None-Match": etag}).status_code == 304
+    assert standin.get(location, headers={"Range": "bytes=400000-"}).status_code == 416
+    assert standin.get(location.replace("token=", "token=x")).status_code == 403
+
+    by_hash = standin.get(f"/api/v1/model-versions/by-hash/{file_data['hashes']['SHA256']}")
+    assert by_hash.json()["id"] == 1000
+
+
+def test_real_hashes_are_cached(config, tmp_path):
+    """Test that every file gets its real hash, computed once across restarts"""
+    config.hash_limit = None
+    config.hash_cache = str(tmp_path / "hashes.json")
+    catalog = Catalog(config)
+    expected = catalog.files[10000].sha256()
+    assert catalog.versions[1000]["files"][0]["hashes"]["SHA256"] == expected
+
+    with patch.object(SyntheticFile, "sha256") as sha256:
+        assert Catalog(config).by_hash[expected] == 1000
+    sha256.assert_not_called()
+
+    # 只有显式设置大小上限时才使用占位哈希
+    config.hash_limit = 1 * MiB
+    limited = Catalog(config)
+    assert expected in limited.by_hash
+    assert limited.versions[1001]["files"][0]["hashes"]["SHA256"] != catalog.files[10010].sha256()
+
+
+def test_fault_injection(config):
+    """Test random 429s and disconnects"""
+    config.error_rate = 1.0
+    standin = TestClient(create_app(config))
+    response = standin.get("/api/v1/models/1")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+
+    config.error_rate = 0.0
+    config.disconnect_rate = 1.0
+    standin = TestClient(create_app(config))
+    location = standin.get("/api/download/models/1001", follow_redirects=False).headers[
+        "location"
+    ]
+    # The body stops short of the advertised Content-Length
+    response = standin.get(location)
+    assert len(response.content) < int(response.headers["content-length"])
+
+
+def test_async_client_against_standin(config):
+    """Test pointing the API client at the stand-in with api_base_url"""
+    settings = MagicMock()
+    settings.api_key = ""
+    settings.timeout = 30
+    settings.disable_dns_lookup = False
+    settings.api_base_url = "http://standin/api/v1"
+    settings.get_proxy_settings.return_value = None
+
+    async def run():
+        api = AsyncCivitaiAPI(
+            settings=settings, transport=httpx.ASGITransport(app=create_app(config))
+        )
+        try:
+            models = await api.get_models_bulk([1, 2, 3])
+            url = await api.get_download_url(2, 2001)
+            return models, url
+        finally:
+            await api.aclose()
+
+    models, url = asyncio.run(run())
+    assert sorted(models) == [1, 2, 3]
+    assert url == "http://standin/api/download/models/2001"
@@ -0,0 +1,143 @@
+import threading
+import pytest
+
+from app.core.jobs import get_job_manager
+from app.core.library_index import LibraryIndex
+from app.core.settings import get_settings_service
+from app.core.update_checker import UpdateCheckCancelled, UpdateChecker
+from app.tests.test_jobs import wait_for
+
+
+def model(model_id, version_ids, updated_at):
+    """A model as returned by models?ids=, newest version first"""
+    return {
+        "id": model_id,
+        "name": f"model {model_id}",
+        "modelVersions": [
+            {"id": v, "name": f"v{v}", "publishedAt": updated_at} for v in version_ids
+        ],
+    }
+
+
+class FakeAPI:
+    """Stand-in for CivitaiAPI serving models and recording bulk requests"""
+
+    def __init__(self, models):
+        self.models = models
+        self.bulk = []
+        self.refreshed = []
+
+    def get_models_bulk(self, ids, refresh=False):
+        self.bulk.append(sorted(ids))
+        if refresh:
+            self.refreshed.append(sorted(ids))
+        return {i: self.models[i] for i in ids if i in self.models}
+
+
+@pytest.fixture
+def library(tmp_path):
+    """An index with an outdated, a current, an unresolved and a deleted model file"""
+    folder = tmp_path / "Lora"
+    folder.mkdir()
+    files = {
+        "old.safetensors": ("A" * 64, 1, 10),
+        "new.safetensors": ("B" * 64, 2, 21),
+        "gone.safetensors": ("C" * 64, 3, 30),
+    }
+    for name in files:
+        (folder / name).write_bytes(name.encode())
+    (folder / "mystery.safetensors").write_bytes(b"?")
+
+    library = LibraryIndex(str(tmp_path / "library.sqlite3"))
+    library.scan(str(folder), "LORA")
+    for name, (sha256, model_id, version_id) in files.items():
+        library.remember_sha256(str(folder / name), sha256)
+        library.remember_lookup(sha256, model_id, version_id)
+    library.folder = folder
+    yield library
+    library.close()
+
+
+def test_reports_updates_per_file_and_model(library):
+    """Test that files on an older version are reported as outdated"""
+    api = FakeAPI({1: model(1, [11, 10], "2024-01-01"), 2: model(2, [21, 20], "2024-01-01")})
+
+    result = UpdateChecker(api, library).check()
+
+    files = result["files"]
+    folder = library.folder
+    assert files[str(folder / "old.safetensors")]["status"] == "outdated"
+    assert files[str(folder / "old.safetensors")]["latest_version_id"] == 11
+    assert files[str(folder / "new.safetensors")]["status"] == "latest"
+    assert files[str(folder / "gone.safetensors")]["status"] == "unavailable"
+    assert files[str(folder / "mystery.safetensors")]["status"] == "unresolved"
+    assert result["models"][1]["update"] is True
+    assert result["models"][2]["update"] is False
+    assert result["updates"] == 1
+    assert api.bulk == [[1, 2, 3]]
+
+
+def test_repeat_checks_reuse_remembered_versions(library):
+    """Test that remembered version lists are reused and new versions are flagged"""
+    api = FakeAPI({1: model(1, [11, 10], "2024-01-01"), 2: model(2, [21, 20], "2024-01-01")})
+    UpdateChecker(api, library).check()
+
+    # 检查间隔内只再问没有结果的模型（客户端的未找到缓存会直接回答）
+    result = UpdateChecker(api, library).check()
+    assert api.bulk == [[1, 2, 3], [3]]
+    assert result["checked"] == 1
+    assert result["files"][str(library.folder / "old.safetensors")]["status"] == "outdated"
+
+    # 到期的模型都重新获取，只有 updatedAt 变化的模型算作变化
+    api.models[2] = model(2, [22, 21, 20], "2024-02-01")
+    result = UpdateChecker(api, library, check_interval=0).check()
+    assert result["checked"] == 3
+    assert result["changed"] == 1
+    assert result["models"][2]["new"] is True
+    assert result["models"][1]["new"] is False
+    assert result["files"][str(library.folder / "new.safetensors")]["status"] == "outdated"
+
+
+def test_refresh_bypasses_negative_cache(library):
+    """Test that a refresh asks about every model, including unknown ones"""
+    api = FakeAPI({1: model(1, [11, 10], "2024-01-01")})
+    UpdateChecker(api, library).check()
+
+    UpdateChecker(api, library).check(refresh=True)
+    assert api.refreshed == [[1, 2, 3]]
+
+
+def test_cancel_keeps_fetched_batches(library):
+    """Test that a cancelled check stops between batches and keeps the fetched ones"""
+    api = FakeAPI({1: model(1, [11, 10], "2024-01-01"), 2: model(2, [21, 20], "2024-01-01")})
+    checker = UpdateChecker(api, library)
+    checker.CHUNK_SIZE = 1
+    cancel = threading.Event()
+
+    def progress(state):
+        if state["models_done"] == 2:
+            cancel.set()
+
+    with pytest.raises(UpdateCheckCancelled):
+        checker.check(progress=progress, cancel=cancel)
+    assert api.bulk == [[1], [2]]
+    assert set(library.model_versions([1, 2, 3])) == {1, 2}
+
+    # 再次检查只问没有结果的模型
+    result = checker.check()
+    assert api.bulk == [[1], [2], [3]]
+    assert result["checked"] == 1
+
+
+def test_update_check_job_api(client, tmp_path):
+    """Test that the update check runs as a job"""
+    settings = get_settings_service().get()
+    settings.model_dir = str(tmp_path / "models")
+    (tmp_path / "models" / "Lora").mkdir(parents=True)
+
+    response = client.post("/api/library/updates")
+    assert response.status_code == 200
+    job = get_job_manager().get(response.json()["id"])
+    assert wait_for(job) == "completed"
+    assert job.kind == "updates"
+    assert job.result["updates"] == 0
@@ -17,4 +17,5 @@ install_req("send2trash", "send2trash==1.8.2")
 install_req("zip_unicode", "ZipUnicode==1.1.1")
 install_req("bs4", "beautifulsoup4==4.12.3")
 install_req("packaging","packaging==23.2")
-install_req("pysocks","pysocks==1.7.1")
\ No newline at end of file
+install_req("pysocks","pysocks==1.7.1")
+install_req("watchdog","watchdog==4.0.0")
\ No newline at end of file
@@ -180,29 +180,16 @@ def model_list_html(json_data):
     sorted_models = {}
     existing_files = set()
     existing_files_sha256 = set()
-    model_folders = set()
+    model_folders = {}
     
     for item in json_data['items']:
         model_folder = os.path.join(contenttype_folder(item['type'], item['description']))
-        model_folders.add(model_folder)
+        model_folders.setdefault(model_folder, item['type'])
     
-    for folder in model_folders:
-        for root, dirs, files in os.walk(folder, followlinks=True):
-            for file in files:
-                existing_files.add(file.lower())
-                if file.endswith('.json'):
-                    json_path = os.path.join(root, file)
-                    with open(json_path, 'r', encoding="utf-8") as f:
-                        try:
-                            json_file = json.load(f)
-                            if isinstance(json_file, dict):
-                                sha256 = json_file.get('sha256')
-                                if sha256:
-                                    existing_files_sha256.add(sha256.upper())
-                            else:
-                                print(f"Invalid JSON data in {json_path}. Expected a dictionary.")
-                        except Exception as e:
-                            print(f"Error decoding JSON in {json_path}: {e}")
+    for folder, content_type in model_folders.items():
+        index = _file.indexed_folder(folder, content_type)
+        existing_files.update(index.filenames(folder))
+        existing_files_sha256.update(index.sha256_set(folder))
     
     for item in json_data['items']:
         model_id = item.get('id')
@@ -509,28 +496,11 @@ def update_model_versions(model_id, json_input=None):
                     version_filename = f"{version_filename}_{version_file['id']}{version_extension}"
                     version_files.add((version['name'], version_filename, file_sha256))
 
-            for root, _, files in os.walk(model_folder, followlinks=True):
-                for file in files:
-                    if file.endswith('.json'):
-                        try:
-                            json_path = os.path.join(root, file)
-                            with open(json_path, 'r', encoding="utf-8") as f:
-                                json_data = json.load(f)
-                                if isinstance(json_data, dict):
-                                    if 'sha256' in json_data and json_data['sha256']:
-                                        sha256 = json_data.get('sha256', "").upper()
-                                        for version_name, _, file_sha256 in version_files:
-                                            if sha256 == file_sha256:
-                                                installed_versions.add(version_name)
-                                                break
-                        except Exception as e:
-                            print(f"failed to read: \"{file}\": {e}")
-
-                    #filename_check
-                    for version_name, version_filename, _ in version_files:
-                        if file.lower() == version_filename.lower():
-                            installed_versions.add(version_name)
-                            break
+            index = _file.indexed_folder(model_folder, content_type)
+            for version_name, version_filename, file_sha256 in version_files:
+                #filename_check
+                if (file_sha256 and index.by_sha256(file_sha256, model_folder)) or index.by_filename(version_filename, model_folder):
+                    installed_versions.add(version_name)
 
             version_names = list(versions_dict.keys())
             display_version_names = [f"{v} [Installed]" if v in installed_versions else v for v in version_names]
@@ -872,35 +842,15 @@ def update_model_info(model_string=None, model_version=None, only_html=False, in
         default_subfolder = "None"
         sub_folders = _file.getSubfolders(model_folder, output_basemodel, nsfw, model_uploader, model_name, model_id, version_name, version_id)
 
-        for root, dirs, files in os.walk(model_folder, followlinks=True):
-            for filename in files:
-                if filename.endswith('.json'):
-                    json_file_path = os.path.join(root, filename)
-                    with open(json_file_path, 'r', encoding="utf-8") as f:
-                        try:
-                            data = json.load(f)
-                            sha256 = data.get('sha256')
-                            if sha256:
-                                sha256 = sha256.upper()
-                            if sha256 == sha256_value:
-                                folder_location = root
-                                BtnDownInt = False
-                                BtnDel = True
-                                
-                                break
-                        except Exception as e:
-                            print(f"Error decoding JSON: {str(e)}")
-            else:
-                #filename_check
-                for filename in files:
-                    if filename.lower() == model_filename.lower() or filename.lower() == cleaned_name(model_filename).lower():
-                        folder_location = root
-                        BtnDownInt = False
-                        BtnDel = True
-                        break
-
-            if folder_location != "None":
-                break
+        index = _file.indexed_folder(model_folder, content_type)
+        matches = index.by_sha256(sha256_value, model_folder) if sha256_value else []
+        if not matches:
+            #filename_check
+            matches = index.by_filename(model_filename, model_folder) or index.by_filename(cleaned_name(model_filename), model_folder)
+        if matches:
+            folder_location = matches[0]['folder']
+            BtnDownInt = False
+            BtnDel = True
 
         default_subfolder = sub_folder_value(content_type, desc)
         if default_subfolder != "None":
@@ -1027,26 +977,13 @@ def update_file_info(model_string, model_version, file_metadata):
                                         model_folder = os.path.join(contenttype_folder("TextualInversion"))
                                 dl_url = file['downloadUrl']
                                 gl.json_info = item
-                                for root, _, files in os.walk(model_folder, followlinks=True):
-                                    if file_name in files:
-                                        installed = True
-                                        folder_location = root
-                                        break
-                                
-                                if not installed:
-                                    for root, _, files in os.walk(model_folder, followlinks=True):
-                                        for filename in files:
-                                            if filename.endswith('.json'):
-                                                with open(os.path.join(root, filename), 'r', encoding="utf-8") as f:
-                                                    try:
-                                                        data = json.load(f)
-                                                        sha256_value = data.get('sha256')
-                                                        if sha256_value != None and sha256_value.upper() == sha256:
-                                                            folder_location = root
-                                                            installed = True
-                                                            break
-                                                    except Exception as e:
-                                                        print(f"Error decoding JSON: {str(e)}")
+                                index = _file.indexed_folder(model_folder)
+                                matches = [entry for entry in index.by_filename(file_name, model_folder) if entry['name'] == file_name]
+                                if not matches:
+                                    matches = index.by_sha256(sha256, model_folder)
+                                if matches:
+                                    installed = True
+                                    folder_location = matches[0]['folder']
                                 default_sub = sub_folder_value(content_type, desc)
                                 if folder_location == "None":
                                     folder_location = model_folder
@@ -719,6 +719,7 @@ def download_create_thread(download_finish, queue_trigger, progress=gr_progress_
                 _file.save_preview(path_to_new_file, item['model_json'], True, item['model_sha256'])
                 if save_all_images:
                     _file.save_images(item['preview_html'], item['model_filename'], item['install_path'], item['sub_folder'], api_response=item['model_json'])
+                _file.library_index().scan(os.path.dirname(path_to_new_file), recursive=False)
                 
     base_name = os.path.splitext(item['model_filename'])[0]
     base_name_preview = base_name + '.preview'
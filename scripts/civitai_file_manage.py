@@ -5,11 +5,11 @@ import urllib.parse
 import urllib.error
 import os
 import io
+import sys
 import re
 import time
 import errno
 import requests
-import hashlib
 import base64
 from PIL import Image
 from pathlib import Path
@@ -44,6 +44,122 @@ except AttributeError:
 except:
     queue = True
 
+library = None
+watcher = None
+
+def library_index():
+    global library
+    if library is None:
+        # The index lives in the standalone app's core package, which only needs the stdlib
+        app_dir = str(Path(__file__).resolve().parents[1] / "app")
+        if app_dir not in sys.path:
+            sys.path.append(app_dir)
+        from core.library_index import LibraryIndex
+        library = LibraryIndex(os.path.join(os.getcwd(), "config_states", LibraryIndex.FILENAME))
+    return library
+
+def indexed_folder(model_folder, content_type=None):
+    index = library_index()
+    index.ensure(model_folder, content_type)
+    watch_folder(model_folder, content_type)
+    return index
+
+def watch_folder(model_folder, content_type=None):
+    global watcher
+    if not getattr(opts, "civitai_watch_folders", True):
+        return
+    if watcher is None:
+        from core.library_watcher import LibraryWatcher
+        watcher = LibraryWatcher(library_index())
+        watcher.start()
+    watcher.add(model_folder, content_type)
+
+class CancelFlag:
+    def is_set(self):
+        return bool(gl.cancel_status)
+
+class ClientSettings:
+    # Settings read by the core API client, filled from the webui options
+    api_key = ""
+    timeout = (60, 30)
+    disable_dns_lookup = False
+    model_dir = os.path.join(os.getcwd(), "models")
+    
+    @property
+    def negative_cache_ttl(self):
+        return int(float(getattr(opts, "civitai_not_found_days", 7)) * 86400)
+    
+    def get_proxy_settings(self):
+        return _api.get_proxies()[0] or None
+    
+    def get_config_dir(self):
+        return os.path.join(os.getcwd(), "config_states")
+
+def send_request(**kwargs):
+    proxies, ssl = _api.get_proxies()
+    kwargs.update(proxies=proxies or None, verify=ssl)
+    api_key = getattr(opts, "custom_api_key", "")
+    if api_key:
+        kwargs['headers']['Authorization'] = f'Bearer {api_key}'
+    return requests.request(**kwargs)
+
+client = None
+
+def civitai_client():
+    global client
+    if client is None:
+        library_index()
+        from core.civitai_api import CivitaiAPI
+        client = CivitaiAPI(settings=ClientSettings(), transport=send_request)
+    if client.cache is not None:
+        client.cache.negative_ttl = client.settings.negative_cache_ttl
+    return client
+
+def scan_library(file_paths, gen_hash, progress=None, fetch_models=True):
+    index = library_index()
+    from core.hashing import HashingEngine
+    from core.library_scanner import LibraryScanner, ScanCancelled
+    engine = HashingEngine(int(getattr(opts, "civitai_hash_workers", 4)), index=index)
+    api = civitai_client()
+    scanner = LibraryScanner(api, index, engine, not_found_ttl=api.settings.negative_cache_ttl)
+    
+    def report(state):
+        if progress == None:
+            return
+        if state['stage'] == "hash":
+            eta = f", {int(state['eta'])}s left" if state['eta'] is not None else ""
+            progress(state['bytes_done'] / max(state['bytes_total'], 1), desc=f"Hashing files: {state['files_done']}/{state['files_total']}{eta}")
+        elif state['stage'] == "lookup":
+            progress(state['lookups_done'] / max(state['lookups_total'], 1), desc=f"Looking up models on CivitAI: {state['lookups_done']}/{state['lookups_total']}")
+        else:
+            progress(0, desc=f"Sending API request for {state['models_total']} models...")
+    
+    try:
+        return scanner.run(file_paths, report, CancelFlag(), hash_missing=bool(gen_hash), fetch_models=fetch_models)
+    except ScanCancelled:
+        return None
+
+def write_model_ids(file_path, modelId, modelVersionId, sha256):
+    json_file = os.path.splitext(file_path)[0] + ".json"
+    data = {}
+    if os.path.exists(json_file):
+        try:
+            with open(json_file, 'r', encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Failed to open {json_file}: {e}")
+            return
+    if data.get('modelId') == modelId and data.get('modelVersionId') == modelVersionId and (data.get('sha256') or '').upper() == sha256.upper():
+        return
+    data['modelId'] = modelId
+    data['modelVersionId'] = modelVersionId
+    data['sha256'] = sha256.upper()
+    try:
+        with open(json_file, 'w', encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+    except Exception as e:
+        print(f"Failed to write {json_file}: {e}")
+
 def delete_model(delete_finish=None, model_filename=None, model_string=None, list_versions=None, sha256=None, selected_list=None, model_ver=None, model_json=None):
     deleted = False
     model_id = None
@@ -75,63 +191,65 @@ def delete_model(delete_finish=None, model_filename=None, model_string=None, lis
     
     model_folder = os.path.join(_api.contenttype_folder(selected_content_type, desc))
     
+    index = indexed_folder(model_folder, selected_content_type)
+    touched_folders = set()
+    
     # Delete based on provided SHA-256 hash
     if sha256:
-        sha256_upper = sha256.upper()
-        for root, _, files in os.walk(model_folder, followlinks=True):
-            for file in files:
-                if file.endswith('.json'):
-                    file_path = os.path.join(root, file)
+        for entry in index.by_sha256(sha256, model_folder):
+            if not entry['name'].lower().endswith('.json'):
+                continue
+            root = entry['folder']
+            file_path = entry['path']
+            try:
+                with open(file_path, 'r', encoding="utf-8") as json_file:
+                    data = json.load(json_file)
+            except Exception as e:
+                print(f"Failed to open: {file_path}: {e}")
+                continue
+                
+            unpack_list = data.get('unpackList', [])
+            for unpacked_file in unpack_list:
+                unpacked_file_path = os.path.join(root, unpacked_file)
+                if os.path.isfile(unpacked_file_path):
                     try:
-                        with open(file_path, 'r', encoding="utf-8") as json_file:
-                            data = json.load(json_file)
-                            file_sha256 = data.get('sha256', '')
-                            if file_sha256:
-                                file_sha256 = file_sha256.upper()
-                    except Exception as e:
-                        print(f"Failed to open: {file_path}: {e}")
-                        file_sha256 = "0"
-                        
-                    if file_sha256 == sha256_upper:
-                        unpack_list = data.get('unpackList', [])
-                        for unpacked_file in unpack_list:
-                            unpacked_file_path = os.path.join(root, unpacked_file)
-                            if os.path.isfile(unpacked_file_path):
-                                try:
-                                    send2trash(unpacked_file_path)
-                                    print(f"File moved to trash based on unpackList: {unpacked_file_path}")
-                                except:
-                                    os.remove(unpacked_file_path)
-                                    print(f"File deleted based on unpackList: {unpacked_file_path}")
-                        
-                        base_name, _ = os.path.splitext(file)
-                        if os.path.isfile(file_path):
-                            try:
-                                send2trash(file_path)
-                                print(f"Model moved to trash based on SHA-256: {file_path}")
-                            except:
-                                os.remove(file_path)
-                                print(f"Model deleted based on SHA-256: {file_path}")
-                            delete_associated_files(root, base_name)
-                            deleted = True
+                        send2trash(unpacked_file_path)
+                        print(f"File moved to trash based on unpackList: {unpacked_file_path}")
+                    except:
+                        os.remove(unpacked_file_path)
+                        print(f"File deleted based on unpackList: {unpacked_file_path}")
+            
+            base_name = entry['stem']
+            if os.path.isfile(file_path):
+                try:
+                    send2trash(file_path)
+                    print(f"Model moved to trash based on SHA-256: {file_path}")
+                except:
+                    os.remove(file_path)
+                    print(f"Model deleted based on SHA-256: {file_path}")
+                delete_associated_files(root, base_name)
+                touched_folders.add(root)
+                deleted = True
 
     # Fallback to delete based on filename if not deleted based on SHA-256
     filename_to_delete = os.path.splitext(model_filename)[0]
     aria2_file = model_filename + ".aria2"
     if not deleted:
-        for root, dirs, files in os.walk(model_folder, followlinks=True):
-            for file in files:
-                current_file_name = os.path.splitext(file)[0]
-                if filename_to_delete == current_file_name or aria2_file == file:
-                    path_file = os.path.join(root, file)
-                    if os.path.isfile(path_file):
-                        try:
-                            send2trash(path_file)
-                            print(f"Model moved to trash based on filename: {path_file}")
-                        except:
-                            os.remove(path_file)
-                            print(f"Model deleted based on filename: {path_file}")
-                        delete_associated_files(root, current_file_name)
+        matches = index.find(stem=filename_to_delete, folder=model_folder) + index.find(filename=aria2_file, folder=model_folder)
+        for entry in matches:
+            path_file = entry['path']
+            if os.path.isfile(path_file):
+                try:
+                    send2trash(path_file)
+                    print(f"Model moved to trash based on filename: {path_file}")
+                except:
+                    os.remove(path_file)
+                    print(f"Model deleted based on filename: {path_file}")
+                delete_associated_files(entry['folder'], entry['stem'])
+                touched_folders.add(entry['folder'])
+
+    for folder in touched_folders:
+        index.scan(folder, selected_content_type, recursive=False)
 
     number = _download.random_number(delete_finish)
 
@@ -293,44 +411,18 @@ def list_files(folders):
 def gen_sha256(file_path):
     json_file = os.path.splitext(file_path)[0] + ".json"
     
-    if os.path.exists(json_file):
-        try:
-            with open(json_file, 'r', encoding="utf-8") as f:
-                data = json.load(f)
-        
-            if 'sha256' in data and data['sha256']:
-                hash_value = data['sha256']
-                return hash_value
-        except Exception as e:
-            print(f"Failed to open {json_file}: {e}")
-        
-    def read_chunks(file, size=io.DEFAULT_BUFFER_SIZE):
-        while True:
-            chunk = file.read(size)
-            if not chunk:
-                break
-            yield chunk
-    
-    blocksize = 1 << 20
-    h = hashlib.sha256()
-    length = 0
-    with open(os.path.realpath(file_path), 'rb') as f:
-        for block in read_chunks(f, size=blocksize):
-            length += len(block)
-            h.update(block)
-
-    hash_value = h.hexdigest()
+    # Cached by device, inode, size and mtime; the sidecar is only trusted if it is not older than the file
+    hash_value = library_index().file_sha256(os.path.realpath(file_path))
     
     if os.path.exists(json_file):
         try:
             with open(json_file, 'r', encoding="utf-8") as f:
                 data = json.load(f)
     
-            if 'sha256' in data and data['sha256']:
+            if (data.get('sha256') or '').upper() != hash_value:
                 data['sha256'] = hash_value
-                
-            with open(json_file, 'w', encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
+                with open(json_file, 'w', encoding="utf-8") as f:
+                    json.dump(data, f, indent=4)
         except Exception as e:
             print(f"Failed to open {json_file}: {e}")
     else:
@@ -781,58 +873,26 @@ def get_models(file_path, gen_hash=None):
         if not sha256 and gen_hash:
             sha256 = gen_sha256(file_path)
         
-        if sha256:
-            by_hash = f"https://civitai.com/api/v1/model-versions/by-hash/{sha256}"
-        else:
+        if not sha256:
             return modelId if modelId else None
 
-    proxies, ssl = _api.get_proxies()
     try:
         if not modelId or not modelVersionId:
-            response = requests.get(by_hash, timeout=(60,30), proxies=proxies, verify=ssl)
-            if response.status_code == 200:
-                api_response = response.json()
-                if 'error' in api_response:
-                    print(f"\"{file_path}\": {api_response['error']}")
-                    return None
-                else:
-                    modelId = api_response.get("modelId", "")
-                    modelVersionId = api_response.get("id", "")
-            elif response.status_code == 503:
-                return "offline"
-            elif response.status_code == 404:
+            # Unknown hashes are remembered by the client, so they are not looked up on every scan
+            api = civitai_client()
+            api_response = api.get_model_version_by_hash(sha256, not_found=api.NOT_FOUND)
+            if api_response is api.NOT_FOUND:
                 modelId = "Model not found"
                 modelVersionId = "Model not found"
-                
-            if os.path.exists(json_file):
-                try:
-                    with open(json_file, 'r', encoding="utf-8") as f:
-                        data = json.load(f)
-
-                    data['modelId'] = modelId
-                    data['modelVersionId'] = modelVersionId
-                    data['sha256'] = sha256.upper()
-                        
-                    with open(json_file, 'w', encoding="utf-8") as f:
-                        json.dump(data, f, indent=4)
-                except Exception as e:
-                    print(f"Failed to open {json_file}: {e}")
+            elif not api_response:
+                return "offline"
             else:
-                data = {
-                    'modelId': modelId,
-                    'modelVersionId': modelVersionId,
-                    'sha256': sha256.upper()
-                    }
-                with open(json_file, 'w', encoding="utf-8") as f:
-                    json.dump(data, f, indent=4)
+                modelId = api_response.get("modelId", "")
+                modelVersionId = api_response.get("id", "")
+                
+            write_model_ids(file_path, modelId, modelVersionId, sha256)
         
         return modelId
-    except requests.exceptions.Timeout:
-        print(f"Request timed out for {file_path}. Skipping...")
-        return "offline"
-    except requests.exceptions.ConnectionError:
-        print("Failed to connect to the API. The CivitAI servers might be offline.")
-        return "offline"
     except Exception as e:
         print(f"An error occurred for {file_path}: {str(e)}")
         return None
@@ -996,32 +1056,39 @@ def file_scan(folders, ver_finish, tag_finish, installed_finish, preview_finish,
     
     not_found_print = getattr(opts, "civitai_not_found_print", True)
     
+    # Hash, look up by hash and fetch the models as one pipeline; the answers are kept in the library index
+    for folder in folders_to_check:
+        indexed_folder(folder)
+    result = scan_library(files, gen_hash, progress, fetch_models=not from_installed)
+    if result == None:
+        if progress != None:
+            progress(0, desc=f"Processing files cancelled.")
+        no_update = True
+        gl.scan_files = False
+        time.sleep(2)
+        return (gr.HTML.update(value='<div style="min-height: 0px;"></div>'),
+                gr.Textbox.update(value=number))
+    
+    offline = False
     for file_path in files:
-        if gl.cancel_status:
-            if progress != None:
-                progress(files_done / total_files, desc=f"Processing files cancelled.")
-            no_update = True
-            gl.scan_files = False
-            time.sleep(2)
-            return (gr.HTML.update(value='<div style="min-height: 0px;"></div>'),
-                    gr.Textbox.update(value=number))
         file_name = os.path.basename(file_path)
-        if progress != None:
-            progress(files_done / total_files, desc=f"Processing file: {file_name}")
-        
-        model_id = get_models(file_path, gen_hash)
-        if model_id == "offline":
-            print("The CivitAI servers did not respond, unable to retrieve Model ID")
-        elif model_id == "Model not found":
-            if not_found_print:
-                print(f"model: \"{file_name}\" not found on CivitAI servers.")
-        elif model_id != None:
+        info = result['files'][file_path]
+        if info['status'] == "found":
+            model_id = info['model_id']
             all_model_ids.append(f"&ids={model_id}")
             all_ids.append(model_id)
             file_paths.append(file_path)
-        elif not model_id:
+            write_model_ids(file_path, model_id, info['version_id'], info['sha256'])
+        elif info['status'] == "not_found":
+            write_model_ids(file_path, "Model not found", "Model not found", info['sha256'])
+            if not_found_print:
+                print(f"model: \"{file_name}\" not found on CivitAI servers.")
+        elif info['status'] == "failed":
+            offline = True
+        else:
             print(f"model ID not found for: \"{file_name}\"")
-        files_done += 1
+    if offline:
+        print("The CivitAI servers did not respond, unable to retrieve Model ID")
         
     all_items = []
 
@@ -1041,48 +1108,8 @@ def file_scan(folders, ver_finish, tag_finish, installed_finish, preview_finish,
             yield lst[i:i + n]
             
     if not from_installed:
-        model_chunks = list(chunks(all_model_ids, 500))
-
-        base_url = "https://civitai.com/api/v1/models?limit=100&nsfw=true"
-        url_list = [f"{base_url}{''.join(chunk)}" for chunk in model_chunks]
-
-        url_count = len(all_model_ids) // 100
-        if len(all_model_ids) % 100 != 0:
-            url_count += 1
-        url_done = 0
         api_response = {}
-        for url in url_list:
-            while url:
-                try:
-                    if progress is not None:
-                        progress(url_done / url_count, desc=f"Sending API request... {url_done}/{url_count}")
-                    response = requests.get(url, timeout=(60,30), proxies=proxies, verify=ssl)
-                    if response.status_code == 200:
-                        api_response_json = response.json()
-
-                        all_items.extend(api_response_json['items'])
-                        metadata = api_response_json.get('metadata', {})
-                        url = metadata.get('nextPage', None)
-                    elif response.status_code == 503:
-                        print(f"Error: Received status code: {response.status_code} with URL: {url}")
-                        print(response.text)
-                        return  (
-                            gr.HTML.update(value=_api.api_error_msg("error")),
-                            gr.Textbox.update(value=number)
-                        )
-                    else:
-                        print(f"Error: Received status code {response.status_code} with URL: {url}")
-                        url = None
-                    url_done += 1
-                except requests.exceptions.Timeout:
-                    print(f"Request timed out for {url}. Skipping...")
-                    url = None
-                except requests.exceptions.ConnectionError:
-                    print("Failed to connect to the API. The servers might be offline.")
-                    url = None
-                except Exception as e:
-                    print(f"An unexpected error occurred: {e}")
-                    url = None
+        all_items = list(result['models'].values())
         
         api_response['items'] = all_items
         if api_response['items'] == []:
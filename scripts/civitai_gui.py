@@ -1278,6 +1278,40 @@ def on_ui_settings():
         )
     )
     
+    shared.opts.add_option(
+        "civitai_hash_workers",
+        shared.OptionInfo(
+            4,
+            "Number of files to hash at the same time",
+            gr.Slider,
+            lambda: {"maximum": "16", "minimum": "1", "step": "1"},
+            section=browser,
+            **({'category_id': cat_id} if ver_bool else {})
+        ).info("Use 4-6 for NVMe drives, 1-2 for hard drives or network storage")
+    )
+    
+    shared.opts.add_option(
+        "civitai_not_found_days",
+        shared.OptionInfo(
+            7,
+            "Days before models not found on CivitAI are looked up again",
+            gr.Slider,
+            lambda: {"maximum": "90", "minimum": "0", "step": "1"},
+            section=browser,
+            **({'category_id': cat_id} if ver_bool else {})
+        ).info("Skips merges and private models on repeated scans. 0 looks them up every time")
+    )
+    
+    shared.opts.add_option(
+        "civitai_watch_folders",
+        shared.OptionInfo(
+            True,
+            "Watch model folders for changes made outside the browser",
+            section=browser,
+            **({'category_id': cat_id} if ver_bool else {})
+        ).info("Keeps installed and update badges current without rescanning. Network folders are checked once a minute")
+    )
+    
     shared.opts.add_option(
         "custom_civitai_proxy",
         shared.OptionInfo(
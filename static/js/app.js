@@ -9,9 +9,27 @@ const state = {
   showNsfw: false,
   downloads: [],
   downloadRefreshInterval: null,
-  currentRefreshRate: 'slow'
+  refreshRateCheckInterval: null,
+  currentRefreshRate: 'slow',
+  // Download control socket, with the Server-Sent Events stream and then
+  // polling as fallbacks
+  downloadSocket: null,
+  downloadSocketFailed: false,
+  socketCommands: new Map(),
+  nextSocketCommandId: 1,
+  downloadStream: null,
+  downloadStreamFailures: 0,
+  // Search pages fetched ahead of time, keyed by query string
+  searchPageCache: new Map(),
+  // Cursors for cursor-paginated results, keyed by page number
+  pageCursors: {}
 };
 
+const SEARCH_PAGE_CACHE_SIZE = 20;
+
+// Stream errors before any message arrives, after which we fall back to polling
+const DOWNLOAD_STREAM_MAX_FAILURES = 3;
+
 // DOM elements
 const elements = {
   // Navigation
@@ -78,7 +96,7 @@ async function init() {
 
   // Decide whether to start auto-refresh based on current page
   if (document.querySelector('.page.active').id === 'downloads') {
-    startDownloadRefresh();
+    startDownloadUpdates();
   }
 }
 
@@ -195,15 +213,11 @@ function showPage(pageId) {
 
   // Manage download refresh based on page type
   if (pageId === 'downloads') {
-    // When switching to downloads page, refresh immediately and start auto-refresh
-    refreshDownloads();
-    startDownloadRefresh();
+    // When switching to downloads page, start live updates
+    startDownloadUpdates();
   } else {
-    // When switching to other pages, stop auto-refresh to save resources
-    if (state.downloadRefreshInterval) {
-      clearInterval(state.downloadRefreshInterval);
-      state.downloadRefreshInterval = null;
-    }
+    // When switching to other pages, stop updates to save resources
+    stopDownloadUpdates();
   }
 }
 
@@ -269,47 +283,94 @@ async function loadBaseModels() {
   }
 }
 
-// Search for models
-async function searchModels() {
-  try {
-    // Show loading state
-    elements.resultsContainer.innerHTML = '<div class="loading">Loading models...</div>';
+// Build the query parameters for a search results page
+function buildSearchParams(page) {
+  const params = new URLSearchParams({
+    page: page,
+    page_size: 20,
+    sort: state.sortBy,
+    nsfw: state.showNsfw
+  });
 
-    // Build query parameters
-    const params = new URLSearchParams({
-      page: state.currentPage,
-      page_size: 20,
-      sort: state.sortBy,
-      nsfw: state.showNsfw
+  // Add search query if present
+  if (elements.searchInput.value) {
+    params.append('query', elements.searchInput.value);
+  }
+
+  // Add selected types if any
+  if (state.selectedTypes.length > 0) {
+    state.selectedTypes.forEach(type => {
+      params.append('type', type);
     });
+  }
 
-    // Add search query if present
-    if (elements.searchInput.value) {
-      params.append('query', elements.searchInput.value);
-    }
+  // Add selected base models if any
+  if (state.selectedBaseModels.length > 0) {
+    state.selectedBaseModels.forEach(model => {
+      params.append('base_model', model);
+    });
+  }
 
-    // Add selected types if any
-    if (state.selectedTypes.length > 0) {
-      state.selectedTypes.forEach(type => {
-        params.append('type', type);
-      });
-    }
+  // Continue from the cursor of the previous page if the API returned one
+  if (state.pageCursors[page]) {
+    params.append('cursor', state.pageCursors[page]);
+  }
 
-    // Add selected base models if any
-    if (state.selectedBaseModels.length > 0) {
-      state.selectedBaseModels.forEach(model => {
-        params.append('base_model', model);
-      });
-    }
+  return params;
+}
 
-    // Make the API request
-    const response = await fetch(`/api/models/search?${params.toString()}`);
+// Fetch a search results page, using a prefetched copy when available
+async function fetchSearchPage(params) {
+  const key = params.toString();
+  if (state.searchPageCache.has(key)) {
+    return state.searchPageCache.get(key);
+  }
 
+  const request = fetch(`/api/models/search?${key}`).then(async response => {
     if (!response.ok) {
       throw new Error(`API returned ${response.status}: ${response.statusText}`);
     }
+    return response.json();
+  });
 
-    const data = await response.json();
+  // Cache the pending request so a click during prefetch reuses it
+  state.searchPageCache.set(key, request);
+  if (state.searchPageCache.size > SEARCH_PAGE_CACHE_SIZE) {
+    state.searchPageCache.delete(state.searchPageCache.keys().next().value);
+  }
+  request.catch(() => state.searchPageCache.delete(key));
+  return request;
+}
+
+// Fetch the next page in the background so paging forward is instant
+function prefetchNextPage() {
+  if (state.currentPage >= state.totalPages) {
+    return;
+  }
+  fetchSearchPage(buildSearchParams(state.currentPage + 1)).catch(error => {
+    console.debug('Prefetching next page failed:', error);
+  });
+}
+
+// Search for models
+async function searchModels() {
+  try {
+    // A new search starts over, so cached pages and cursors are stale
+    if (state.currentPage === 1) {
+      state.pageCursors = {};
+      state.searchPageCache.clear();
+    }
+
+    // Build query parameters
+    const params = buildSearchParams(state.currentPage);
+
+    // Show loading state unless the page was already prefetched
+    if (!state.searchPageCache.has(params.toString())) {
+      elements.resultsContainer.innerHTML = '<div class="loading">Loading models...</div>';
+    }
+
+    // Make the API request
+    const data = await fetchSearchPage(params);
 
     // Check if data has the expected format
     if (!data || !data.metadata || !data.items) {
@@ -318,6 +379,9 @@ async function searchModels() {
 
     // Update state
     state.totalPages = data.metadata.totalPages || 1;
+    if (data.metadata.nextCursor) {
+      state.pageCursors[state.currentPage + 1] = data.metadata.nextCursor;
+    }
 
     // Update pagination
     elements.pageInfo.textContent = `Page ${state.currentPage} of ${state.totalPages}`;
@@ -326,6 +390,8 @@ async function searchModels() {
 
     // Render results
     renderSearchResults(data.items);
+
+    prefetchNextPage();
   } catch (error) {
     console.error('Error searching models:', error);
     elements.resultsContainer.innerHTML = '<div class="error">Error loading models. Please try again.</div>';
@@ -625,12 +691,158 @@ async function refreshDownloads() {
   }
 }
 
+// Sort downloads newest first, like the server does
+function sortDownloads(downloads) {
+  return downloads.sort((a, b) => (b.created_at || 0) - (a.created_at || 0));
+}
+
+// Apply a delta event from the download stream
+function applyDownloadDelta(delta) {
+  const byId = new Map(state.downloads.map(download => [download.id, download]));
+  (delta.remove || []).forEach(id => byId.delete(id));
+  (delta.upsert || []).forEach(download => byId.set(download.id, download));
+  state.downloads = sortDownloads(Array.from(byId.values()));
+  renderDownloads(state.downloads);
+}
+
+// Start live download updates: control socket, then event stream, then polling
+function startDownloadUpdates() {
+  if (window.WebSocket && !state.downloadSocketFailed) {
+    openDownloadSocket();
+    return;
+  }
+  startDownloadStream();
+}
+
+// Open the control socket carrying download events and queue commands
+function openDownloadSocket() {
+  if (state.downloadSocket) {
+    return;
+  }
+
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+  const socket = new WebSocket(`${protocol}//${window.location.host}/api/ws`);
+  state.downloadSocket = socket;
+  let opened = false;
+
+  socket.onopen = () => {
+    opened = true;
+  };
+
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    if (message.type === 'snapshot') {
+      state.downloads = sortDownloads(message.tasks || []);
+      renderDownloads(state.downloads);
+    } else if (message.type === 'delta') {
+      applyDownloadDelta(message);
+    } else if (message.type === 'reply') {
+      const pending = state.socketCommands.get(message.id);
+      if (pending) {
+        state.socketCommands.delete(message.id);
+        pending.resolve(message);
+      }
+    }
+  };
+
+  socket.onclose = () => {
+    if (state.downloadSocket === socket) {
+      state.downloadSocket = null;
+    }
+    state.socketCommands.forEach(pending => pending.reject(new Error('Connection closed')));
+    state.socketCommands.clear();
+
+    if (!opened) {
+      console.warn('Download socket unavailable, falling back to event stream');
+      state.downloadSocketFailed = true;
+    }
+    // Reconnect (or fall back) while the downloads page is open
+    if (socket.keepOpen !== false && document.querySelector('.page.active').id === 'downloads') {
+      setTimeout(startDownloadUpdates, opened ? 3000 : 0);
+    }
+  };
+}
+
+// Send a queue command over the control socket; resolves to null if the socket is not open
+function sendDownloadCommand(op, fields = {}) {
+  const socket = state.downloadSocket;
+  if (!socket || socket.readyState !== WebSocket.OPEN) {
+    return Promise.resolve(null);
+  }
+  const id = state.nextSocketCommandId++;
+  return new Promise((resolve, reject) => {
+    state.socketCommands.set(id, { resolve, reject });
+    socket.send(JSON.stringify({ id, op, ...fields }));
+  });
+}
+
+// Start the Server-Sent Events stream, falling back to polling
+function startDownloadStream() {
+  if (!window.EventSource || state.downloadStreamFailures >= DOWNLOAD_STREAM_MAX_FAILURES) {
+    startDownloadRefresh();
+    return;
+  }
+  if (state.downloadStream) {
+    return;
+  }
+
+  const stream = new EventSource('/api/downloads/stream');
+  state.downloadStream = stream;
+
+  stream.addEventListener('snapshot', (event) => {
+    state.downloadStreamFailures = 0;
+    state.downloads = sortDownloads(JSON.parse(event.data).tasks || []);
+    renderDownloads(state.downloads);
+  });
+
+  stream.addEventListener('delta', (event) => {
+    applyDownloadDelta(JSON.parse(event.data));
+  });
+
+  stream.onerror = () => {
+    // The browser reconnects by itself; give up only if the stream keeps failing
+    state.downloadStreamFailures += 1;
+    if (stream.readyState === EventSource.CLOSED
+        || state.downloadStreamFailures >= DOWNLOAD_STREAM_MAX_FAILURES) {
+      console.warn('Download stream unavailable, falling back to polling');
+      stream.close();
+      state.downloadStream = null;
+      startDownloadRefresh();
+    }
+  };
+}
+
+// Stop live download updates
+function stopDownloadUpdates() {
+  if (state.downloadSocket) {
+    state.downloadSocket.keepOpen = false;
+    state.downloadSocket.close();
+    state.downloadSocket = null;
+  }
+  if (state.downloadStream) {
+    state.downloadStream.close();
+    state.downloadStream = null;
+  }
+  if (state.downloadRefreshInterval) {
+    clearInterval(state.downloadRefreshInterval);
+    state.downloadRefreshInterval = null;
+  }
+  if (state.refreshRateCheckInterval) {
+    clearInterval(state.refreshRateCheckInterval);
+    state.refreshRateCheckInterval = null;
+  }
+}
+
 // Start automatic refresh of download queue
 function startDownloadRefresh() {
-  // Clear any existing interval
+  // Clear any existing intervals
   if (state.downloadRefreshInterval) {
     clearInterval(state.downloadRefreshInterval);
   }
+  if (state.refreshRateCheckInterval) {
+    clearInterval(state.refreshRateCheckInterval);
+  }
+  state.currentRefreshRate = null;
 
   // Refresh immediately
   refreshDownloads();
@@ -665,7 +877,7 @@ function startDownloadRefresh() {
   checkAndAdjustRefreshRate();
 
   // Set up periodic check of refresh rate
-  setInterval(checkAndAdjustRefreshRate, 5000); // Check every 5 seconds if refresh rate needs adjustment
+  state.refreshRateCheckInterval = setInterval(checkAndAdjustRefreshRate, 5000); // Check every 5 seconds if refresh rate needs adjustment
 }
 
 // Render downloads list
@@ -785,6 +997,15 @@ function renderDownloads(downloads) {
 // Cancel a download
 async function cancelDownload(taskId) {
   try {
+    // Prefer the control socket; its events update the list
+    const reply = await sendDownloadCommand('cancel', { task_id: taskId });
+    if (reply) {
+      if (!reply.ok) {
+        throw new Error(reply.error || 'Failed to cancel download');
+      }
+      return;
+    }
+
     const response = await fetch(`/api/downloads/${taskId}`, {
       method: 'DELETE'
     });
@@ -883,16 +1104,23 @@ async function clearDownloadHistory() {
       return;
     }
 
-    const response = await fetch('/api/downloads/history', {
-      method: 'DELETE'
-    });
+    const reply = await sendDownloadCommand('clear_history');
+    if (reply) {
+      if (!reply.ok) {
+        throw new Error(reply.error || 'Failed to clear history');
+      }
+    } else {
+      const response = await fetch('/api/downloads/history', {
+        method: 'DELETE'
+      });
 
-    if (!response.ok) {
-      throw new Error('Failed to clear history');
-    }
+      if (!response.ok) {
+        throw new Error('Failed to clear history');
+      }
 
-    // Refresh download list
-    refreshDownloads();
+      // Refresh download list
+      refreshDownloads();
+    }
 
     alert('Download history has been cleared');
   } catch (error) {